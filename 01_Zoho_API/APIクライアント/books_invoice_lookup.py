@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Zoho Books 請求書 reference_number 検索
+商談IDを reference_number に持つ請求書を、全請求書の走査ではなく
+サーバー側のフィルタ（reference_number / reference_number_contains）で並列に取得する
+
+- Books APIは組織あたり毎分100リクエスト程度の制限があるため、ID1件ずつではなく
+  共通の接頭辞（CRMのIDは採番順に先頭桁が揃う）で reference_number_contains にまとめ、
+  クエリ数を max_queries 以下に抑える
+- 接頭辞に1件しか属さないIDは reference_number の完全一致で問い合わせる
+- まとめ検索の結果には対象外の請求書も含まれるため、対象IDだけをローカルで絞り込む
+- 取得結果は reference_number → 請求書リスト のインデックスに保持し、
+  同じIDの再検索ではAPIを呼ばない（エラーで取得できなかったIDは再検索時に取り直す）
+"""
+
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+BOOKS_INVOICES_URL = "https://www.zohoapis.com/books/v3/invoices"
+
+
+class BooksInvoiceLookup:
+    """reference_number をキーにした請求書検索とローカルインデックス"""
+
+    def __init__(self, session, headers, org_id, max_workers=4, max_queries=20, min_prefix_length=10, per_page=200):
+        """
+        Args:
+            session (ZohoSession): Books用のリトライ付きセッション
+            headers (dict): 認証ヘッダー
+            org_id (str): Books組織ID
+            max_workers (int): 同時に実行するクエリ数
+            max_queries (int): 1回の検索で発行するクエリ数の目安（接頭辞を短くして収める）
+            min_prefix_length (int): まとめ検索に使う接頭辞の最短桁数
+            per_page (int): 1ページの件数
+        """
+        self.session = session
+        self.headers = headers
+        self.org_id = org_id
+        self.max_workers = max_workers
+        self.max_queries = max_queries
+        self.min_prefix_length = min_prefix_length
+        self.per_page = per_page
+
+        self.index = defaultdict(list)
+        self._resolved = set()
+        self._seen_invoice_ids = set()
+        self.request_count = 0
+
+    def lookup(self, reference_numbers):
+        """
+        reference_number ごとの請求書を返す（未取得のIDのみAPIに問い合わせる）
+
+        Returns:
+            dict: {reference_number: [請求書, ...]}（請求書がないIDは空リスト）
+        """
+        wanted = {str(ref).strip() for ref in reference_numbers if ref}
+        pending = wanted - self._resolved
+        if pending:
+            self._fetch(pending)
+        return {ref: self.index.get(ref, []) for ref in wanted}
+
+    def invoices_for(self, reference_number):
+        """インデックス済みの請求書（未取得ならAPIに問い合わせる）"""
+        return self.lookup([reference_number])[str(reference_number).strip()]
+
+    def plan(self, reference_numbers):
+        """
+        クエリ数が max_queries 以下になるまで接頭辞を短くしてIDをまとめる
+
+        Returns:
+            list: [('reference_number_contains', 接頭辞) or ('reference_number', ID), ...]
+        """
+        refs = sorted(reference_numbers)
+        length = max(len(ref) for ref in refs)
+        while True:
+            groups = defaultdict(list)
+            for ref in refs:
+                groups[ref[:length]].append(ref)
+            if len(groups) <= self.max_queries or length <= self.min_prefix_length:
+                break
+            length -= 1
+
+        queries = []
+        for prefix, members in sorted(groups.items()):
+            if len(members) == 1:
+                queries.append(('reference_number', members[0]))
+            else:
+                queries.append(('reference_number_contains', prefix))
+        return queries
+
+    def _fetch(self, pending):
+        queries = self.plan(pending)
+        batched = sum(1 for param, _ in queries if param == 'reference_number_contains')
+        print(f"  🔎 reference_number検索: 対象ID {len(pending)}件 → "
+              f"{len(queries)}クエリ（接頭辞まとめ{batched}件 / 個別{len(queries) - batched}件）")
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = executor.map(lambda query: self._query(*query), queries)
+            for (param, value), (invoices, requests_made, complete) in zip(queries, results):
+                self.request_count += requests_made
+                for invoice in invoices:
+                    self._add(invoice)
+                # 全ページ取得できたクエリの対象IDだけを取得済みにする（失敗したIDは次回の検索で取り直す）
+                if not complete:
+                    continue
+                if param == 'reference_number':
+                    self._resolved.add(value)
+                else:
+                    self._resolved.update(ref for ref in pending if ref.startswith(value))
+
+    def _query(self, param, value):
+        """1つのフィルタ条件で全ページを取得し、(請求書, リクエスト数, 全ページ取得できたか) を返す"""
+        invoices = []
+        page = 1
+        while True:
+            params = {
+                'organization_id': self.org_id,
+                param: value,
+                'per_page': self.per_page,
+                'page': page
+            }
+            try:
+                response = self.session.get(BOOKS_INVOICES_URL, headers=self.headers, params=params)
+            except Exception as e:
+                print(f"  ❌ 請求書検索エラー ({param}={value}): {e}")
+                return invoices, page, False
+            if response.status_code != 200:
+                print(f"  ❌ 請求書検索エラー ({param}={value}): {response.status_code}")
+                return invoices, page, False
+
+            data = response.json()
+            invoices.extend(data.get('invoices', []))
+            if not data.get('page_context', {}).get('has_more_page', False):
+                return invoices, page, True
+            page += 1
+
+    def _add(self, invoice):
+        invoice_id = invoice.get('invoice_id')
+        if invoice_id in self._seen_invoice_ids:
+            return
+        self._seen_invoice_ids.add(invoice_id)
+        ref = (invoice.get('reference_number') or '').strip()
+        if ref:
+            self.index[ref].append(invoice)
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Zoho CRM 一括読み取り（Bulk Read API）
+通常のレコード取得APIは1回200件・実質2,000件程度が上限のため、全期間の商談や
+商品内訳は一括読み取りジョブ（1ジョブ最大200,000件）で取得する
+
+処理の流れ:
+    1. POST /crm/bulk/v2/read          条件・項目を指定してジョブ作成（50クレジット）
+    2. GET  /crm/bulk/v2/read/{job}    COMPLETED になるまでポーリング
+    3. GET  /crm/bulk/v2/read/{job}/result   ZIP（CSV1ファイル）をダウンロード
+    4. more_records が true なら page を進めて次のジョブを作成
+
+- ZIPはストリーミングでファイルに保存し、CSVはZIPから1行ずつ読み出すため、
+  件数が多くても全件をメモリに展開しない
+- 参照項目は "Owner.name" のような列を {'Owner': {'name': ...}} に畳み込み、
+  通常APIのレコードと同じ形で既存の紐づけ・フィルタ処理へ渡せるようにする
+- 空文字は None、numeric_fields に指定した列は数値に変換する
+"""
+
+import csv
+import io
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+BULK_READ_PATH = "/crm/bulk/v2/read"
+# 結果ZIPをファイルへ書き出す単位（バイト）
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class BulkReadError(Exception):
+    """一括読み取りジョブの作成・実行・ダウンロードの失敗"""
+
+
+def build_criteria(*conditions):
+    """
+    (項目API名, 比較演算子, 値) の組から一括読み取り用の criteria を作る
+
+    例: build_criteria(('Closing_Date', 'greater_equal', '2025-04-01'), ('Stage', 'equal', '受注'))
+    """
+    group = [{'api_name': api_name, 'comparator': comparator, 'value': value}
+             for api_name, comparator, value in conditions]
+    if not group:
+        return None
+    if len(group) == 1:
+        return group[0]
+    return {'group_operator': 'and', 'group': group}
+
+
+def _convert_row(row, numeric_fields):
+    record = {}
+    for column, value in row.items():
+        if value == '':
+            value = None
+        elif column in numeric_fields:
+            try:
+                value = float(value) if '.' in value else int(value)
+            except ValueError:
+                pass
+
+        if '.' in column:
+            parent, child = column.split('.', 1)
+            nested = record.get(parent)
+            if not isinstance(nested, dict):
+                nested = {'id': nested} if nested is not None else {}
+                record[parent] = nested
+            nested[child] = value
+        elif isinstance(record.get(column), dict):
+            record[column].setdefault('id', value)
+        else:
+            record[column] = value
+    return record
+
+
+class CRMBulkReader:
+    """CRM一括読み取りジョブの作成・ポーリング・ダウンロード"""
+
+    def __init__(self, session, headers, api_domain="https://www.zohoapis.com",
+                 poll_interval=5.0, timeout=1800.0, download_dir=None):
+        """
+        Args:
+            session (ZohoSession): CRM用のリトライ付きセッション
+            headers (dict): 認証ヘッダー
+            api_domain (str): CRMのAPIドメイン
+            poll_interval (float): ジョブ状態の確認間隔（秒）
+            timeout (float): 1ジョブの完了を待つ上限（秒）
+            download_dir (Path): ZIPの一時保存先（省略時は一時ディレクトリ）
+        """
+        self.session = session
+        self.headers = headers
+        self.api_domain = api_domain.rstrip('/')
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.download_dir = Path(download_dir) if download_dir else None
+        self.jobs = []
+
+    def submit(self, module, fields=None, criteria=None, page=1):
+        """ジョブを作成してジョブIDを返す（fields省略時は全項目）"""
+        query = {'module': module, 'page': page}
+        if fields:
+            query['fields'] = list(fields)
+        if criteria:
+            query['criteria'] = criteria
+
+        response = self.session.post(f"{self.api_domain}{BULK_READ_PATH}", headers=self.headers,
+                                     json={'query': query}, timeout=30)
+        if response.status_code not in (200, 201):
+            raise BulkReadError(f"ジョブ作成エラー ({module} page {page}): {response.status_code} {response.text[:200]}")
+
+        job_id = response.json()['data'][0]['details']['id']
+        self.jobs.append(job_id)
+        print(f"  📤 一括読み取りジョブ作成: {module} page {page}（ジョブID: {job_id}）")
+        return job_id
+
+    def wait(self, job_id):
+        """ジョブ完了まで待機し、result（download_url / count / more_records）を返す"""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            response = self.session.get(f"{self.api_domain}{BULK_READ_PATH}/{job_id}",
+                                        headers=self.headers, timeout=30)
+            if response.status_code != 200:
+                raise BulkReadError(f"ジョブ状態取得エラー ({job_id}): {response.status_code}")
+
+            job = response.json()['data'][0]
+            state = job.get('state')
+            if state == 'COMPLETED':
+                return job.get('result', {})
+            if state == 'FAILURE':
+                raise BulkReadError(f"ジョブ失敗 ({job_id}): {job.get('result') or job}")
+            if time.monotonic() > deadline:
+                raise BulkReadError(f"ジョブが{self.timeout:.0f}秒以内に完了しませんでした ({job_id}, 状態: {state})")
+
+            print(f"  ⏳ ジョブ {job_id}: {state}")
+            time.sleep(self.poll_interval)
+
+    def download(self, job_id, result):
+        """結果ZIPを保存してパスを返す"""
+        url = result.get('download_url') or f"{BULK_READ_PATH}/{job_id}/result"
+        if url.startswith('/'):
+            url = f"{self.api_domain}{url}"
+
+        # ZIPは数百MBになるため、本文をメモリに読み込まずチャンクごとにファイルへ書き出す
+        response = self.session.get(url, headers=self.headers, timeout=300, stream=True)
+        try:
+            if response.status_code != 200:
+                raise BulkReadError(f"結果ダウンロードエラー ({job_id}): {response.status_code}")
+
+            directory = self.download_dir or Path(tempfile.gettempdir())
+            directory.mkdir(parents=True, exist_ok=True)
+            path = directory / f"bulk_read_{job_id}.zip"
+            temp_file = path.with_suffix('.part')
+            with open(temp_file, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+            temp_file.replace(path)
+        finally:
+            response.close()
+        return path
+
+    def iter_zip_rows(self, path, numeric_fields=()):
+        """ZIP内のCSVを1行ずつレコードとして返す"""
+        numeric_fields = set(numeric_fields)
+        with zipfile.ZipFile(path) as archive:
+            for name in archive.namelist():
+                if not name.lower().endswith('.csv'):
+                    continue
+                with archive.open(name) as raw:
+                    reader = csv.DictReader(io.TextIOWrapper(raw, encoding='utf-8-sig', newline=''))
+                    for row in reader:
+                        yield _convert_row(row, numeric_fields)
+
+    def iter_records(self, module, fields=None, criteria=None, numeric_fields=(), keep_files=False):
+        """
+        モジュールの該当レコードを全件、1件ずつ返す（200,000件を超える場合は次ページのジョブを自動作成）
+
+        Args:
+            module (str): モジュールAPI名（Deals / Deal_Products 等）
+            fields (list): 取得する項目API名（省略時は全項目）
+            criteria (dict): build_criteria で作った条件
+            numeric_fields (iterable): 数値に変換する列
+            keep_files (bool): ダウンロードしたZIPを残すか
+        """
+        page = 1
+        while True:
+            job_id = self.submit(module, fields, criteria, page)
+            result = self.wait(job_id)
+            path = self.download(job_id, result)
+            print(f"  📥 ジョブ {job_id}: {result.get('count', '?')}件をダウンロード")
+
+            try:
+                yield from self.iter_zip_rows(path, numeric_fields)
+            finally:
+                if not keep_files:
+                    path.unlink(missing_ok=True)
+
+            if not result.get('more_records'):
+                return
+            page += 1
+
+    def fetch_all(self, module, fields=None, criteria=None, numeric_fields=()):
+        """iter_records の結果をリストで返す"""
+        records = list(self.iter_records(module, fields, criteria, numeric_fields))
+        print(f"  ✅ 一括読み取り完了: {module} {len(records)}件（ジョブ{len(self.jobs)}件）")
+        return records
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+再開可能なページ取得ジャーナル
+CRM/Booksの長いページング取得で、取得したページを1行ずつJSONLへ追記し、
+途中でエラーやトークン切れが起きても次回の実行で最後に確定したページの続きから再開する
+
+ジャーナルの形式（1行1JSON）:
+    {"job": 名前, "params": 取得条件, "created_at": ...}                        ← 先頭行
+    {"page": 取得したカーソル, "next": 次のカーソル, "records": [...], "saved_at": ...}
+
+- 各行は書き込み後に fsync するため、確定したページは中断後も残る
+- 書き込み途中で中断した末尾行（JSONとして読めない行）は未確定として読み飛ばす
+- 取得条件（params）が前回と異なる場合は再開せず最初から取得し直す
+- 完了済みのジャーナルは reuse_hours 以内なら再取得せずそのまま使う
+- 再開時に同じページを取り直してもレコードはIDで重複排除する（IDのないレコードはそのまま残す）
+"""
+
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+
+DEFAULT_JOURNAL_DIR = Path(__file__).parent.parent.parent / "logs" / "journals"
+
+
+class ExtractionJournal:
+    """1つの取得ジョブのページ単位ジャーナル"""
+
+    def __init__(self, name, params=None, id_field='id', journal_dir=None, reuse_hours=12):
+        """
+        Args:
+            name (str): ジョブ名（ファイル名に使用）
+            params (dict): 取得条件（前回と異なれば最初から取得し直す）
+            id_field (str): 重複排除に使うレコードのIDフィールド
+            journal_dir (Path): 保存先（既定: logs/journals）
+            reuse_hours (float): 完了済みジャーナルを再利用する時間
+        """
+        self.name = name
+        self.params = params or {}
+        self.id_field = id_field
+        self.reuse_hours = reuse_hours
+        self.path = Path(journal_dir or DEFAULT_JOURNAL_DIR) / f"{name}.jsonl"
+        self.pages = []
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+
+        entries = []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # 書き込み途中の末尾行は切り捨て、続きを追記できる状態に戻す
+                with open(self.path, 'w', encoding='utf-8') as f:
+                    f.writelines(json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries)
+                break
+
+        if not entries:
+            return
+        if entries[0].get('params') != self.params:
+            print(f"  ⚠️ ジャーナルの取得条件が異なるため最初から取得します: {self.path.name}")
+            return
+        self.pages = entries[1:]
+
+        if self.complete and time.time() - self.path.stat().st_mtime > self.reuse_hours * 3600:
+            print(f"  ⚠️ 完了済みジャーナルが{self.reuse_hours}時間以上前のため最初から取得します: {self.path.name}")
+            self.pages = []
+
+    @property
+    def complete(self):
+        return bool(self.pages) and self.pages[-1].get('next') is None
+
+    def next_cursor(self, start):
+        """次に取得するカーソル（完了済みならNone、未取得なら start）"""
+        if not self.pages:
+            return start
+        return self.pages[-1].get('next')
+
+    def reset(self):
+        """ジャーナルを空にして先頭行を書き直す"""
+        self.pages = []
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({
+                'job': self.name,
+                'params': self.params,
+                'created_at': datetime.now().isoformat()
+            }, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def append_page(self, page, records, next_cursor):
+        """取得したページを確定させる（next_cursor=None で完了）"""
+        entry = {
+            'page': page,
+            'next': next_cursor,
+            'records': records,
+            'saved_at': datetime.now().isoformat()
+        }
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.pages.append(entry)
+
+    def records(self):
+        """
+        確定済みの全レコード（IDで重複排除、後から取得したものを優先し順序は初出順）
+        IDのないレコード（集計行など）は重複排除せずすべて残す
+        """
+        records = []
+        positions = {}
+        for entry in self.pages:
+            for record in entry['records']:
+                key = record.get(self.id_field)
+                if key is None:
+                    records.append(record)
+                elif key in positions:
+                    records[positions[key]] = record
+                else:
+                    positions[key] = len(records)
+                    records.append(record)
+        return records
+
+    def record_count(self):
+        return sum(len(entry['records']) for entry in self.pages)
+
+
+def run_extraction(journal, fetch_page, start=1):
+    """
+    ジャーナルの続きからページ取得を実行し、重複排除済みの全レコードを返す
+
+    Args:
+        journal (ExtractionJournal): 取得ジャーナル
+        fetch_page (callable): fetch_page(cursor) -> (records, next_cursor or None)
+            例外を送出した場合はそれまでに確定したページを残して中断する
+        start: 最初のカーソル（ページ番号やページトークン）
+
+    Returns:
+        list: 全レコード
+    """
+    cursor = journal.next_cursor(start)
+    if cursor is None:
+        print(f"  ⏭️ 取得済みのジャーナルを使用: {journal.path.name}（{journal.record_count()}件）")
+        return journal.records()
+
+    if journal.pages:
+        print(f"  🔁 ジャーナルから再開: {journal.path.name} "
+              f"（確定済み{len(journal.pages)}ページ・{journal.record_count()}件、カーソル {cursor} から）")
+    else:
+        journal.reset()
+
+    try:
+        while cursor is not None:
+            records, next_cursor = fetch_page(cursor)
+            journal.append_page(cursor, records, next_cursor)
+            cursor = next_cursor
+    except Exception:
+        print(f"  ⚠️ カーソル {cursor} で中断しました。再実行すると確定済みの"
+              f"{len(journal.pages)}ページの続きから再開します")
+        raise
+
+    return journal.records()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CRM 取得項目（fields）プロジェクション レジストリ
+分析ごとに必要な項目をモジュール単位で宣言し、キャッシュ済みスキーマ
+（07_スキーマ情報/zoho_crm_schema.json）に存在する項目か検証する
+（検証は python field_projection.py とユニットテストで行い、分析の実行時はスキーマを読み込まない）
+
+- ZohoSession(projection=...) に渡すと、CRMのレコード取得（一覧・検索・ID指定）で
+  fields が指定されていないリクエストに宣言済みの項目を自動で付ける
+- 自動で付けたリクエストのレコードは ProjectedRecord になり、宣言していない項目を読むと
+  項目ごとに1回だけ警告する（取得していないため常に空になる）
+- id と $ で始まるシステム項目は常に返るため宣言不要
+
+使い方:
+    python field_projection.py    全プロジェクションの検証と項目数の削減率を表示
+"""
+
+import json
+import re
+import sys
+from functools import lru_cache
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+SCHEMA_FILE = Path(__file__).parent.parent.parent / "07_スキーマ情報" / "zoho_crm_schema.json"
+
+# CRMが常に返す項目（宣言・検証の対象外）
+IMPLICIT_FIELDS = {'id'}
+
+# 分析ごとの取得項目 {分析名: {モジュールAPI名: [項目API名, ...]}}
+PROJECTIONS = {
+    # 11_請求書チェック/correct_invoice_leakage_analyzer.py
+    'correct_invoice_leakage': {
+        'Deals': ['Deal_Name', 'Account_Name', 'Amount', 'Stage', 'Closing_Date', 'field78'],
+    },
+    # 11_請求書チェック/complete_jt_etp_analysis.py
+    'complete_jt_etp': {
+        'Deals': ['Deal_Name', 'Amount', 'Stage', 'Closing_Date', 'Created_Time', 'Modified_Time', 'field78'],
+    },
+    # 11_請求書チェック/get_jt_etp_complete_531_deals.py
+    'jt_etp_children': {
+        'Deals': ['Deal_Name', 'Amount', 'Stage', 'Closing_Date', 'field78'],
+    },
+    # 11_請求書チェック/comprehensive_pattern_analysis.py
+    'comprehensive_pattern': {
+        'Deals': ['Deal_Name', 'Account_Name', 'Amount', 'Stage', 'Closing_Date', 'field78'],
+    },
+    # 11_請求書チェック/final_comprehensive_summary.py
+    'final_summary': {
+        'Deals': ['Deal_Name', 'Account_Name', 'Amount', 'Stage', 'Closing_Date', 'field78'],
+    },
+    # 03_商談・粗利率/実行スクリプト/extract_deal_products_data.py
+    'deal_products_export': {
+        'Deal_Products': ['Name', 'Deal', 'Unit_Price', 'Number', 'Subtotal', 'Purchase_Price',
+                          'Purchase_Price_Amount', 'Currency', 'Type', 'Owner', 'Account', 'Contact',
+                          'Created_Time', 'Modified_Time', 'Email', 'field1', 'field2', 'field98', 'field'],
+    },
+}
+
+# fields を付けるCRMのレコード取得パス（/crm/v2/{モジュール}、/search、/{レコードID}）
+_RECORDS_PATH = re.compile(r'/crm/v[\d.]+/(?P<module>[A-Za-z][\w]*)(?:/search|/\d+)?/?$')
+_NON_RECORD_MODULES = {'settings', 'coql', 'bulk', 'users', 'org'}
+
+
+class ProjectionError(ValueError):
+    """スキーマに存在しない項目・モジュールを宣言した"""
+
+
+@lru_cache(maxsize=None)
+def load_schema_fields(schema_file=SCHEMA_FILE):
+    """スキーマから {モジュールAPI名: {項目API名: データ型}} を読み込む（プロセス内でキャッシュ）"""
+    with open(schema_file, 'r', encoding='utf-8') as f:
+        schema = json.load(f)
+    return {
+        module['api_name']: {field['api_name']: field.get('data_type') for field in module.get('fields', [])}
+        for module in schema.get('modules', [])
+    }
+
+
+def records_module(url):
+    """CRMのレコード取得URLならモジュールAPI名を返す（それ以外はNone）"""
+    match = _RECORDS_PATH.search(urlparse(url).path)
+    if not match or match.group('module').lower() in _NON_RECORD_MODULES:
+        return None
+    return match.group('module')
+
+
+class ProjectedRecord(dict):
+    """宣言外の項目を読んだときに警告するレコード（中身は通常のdict）"""
+
+    __slots__ = ('_projection', '_module')
+
+    def __init__(self, data, projection, module):
+        super().__init__(data)
+        self._projection = projection
+        self._module = module
+
+    def __missing__(self, key):
+        self._projection.check_read(self._module, key)
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key not in self:
+            self._projection.check_read(self._module, key)
+        return super().get(key, default)
+
+    def __reduce__(self):
+        # プロセス間受け渡し・コピーでは通常のdictに戻す
+        return (dict, (dict(self),))
+
+
+class FieldProjection:
+    """1つの分析の取得項目"""
+
+    def __init__(self, name, modules, schema_file=SCHEMA_FILE, log=print, validate=False):
+        """
+        Args:
+            name (str): 分析名
+            modules (dict): {モジュールAPI名: [項目API名, ...]}
+            schema_file (Path): 検証に使うスキーマ
+            log (callable): 警告の出力先
+            validate (bool): 作成時にスキーマで検証するか（スキーマJSONは2MB以上あるため、
+                分析の実行時は読み込まず、python field_projection.py・テストで検証する）
+
+        Raises:
+            ProjectionError: validate=True でスキーマにないモジュール・項目を含む場合
+        """
+        self.name = name
+        self.log = log
+        self.schema_file = schema_file
+        self.fields = {module: list(dict.fromkeys(f for f in fields if f not in IMPLICIT_FIELDS))
+                       for module, fields in modules.items()}
+        self.unprojected_reads = {}
+        if validate:
+            self.validate()
+
+    def validate(self):
+        """
+        宣言した項目がスキーマに存在するか検証する
+
+        Raises:
+            ProjectionError: スキーマにないモジュール・項目を含む場合
+        """
+        schema = load_schema_fields(self.schema_file)
+        for module, fields in self.fields.items():
+            if module not in schema:
+                raise ProjectionError(f"{self.name}: モジュール {module} はスキーマにありません")
+            unknown = [f for f in fields if f not in schema[module]]
+            if unknown:
+                raise ProjectionError(f"{self.name}: {module} に存在しない項目 {', '.join(unknown)}")
+
+    @classmethod
+    def for_analysis(cls, name, **kwargs):
+        """PROJECTIONS に登録済みの分析のプロジェクション"""
+        if name not in PROJECTIONS:
+            raise ProjectionError(f"未登録の分析です: {name}")
+        return cls(name, PROJECTIONS[name], **kwargs)
+
+    def fields_param(self, module):
+        """fields パラメータの値（'id,Deal_Name,...'）"""
+        return ','.join(['id'] + self.fields[module])
+
+    def allows(self, module, field):
+        return (field in IMPLICIT_FIELDS or field.startswith('$')
+                or module not in self.fields or field in self.fields[module])
+
+    def inject(self, url, params=None):
+        """
+        CRMのレコード取得なら fields を付ける
+
+        Returns:
+            tuple: (params, モジュールAPI名)。対象外のURL・未宣言のモジュール・
+            fields指定済みの場合は (元のparams, None)
+        """
+        module = records_module(url)
+        if module not in self.fields:
+            return params, None
+        if (params and 'fields' in params) or 'fields' in parse_qs(urlparse(url).query):
+            return params, None
+        injected = dict(params or {})
+        injected['fields'] = self.fields_param(module)
+        return injected, module
+
+    def wrap_records(self, module, records):
+        return [ProjectedRecord(record, self, module) if isinstance(record, dict) else record
+                for record in records]
+
+    def attach(self, module, response):
+        """レスポンスの json() が data 内のレコードを ProjectedRecord で返すようにする"""
+        if response.status_code != 200:
+            return response
+        load_json = response.json
+
+        def projected_json(**kwargs):
+            payload = load_json(**kwargs)
+            if isinstance(payload, dict) and isinstance(payload.get('data'), list):
+                payload['data'] = self.wrap_records(module, payload['data'])
+            return payload
+
+        response.json = projected_json
+        return response
+
+    def check_read(self, module, field):
+        """宣言外の項目の読み取りを記録し、初回のみ警告する"""
+        if self.allows(module, field):
+            return
+        key = (module, field)
+        self.unprojected_reads[key] = self.unprojected_reads.get(key, 0) + 1
+        if self.unprojected_reads[key] == 1:
+            self.log(f"  ⚠️ 取得項目にない {module}.{field} を参照しました"
+                     f"（field_projection.PROJECTIONS['{self.name}'] に追加してください）")
+
+
+def main():
+    """全プロジェクションを検証し、全項目取得との項目数を比較"""
+    schema = load_schema_fields()
+    print("=" * 60)
+    print(f"📊 取得項目プロジェクション検証（スキーマ: {sum(len(f) for f in schema.values())}項目）")
+    print("=" * 60)
+
+    failed = 0
+    for name in PROJECTIONS:
+        try:
+            projection = FieldProjection.for_analysis(name, validate=True)
+        except ProjectionError as e:
+            print(f"❌ {e}")
+            failed += 1
+            continue
+        for module, fields in projection.fields.items():
+            total = len(schema[module])
+            print(f"✅ {name} / {module}: {len(fields) + 1}項目 / 全{total}項目"
+                  f"（約{total / (len(fields) + 1):.0f}分の1）")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
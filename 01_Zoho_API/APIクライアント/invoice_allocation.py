@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+親子商談セットの請求書 → 商談（明細）割り当て
+1枚の請求書が複数の子商談をまとめて請求している場合や、親商談を分割請求している場合に、
+合計額の比較ではなく「どの請求書がどの商談を請求しているか」を明細単位で求める
+
+割り当ての順序:
+    1. reference_number が商談IDと一致し、金額も合う請求書 → その商談（参照一致）
+    2. 同じ商談IDを参照する複数の請求書の合計が合う → その商談の分割請求
+    3. 残りの請求書ごとに、未割り当ての商談の部分集合で金額が合うものを探す（部分和）
+
+- 金額の比較は税込み: 商談金額（税抜き）の合計の税込み額（tax_engine、請求書ごとに端数処理）と、
+  請求書の total の差が許容誤差以内なら一致とする（明細ごとの端数処理の差を吸収）
+- 部分和は金額ごとの件数で解くため（reconciliation_solver.count_vectors）、
+  同額の子商談が多いセットでも組み合わせが爆発しない
+- 金額の並びと請求書の組が同じなら結果は同じため、探索結果はセットをまたいでメモ化する
+  （同じ受講料の子商談が並ぶセットが多いため、2組目以降はほぼ再計算しない）
+"""
+
+from collections import Counter, defaultdict
+from fractions import Fraction
+from math import ceil, floor
+
+from reconciliation_solver import count_vectors
+from tax_engine import TaxEngine, TaxRule, to_yen
+
+# 1枚の請求書について調べる部分集合の候補数
+MAX_ALTERNATIVES = 3
+# 1セットの割り当て探索で調べる状態数の上限（超えたら以降は最初に見つかった割り当てを使う）
+MAX_SEARCH_STATES = 2_000
+
+
+def _ref(invoice):
+    return str(invoice.get('reference_number') or '').strip()
+
+
+class AllocationMatcher:
+    """請求書の合計額を商談の部分集合へ割り当てる"""
+
+    def __init__(self, tax_rate=0.10, tolerance=1, max_alternatives=MAX_ALTERNATIVES, rounding='四捨五入'):
+        """
+        Args:
+            tax_rate (float): 消費税率
+            tolerance (int): 1件の割り当てで許す税込み金額の誤差（円、端数処理の差）
+            max_alternatives (int): 請求書1枚について試す部分集合の数
+            rounding (str): 税込み換算の端数処理（tax_engine.ROUNDING_MODES）
+        """
+        self.tax = TaxEngine(TaxRule(tax_rate, rounding, unit='invoice'))
+        self.tax_multiplier = self.tax.rule.multiplier
+        self.tolerance = tolerance
+        self.max_alternatives = max_alternatives
+        # セットをまたいだメモ
+        self._window_cache = {}
+        self._search_cache = {}
+        self.cache_hits = 0
+
+    def with_tax(self, amount):
+        """税抜き金額（円）の税込み額"""
+        return self.tax.with_tax(amount)
+
+    def matches(self, amount_ex_tax, invoice_total):
+        return abs(self.with_tax(amount_ex_tax) - invoice_total) <= self.tolerance
+
+    def _window(self, invoice_total):
+        """税込みで invoice_total に一致しうる税抜き合計の範囲"""
+        lo = max(1, floor(Fraction(invoice_total - self.tolerance - 1) / self.tax_multiplier))
+        hi = ceil(Fraction(invoice_total + self.tolerance + 1) / self.tax_multiplier)
+        return lo, hi
+
+    def _subsets(self, counts, invoice_total):
+        """
+        金額ごとの件数 counts（((金額, 件数), ...)）から請求額に一致する選び方を最大 max_alternatives 通り
+        """
+        key = (counts, invoice_total)
+        cached = self._window_cache.get(key)
+        if cached is not None:
+            self.cache_hits += 1
+            return cached
+        lo, hi = self._window(invoice_total)
+        # 請求額に近い合計から調べる
+        center = Fraction(invoice_total) / self.tax_multiplier
+        totals = sorted(range(lo, hi + 1), key=lambda total: abs(total - center))
+        found = []
+        for total, chosen in count_vectors(dict(counts), totals, upper=hi):
+            if self.matches(total, invoice_total):
+                found.append(tuple(chosen))
+                if len(found) >= self.max_alternatives:
+                    break
+        self._window_cache[key] = found
+        return found
+
+    def _search(self, counts, invoice_totals):
+        """
+        請求書（金額の大きい順）ごとに部分集合を選び、一致する請求書の数・割り当て額が最大の組を返す
+
+        Returns:
+            tuple: ((一致数, 割り当て額), [請求書ごとの選び方 or None, ...])
+        """
+        key = (counts, invoice_totals)
+        cached = self._search_cache.get(key)
+        if cached is not None:
+            self.cache_hits += 1
+            return cached
+
+        memo = {}
+        states = [0]
+
+        def search(index, remaining):
+            if index == len(invoice_totals):
+                return (0, 0), []
+            state = (index, remaining)
+            if state in memo:
+                return memo[state]
+            states[0] += 1
+
+            best = None
+            for chosen in self._subsets(remaining, invoice_totals[index]):
+                used = dict(chosen)
+                rest = tuple((amount, count - used.get(amount, 0)) for amount, count in remaining
+                             if count - used.get(amount, 0) > 0)
+                (matched, covered), plan = search(index + 1, rest)
+                candidate = ((matched + 1, covered + sum(a * c for a, c in chosen)), [chosen] + plan)
+                if best is None or candidate[0] > best[0]:
+                    best = candidate
+                # 残りの請求書がすべて一致した、または上限を超えた
+                if best[0][0] == len(invoice_totals) - index or states[0] > MAX_SEARCH_STATES:
+                    break
+            # この請求書を割り当てない場合（上限を超えたら見つかった割り当てをそのまま使う）
+            if best is None or (states[0] <= MAX_SEARCH_STATES and best[0][0] < len(invoice_totals) - index):
+                score, plan = search(index + 1, remaining)
+                if best is None or score > best[0]:
+                    best = (score, [None] + plan)
+            memo[state] = best
+            return best
+
+        result = search(0, counts)
+        self._search_cache[key] = result
+        return result
+
+    def allocate(self, deals, invoices):
+        """
+        1つの親子セットの請求書を商談に割り当てる
+
+        Args:
+            deals (list): セットの商談（親・子。Amount は税抜き）
+            invoices (list): セットに関係する請求書（total は税込み）
+
+        Returns:
+            dict: {
+                'allocations': [{'method', 'invoices', 'deals', 'invoice_total', 'deal_total_in_tax', 'difference'}],
+                'covered_deals': 請求書が割り当てられた商談ID,
+                'uncovered_deals': 金額があるのに請求書が割り当てられない商談ID,
+                'unmatched_invoices': どの商談にも割り当てられない請求書番号,
+                'partial': {商談ID: 参照している請求書の合計 / 税込み金額}（分割請求の途中など）,
+                'line_coverage': 割り当て済み商談の件数比,
+                'amount_coverage': 割り当て済み商談の税込み金額比
+            }
+        """
+        lines = {}
+        for deal in deals:
+            amount = to_yen(deal.get('Amount') or 0)
+            if amount > 0:
+                lines[str(deal['id'])] = amount
+        remaining_lines = dict(lines)
+        remaining_invoices = [inv for inv in invoices if to_yen(inv.get('total') or 0) > 0]
+        allocations = []
+
+        def assign(method, chosen_invoices, deal_ids):
+            invoice_total = sum(to_yen(inv.get('total')) for inv in chosen_invoices)
+            deal_total = self.with_tax(sum(lines[deal_id] for deal_id in deal_ids))
+            allocations.append({
+                'method': method,
+                'invoices': [inv.get('invoice_number') or inv.get('invoice_id') for inv in chosen_invoices],
+                'deals': deal_ids,
+                'invoice_total': invoice_total,
+                'deal_total_in_tax': deal_total,
+                'difference': invoice_total - deal_total
+            })
+            for deal_id in deal_ids:
+                remaining_lines.pop(deal_id, None)
+
+        # 1. 参照一致
+        unmatched = []
+        for invoice in remaining_invoices:
+            deal_id = _ref(invoice)
+            if deal_id in remaining_lines and self.matches(remaining_lines[deal_id], to_yen(invoice['total'])):
+                assign('参照一致', [invoice], [deal_id])
+            else:
+                unmatched.append(invoice)
+
+        # 2. 同じ商談を参照する請求書の合計（分割請求）
+        by_reference = defaultdict(list)
+        for invoice in unmatched:
+            if _ref(invoice) in remaining_lines:
+                by_reference[_ref(invoice)].append(invoice)
+        for deal_id, group in by_reference.items():
+            if len(group) > 1 and self.matches(remaining_lines[deal_id], sum(to_yen(inv['total']) for inv in group)):
+                assign('分割請求', group, [deal_id])
+                grouped = {id(inv) for inv in group}
+                unmatched = [inv for inv in unmatched if id(inv) not in grouped]
+
+        # 3. 部分和（大きい請求書から）
+        unmatched.sort(key=lambda inv: to_yen(inv['total']), reverse=True)
+        if unmatched and remaining_lines:
+            counts = tuple(sorted(Counter(remaining_lines.values()).items()))
+            _, plan = self._search(counts, tuple(to_yen(inv['total']) for inv in unmatched))
+            # 選んだ金額を具体的な商談へ割り振る（請求書の参照先の商談を優先）
+            pool = defaultdict(list)
+            for deal_id, amount in remaining_lines.items():
+                pool[amount].append(deal_id)
+            still_unmatched = []
+            for invoice, chosen in zip(unmatched, plan):
+                if chosen is None:
+                    still_unmatched.append(invoice)
+                    continue
+                deal_ids = []
+                for amount, count in chosen:
+                    ids = pool[amount]
+                    ids.sort(key=lambda deal_id: deal_id != _ref(invoice))
+                    deal_ids.extend(ids[:count])
+                    del ids[:count]
+                assign('部分和' if len(deal_ids) > 1 else '金額一致', [invoice], deal_ids)
+            unmatched = still_unmatched
+
+        partial = {}
+        for invoice in unmatched:
+            deal_id = _ref(invoice)
+            if deal_id in remaining_lines:
+                partial[deal_id] = partial.get(deal_id, 0) + to_yen(invoice['total'])
+        for deal_id in partial:
+            partial[deal_id] = partial[deal_id] / self.with_tax(lines[deal_id])
+
+        covered = [deal_id for deal_id in lines if deal_id not in remaining_lines]
+        total_in_tax = self.with_tax(sum(lines.values()))
+        return {
+            'allocations': allocations,
+            'covered_deals': covered,
+            'uncovered_deals': list(remaining_lines),
+            'unmatched_invoices': [inv.get('invoice_number') or inv.get('invoice_id') for inv in unmatched],
+            'partial': partial,
+            'line_coverage': len(covered) / len(lines) if lines else 1.0,
+            'amount_coverage': (self.with_tax(sum(lines[deal_id] for deal_id in covered)) / total_in_tax
+                                if total_in_tax else 1.0)
+        }
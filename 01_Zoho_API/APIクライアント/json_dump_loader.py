@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+保存済み結果JSON（ダンプ）のストリーミング読み込み
+JT_ETP_全件データ_*.json のような結果ファイルを json.load で丸ごと読まずに、
+配列のレコードを1件ずつ読み出す（条件での絞り込み・項目の射影つき）
+
+- 先頭が配列のファイルはその要素を、先頭がオブジェクトのファイルは key で指定した配列
+  （省略時は配列の値すべて）の要素を返す
+- 一度全件を読むと、レコードIDごとのバイト位置をサイドカー
+  （logs/dump_index/{ファイル名}_{パスのハッシュ}.{key}.idx.json）に保存し、
+  以降のID検索はその位置へ seek して1件だけ解析する
+- 元ファイルのサイズ・更新時刻が変わったサイドカーは使わずに作り直す
+- 改行コード（CRLF）はそのまま、先頭のBOMは読み飛ばしてバイト位置を数える
+
+使い方:
+    python json_dump_loader.py <ファイル> [--key=all_children] [ID ...]
+"""
+
+import hashlib
+import json
+import os
+import re
+import sys
+from pathlib import Path
+
+CHUNK_SIZE = 1 << 16
+INDEX_VERSION = 2
+DEFAULT_INDEX_DIR = Path(__file__).parent.parent.parent / "logs" / "dump_index"
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_DECODER = json.JSONDecoder()
+
+
+class DumpFormatError(ValueError):
+    """ダンプが想定した形（配列、または配列を持つオブジェクト）ではない"""
+
+
+class _StreamReader:
+    """テキストをチャンク単位で読み、消費した位置をバイト単位で数える"""
+
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.byte_pos = 0
+        self.eof = False
+
+    def _fill(self):
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def skip_bom(self):
+        """先頭のBOM（U+FEFF、UTF-8で3バイト）を読み飛ばす"""
+        if self._fill() and self.buf.startswith('\ufeff'):
+            self._advance(1)
+
+    def _advance(self, end):
+        self.byte_pos += len(self.buf[self.pos:end].encode('utf-8'))
+        self.pos = end
+
+    def peek(self):
+        """空白を読み飛ばして次の1文字（終端ならNone）"""
+        while True:
+            self._advance(_WHITESPACE.match(self.buf, self.pos).end())
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return None
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise DumpFormatError(f"{self.byte_pos}バイト目: '{char}' が必要です")
+        self._advance(self.pos + 1)
+
+    def value(self):
+        """次のJSON値を1つ解析して (値, 開始バイト, 終了バイト) を返す"""
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # バッファ末尾で終わる数値などは続きがある可能性があるため読み足して解析し直す
+            if end == len(self.buf) and self._fill():
+                continue
+            start = self.byte_pos
+            self._advance(end)
+            return value, start, self.byte_pos
+
+
+def _iter_array(reader):
+    """現在位置の配列の要素を (値, 開始バイト, 終了バイト) で返す"""
+    reader.expect('[')
+    if reader.peek() == ']':
+        reader.expect(']')
+        return
+    while True:
+        yield reader.value()
+        if reader.peek() == ',':
+            reader.expect(',')
+            continue
+        reader.expect(']')
+        return
+
+
+def iter_dump_entries(path, key=None):
+    """
+    ダンプの配列要素を (配列のキー, 値, 開始バイト, 終了バイト) で返す
+
+    Args:
+        path (Path): ダンプファイル
+        key (str): 先頭がオブジェクトの場合に読む配列のキー（省略時は配列の値すべて）
+    """
+    # newline='' で改行を変換せずに読み、バイト位置をファイル上の位置と一致させる
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        reader = _StreamReader(f)
+        reader.skip_bom()
+        first = reader.peek()
+        if first == '[':
+            for value, start, end in _iter_array(reader):
+                yield None, value, start, end
+            return
+        if first != '{':
+            raise DumpFormatError(f"{path}: 先頭が配列・オブジェクトではありません")
+
+        reader.expect('{')
+        while reader.peek() != '}':
+            name, _, _ = reader.value()
+            reader.expect(':')
+            if reader.peek() == '[' and (key is None or name == key):
+                for value, start, end in _iter_array(reader):
+                    yield name, value, start, end
+                if key is not None:
+                    return
+            else:
+                reader.value()
+            if reader.peek() == ',':
+                reader.expect(',')
+
+
+def _project(record, fields):
+    if fields is None or not isinstance(record, dict):
+        return record
+    return {field: record[field] for field in fields if field in record}
+
+
+class JsonDump:
+    """1つのダンプファイルの読み出しとID索引"""
+
+    def __init__(self, path, key=None, id_field='id', index_dir=None):
+        """
+        Args:
+            path (Path): ダンプファイル
+            key (str): 読む配列のキー（先頭が配列のファイルは不要）
+            id_field (str): 索引に使うレコードのIDフィールド
+            index_dir (Path): サイドカーの保存先（省略時は logs/dump_index）
+        """
+        self.path = Path(path)
+        self.key = key
+        self.id_field = id_field
+        # 結果フォルダを汚さないよう logs/ に置き、同名ファイルはパスのハッシュで区別する
+        path_hash = hashlib.blake2b(str(self.path.resolve()).encode('utf-8'), digest_size=4).hexdigest()
+        self.index_path = (Path(index_dir or DEFAULT_INDEX_DIR)
+                           / f"{self.path.name}_{path_hash}.{key or 'records'}.idx.json")
+        self._index = None
+
+    def _source_stamp(self):
+        stat = self.path.stat()
+        return {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+    def _load_index(self):
+        if self._index is not None:
+            return self._index
+        if self.index_path.exists():
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if (index.get('version') == INDEX_VERSION and index.get('source') == self._source_stamp()
+                    and index.get('id_field') == self.id_field):
+                self._index = index
+        return self._index
+
+    def _save_index(self, offsets, count):
+        index = {
+            'version': INDEX_VERSION,
+            'source': self._source_stamp(),
+            'key': self.key,
+            'id_field': self.id_field,
+            'count': count,
+            'offsets': offsets
+        }
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = self.index_path.with_suffix('.tmp')
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(temp_file, self.index_path)
+        self._index = index
+
+    def records(self, predicate=None, fields=None):
+        """
+        レコードを1件ずつ返す
+
+        Args:
+            predicate (callable): predicate(record) が真のレコードだけ返す
+            fields (list): 指定した項目だけの辞書にして返す
+
+        索引がなければ読みながら作り、最後まで読み切ったときにサイドカーへ保存する
+        """
+        build = self._load_index() is None
+        offsets = {}
+        count = 0
+        for _, record, start, end in iter_dump_entries(self.path, self.key):
+            count += 1
+            if build and isinstance(record, dict) and record.get(self.id_field) is not None:
+                offsets[str(record[self.id_field])] = [start, end - start]
+            if predicate is None or predicate(record):
+                yield _project(record, fields)
+        if build:
+            self._save_index(offsets, count)
+
+    def __iter__(self):
+        return self.records()
+
+    def ensure_index(self):
+        """索引がなければ全件を1回読んで作る"""
+        if self._load_index() is None:
+            for _ in self.records():
+                pass
+        return self._index
+
+    def get(self, record_id, fields=None):
+        """IDのレコード（索引の位置へ seek して1件だけ解析、なければNone）"""
+        return self.get_many([record_id], fields).get(str(record_id))
+
+    def get_many(self, record_ids, fields=None):
+        """{ID: レコード}（ダンプにないIDは含まない）"""
+        offsets = self.ensure_index()['offsets']
+        found = {}
+        with open(self.path, 'rb') as f:
+            for record_id in record_ids:
+                location = offsets.get(str(record_id))
+                if location is None:
+                    continue
+                f.seek(location[0])
+                found[str(record_id)] = _project(json.loads(f.read(location[1])), fields)
+        return found
+
+    def count(self):
+        return self.ensure_index()['count']
+
+
+def iter_records(path, key=None, predicate=None, fields=None):
+    """JsonDump(path, key).records(predicate, fields) の短縮形"""
+    return JsonDump(path, key).records(predicate, fields)
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    key = next((arg.split('=', 1)[1] for arg in sys.argv[1:] if arg.startswith('--key=')), None)
+    if not args:
+        print("使い方: python json_dump_loader.py <ファイル> [--key=配列のキー] [ID ...]")
+        return 1
+
+    dump = JsonDump(args[0], key)
+    ids = args[1:]
+    if not ids:
+        print(f"📊 {dump.path.name}: {dump.count()}件（索引: {dump.index_path.name}）")
+        return 0
+
+    found = dump.get_many(ids)
+    for record_id in ids:
+        record = found.get(record_id)
+        if record is None:
+            print(f"❌ {record_id}: 見つかりません")
+        else:
+            print(json.dumps(record, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+重い依存モジュール（requests・pandas・aiohttp・openpyxl）の遅延読み込み
+モジュールの読み込み時ではなく、最初に属性を使ったときに import するため、
+status・get_workspaces のような軽いコマンドの起動時間に重い依存の読み込み時間が乗らない
+
+    requests = lazy_module('requests')      # この時点では読み込まない
+    requests.get(url)                       # ここで import requests
+
+インストールされていないモジュールは、最初に使ったときに ImportError になる
+（有無だけを調べるときは is_available。find_spec なので読み込みは起きない）
+
+起動時間の確認:
+    python -X importtime -c "import zoho_analytics_api_client_auto" 2>&1 | tail -5
+"""
+
+import importlib
+import importlib.util
+import sys
+import types
+
+
+class LazyModule(types.ModuleType):
+    """最初の属性アクセスで本物のモジュールを読み込み、以後はそれに委ねる"""
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__['_lazy_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_lazy_module']
+        if module is None:
+            module = importlib.import_module(self.__name__)
+            self.__dict__['_lazy_module'] = module
+        return module
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = 'loaded' if self.__dict__['_lazy_module'] is not None else 'not loaded'
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+def lazy_module(name):
+    """name のモジュールを遅延読み込みするプロキシ（読み込み済みならそのモジュール）"""
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
+
+
+def is_available(name):
+    """モジュールがインストールされているか（読み込まずに調べる）"""
+    if name in sys.modules:
+        return True
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
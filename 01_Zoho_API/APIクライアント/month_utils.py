@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+月（'YYYY-MM'）と日付（'YYYY-MM-DD'）の文字列の変換
+入金台帳（payment_ledger）と期間の索引（period_index）で共通に使う
+"""
+
+from datetime import datetime, timedelta
+
+
+def month_of(day):
+    """'YYYY-MM-DD' → 'YYYY-MM'"""
+    return day[:7]
+
+
+def month_bounds(month):
+    """月の初日と末日（'YYYY-MM-DD'）"""
+    first = datetime.strptime(month, "%Y-%m").date()
+    following = (first.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return first.isoformat(), (following - timedelta(days=1)).isoformat()
+
+
+def month_range(start_month, end_month):
+    """start_month から end_month までの月（両端を含む）"""
+    months = []
+    year, month = map(int, start_month.split('-'))
+    while f"{year:04d}-{month:02d}" <= end_month:
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def end_of(value):
+    """日付（YYYY-MM-DD）または月（YYYY-MM）を期間の終わりの日付にする"""
+    if value and len(value) == 7:
+        return month_bounds(value)[1]
+    return value
@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Books入金（customerpayments）の月別ローカル台帳
+月ごとのパーティションに入金を保存し、期間・顧客・請求書・商談ごとの入金額を
+APIを呼ばずに累積和の二分探索（O(log n)）で返す
+
+保存形式:
+    logs/ledger/customerpayments/{YYYY-MM}.json   その月の入金（日付順）
+    logs/ledger/customerpayments/manifest.json     {"months": {YYYY-MM: {synced_at, rows, total}}}
+
+- sync() は未取得の月と、まだ締まっていない月（月末から OPEN_MONTH_DAYS 日以内に同期した月）
+  だけをBooksから取り直し、その月のパーティションを置き換える
+  （後日の入力・修正・削除も月単位の置き換えで反映される）
+- 締まった月は再取得しないため、「X月末までの入金」は同期済みなら追加のAPI呼び出しなしで答えられる
+- 集計は 全体 / 顧客ID / 請求書番号 / 参照番号（商談ID） ごとの日付順の累積和で行う
+- 入金一覧（/customerpayments）は適用先を invoice_numbers（"INV-1, INV-2"）でしか返さないため、
+  請求書1件への入金は 入金額 − 未使用額 をその請求書への適用額とし、複数の請求書に
+  適用された入金だけ詳細（/customerpayments/{id}）を取得して請求書ごとの適用額を得る
+
+使い方:
+    python payment_ledger.py sync [--from=2024-04] [--to=2025-07] [--force]
+    python payment_ledger.py [--to=2025-06-30] [--customer=JT]     月別合計と期間合計
+"""
+
+import json
+import sys
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from month_utils import end_of, month_bounds, month_of, month_range
+
+DEFAULT_LEDGER_DIR = Path(__file__).parent.parent.parent / "logs" / "ledger" / "customerpayments"
+MANIFEST_NAME = "manifest.json"
+BOOKS_PAYMENTS_URL = "https://www.zohoapis.com/books/v3/customerpayments"
+
+DEFAULT_START_MONTH = '2024-04'
+# 台帳の保存形式（変わったら全月を取り直す）
+LEDGER_VERSION = 2
+# 月末からこの日数以内に同期した月は、後日の入力・修正を取り込むため次回も取り直す
+OPEN_MONTH_DAYS = 45
+
+# 台帳に残す入金の項目
+PAYMENT_FIELDS = ('payment_id', 'payment_number', 'customer_id', 'customer_name', 'date', 'amount',
+                  'unused_amount', 'payment_mode', 'reference_number', 'description', 'invoice_numbers',
+                  'last_modified_time')
+
+
+class LedgerError(Exception):
+    """台帳の同期・読み込みができない"""
+
+
+def parse_invoice_numbers(value):
+    """入金一覧の invoice_numbers（"INV-000001, INV-000002"）→ 請求書番号のリスト"""
+    return [number.strip() for number in (value or '').split(',') if number.strip()]
+
+
+def normalize_payment(payment):
+    """
+    台帳に保存する形（項目を絞り、適用先の請求書は id・番号・適用額のみ）
+
+    詳細の invoices がない入金（一覧の形）は invoice_numbers から適用先を作る。
+    請求書1件なら 入金額 − 未使用額 を適用額とし、複数で内訳が分からなければ None にする
+    """
+    record = {field: payment.get(field) for field in PAYMENT_FIELDS if payment.get(field) is not None}
+    record['amount'] = payment.get('amount') or 0
+    if payment.get('invoices') is not None:
+        record['invoices'] = [
+            {'invoice_id': inv.get('invoice_id'), 'invoice_number': inv.get('invoice_number'),
+             'amount_applied': inv.get('amount_applied') or 0}
+            for inv in payment['invoices']
+        ]
+        return record
+    numbers = parse_invoice_numbers(payment.get('invoice_numbers'))
+    applied = record['amount'] - (payment.get('unused_amount') or 0) if len(numbers) == 1 else None
+    record['invoices'] = [{'invoice_id': None, 'invoice_number': number, 'amount_applied': applied}
+                          for number in numbers]
+    return record
+
+
+class _PrefixIndex:
+    """日付順の金額と累積和（期間の合計・件数を二分探索で求める）"""
+
+    __slots__ = ('dates', 'prefix')
+
+    def __init__(self, rows):
+        rows = sorted(rows, key=lambda row: row[0])
+        self.dates = [day for day, _ in rows]
+        self.prefix = [0]
+        for _, amount in rows:
+            self.prefix.append(self.prefix[-1] + amount)
+
+    def _slice(self, date_from, date_to):
+        lo = bisect_left(self.dates, date_from) if date_from else 0
+        hi = bisect_right(self.dates, date_to) if date_to else len(self.dates)
+        return lo, max(lo, hi)
+
+    def total(self, date_from=None, date_to=None):
+        lo, hi = self._slice(date_from, date_to)
+        return self.prefix[hi] - self.prefix[lo]
+
+    def count(self, date_from=None, date_to=None):
+        lo, hi = self._slice(date_from, date_to)
+        return hi - lo
+
+
+class PaymentLedger:
+    """月別パーティションの入金台帳と集計インデックス"""
+
+    def __init__(self, root=None):
+        self.root = Path(root or DEFAULT_LEDGER_DIR)
+        self.manifest_path = self.root / MANIFEST_NAME
+        self.manifest = self._load_manifest()
+        self._payments = None
+        self._indexes = None
+
+    def _load_manifest(self):
+        if not self.manifest_path.exists():
+            return {'version': LEDGER_VERSION, 'months': {}}
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') != LEDGER_VERSION:
+            # 適用先の請求書を持たない旧形式の台帳は全月を取り直す
+            return {'version': LEDGER_VERSION, 'months': {}}
+        return manifest
+
+    def _write_json(self, path, data):
+        self.root.mkdir(parents=True, exist_ok=True)
+        temp_file = path.with_suffix('.tmp')
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+        temp_file.replace(path)
+
+    def _partition(self, month):
+        return self.root / f"{month}.json"
+
+    # ------------------------------------------------------------------
+    # 同期・書き込み
+    # ------------------------------------------------------------------
+
+    def replace_month(self, month, payments):
+        """1か月分の入金でパーティションを置き換える"""
+        rows = sorted((normalize_payment(p) for p in payments if month_of(p.get('date') or '') == month),
+                      key=lambda p: (p['date'], str(p.get('payment_id'))))
+        self._write_json(self._partition(month), rows)
+        self.manifest['months'][month] = {
+            'synced_at': datetime.now().isoformat(),
+            'rows': len(rows),
+            'total': sum(p['amount'] for p in rows)
+        }
+        self._write_json(self.manifest_path, self.manifest)
+        self._payments = self._indexes = None
+        return rows
+
+    def months_to_sync(self, start_month, end_month, today=None, force=False):
+        """取得が必要な月（未取得、または締まる前に同期した月）"""
+        today = today or date.today()
+        months = []
+        for month in month_range(start_month, end_month):
+            if month > month_of(today.isoformat()):
+                break
+            entry = self.manifest['months'].get(month)
+            if force or entry is None:
+                months.append(month)
+                continue
+            closes_at = date.fromisoformat(month_bounds(month)[1]) + timedelta(days=OPEN_MONTH_DAYS)
+            if datetime.fromisoformat(entry['synced_at']).date() <= closes_at:
+                months.append(month)
+        return months
+
+    def sync(self, fetch, start_month=DEFAULT_START_MONTH, end_month=None, force=False):
+        """
+        必要な月だけをBooksから取り直す
+
+        Args:
+            fetch (callable): fetch(date_start, date_end) -> 入金のリスト
+            start_month (str): 台帳の最初の月（YYYY-MM）
+            end_month (str): 台帳の最後の月（省略時は今月）
+            force (bool): 締まった月も取り直す
+
+        Returns:
+            list: 取り直した月
+        """
+        end_month = end_month or month_of(date.today().isoformat())
+        months = self.months_to_sync(start_month, end_month, force=force)
+        if not months:
+            print(f"  ⏭️ 入金台帳は同期済み（{start_month}〜{end_month}）")
+            return []
+        for month in months:
+            first, last = month_bounds(month)
+            rows = self.replace_month(month, fetch(first, last))
+            print(f"  📥 {month}: {len(rows)}件")
+        print(f"✅ 入金台帳を同期: {len(months)}か月（{months[0]}〜{months[-1]}）")
+        return months
+
+    # ------------------------------------------------------------------
+    # 読み込み・インデックス
+    # ------------------------------------------------------------------
+
+    def months(self):
+        return sorted(self.manifest['months'])
+
+    def _load(self):
+        if self._payments is not None:
+            return
+        payments = []
+        for month in self.months():
+            path = self._partition(month)
+            if path.exists():
+                with open(path, 'r', encoding='utf-8') as f:
+                    payments.extend(json.load(f))
+        payments.sort(key=lambda p: p['date'])
+        self._payments = payments
+
+        by_customer, by_invoice, by_reference = defaultdict(list), defaultdict(list), defaultdict(list)
+        self._invoice_numbers = {}
+        self._customer_names = {}
+        for payment in payments:
+            day, amount = payment['date'], payment['amount']
+            if payment.get('customer_id'):
+                by_customer[payment['customer_id']].append((day, amount))
+                self._customer_names[payment['customer_id']] = payment.get('customer_name') or ''
+            reference = str(payment.get('reference_number') or '').strip()
+            if reference:
+                by_reference[reference].append((day, amount))
+            for applied in payment['invoices']:
+                if applied.get('invoice_id') and applied.get('invoice_number'):
+                    self._invoice_numbers[applied['invoice_id']] = applied['invoice_number']
+                # 内訳の分からない適用額は請求書ごとの集計に入れない
+                if applied['amount_applied'] is not None:
+                    key = applied.get('invoice_number') or applied['invoice_id']
+                    by_invoice[key].append((day, applied['amount_applied']))
+
+        self._indexes = {
+            'all': _PrefixIndex((p['date'], p['amount']) for p in payments),
+            'customer': {key: _PrefixIndex(rows) for key, rows in by_customer.items()},
+            'invoice': {key: _PrefixIndex(rows) for key, rows in by_invoice.items()},
+            'reference': {key: _PrefixIndex(rows) for key, rows in by_reference.items()},
+        }
+
+    def __len__(self):
+        self._load()
+        return len(self._payments)
+
+    # ------------------------------------------------------------------
+    # 集計（date_to は日付または月。月なら月末までを含む）
+    # ------------------------------------------------------------------
+
+    def total(self, date_from=None, date_to=None, customer_ids=None):
+        """期間の入金合計（customer_ids を指定するとその顧客分のみ）"""
+        self._load()
+        date_to = end_of(date_to)
+        if customer_ids is None:
+            return self._indexes['all'].total(date_from, date_to)
+        indexes = self._indexes['customer']
+        return sum(indexes[cid].total(date_from, date_to) for cid in set(customer_ids) if cid in indexes)
+
+    def count(self, date_from=None, date_to=None, customer_ids=None):
+        self._load()
+        date_to = end_of(date_to)
+        if customer_ids is None:
+            return self._indexes['all'].count(date_from, date_to)
+        indexes = self._indexes['customer']
+        return sum(indexes[cid].count(date_from, date_to) for cid in set(customer_ids) if cid in indexes)
+
+    def paid_through(self, month, customer_ids=None):
+        """月末までの入金合計"""
+        return self.total(date_to=month, customer_ids=customer_ids)
+
+    def invoice_paid(self, invoice, date_to=None):
+        """請求書（請求書番号・ID）への適用額の合計"""
+        self._load()
+        number = self._invoice_numbers.get(invoice, invoice)
+        index = self._indexes['invoice'].get(number)
+        return index.total(date_to=end_of(date_to)) if index else 0
+
+    def deal_paid(self, deal_id, date_to=None, invoices=None):
+        """
+        商談の入金額（date_to までの累計）
+
+        invoices（reference_number が商談IDの請求書）を渡すとその請求書への適用額の合計、
+        省略時は参照番号が商談IDの入金の合計
+        """
+        self._load()
+        if invoices is not None:
+            return sum(self.invoice_paid(inv.get('invoice_number') or inv['invoice_id'], date_to)
+                       for inv in invoices if str(inv.get('reference_number') or '').strip() == str(deal_id))
+        index = self._indexes['reference'].get(str(deal_id))
+        return index.total(date_to=end_of(date_to)) if index else 0
+
+    def payments(self, date_from=None, date_to=None, customer_ids=None):
+        """期間の入金（日付順）"""
+        self._load()
+        dates = self._indexes['all'].dates
+        lo = bisect_left(dates, date_from) if date_from else 0
+        hi = bisect_right(dates, end_of(date_to)) if date_to else len(dates)
+        selected = self._payments[lo:hi]
+        if customer_ids is not None:
+            wanted = set(customer_ids)
+            selected = [p for p in selected if p.get('customer_id') in wanted]
+        return selected
+
+    def customer_ids(self, keywords):
+        """顧客名にキーワード（大文字小文字を区別しない）を含む顧客ID"""
+        self._load()
+        keywords = [keyword.upper() for keyword in keywords]
+        return [cid for cid, name in self._customer_names.items()
+                if any(keyword in name.upper() for keyword in keywords)]
+
+    def monthly_totals(self, customer_ids=None):
+        """{月: 入金合計}"""
+        return {month: self.total(*month_bounds(month), customer_ids=customer_ids) for month in self.months()}
+
+
+class BooksPaymentFetcher:
+    """
+    Booksの入金一覧を期間指定で全ページ取得する（最初の呼び出しで接続・組織IDを準備）
+
+    複数の請求書に適用された入金は詳細を取得して請求書ごとの適用額（invoices）を付ける
+    """
+
+    def __init__(self, session=None, headers=None, org_id=None, token_file=None, per_page=200):
+        self.session = session
+        self.headers = headers
+        self.org_id = org_id
+        self.token_file = token_file
+        self.per_page = per_page
+        self.request_count = 0
+
+    def _connect(self):
+        from zoho_http_transport import ZohoSession, FileTokenRefresher, TOKEN_DIR
+
+        token_file = Path(self.token_file or TOKEN_DIR / "zoho_books_tokens.json")
+        if self.session is None:
+            self.session = ZohoSession(FileTokenRefresher(token_file))
+        if self.headers is None:
+            try:
+                with open(token_file, 'r') as f:
+                    self.headers = {'Authorization': f'Bearer {json.load(f)["access_token"]}'}
+            except (OSError, ValueError, KeyError) as e:
+                raise LedgerError(f"Booksトークンを読み込めません: {e}")
+        if self.org_id is None:
+            # 組織IDは ZohoContext のキャッシュファイルから読む（期限切れ時だけ /books/v3/organizations を呼ぶ）
+            from zoho_context import ZohoContext
+
+            self.org_id = ZohoContext(token_file.parent).books_org_id()
+            if self.org_id is None:
+                raise LedgerError("Books組織IDを取得できません")
+
+    def __call__(self, date_start, date_end):
+        if self.session is None or self.headers is None or self.org_id is None:
+            self._connect()
+        payments = []
+        page = 1
+        while True:
+            params = {
+                'organization_id': self.org_id,
+                'per_page': self.per_page,
+                'page': page,
+                'sort_column': 'date',
+                'date_start': date_start,
+                'date_end': date_end
+            }
+            response = self.session.get(BOOKS_PAYMENTS_URL, headers=self.headers, params=params)
+            self.request_count += 1
+            if response.status_code != 200:
+                raise LedgerError(f"入金の取得に失敗（{date_start}〜{date_end} ページ{page}）: {response.status_code}")
+            data = response.json()
+            payments.extend(data.get('customerpayments', []))
+            if not data.get('page_context', {}).get('has_more_page', False):
+                break
+            page += 1
+        for payment in payments:
+            if len(parse_invoice_numbers(payment.get('invoice_numbers'))) > 1 and 'invoices' not in payment:
+                payment['invoices'] = self.applied_invoices(payment['payment_id'])
+        return payments
+
+    def applied_invoices(self, payment_id):
+        """入金の詳細から適用先の請求書（invoice_id・invoice_number・amount_applied）"""
+        response = self.session.get(f"{BOOKS_PAYMENTS_URL}/{payment_id}", headers=self.headers,
+                                    params={'organization_id': self.org_id})
+        self.request_count += 1
+        if response.status_code != 200:
+            raise LedgerError(f"入金{payment_id}の詳細を取得できません: {response.status_code}")
+        return response.json().get('payment', {}).get('invoices', [])
+
+
+def open_ledger(end_month, start_month=DEFAULT_START_MONTH, fetcher=None, force=False, root=None):
+    """台帳を開き、end_month までの必要な月だけ同期して返す"""
+    ledger = PaymentLedger(root)
+    ledger.sync(fetcher or BooksPaymentFetcher(), start_month, end_month, force=force)
+    return ledger
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    options = dict(arg[2:].split('=', 1) for arg in sys.argv[1:] if arg.startswith('--') and '=' in arg)
+
+    if args and args[0] == 'sync':
+        print("=" * 60)
+        print("📥 入金台帳の同期")
+        print("=" * 60)
+        try:
+            open_ledger(options.get('to'), options.get('from', DEFAULT_START_MONTH), force='--force' in sys.argv)
+        except LedgerError as e:
+            print(f"❌ {e}")
+            return 1
+        return 0
+
+    ledger = PaymentLedger()
+    if not ledger.months():
+        print("❌ 入金台帳がありません（python payment_ledger.py sync で作成）")
+        return 1
+    customer_ids = ledger.customer_ids(options['customer'].split(',')) if 'customer' in options else None
+
+    print("=" * 60)
+    print(f"📒 入金台帳: {ledger.months()[0]}〜{ledger.months()[-1]}（{len(ledger)}件）")
+    print("=" * 60)
+    for month, amount in ledger.monthly_totals(customer_ids).items():
+        print(f"  {month}: ¥{amount:>14,.0f}")
+    date_to = options.get('to')
+    print(f"\n  {date_to or '全期間'}までの入金: ¥{ledger.total(options.get('from'), date_to, customer_ids):,.0f}"
+          f"（{ledger.count(options.get('from'), date_to, customer_ids)}件）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
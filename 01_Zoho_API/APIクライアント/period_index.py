@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+会計期間と学習期間の索引
+商談の成約日（Closing_Date）と、商品内訳の学習期間（学習開始日〜学習終了日）を索引にして、
+「X年度上期・X月に成約した商談」「X月に学習期間がかかっている明細」を
+O(log n + k)（k は該当件数）で返す
+
+- 成約日は日付順の配列と金額の累積和（期間の件数・合計は二分探索だけで求まる）
+- 学習期間は区間木（中心点で分割し、中心を含む区間を開始日順・終了日順に持つ）
+- 期の区切りは FiscalCalendar で指定する（会社の年度は4月始まり、
+  JT ETP の上期/下期は1〜5月・6〜12月）
+- 日付は 'YYYY-MM-DD' に揃えて文字列のまま比較する（'2025/1/5'・日時つきの値も受け付ける）
+
+使い方:
+    python period_index.py <商談JSON> [--calendar=company|jt_etp] [--month=2025-01] [--half=2025-1]
+"""
+
+import json
+import re
+import sys
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import date, datetime
+
+from month_utils import month_bounds, month_of, month_range
+from tax_engine import to_yen
+
+# 学習期間の項目名（CRM の商品内訳・Analytics のSQL結果）
+STUDY_PERIOD_FIELDS = (
+    ('学習開始日', '学習終了日'),
+    ('学習開始日（商品内訳）', '学習終了日（商品内訳）'),
+    ('study_start_date', 'study_end_date'),
+)
+# 終了日のない学習期間は継続中として扱う
+OPEN_END = '9999-12-31'
+UNKNOWN_PERIOD = '期間不明'
+
+_DATE_PATTERN = re.compile(r'^(\d{4})[-/](\d{1,2})[-/](\d{1,2})')
+
+
+def normalize_date(value):
+    """日付を 'YYYY-MM-DD' にする（読めなければNone）"""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    match = _DATE_PATTERN.match(str(value).strip())
+    if not match:
+        return None
+    year, month, day = map(int, match.groups())
+    return f"{year:04d}-{month:02d}-{day:02d}"
+
+
+def month_label(month):
+    """'2025-01' → '2025年1月'"""
+    year, number = month.split('-')
+    return f"{year}年{int(number)}月"
+
+
+def study_period(item):
+    """明細の学習期間 (開始日, 終了日)（項目がなければ (None, None)）"""
+    for start_field, end_field in STUDY_PERIOD_FIELDS:
+        if start_field in item or end_field in item:
+            return normalize_date(item.get(start_field)), normalize_date(item.get(end_field))
+    return None, None
+
+
+class FiscalCalendar:
+    """年度の始まりの月と下期の始まりの月"""
+
+    def __init__(self, start_month=4, second_half_month=None, half_labels=('上期', '下期')):
+        """
+        Args:
+            start_month (int): 年度の始まりの月（4 なら4月〜翌3月）
+            second_half_month (int): 下期の始まりの月（省略時は年度の7か月目）
+            half_labels (tuple): 上期・下期の表示名
+        """
+        if second_half_month is None:
+            second_half_month = (start_month + 5) % 12 + 1
+        if not (1 <= start_month <= 12 and 1 <= second_half_month <= 12) or second_half_month == start_month:
+            raise ValueError(f"年度の月の指定が正しくありません: {start_month}, {second_half_month}")
+        self.start_month = start_month
+        self.second_half_month = second_half_month
+        self.half_labels = tuple(half_labels)
+        self._second_half_offset = (second_half_month - start_month) % 12
+
+    def _offset(self, day):
+        year, month = int(day[:4]), int(day[5:7])
+        offset = (month - self.start_month) % 12
+        return (year if month >= self.start_month else year - 1), offset
+
+    def _month_at(self, fiscal_year, offset):
+        total = self.start_month - 1 + offset
+        return f"{fiscal_year + total // 12:04d}-{total % 12 + 1:02d}"
+
+    def fiscal_year(self, day):
+        """日付の年度（年度が始まる年）"""
+        return self._offset(day)[0]
+
+    def half(self, day):
+        """日付の (年度, 0=上期 / 1=下期)"""
+        fiscal_year, offset = self._offset(day)
+        return fiscal_year, 0 if offset < self._second_half_offset else 1
+
+    def half_label(self, day):
+        """日付の上期・下期の表示名（年度なし。日付が読めなければ期間不明）"""
+        day = normalize_date(day)
+        return self.half_labels[self.half(day)[1]] if day else UNKNOWN_PERIOD
+
+    def period_label(self, fiscal_year, half):
+        return f"{fiscal_year}年度{self.half_labels[half]}"
+
+    def year_bounds(self, fiscal_year):
+        """年度の初日と末日"""
+        return month_bounds(self._month_at(fiscal_year, 0))[0], month_bounds(self._month_at(fiscal_year, 11))[1]
+
+    def half_bounds(self, fiscal_year, half):
+        """上期・下期の初日と末日"""
+        if half == 0:
+            first, last = 0, self._second_half_offset - 1
+        else:
+            first, last = self._second_half_offset, 11
+        return month_bounds(self._month_at(fiscal_year, first))[0], month_bounds(self._month_at(fiscal_year, last))[1]
+
+    def half_months(self, fiscal_year, half):
+        date_from, date_to = self.half_bounds(fiscal_year, half)
+        return month_range(month_of(date_from), month_of(date_to))
+
+    def halves_between(self, date_from, date_to):
+        """期間にかかる (年度, 上期/下期) の一覧（古い順）"""
+        halves = []
+        current = self.half(date_from)
+        last = self.half(date_to)
+        while current <= last:
+            halves.append(current)
+            fiscal_year, half = current
+            current = (fiscal_year, 1) if half == 0 else (fiscal_year + 1, 0)
+        return halves
+
+    def __repr__(self):
+        return f"FiscalCalendar({self.start_month}月始まり・下期{self.second_half_month}月〜)"
+
+
+# 会社の年度（4月〜翌3月、上期4〜9月）
+COMPANY_CALENDAR = FiscalCalendar(4)
+# JT ETP の上期/下期（1〜5月・6〜12月）
+JT_ETP_CALENDAR = FiscalCalendar(1, 6, half_labels=('上期(〜5月)', '下期(6月〜)'))
+CALENDARS = {'company': COMPANY_CALENDAR, 'jt_etp': JT_ETP_CALENDAR}
+
+
+class DateIndex:
+    """日付順の配列と金額の累積和"""
+
+    __slots__ = ('dates', 'items', 'prefix')
+
+    def __init__(self, entries):
+        """
+        Args:
+            entries (list): [(日付, 金額, 項目), ...]
+        """
+        entries = sorted(entries, key=lambda entry: entry[0])
+        self.dates = [day for day, _, _ in entries]
+        self.items = [item for _, _, item in entries]
+        self.prefix = [0]
+        for _, amount, _ in entries:
+            self.prefix.append(self.prefix[-1] + amount)
+
+    def _slice(self, date_from, date_to):
+        lo = bisect_left(self.dates, date_from) if date_from else 0
+        hi = bisect_right(self.dates, date_to) if date_to else len(self.dates)
+        return lo, max(lo, hi)
+
+    def between(self, date_from=None, date_to=None):
+        """期間（両端を含む）の項目（日付順）"""
+        lo, hi = self._slice(date_from, date_to)
+        return self.items[lo:hi]
+
+    def count(self, date_from=None, date_to=None):
+        lo, hi = self._slice(date_from, date_to)
+        return hi - lo
+
+    def total(self, date_from=None, date_to=None):
+        lo, hi = self._slice(date_from, date_to)
+        return self.prefix[hi] - self.prefix[lo]
+
+    def __len__(self):
+        return len(self.dates)
+
+
+class _Node:
+    __slots__ = ('center', 'by_start', 'by_end', 'left', 'right')
+
+
+class IntervalTree:
+    """区間（両端を含む）の重なり検索"""
+
+    def __init__(self, intervals):
+        """
+        Args:
+            intervals (list): [(開始, 終了, 項目), ...]（開始 <= 終了）
+        """
+        self.size = len(intervals)
+        self._root = self._build(list(intervals))
+
+    def _build(self, intervals):
+        if not intervals:
+            return None
+        points = sorted(point for start, end, _ in intervals for point in (start, end))
+        node = _Node()
+        node.center = points[len(points) // 2]
+        left, right, here = [], [], []
+        for interval in intervals:
+            if interval[1] < node.center:
+                left.append(interval)
+            elif interval[0] > node.center:
+                right.append(interval)
+            else:
+                here.append(interval)
+        node.by_start = sorted(here, key=lambda interval: interval[0])
+        node.by_end = sorted(here, key=lambda interval: interval[1], reverse=True)
+        node.left = self._build(left)
+        node.right = self._build(right)
+        return node
+
+    def overlapping(self, date_from, date_to):
+        """[date_from, date_to] と重なる区間の項目"""
+        found = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            if date_to < node.center:
+                for start, _, item in node.by_start:
+                    if start > date_to:
+                        break
+                    found.append(item)
+                stack.append(node.left)
+            elif date_from > node.center:
+                for _, end, item in node.by_end:
+                    if end < date_from:
+                        break
+                    found.append(item)
+                stack.append(node.right)
+            else:
+                found.extend(item for _, _, item in node.by_start)
+                stack.append(node.left)
+                stack.append(node.right)
+        return found
+
+    def at(self, day):
+        """day を含む区間の項目"""
+        return self.overlapping(day, day)
+
+    def __len__(self):
+        return self.size
+
+
+class PeriodIndex:
+    """商談の成約日と明細の学習期間の索引"""
+
+    def __init__(self, calendar=None, date_field='Closing_Date'):
+        """
+        Args:
+            calendar (FiscalCalendar): 上期・下期の区切り（省略時は会社の年度）
+            date_field (str): 商談の日付項目
+        """
+        self.calendar = calendar or COMPANY_CALENDAR
+        self.date_field = date_field
+        self._deal_entries = []
+        self._line_entries = []
+        self.undated_deals = []
+        self.undated_lines = []
+        self._closing = None
+        self._study = None
+
+    @classmethod
+    def build(cls, deals=(), lines=(), calendar=None, date_field='Closing_Date'):
+        index = cls(calendar, date_field)
+        for deal in deals:
+            index.add_deal(deal)
+        for line in lines:
+            index.add_line(line)
+        return index
+
+    def add_deal(self, deal):
+        day = normalize_date(deal.get(self.date_field))
+        if day is None:
+            self.undated_deals.append(deal)
+            return
+        self._deal_entries.append((day, to_yen(deal.get('Amount') or 0), deal))
+        self._closing = None
+
+    def add_line(self, item, start=None, end=None):
+        """
+        明細を学習期間で登録する（start/end を省略すると項目から読む）
+        終了日がなければ継続中、開始日がなければ終了日の1日として扱う
+        """
+        if start is None and end is None:
+            start, end = study_period(item)
+        else:
+            start, end = normalize_date(start), normalize_date(end)
+        start = start or end
+        if start is None or (end and end < start):
+            self.undated_lines.append(item)
+            return
+        self._line_entries.append((start, end or OPEN_END, item))
+        self._study = None
+
+    @property
+    def closing(self):
+        if self._closing is None:
+            self._closing = DateIndex(self._deal_entries)
+        return self._closing
+
+    @property
+    def study(self):
+        if self._study is None:
+            self._study = IntervalTree(self._line_entries)
+        return self._study
+
+    # --- 成約日 ---
+
+    def deals_closed(self, date_from=None, date_to=None):
+        return self.closing.between(date_from, date_to)
+
+    def closing_amount(self, date_from=None, date_to=None):
+        """期間に成約した商談の金額合計（税抜き）"""
+        return self.closing.total(date_from, date_to)
+
+    def deals_closed_in_month(self, month):
+        return self.closing.between(*month_bounds(month))
+
+    def deals_closed_in_half(self, fiscal_year, half):
+        return self.closing.between(*self.calendar.half_bounds(fiscal_year, half))
+
+    def deals_by_month(self, months):
+        """{月: その月に成約した商談}（months の順）"""
+        return OrderedDict((month, self.deals_closed_in_month(month)) for month in months)
+
+    def deals_by_half(self, with_year=True):
+        """
+        上期・下期ごとの商談（古い順、日付のない商談は期間不明）
+        with_year=False なら年度をまたいで上期・下期の2つにまとめる
+        """
+        groups = OrderedDict()
+        if not with_year:
+            for label in self.calendar.half_labels:
+                groups[label] = []
+        if len(self.closing):
+            for fiscal_year, half in self.calendar.halves_between(self.closing.dates[0], self.closing.dates[-1]):
+                label = self.calendar.period_label(fiscal_year, half) if with_year else self.calendar.half_labels[half]
+                groups.setdefault(label, []).extend(self.deals_closed_in_half(fiscal_year, half))
+        groups[UNKNOWN_PERIOD] = list(self.undated_deals)
+        return groups
+
+    # --- 学習期間 ---
+
+    def lines_active(self, date_from, date_to):
+        """学習期間が [date_from, date_to] にかかる明細"""
+        return self.study.overlapping(date_from, date_to)
+
+    def lines_active_on(self, day):
+        return self.study.at(normalize_date(day))
+
+    def lines_active_in_month(self, month):
+        return self.study.overlapping(*month_bounds(month))
+
+    def lines_active_in_half(self, fiscal_year, half):
+        return self.study.overlapping(*self.calendar.half_bounds(fiscal_year, half))
+
+    def lines_by_month(self, months):
+        """{月: その月に学習期間がかかる明細}（months の順）"""
+        return OrderedDict((month, self.lines_active_in_month(month)) for month in months)
+
+
+def main():
+    options = dict(arg[2:].split('=', 1) for arg in sys.argv[1:] if arg.startswith('--') and '=' in arg)
+    files = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if not files:
+        print("使い方: python period_index.py <商談JSON> [--calendar=company|jt_etp] [--month=YYYY-MM] [--half=YYYY-1|2]")
+        return 1
+    calendar = CALENDARS.get(options.get('calendar', 'company'))
+    if calendar is None:
+        print(f"❌ 期の区切りは {', '.join(CALENDARS)} のいずれかです")
+        return 1
+
+    with open(files[0], 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    deals = data if isinstance(data, list) else data.get('data', [])
+    index = PeriodIndex.build(deals, calendar=calendar)
+    print(f"📊 {files[0]}: 商談{len(deals)}件（{calendar}）")
+
+    if 'month' in options:
+        month = options['month']
+        selected = index.deals_closed_in_month(month)
+        print(f"  {month_label(month)}: {len(selected)}件, ¥{index.closing_amount(*month_bounds(month)):,}")
+    elif 'half' in options:
+        fiscal_year, half = map(int, options['half'].split('-'))
+        date_from, date_to = calendar.half_bounds(fiscal_year, half - 1)
+        print(f"  {calendar.period_label(fiscal_year, half - 1)}（{date_from}〜{date_to}）: "
+              f"{index.closing.count(date_from, date_to)}件, ¥{index.closing_amount(date_from, date_to):,}")
+    else:
+        for label, selected in index.deals_by_half().items():
+            print(f"  {label}: {len(selected)}件, ¥{sum(to_yen(deal.get('Amount') or 0) for deal in selected):,}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+入金・請求差額の照合ソルバー（部分和探索）
+商談・請求書・入金（customerpayments）の中から、合計が差額（目標金額）に
+許容誤差内で一致する組み合わせを探す
+
+- 金額は円単位の整数で扱う（税込み換算は tax_engine で1件ごとに端数処理）
+- 候補は顧客・日付で絞り込み、まず顧客ごとに探してから全体で探す
+- 金額が正の候補は、整数のビット列による有界DP（到達可能な合計の集合）で解く。
+  同じ金額の候補はまとめて「何件使うか」で扱うため、入れ替えただけの同じ解は1つになる
+- 正負が混在する場合・目標金額が大きくDPのビット列が大きすぎる場合は、
+  候補を半分に分けた半分全列挙（meet-in-the-middle）で解く
+- 正負混在で半分全列挙には候補が多すぎる場合は、負の候補を「使わない」ことを
+  正の金額として選ぶ問題に置き換えて有界DPで解く
+- どの方式でも扱えない規模では、目標金額に近い候補だけに絞って半分全列挙し、
+  見つかった解を部分的な結果（partial=True）として返す
+- 数百件の候補・数百万円の目標金額なら数秒以内に解が出る
+
+使い方:
+    python reconciliation_solver.py <目標金額> <JSONファイル> [--kind=deals|invoices|payments]
+                                    [--tolerance=許容誤差] [--tax-rate=0.10] [--from=YYYY-MM-DD] [--to=YYYY-MM-DD]
+"""
+
+import json
+import sys
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+from tax_engine import TaxEngine, TaxRule, to_yen
+
+# 半分全列挙で扱う候補数の上限（片側 2^(n/2) 通りを列挙する）
+MITM_LIMIT = 36
+# 有界DPで保持するビット列の合計サイズ上限（バイト）
+DP_MAX_BYTES = 256 * 1024 * 1024
+# 半分全列挙で調べる組の上限（許容誤差が大きいと組み合わせが爆発するため）
+MITM_MAX_PAIRS = 2_000_000
+
+CANDIDATE_KINDS = ('deal', 'invoice', 'payment')
+
+
+def _name(value):
+    if isinstance(value, dict):
+        return value.get('name')
+    return value or None
+
+
+class Candidate:
+    """照合候補1件（商談・請求書・入金）"""
+
+    __slots__ = ('kind', 'id', 'label', 'amount', 'customer', 'date')
+
+    def __init__(self, kind, id, label, amount, customer=None, date=None):
+        self.kind = kind
+        self.id = id
+        self.label = label
+        self.amount = amount
+        self.customer = customer
+        self.date = date
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __repr__(self):
+        return f"Candidate({self.kind} {self.id} ¥{self.amount:,})"
+
+
+def deal_candidates(deals, tax_rate=None, rounding='四捨五入'):
+    """
+    商談の候補（顧客は取引先名、なければ親商談名）
+
+    Args:
+        deals (list): CRM商談（辞書・DealRecord）
+        tax_rate (float): 指定すると Amount を税込みに換算する（1件ごとに端数処理）
+        rounding (str): 税込み換算の端数処理（tax_engine.ROUNDING_MODES）
+    """
+    deals = list(deals)
+    amounts = [deal.get('Amount') or 0 for deal in deals]
+    if tax_rate:
+        amounts = TaxEngine(TaxRule(tax_rate, rounding)).with_tax_many(amounts)
+    return [Candidate('deal', deal.get('id'), deal.get('Deal_Name'), to_yen(amount),
+                      _name(deal.get('Account_Name')) or _name(deal.get('field78')),
+                      deal.get('Closing_Date'))
+            for deal, amount in zip(deals, amounts)]
+
+
+def invoice_candidates(invoices, amount_field='balance'):
+    """請求書の候補（amount_field='total' で請求額、既定は未入金残高）"""
+    return [Candidate('invoice', invoice.get('invoice_id'), invoice.get('invoice_number'),
+                      to_yen(invoice.get(amount_field)), invoice.get('customer_name'), invoice.get('date'))
+            for invoice in invoices]
+
+
+def payment_candidates(payments):
+    """入金（customerpayments）の候補"""
+    return [Candidate('payment', payment.get('payment_id'),
+                      payment.get('reference_number') or payment.get('payment_number'),
+                      to_yen(payment.get('amount')), payment.get('customer_name'), payment.get('date'))
+            for payment in payments]
+
+
+def filter_candidates(candidates, customer=None, date_from=None, date_to=None):
+    """顧客名（部分一致）・日付（YYYY-MM-DD、両端を含む）で絞り込む"""
+    selected = []
+    for candidate in candidates:
+        if customer and customer not in (candidate.customer or ''):
+            continue
+        if date_from and (not candidate.date or candidate.date < date_from):
+            continue
+        if date_to and (not candidate.date or candidate.date > date_to):
+            continue
+        selected.append(candidate)
+    return selected
+
+
+def _solution(items, target, method, scope, interchangeable=None, partial=False):
+    total = sum(item.amount for item in items)
+    return {
+        'items': items,
+        'total': total,
+        'gap': total - target,
+        'method': method,
+        'scope': scope,
+        # 同じ金額で入れ替え可能な候補 {金額: [候補, ...]}
+        'interchangeable': interchangeable or {},
+        # 候補を絞り込んで探した解（見つからなかった組み合わせがありうる）
+        'partial': partial
+    }
+
+
+def _rank(solution):
+    return abs(solution['gap']), len(solution['items'])
+
+
+def count_vectors(amount_counts, totals, upper=None):
+    """
+    金額ごとの件数 {金額: 使える件数} から合計が totals になる選び方を返す（有界DP）
+
+    到達可能な合計を金額の種類ごとにintのビット列で持ち、後ろから件数を選び直す。
+    同じ金額の候補は件数だけで区別するため、入れ替えただけの選び方は1つになる
+
+    Args:
+        amount_counts (dict): {正の整数金額: 件数}
+        totals (iterable): 目標の合計（この順に調べる）
+        upper (int): 合計の上限（ビット列の長さ、省略時は totals の最大値）
+
+    Yields:
+        tuple: (合計, [(金額, 件数), ...])。大きい金額を多く使う選び方から順に返す
+    """
+    totals = list(totals)
+    if upper is None:
+        upper = max(totals, default=0)
+    amounts = sorted(amount_counts)
+    mask = (1 << (upper + 1)) - 1
+
+    # reach[g] = 先頭 g 種類の金額で作れる合計の集合
+    reach = [1]
+    for amount in amounts:
+        current = accumulated = reach[-1]
+        for _ in range(min(amount_counts[amount], upper // amount)):
+            current = (current << amount) & mask
+            if not current:
+                break
+            accumulated |= current
+        reach.append(accumulated)
+
+    for total in totals:
+        if total <= 0 or total > upper or not reach[-1] >> total & 1:
+            continue
+        stack = [(len(amounts), total, [])]
+        while stack:
+            level, remaining, counts = stack.pop()
+            if level == 0:
+                if remaining == 0:
+                    yield total, counts
+                continue
+            amount = amounts[level - 1]
+            previous = reach[level - 1]
+            options = []
+            for count in range(min(amount_counts[amount], remaining // amount), -1, -1):
+                rest = remaining - count * amount
+                if previous >> rest & 1:
+                    options.append((level - 1, rest, counts + [(amount, count)] if count else counts))
+            # 件数の多い選択肢を先に調べる（スタックなので逆順に積む）
+            stack.extend(reversed(options))
+
+
+class ReconciliationSolver:
+    """目標金額に一致する候補の組み合わせを探す"""
+
+    def __init__(self, tolerance=0, max_solutions=5, mitm_limit=MITM_LIMIT, dp_max_bytes=DP_MAX_BYTES):
+        """
+        Args:
+            tolerance (int): 許容誤差（円、合計が 目標±tolerance なら一致とみなす）
+            max_solutions (int): 返す解の最大数
+            mitm_limit (int): 半分全列挙を使う候補数の上限
+            dp_max_bytes (int): 有界DPのビット列の合計サイズ上限
+        """
+        self.tolerance = int(tolerance)
+        self.max_solutions = max_solutions
+        self.mitm_limit = mitm_limit
+        self.dp_max_bytes = dp_max_bytes
+
+    def solve(self, candidates, target, scope='全体'):
+        """
+        候補の組み合わせのうち合計が目標金額に近い順（同じなら件数が少ない順）に返す
+
+        どの方式でも扱えない規模の場合は、目標金額に近い mitm_limit 件の候補だけで探した
+        解を partial=True として返す
+
+        Returns:
+            list: [{'items', 'total', 'gap', 'method', 'scope', 'interchangeable', 'partial'}, ...]
+        """
+        target = int(target)
+        items = [candidate for candidate in candidates if candidate.amount]
+        if not items:
+            return []
+
+        sign = 1
+        if all(item.amount < 0 for item in items):
+            sign, target = -1, -target
+        if all(item.amount * sign > 0 for item in items):
+            # 目標金額＋誤差を超える候補は使えない
+            upper = target + self.tolerance
+            items = [item for item in items if item.amount * sign <= upper]
+            if upper < 0 or sum(item.amount * sign for item in items) < target - self.tolerance:
+                return []
+            width = upper + 1
+            groups = len({item.amount for item in items})
+            if groups * (width // 8 + 1) <= self.dp_max_bytes:
+                return self._solve_dp(items, target, sign, scope)
+
+        if len(items) <= self.mitm_limit:
+            return self._solve_mitm(items, target * sign, scope)
+
+        target *= sign
+        offset = -sum(item.amount for item in items if item.amount < 0)
+        upper = target + offset + self.tolerance
+        groups = len({abs(item.amount) for item in items})
+        if offset and upper > 0 and groups * (upper // 8 + 1) <= self.dp_max_bytes:
+            return self._solve_shifted_dp(items, target, offset, scope)
+        return self._solve_bounded(items, target, scope)
+
+    def _solve_shifted_dp(self, items, target, offset, scope):
+        """
+        正負混在の候補を有界DPで解く
+
+        負の候補をすべて使った合計 -offset から始めると、正の候補を使うか負の候補を外すごとに
+        合計が |金額| だけ増える。そのため |金額| の候補から合計 target + offset を選ぶ問題になる
+        """
+        proxies = [Candidate(item.kind, index, item.label, abs(item.amount)) for index, item in enumerate(items)]
+        solutions = []
+        for solution in self._solve_dp(proxies, target + offset, 1, scope):
+            picked = {proxy.id for proxy in solution['items']}
+            chosen = [item for index, item in enumerate(items) if (index in picked) == (item.amount > 0)]
+            interchangeable = {}
+            for group in solution['interchangeable'].values():
+                originals = [items[proxy.id] for proxy in group]
+                if len({item.amount for item in originals}) == 1:
+                    interchangeable[originals[0].amount] = originals
+            solutions.append(_solution(chosen, target, 'DP（正負混在）', scope, interchangeable))
+        return sorted(solutions, key=_rank)
+
+    def _solve_bounded(self, items, target, scope):
+        """目標金額に近い mitm_limit 件の候補だけで半分全列挙する（部分的な結果）"""
+        nearest = sorted(items, key=lambda item: abs(abs(item.amount) - abs(target)))[:self.mitm_limit]
+        solutions = self._solve_mitm(nearest, target, scope)
+        for solution in solutions:
+            solution['method'] = '半分全列挙（候補を絞り込み）'
+            solution['partial'] = True
+        return solutions
+
+    def _solve_dp(self, items, target, sign, scope):
+        """金額ごとの件数を選ぶ有界DP（到達可能な合計をintのビット列で保持）"""
+        by_amount = defaultdict(list)
+        for item in items:
+            by_amount[item.amount * sign].append(item)
+        totals = (target + gap for gap in self._gaps())
+        solutions = []
+        for _, counts in count_vectors({amount: len(group) for amount, group in by_amount.items()}, totals,
+                                       upper=target + self.tolerance):
+            chosen, interchangeable = [], {}
+            for amount, count in counts:
+                group = by_amount[amount]
+                chosen.extend(group[:count])
+                if count < len(group):
+                    interchangeable[amount * sign] = group
+            solutions.append(_solution(chosen, target * sign, 'DP', scope, interchangeable))
+            if len(solutions) >= self.max_solutions:
+                break
+        return sorted(solutions, key=_rank)
+
+    def _gaps(self):
+        yield 0
+        for gap in range(1, self.tolerance + 1):
+            yield -gap
+            yield gap
+
+    def _solve_mitm(self, items, target, scope):
+        """候補を半分に分け、片側の部分和を並べて二分探索で突き合わせる"""
+        half = len(items) // 2
+        left = self._subset_sums(items[:half])
+        right = sorted(self._subset_sums(items[half:]))
+        right_sums = [total for total, _ in right]
+
+        best = []
+        seen = set()
+        pairs = 0
+        for left_total, left_mask in left:
+            lo = bisect_left(right_sums, target - self.tolerance - left_total)
+            hi = bisect_right(right_sums, target + self.tolerance - left_total)
+            for right_total, right_mask in right[lo:hi]:
+                pairs += 1
+                if pairs > MITM_MAX_PAIRS:
+                    break
+                mask = left_mask | right_mask << half
+                if not mask:
+                    continue
+                chosen = [items[i] for i in range(len(items)) if mask >> i & 1]
+                signature = tuple(sorted(item.amount for item in chosen))
+                if signature in seen:
+                    continue
+                seen.add(signature)
+                best.append(_solution(chosen, target, '半分全列挙', scope))
+            if pairs > MITM_MAX_PAIRS:
+                break
+            if len(best) > self.max_solutions * 4:
+                best = sorted(best, key=_rank)[:self.max_solutions]
+        return sorted(best, key=_rank)[:self.max_solutions]
+
+    @staticmethod
+    def _subset_sums(items):
+        sums = [(0, 0)]
+        for i, item in enumerate(items):
+            bit = 1 << i
+            sums += [(total + item.amount, mask | bit) for total, mask in sums]
+        return sums
+
+    def explain(self, candidates, target, date_from=None, date_to=None, by_customer=True):
+        """
+        差額を説明する組み合わせを探す
+
+        期間で絞り込んだ後、顧客ごと（1社で説明できるか）に探し、
+        見つからなければ全候補で探す
+
+        Returns:
+            list: solve と同じ形式の解（誤差の小さい順）
+        """
+        pool = filter_candidates(candidates, date_from=date_from, date_to=date_to)
+        solutions = []
+        if by_customer:
+            groups = defaultdict(list)
+            for candidate in pool:
+                groups[candidate.customer or '（顧客不明）'].append(candidate)
+            if len(groups) > 1:
+                for customer, group in groups.items():
+                    solutions.extend(self.solve(group, target, scope=customer))
+        if not solutions:
+            solutions = self.solve(pool, target)
+        return sorted(solutions, key=_rank)[:self.max_solutions]
+
+
+def print_solutions(solutions, target, limit=20):
+    """解を件数・合計・誤差と候補の一覧で表示"""
+    if not solutions:
+        print(f"  ❌ ¥{target:,} に一致する組み合わせは見つかりませんでした")
+        return
+    for number, solution in enumerate(solutions, 1):
+        print(f"\n  【解{number}】{len(solution['items'])}件 合計¥{solution['total']:,}"
+              f"（誤差¥{solution['gap']:+,}・{solution['scope']}・{solution['method']}）")
+        for item in solution['items'][:limit]:
+            print(f"    {item.date or '----------'}  ¥{item.amount:>12,}  {item.label or item.id}")
+        if len(solution['items']) > limit:
+            print(f"    ... 他{len(solution['items']) - limit}件")
+        for amount, group in solution['interchangeable'].items():
+            print(f"    ※ ¥{amount:,} の候補は{len(group)}件のどれでも同じ合計になります")
+        if solution['partial']:
+            print("    ※ 候補が多すぎるため目標金額に近い候補だけで探した結果です"
+                  "（顧客・期間で絞り込むと全候補を探索します）")
+
+
+def _load_records(path, kind):
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        key = {'deals': 'data', 'invoices': 'invoices', 'payments': 'customerpayments'}[kind]
+        data = data.get(key, [])
+    return data
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    options = dict(arg[2:].split('=', 1) for arg in sys.argv[1:] if arg.startswith('--') and '=' in arg)
+    if len(args) < 2:
+        print("使い方: python reconciliation_solver.py <目標金額> <JSONファイル> "
+              "[--kind=deals|invoices|payments] [--tolerance=0] [--tax-rate=0.10] [--from=日付] [--to=日付]")
+        return 1
+
+    target = to_yen(args[0].replace(',', ''))
+    kind = options.get('kind', 'deals')
+    records = _load_records(args[1], kind)
+    if kind == 'deals':
+        candidates = deal_candidates(records, options.get('tax-rate'))
+    elif kind == 'invoices':
+        candidates = invoice_candidates(records)
+    else:
+        candidates = payment_candidates(records)
+
+    solver = ReconciliationSolver(tolerance=to_yen(options.get('tolerance', 0)))
+    print("=" * 60)
+    print(f"🔍 ¥{target:,} の照合（候補{len(candidates)}件・許容誤差¥{solver.tolerance:,}）")
+    print("=" * 60)
+    solutions = solver.explain(candidates, target, options.get('from'), options.get('to'))
+    print_solutions(solutions, target)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+商談・請求書のコンパクトなインメモリ表現
+APIレスポンスの辞書（参照項目のネストした辞書を含む）をそのまま保持する代わりに、
+__slots__ のレコードへ必要な項目だけを詰め替えて保持する
+
+- 数字だけのID（商談ID・請求書ID・reference_number）は int で保持する
+- ステージ・取引先名・日付など繰り返し現れる値はストア内で共有（インターン）する
+- 参照項目（Account_Name / Owner / field78）は名前とIDだけを平坦に持つ
+- IDと reference_number による検索はインデックス（辞書）経由
+- レコードは record.get('Amount') / record['id'] のようにAPI項目名でも読めるため、
+  既存の分類・マッチング処理に辞書の代わりにそのまま渡せる
+  （保持していない項目を読むと KeyError）
+"""
+
+from collections import defaultdict
+
+
+def encode_id(value):
+    """IDを保持用の値にする（数字のみなら int、参照項目の辞書なら その id）"""
+    if isinstance(value, dict):
+        value = value.get('id')
+    if value is None or isinstance(value, int):
+        return value
+    text = str(value).strip()
+    if not text:
+        return None
+    if text.isdigit() and (text == '0' or not text.startswith('0')):
+        return int(text)
+    return text
+
+
+def decode_id(key):
+    """encode_id で保持した値をAPIと同じ文字列に戻す"""
+    return None if key is None else str(key)
+
+
+def _field(record, key):
+    # ProjectedRecord の未取得項目警告を出さずに読む
+    return record[key] if key in record else None
+
+
+def _ref_name(value):
+    if isinstance(value, dict):
+        return value.get('name')
+    return value or None
+
+
+class _ValuePool:
+    """同じ値を1つのオブジェクトに寄せる（文字列・int共通のインターン）"""
+
+    __slots__ = ('_values',)
+
+    def __init__(self):
+        self._values = {}
+
+    def __call__(self, value):
+        if value is None:
+            return None
+        return self._values.setdefault(value, value)
+
+    def __len__(self):
+        return len(self._values)
+
+
+class _CompactRecord:
+    """API項目名での読み取りを提供する共通部分"""
+
+    __slots__ = ()
+    FIELDS = {}
+
+    def get(self, field, default=None):
+        value = self[field]
+        return default if value is None else value
+
+    def __getitem__(self, field):
+        getter = self.FIELDS.get(field)
+        if getter is None:
+            raise KeyError(f"{type(self).__name__} は {field} を保持していません")
+        return getter(self)
+
+    def __contains__(self, field):
+        return field in self.FIELDS and self[field] is not None
+
+    def to_dict(self):
+        """API形式の辞書（エクスポート・JSON保存用）"""
+        return {field: getter(self) for field, getter in self.FIELDS.items()}
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()})"
+
+
+class DealRecord(_CompactRecord):
+    """商談1件"""
+
+    __slots__ = ('id', 'name', 'account', 'account_id', 'owner', 'amount', 'stage',
+                 'closing_date', 'parent_id', 'parent_name')
+
+    FIELDS = {
+        'id': lambda r: decode_id(r.id),
+        'Deal_Name': lambda r: r.name,
+        'Account_Name': lambda r: {'name': r.account, 'id': decode_id(r.account_id)} if r.account else None,
+        'Owner': lambda r: {'name': r.owner} if r.owner else None,
+        'Amount': lambda r: r.amount,
+        'Stage': lambda r: r.stage,
+        'Closing_Date': lambda r: r.closing_date,
+        'field78': lambda r: {'name': r.parent_name, 'id': decode_id(r.parent_id)} if r.parent_id else None,
+    }
+
+    @classmethod
+    def from_api(cls, deal, intern):
+        record = cls.__new__(cls)
+        record.id = encode_id(deal['id'])
+        record.name = _field(deal, 'Deal_Name')
+        account = _field(deal, 'Account_Name')
+        record.account = intern(_ref_name(account))
+        record.account_id = intern(encode_id(account) if isinstance(account, dict) else None)
+        record.owner = intern(_ref_name(_field(deal, 'Owner')))
+        record.amount = _field(deal, 'Amount')
+        record.stage = intern(_field(deal, 'Stage'))
+        record.closing_date = intern(_field(deal, 'Closing_Date'))
+        parent = _field(deal, 'field78')
+        record.parent_id = intern(encode_id(parent))
+        record.parent_name = intern(_ref_name(parent)) if record.parent_id else None
+        return record
+
+
+class InvoiceRecord(_CompactRecord):
+    """請求書1件"""
+
+    __slots__ = ('invoice_id', 'invoice_number', 'reference_number', 'customer_id', 'customer_name',
+                 'date', 'status', 'total', 'sub_total', 'balance')
+
+    FIELDS = {
+        'invoice_id': lambda r: decode_id(r.invoice_id),
+        'invoice_number': lambda r: r.invoice_number,
+        'reference_number': lambda r: decode_id(r.reference_number) or '',
+        'customer_id': lambda r: decode_id(r.customer_id),
+        'customer_name': lambda r: r.customer_name,
+        'date': lambda r: r.date,
+        'status': lambda r: r.status,
+        'total': lambda r: r.total,
+        'sub_total': lambda r: r.sub_total,
+        'balance': lambda r: r.balance,
+    }
+
+    @classmethod
+    def from_api(cls, invoice, intern):
+        record = cls.__new__(cls)
+        record.invoice_id = encode_id(invoice['invoice_id'])
+        record.invoice_number = invoice.get('invoice_number')
+        record.reference_number = encode_id(invoice.get('reference_number'))
+        record.customer_id = intern(encode_id(invoice.get('customer_id')))
+        record.customer_name = intern(invoice.get('customer_name'))
+        record.date = intern(invoice.get('date'))
+        record.status = intern(invoice.get('status'))
+        record.total = invoice.get('total')
+        record.sub_total = invoice.get('sub_total')
+        record.balance = invoice.get('balance')
+        return record
+
+
+class DealStore:
+    """商談ID → DealRecord（同じIDは後から追加したもので置き換え、順序は初出順）
+
+    get / items / in で商談IDの辞書と同じように使える。
+    """
+
+    def __init__(self):
+        self.by_id = {}
+        self._intern = _ValuePool()
+        self._children = None
+
+    @classmethod
+    def from_api(cls, deals):
+        store = cls()
+        store.extend(deals)
+        return store
+
+    def add(self, deal):
+        record = deal if isinstance(deal, DealRecord) else DealRecord.from_api(deal, self._intern)
+        self.by_id[record.id] = record
+        self._children = None
+        return record
+
+    def extend(self, deals):
+        for deal in deals:
+            self.add(deal)
+
+    def get(self, deal_id, default=None):
+        return self.by_id.get(encode_id(deal_id), default)
+
+    def __getitem__(self, deal_id):
+        return self.by_id[encode_id(deal_id)]
+
+    def __contains__(self, deal_id):
+        return encode_id(deal_id) in self.by_id
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def __iter__(self):
+        return iter(self.by_id.values())
+
+    def values(self):
+        return self.by_id.values()
+
+    def items(self):
+        """(商談ID文字列, レコード)"""
+        return ((decode_id(key), record) for key, record in self.by_id.items())
+
+    def children_of(self, parent_id):
+        """field78 が parent_id の商談（初回呼び出し時に親ID索引を作る）"""
+        if self._children is None:
+            self._children = defaultdict(list)
+            for record in self.by_id.values():
+                if record.parent_id is not None:
+                    self._children[record.parent_id].append(record)
+        return self._children.get(encode_id(parent_id), [])
+
+    def to_records(self):
+        return [record.to_dict() for record in self.by_id.values()]
+
+
+class InvoiceStore:
+    """請求書ID → InvoiceRecord と reference_number の索引"""
+
+    def __init__(self):
+        self.by_id = {}
+        self.by_reference = defaultdict(list)
+        self._intern = _ValuePool()
+
+    @classmethod
+    def from_api(cls, invoices, exclude_statuses=()):
+        store = cls()
+        store.extend(invoice for invoice in invoices if invoice.get('status') not in exclude_statuses)
+        return store
+
+    def add(self, invoice):
+        record = invoice if isinstance(invoice, InvoiceRecord) else InvoiceRecord.from_api(invoice, self._intern)
+        previous = self.by_id.get(record.invoice_id)
+        if previous is not None and previous.reference_number is not None:
+            self.by_reference[previous.reference_number].remove(previous)
+        self.by_id[record.invoice_id] = record
+        if record.reference_number is not None:
+            self.by_reference[record.reference_number].append(record)
+        return record
+
+    def extend(self, invoices):
+        for invoice in invoices:
+            self.add(invoice)
+
+    def for_reference(self, reference_number):
+        """reference_number が一致する請求書（追加順）"""
+        return self.by_reference.get(encode_id(reference_number), [])
+
+    def latest_for_reference(self, reference_number):
+        """reference_number が一致する請求書のうち最後に追加したもの"""
+        matches = self.for_reference(reference_number)
+        return matches[-1] if matches else None
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def __iter__(self):
+        return iter(self.by_id.values())
+
+    def to_records(self):
+        return [record.to_dict() for record in self.by_id.values()]
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分析結果のスナップショットストア（Parquet・実行日パーティション）
+実行ごとの分析結果を1ファイルのJSONで丸ごと書き直す代わりに、データセット単位で
+キー順に並べたParquetとして保存し、任意の2回の実行を比較できるようにする
+
+保存形式:
+    logs/snapshots/{データセット}/run_date=YYYY-MM-DD/{実行ID}.parquet
+    logs/snapshots/manifest.json    {データセット: [{run_id, run_date, path, key, rows, columns, created_at}]}
+
+- 保存時にキー列で並べ替えるため、比較はキー順のマージ結合（インデックスの単調結合）で行う
+- 比較結果は 新規 / 削除 / 変更 のDataFrame。leakage_column を指定すると
+  「漏れになった / 漏れが解消した / 漏れのまま内容が変わった」の比較になる
+- 参照項目（{'id', 'name'}）は {列}（ID）と {列}_name に展開して保存する
+- リスト・配列などの非スカラー値の列（invoice_types 等）は JSON 文字列にして比較する
+- Parquetの読み書きには pyarrow が必要
+
+使い方:
+    python snapshot_store.py                               データセットと実行の一覧
+    python snapshot_store.py diff <データセット> [旧実行ID] [新実行ID]
+"""
+
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+DEFAULT_SNAPSHOT_DIR = Path(__file__).parent.parent.parent / "logs" / "snapshots"
+MANIFEST_NAME = "manifest.json"
+RUN_ID_FORMAT = "%Y%m%d_%H%M%S"
+
+
+class SnapshotError(Exception):
+    """スナップショットの保存・読み込み・比較ができない"""
+
+
+def flatten_record(record):
+    """参照項目の辞書を {列}=ID, {列}_name=名前 に展開した辞書"""
+    flat = {}
+    for field, value in record.items():
+        if isinstance(value, dict):
+            flat[field] = value.get('id')
+            flat[f"{field}_name"] = value.get('name')
+        else:
+            flat[field] = value
+    return flat
+
+
+def _plain(value):
+    """Parquetから読んだ配列・構造体を JSON にできる Python の値に戻す"""
+    if isinstance(value, np.ndarray):
+        value = value.tolist()
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    return value
+
+
+def comparable(series):
+    """非スカラー値を JSON 文字列にした Series（ベクトル化した != で比較できるようにする）"""
+    if series.dtype != object:
+        return series
+    return series.map(lambda value: json.dumps(_plain(value), ensure_ascii=False, default=str)
+                      if isinstance(value, (list, tuple, dict, np.ndarray)) else value)
+
+
+class SnapshotStore:
+    """データセットごとの実行スナップショットとマニフェスト"""
+
+    def __init__(self, root=None):
+        self.root = Path(root or DEFAULT_SNAPSHOT_DIR)
+        self.manifest_path = self.root / MANIFEST_NAME
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self):
+        if not self.manifest_path.exists():
+            return {}
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_manifest(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        temp_file = self.manifest_path.with_suffix('.tmp')
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+        temp_file.replace(self.manifest_path)
+
+    @staticmethod
+    def _require_pyarrow():
+        if pyarrow is None:
+            raise SnapshotError("Parquetの読み書きには pyarrow が必要です（pip install pyarrow）")
+
+    def write(self, dataset, records, key, run_id=None, source=None):
+        """
+        1回分の結果を保存してマニフェストに登録
+
+        Args:
+            dataset (str): データセット名（invoice_leakage / jt_etp_children 等）
+            records (list | DataFrame): 結果レコード（辞書のリストは参照項目を展開して保存）
+            key (str): 行を一意に識別する列（同じキーは後の行を優先）
+            run_id (str): 実行ID（省略時は現在時刻 YYYYMMDD_HHMMSS）
+            source (str): 結果を作ったスクリプト名（マニフェストに記録）
+
+        Returns:
+            dict: マニフェストのエントリ
+        """
+        self._require_pyarrow()
+        run_id = run_id or datetime.now().strftime(RUN_ID_FORMAT)
+        run_date = datetime.strptime(run_id, RUN_ID_FORMAT).strftime("%Y-%m-%d")
+
+        if isinstance(records, pd.DataFrame):
+            frame = records
+        else:
+            frame = pd.DataFrame.from_records([flatten_record(record) for record in records])
+        if key not in frame:
+            raise SnapshotError(f"{dataset}: キー列 {key} がありません")
+        frame = (frame.drop_duplicates(subset=key, keep='last')
+                 .astype({key: str})
+                 .sort_values(key, kind='mergesort')
+                 .reset_index(drop=True))
+
+        path = self.root / dataset / f"run_date={run_date}" / f"{run_id}.parquet"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        frame.to_parquet(path, index=False)
+
+        entry = {
+            'run_id': run_id,
+            'run_date': run_date,
+            'path': path.relative_to(self.root).as_posix(),
+            'key': key,
+            'rows': len(frame),
+            'columns': list(frame.columns),
+            'source': source,
+            'created_at': datetime.now().isoformat()
+        }
+        runs = [run for run in self.manifest.get(dataset, []) if run['run_id'] != run_id]
+        self.manifest[dataset] = sorted(runs + [entry], key=lambda run: run['run_id'])
+        self._save_manifest()
+        print(f"💾 スナップショット保存: {dataset} {run_id}（{len(frame)}行）")
+        return entry
+
+    def runs(self, dataset):
+        """データセットの実行一覧（古い順）"""
+        return self.manifest.get(dataset, [])
+
+    def _entry(self, dataset, run_id):
+        runs = self.runs(dataset)
+        if not runs:
+            raise SnapshotError(f"{dataset} のスナップショットがありません")
+        if run_id is None:
+            return runs[-1]
+        for run in runs:
+            if run['run_id'] == run_id:
+                return run
+        raise SnapshotError(f"{dataset} に実行 {run_id} はありません")
+
+    def load(self, dataset, run_id=None, columns=None):
+        """実行のスナップショットをDataFrameで読み込む（run_id省略時は最新）"""
+        self._require_pyarrow()
+        entry = self._entry(dataset, run_id)
+        if columns is not None and entry['key'] not in columns:
+            columns = [entry['key']] + list(columns)
+        return pd.read_parquet(self.root / entry['path'], columns=columns)
+
+    def diff(self, dataset, old_run=None, new_run=None, compare_columns=None, leakage_column=None):
+        """
+        2回の実行の差分（省略時は直前の実行と最新の実行）
+
+        Args:
+            compare_columns (list): 変更とみなす列（省略時は両方にある全列）
+            leakage_column (str): 真偽値の漏れ列。指定すると漏れの発生・解消・変化で比較する
+
+        Returns:
+            dict: {'old_run', 'new_run',
+                   'new': 新規（漏れになった）行, 'removed': 削除（漏れが解消した）行,
+                   'changed': 内容が変わった行（列名に _old / _new を付けて両方を並べる）}
+        """
+        runs = self.runs(dataset)
+        if new_run is None:
+            new_run = runs[-1]['run_id'] if runs else None
+        if old_run is None:
+            earlier = [run['run_id'] for run in runs if new_run and run['run_id'] < new_run]
+            if not earlier:
+                raise SnapshotError(f"{dataset}: 比較できる以前の実行がありません")
+            old_run = earlier[-1]
+
+        old_entry, new_entry = self._entry(dataset, old_run), self._entry(dataset, new_run)
+        key = new_entry['key']
+        if old_entry['key'] != key:
+            raise SnapshotError(f"{dataset}: キー列が実行間で異なります（{old_entry['key']} / {key}）")
+
+        old = self.load(dataset, old_run).set_index(key)
+        new = self.load(dataset, new_run).set_index(key)
+        columns = [c for c in (compare_columns or new.columns) if c in old.columns and c in new.columns]
+
+        # 保存時にキー順へ並べているため、単調なインデックス同士のマージ結合になる
+        old['_in_old'] = True
+        new['_in_new'] = True
+        joined = old.join(new, how='outer', lsuffix='_old', rsuffix='_new', sort=True)
+        in_old = joined['_in_old'].fillna(False).astype(bool)
+        in_new = joined['_in_new'].fillna(False).astype(bool)
+
+        changed = pd.Series(False, index=joined.index)
+        for column in columns:
+            before, after = comparable(joined[f"{column}_old"]), comparable(joined[f"{column}_new"])
+            changed |= (before != after) & ~(before.isna() & after.isna())
+
+        if leakage_column:
+            old_leak = in_old & joined[f"{leakage_column}_old"].fillna(False).astype(bool)
+            new_leak = in_new & joined[f"{leakage_column}_new"].fillna(False).astype(bool)
+            added, removed, changed = new_leak & ~old_leak, old_leak & ~new_leak, old_leak & new_leak & changed
+        else:
+            added, removed, changed = in_new & ~in_old, in_old & ~in_new, in_old & in_new & changed
+
+        def side(mask, suffix, frame):
+            rows = joined.loc[mask, [f"{c}{suffix}" if c in old.columns and c in new.columns else c
+                                     for c in frame.columns if not c.startswith('_in_')]]
+            rows.columns = [c for c in frame.columns if not c.startswith('_in_')]
+            return rows.reset_index()
+
+        changed_columns = [f"{c}{suffix}" for c in columns for suffix in ('_old', '_new')]
+        return {
+            'old_run': old_run,
+            'new_run': new_run,
+            'new': side(added, '_new', new),
+            'removed': side(removed, '_old', old),
+            'changed': joined.loc[changed, changed_columns].reset_index()
+        }
+
+
+def print_diff(result, label_column=None, limit=10):
+    """diff の結果を件数と先頭の行で表示"""
+    print(f"🔎 スナップショット比較: {result['old_run']} → {result['new_run']}")
+    for name, title in (('new', '新規'), ('removed', '削除・解消'), ('changed', '変更')):
+        rows = result[name]
+        print(f"  {title}: {len(rows)}件")
+        for _, row in rows.head(limit).iterrows():
+            label = row.get(label_column) if label_column else None
+            print(f"    • {row.iloc[0]}{f'  {label}' if isinstance(label, str) else ''}")
+
+
+def main():
+    args = sys.argv[1:]
+    store = SnapshotStore()
+
+    if args and args[0] == 'diff':
+        if len(args) < 2:
+            print("使い方: python snapshot_store.py diff <データセット> [旧実行ID] [新実行ID]")
+            return 1
+        dataset = args[1]
+        old_run = args[2] if len(args) > 2 else None
+        new_run = args[3] if len(args) > 3 else None
+        leakage_column = 'is_leakage' if 'is_leakage' in store._entry(dataset, new_run)['columns'] else None
+        print_diff(store.diff(dataset, old_run, new_run, leakage_column=leakage_column))
+        return 0
+
+    print("=" * 60)
+    print(f"📁 スナップショット一覧: {store.root}")
+    print("=" * 60)
+    for dataset, runs in sorted(store.manifest.items()):
+        print(f"{dataset}（キー: {runs[-1]['key']}）")
+        for run in runs:
+            print(f"  {run['run_id']}  {run['rows']:>8,}行  {run.get('source') or ''}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+消費税計算（円単位の整数演算）
+商談金額（税抜き）から税込み額を求めるときに float の `amount * 1.10` を使うと、
+端数処理の違いと浮動小数点の誤差が「漏れ」に見える差額になるため、税額はすべて整数で計算する
+
+- 税率は分数（0.10 → 10/100）で持ち、税額 = 金額 × 分子 ÷ 分母 を整数の商・余りで端数処理する
+- 端数処理: 切り捨て・四捨五入・切り上げ（負の金額は絶対値で処理して符号を戻す）
+- 端数処理の単位: 明細ごと（line）または請求書・商談ごとに合計してから1回（invoice）
+- NumPy があれば大量の金額を int64 配列でまとめて計算する（数十万件でもミリ秒単位）。
+  ない環境・int64 に収まらない金額は Python の整数で同じ計算をする
+
+使い方:
+    python tax_engine.py <税抜き金額> [...] [--rate=0.10] [--rounding=四捨五入] [--unit=line]
+"""
+
+import sys
+from decimal import Decimal, ROUND_HALF_UP
+from fractions import Fraction
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DEFAULT_RATE = '0.10'
+REDUCED_RATE = '0.08'
+DEFAULT_ROUNDING = '四捨五入'
+ROUNDING_MODES = ('切り捨て', '四捨五入', '切り上げ')
+TAX_UNITS = ('line', 'invoice')
+
+# この件数以上なら NumPy でまとめて計算する
+VECTORIZE_THRESHOLD = 64
+INT64_MAX = 2**63 - 1
+
+
+class TaxRuleError(ValueError):
+    """税率・端数処理・単位の指定が正しくない"""
+
+
+def to_yen(value):
+    """金額を円単位の整数にする（四捨五入）"""
+    if value is None or value == '':
+        return 0
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return int(Decimal(str(value)).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def _divide(numerator, denominator, rounding):
+    """numerator / denominator を端数処理した整数（denominator は正）"""
+    quotient, remainder = divmod(abs(numerator), denominator)
+    if remainder:
+        if rounding == '切り上げ' or (rounding == '四捨五入' and remainder * 2 >= denominator):
+            quotient += 1
+    return -quotient if numerator < 0 else quotient
+
+
+def _divide_array(numerators, denominator, rounding):
+    """_divide の int64 配列版"""
+    magnitude = np.abs(numerators)
+    quotient, remainder = np.divmod(magnitude, denominator)
+    if rounding == '切り上げ':
+        quotient += remainder > 0
+    elif rounding == '四捨五入':
+        quotient += remainder * 2 >= denominator
+    return np.where(numerators < 0, -quotient, quotient)
+
+
+def _round_half_up_array(values):
+    """float 配列を to_yen と同じく絶対値で四捨五入した int64 配列（NaN は0円）"""
+    values = np.nan_to_num(values, nan=0.0)
+    magnitude = np.abs(values)
+    whole = np.floor(magnitude)
+    # magnitude - whole は丸め誤差なしで求まるため、x.5 ちょうどの判定がずれない
+    whole += (magnitude - whole) >= 0.5
+    return np.where(values < 0, -whole, whole).astype(np.int64)
+
+
+def _total(values):
+    """整数のリスト・int64 配列の合計（Python の整数）"""
+    if np is not None and isinstance(values, np.ndarray):
+        return int(values.sum())
+    return sum(values)
+
+
+class TaxRule:
+    """税率・端数処理・端数処理の単位"""
+
+    def __init__(self, rate=DEFAULT_RATE, rounding=DEFAULT_ROUNDING, unit='line'):
+        """
+        Args:
+            rate (str|Decimal|float): 消費税率（0.10、軽減税率は 0.08）
+            rounding (str): 端数処理（切り捨て・四捨五入・切り上げ）
+            unit (str): 'line' は明細ごと、'invoice' は請求書（商談）の合計で1回端数処理する
+        """
+        if rounding not in ROUNDING_MODES:
+            raise TaxRuleError(f"端数処理は {'・'.join(ROUNDING_MODES)} のいずれかです: {rounding}")
+        if unit not in TAX_UNITS:
+            raise TaxRuleError(f"端数処理の単位は {' / '.join(TAX_UNITS)} のいずれかです: {unit}")
+        self.rate = Fraction(str(rate))
+        if self.rate < 0:
+            raise TaxRuleError(f"税率が負です: {rate}")
+        self.rounding = rounding
+        self.unit = unit
+
+    @property
+    def multiplier(self):
+        """税込み倍率（1 + 税率、分数）"""
+        return 1 + self.rate
+
+    def __repr__(self):
+        return f"TaxRule({float(self.rate):.0%} {self.rounding} {self.unit})"
+
+
+class TaxEngine:
+    """税抜き金額（円）から消費税・税込み額を求める"""
+
+    def __init__(self, rule=None, **kwargs):
+        """
+        Args:
+            rule (TaxRule): 省略時は kwargs（rate, rounding, unit）から作る
+        """
+        self.rule = rule or TaxRule(**kwargs)
+        self._numerator = self.rule.rate.numerator
+        self._denominator = self.rule.rate.denominator
+        # int64 の掛け算があふれない金額の上限
+        self._array_limit = INT64_MAX // max(self._numerator * 2, 1)
+
+    # --- 1件 ---
+
+    def tax(self, amount):
+        """税抜き金額の消費税（円）"""
+        return _divide(to_yen(amount) * self._numerator, self._denominator, self.rule.rounding)
+
+    def with_tax(self, amount):
+        """税抜き金額の税込み額（円）"""
+        amount = to_yen(amount)
+        return amount + _divide(amount * self._numerator, self._denominator, self.rule.rounding)
+
+    def split_inclusive(self, total):
+        """
+        税込み額（内税）を (税抜き, 消費税) に分ける
+
+        消費税 = 税込み額 × 税率 / (1 + 税率) を端数処理し、税抜き = 税込み額 - 消費税
+        """
+        total = to_yen(total)
+        tax = _divide(total * self._numerator, self._denominator + self._numerator, self.rule.rounding)
+        return total - tax, tax
+
+    # --- まとめて ---
+
+    def yen_array(self, amounts):
+        """
+        金額のリストを円単位の int64 配列にする（NumPy がなければ整数のリスト）
+
+        整数・float の ndarray（pandas の列の .to_numpy() など）は要素ごとの Python の
+        ループを通さずに変換する。float は to_yen と同じ四捨五入、NaN（欠損）は0円
+        """
+        if np is not None and isinstance(amounts, np.ndarray) and amounts.dtype.kind in 'iu':
+            return amounts.astype(np.int64, copy=False)
+        if np is not None and isinstance(amounts, np.ndarray) and amounts.dtype.kind == 'f':
+            magnitude = np.abs(amounts[~np.isnan(amounts)])
+            if not magnitude.size or magnitude.max() <= self._array_limit:
+                return _round_half_up_array(amounts)
+        values = [to_yen(amount) for amount in amounts]
+        if np is None or len(values) < VECTORIZE_THRESHOLD:
+            return values
+        if values and max(max(values), -min(values)) > self._array_limit:
+            return values
+        return np.fromiter(values, dtype=np.int64, count=len(values))
+
+    def taxes(self, amounts):
+        """
+        明細ごとの消費税
+
+        Returns:
+            NumPy があれば int64 配列、なければ整数のリスト
+        """
+        values = self.yen_array(amounts)
+        if np is not None and isinstance(values, np.ndarray):
+            return _divide_array(values * self._numerator, self._denominator, self.rule.rounding)
+        return [_divide(value * self._numerator, self._denominator, self.rule.rounding) for value in values]
+
+    def with_tax_many(self, amounts):
+        """明細ごとの税込み額（taxes と同じ型）"""
+        values = self.yen_array(amounts)
+        taxes = self.taxes(values)
+        if np is not None and isinstance(values, np.ndarray):
+            return values + taxes
+        return [value + tax for value, tax in zip(values, taxes)]
+
+    def invoice_tax(self, amounts):
+        """
+        1枚の請求書（1件の商談）の明細から消費税を求める
+        rule.unit が 'line' なら明細ごとの税額の合計、'invoice' なら合計額の税額
+        """
+        values = self.yen_array(amounts)
+        if self.rule.unit == 'invoice':
+            return self.tax(_total(values))
+        return _total(self.taxes(values))
+
+    def invoice_total(self, amounts):
+        """1枚の請求書（1件の商談）の税込み合計"""
+        values = self.yen_array(amounts)
+        return _total(values) + self.invoice_tax(values)
+
+    def group_totals(self, amounts, keys):
+        """
+        明細を keys（請求書番号・商談IDなど）ごとにまとめ、{キー: {'base', 'tax', 'total'}} を返す
+        端数処理の単位は rule.unit に従う
+        """
+        values = self.yen_array(amounts)
+        keys = list(keys)
+        if len(keys) != len(values):
+            raise TaxRuleError(f"金額{len(values)}件とキー{len(keys)}件の数が違います")
+        line_taxes = self.taxes(values) if self.rule.unit == 'line' else None
+        if np is not None and isinstance(values, np.ndarray):
+            values = values.tolist()
+            line_taxes = line_taxes.tolist() if line_taxes is not None else None
+
+        totals = {}
+        for index, key in enumerate(keys):
+            entry = totals.get(key)
+            if entry is None:
+                entry = totals[key] = {'base': 0, 'tax': 0, 'total': 0}
+            entry['base'] += values[index]
+            if line_taxes is not None:
+                entry['tax'] += line_taxes[index]
+        for entry in totals.values():
+            if line_taxes is None:
+                entry['tax'] = self.tax(entry['base'])
+            entry['total'] = entry['base'] + entry['tax']
+        return totals
+
+
+def compare_rules(amounts, rate=DEFAULT_RATE):
+    """
+    同じ明細を端数処理・単位の組み合わせごとに計算した税込み合計
+    （請求書・入金の金額がどのルールで計算されたかを逆引きする）
+
+    Returns:
+        list: [(TaxRule, 税込み合計), ...]
+    """
+    results = []
+    for unit in TAX_UNITS:
+        for rounding in ROUNDING_MODES:
+            engine = TaxEngine(TaxRule(rate, rounding, unit))
+            results.append((engine.rule, engine.invoice_total(amounts)))
+    return results
+
+
+def main():
+    options = dict(arg[2:].split('=', 1) for arg in sys.argv[1:] if arg.startswith('--') and '=' in arg)
+    amounts = [arg.replace(',', '') for arg in sys.argv[1:] if not arg.startswith('--')]
+    if not amounts:
+        print("使い方: python tax_engine.py <税抜き金額> [...] [--rate=0.10] [--rounding=四捨五入] [--unit=line]")
+        return 1
+    try:
+        engine = TaxEngine(rate=options.get('rate', DEFAULT_RATE),
+                           rounding=options.get('rounding', DEFAULT_ROUNDING),
+                           unit=options.get('unit', 'line'))
+    except TaxRuleError as e:
+        print(f"❌ {e}")
+        return 1
+
+    print(f"📊 {engine.rule}")
+    for amount, total in zip(amounts, engine.with_tax_many(amounts)):
+        print(f"  ¥{to_yen(amount):,} → ¥{int(total):,}")
+    if len(amounts) > 1:
+        print(f"  合計: ¥{sum(to_yen(amount) for amount in amounts):,} → ¥{engine.invoice_total(amounts):,}")
+        print("\n🧮 端数処理の比較:")
+        for rule, total in compare_rules(amounts, options.get('rate', DEFAULT_RATE)):
+            print(f"  {rule}: ¥{total:,}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,11 +5,13 @@ Zoho Analytics API v2 クライアント
 VERSANTコーチングレポート実行用
 """
 
-import requests
 import json
 import os
 from datetime import datetime
-import pandas as pd
+
+from lazy_import import lazy_module
+
+requests = lazy_module('requests')
 
 class ZohoAnalyticsAPI:
     def __init__(self, access_token=None, workspace_id=None):
@@ -212,6 +214,7 @@ def save_results_to_file(results, output_file, format_type='json'):
     elif format_type == 'csv':
         # CSV形式で保存（結果がDataFrame形式の場合）
         if 'data' in results:
+            import pandas as pd
             df = pd.DataFrame(results['data'])
             df.to_csv(filename, index=False, encoding='utf-8-sig')
     
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Zoho Analytics API v2 非同期クライアント（ZohoAnalyticsAPIAuto の asyncio 版）
+ZohoAnalyticsAPIAuto はエクスポートジョブの完了を time.sleep で待つためスレッドを占有するが、
+こちらは asyncio.sleep で待つので、n8n・MCP サーバーなど1つのイベントループから
+数十件のクエリを同時に実行できる
+
+- execute_query / get_workspaces / get_tables は ZohoAnalyticsAPIAuto と同じ引数・戻り値（失敗時は None）
+- HTTP は AsyncZohoSession（ClientSession をプールして再利用、429/5xx の再試行、401 時のトークン更新）
+- ジョブの完了待ちは max_wait_time 秒でタイムアウトし、タスクのキャンセルで中断できる
+  （キャンセルは呼び出し元へ伝わる）
+- 同時に実行するエクスポートジョブの数は max_concurrency で制限する
+- トークンの取得（AutoTokenManager）は最初のリクエストまで遅らせ、同期処理のため別スレッドで実行する
+
+使い方:
+    async with AsyncZohoAnalyticsAPIAuto() as client:
+        results = await asyncio.gather(*(client.execute_query(sql) for sql in queries))
+
+    python zoho_analytics_api_client_async.py <SQLファイル> [...] [--timeout=120]
+"""
+
+import asyncio
+import json
+import os
+import sys
+import urllib.parse
+from pathlib import Path
+
+from zoho_http_transport import AsyncZohoSession
+
+# 自動トークン管理システムをインポート
+sys.path.append(str(Path(__file__).parent.parent / "認証・トークン"))
+try:
+    from auto_token_manager import AutoTokenManager
+except ImportError:
+    AutoTokenManager = None
+
+BASE_URL = "https://analyticsapi.zoho.com/restapi/v2"
+DEFAULT_ORG_ID = '772044231'
+
+# ジョブの状態確認の間隔（秒）と、完了を待つ最大時間（秒）
+POLL_INTERVAL = 10
+MAX_WAIT_TIME = 120
+# 同時に実行するエクスポートジョブの上限
+MAX_CONCURRENCY = 10
+
+# エクスポートジョブの状態（jobCode / jobStatus。旧形式の status も受け付ける）
+JOB_COMPLETED = {'1004', 'JOB COMPLETED', 'COMPLETED'}
+JOB_FAILED = {'1003', '1005', 'ERROR OCCURRED', 'JOB NOT FOUND', 'FAILED'}
+
+
+def job_state(status_data):
+    """ジョブ状態のレスポンスを 'completed' / 'failed' / 'running' にする"""
+    data = status_data.get('data') or {}
+    values = {str(data.get(key) or '').upper() for key in ('jobCode', 'jobStatus', 'status')}
+    if values & JOB_COMPLETED:
+        return 'completed'
+    if values & JOB_FAILED:
+        return 'failed'
+    return 'running'
+
+
+class AsyncZohoAnalyticsAPIAuto:
+    def __init__(self, access_token=None, workspace_id=None, auto_refresh=True,
+                 max_concurrency=MAX_CONCURRENCY, poll_interval=POLL_INTERVAL, max_wait_time=MAX_WAIT_TIME,
+                 transport=None, log=print):
+        """
+        Args:
+            access_token (str): アクセストークン（省略時は AutoTokenManager または環境変数）
+            workspace_id (str): ワークスペースID
+            auto_refresh (bool): 自動トークン更新を有効にするか
+            max_concurrency (int): 同時に実行するエクスポートジョブの上限
+            poll_interval (float): ジョブの状態確認の間隔（秒）
+            max_wait_time (float): ジョブの完了を待つ最大時間（秒）
+            transport (AsyncZohoSession): HTTPセッション（省略時は作成し、close() で閉じる）
+            log (callable): メッセージの出力先（MCPサーバーではstderrを指定）
+        """
+        self.base_url = BASE_URL
+        self.auto_refresh = auto_refresh
+        self.access_token = access_token
+        self.workspace_id = workspace_id
+        self.org_id = os.getenv('ZOHO_ANALYTICS_ORG_ID', DEFAULT_ORG_ID)
+        self.poll_interval = poll_interval
+        self.max_wait_time = max_wait_time
+        self.log = log
+        self.token_manager = None
+        self._owns_transport = transport is None
+        self.transport = transport or AsyncZohoSession(token_refresher=self._refresh_for_retry, log=log)
+        self._jobs = asyncio.Semaphore(max_concurrency)
+        self._token_lock = asyncio.Lock()
+        self._ready = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """HTTPセッションを閉じる"""
+        if self._owns_transport:
+            await self.transport.close()
+
+    # ------------------------------------------------------------------
+    # トークン
+    # ------------------------------------------------------------------
+
+    async def _ensure_ready(self):
+        """最初のリクエストの前にトークンとワークスペースIDを用意する"""
+        if self._ready:
+            return
+        async with self._token_lock:
+            if self._ready:
+                return
+            if self.auto_refresh and AutoTokenManager and not self.access_token:
+                try:
+                    self.token_manager = await asyncio.to_thread(AutoTokenManager)
+                    if await asyncio.to_thread(self.token_manager.auto_refresh):
+                        self.log("✅ 自動トークン更新が完了しました")
+                    else:
+                        self.log("⚠️ 自動トークン更新に失敗しました。手動設定を使用します。")
+                    self.access_token = self.token_manager.get_current_token()
+                    config = await asyncio.to_thread(self.token_manager.load_config)
+                    self.workspace_id = self.workspace_id or config.get('org_id')
+                except Exception as e:
+                    self.log(f"⚠️ 自動トークン管理システムの初期化に失敗: {e}")
+                    self.token_manager = None
+
+            self.access_token = self.access_token or os.getenv('ZOHO_ANALYTICS_ACCESS_TOKEN')
+            self.workspace_id = self.workspace_id or os.getenv('ZOHO_ANALYTICS_WORKSPACE_ID')
+            if not self.access_token:
+                raise ValueError("アクセストークンが必要です。環境変数 ZOHO_ANALYTICS_ACCESS_TOKEN を設定してください。")
+            if not self.workspace_id:
+                raise ValueError("ワークスペースIDが必要です。環境変数 ZOHO_ANALYTICS_WORKSPACE_ID を設定してください。")
+            self._ready = True
+
+    async def _refresh_for_retry(self):
+        """401応答時にトークンを更新し、新しいアクセストークンを返す（同時の401でも更新は1回）"""
+        if not (self.auto_refresh and self.token_manager):
+            return None
+        stale_token = self.access_token
+        async with self._token_lock:
+            if self.access_token != stale_token:
+                return self.access_token
+            if await asyncio.to_thread(self.token_manager.auto_refresh):
+                new_token = self.token_manager.get_current_token()
+                if new_token:
+                    self.access_token = new_token
+                    self.log("✅ トークンが自動更新されました")
+                    return new_token
+            self.log("❌ トークンの自動更新に失敗しました")
+            return None
+
+    def _headers(self):
+        # AsyncZohoSession は401時にヘッダーのトークンを書き換えるため、リクエストごとに作る
+        return {
+            'Authorization': f'Zoho-oauthtoken {self.access_token}',
+            'ZANALYTICS-ORGID': self.org_id,
+            'Content-Type': 'application/json'
+        }
+
+    async def _get_json(self, url):
+        """GETしてJSONを返す（200以外は None）"""
+        await self._ensure_ready()
+        response = await self.transport.request('GET', url, headers=self._headers())
+        if response.status != 200:
+            self.log(f"❌ リクエスト失敗: {response.status}")
+            self.log(f"   レスポンス: {response.text[:500]}...")
+            return None
+        return response.json()
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+
+    async def execute_query(self, query, output_format='json', max_wait_time=None):
+        """
+        SQLクエリを実行
+
+        Args:
+            query (str): 実行するSQLクエリ
+            output_format (str): 出力形式 ('json', 'csv', 'xlsx')
+            max_wait_time (float): ジョブの完了を待つ最大時間（秒、省略時は max_wait_time）
+
+        Returns:
+            dict: APIレスポンス（失敗・タイムアウト時は None）
+        """
+        config = {
+            "responseFormat": output_format,
+            "sqlQuery": query
+        }
+        config_encoded = urllib.parse.quote(json.dumps(config))
+
+        async with self._jobs:
+            await self._ensure_ready()
+            url = f"{self.base_url}/bulk/workspaces/{self.workspace_id}/data?CONFIG={config_encoded}"
+            job_data = await self._get_json(url)
+            if job_data is None:
+                return None
+            if 'jobId' not in (job_data.get('data') or {}):
+                return job_data
+            job_id = job_data['data']['jobId']
+            self.log(f"   ✅ エクスポートジョブ開始 (ID: {job_id})")
+            try:
+                return await asyncio.wait_for(self._wait_for_job_completion(job_id),
+                                              max_wait_time or self.max_wait_time)
+            except asyncio.TimeoutError:
+                self.log(f"❌ ジョブ完了待機タイムアウト (ID: {job_id})")
+                return None
+
+    async def _wait_for_job_completion(self, job_id):
+        """ジョブが終わるまで poll_interval 秒ごとに状態を確認し、データを返す"""
+        job_url = f"{self.base_url}/bulk/workspaces/{self.workspace_id}/exportjobs/{job_id}"
+        while True:
+            status_data = await self._get_json(job_url)
+            if status_data is None:
+                return None
+            state = job_state(status_data)
+            if state == 'completed':
+                data_url = (status_data.get('data') or {}).get('downloadUrl') or f"{job_url}/data"
+                result = await self._get_json(data_url)
+                if result is not None:
+                    self.log(f"✅ データ取得完了 (ID: {job_id})")
+                return result
+            if state == 'failed':
+                self.log(f"❌ ジョブが失敗しました (ID: {job_id}): {status_data.get('data')}")
+                return None
+            await asyncio.sleep(self.poll_interval)
+
+    async def get_workspaces(self):
+        """利用可能なワークスペースを取得"""
+        return await self._get_json(f"{self.base_url}/workspaces")
+
+    async def get_tables(self):
+        """ワークスペース内のテーブル一覧を取得"""
+        await self._ensure_ready()
+        return await self._get_json(f"{self.base_url}/workspaces/{self.workspace_id}/views")
+
+
+async def run_queries(paths, max_wait_time=MAX_WAIT_TIME):
+    """SQLファイルを同時に実行し、[(パス, 結果), ...] を返す"""
+    queries = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            queries.append(f.read())
+    async with AsyncZohoAnalyticsAPIAuto(max_wait_time=max_wait_time) as client:
+        results = await asyncio.gather(*(client.execute_query(query) for query in queries),
+                                       return_exceptions=True)
+    return list(zip(paths, results))
+
+
+def main():
+    options = dict(arg[2:].split('=', 1) for arg in sys.argv[1:] if arg.startswith('--') and '=' in arg)
+    paths = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if not paths:
+        print("使い方: python zoho_analytics_api_client_async.py <SQLファイル> [...] [--timeout=120]")
+        return 1
+
+    print(f"📊 {len(paths)}件のクエリを同時に実行")
+    results = asyncio.run(run_queries(paths, float(options.get('timeout', MAX_WAIT_TIME))))
+    failed = 0
+    for path, result in results:
+        if isinstance(result, Exception) or result is None:
+            failed += 1
+            print(f"  ❌ {path}: {result or '結果なし'}")
+        else:
+            print(f"  ✅ {path}: {len(result.get('data', []))}行")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
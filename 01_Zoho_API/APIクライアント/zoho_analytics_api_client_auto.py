@@ -3,23 +3,35 @@
 """
 Zoho Analytics API v2 クライアント（自動トークン更新機能付き）
 VERSANTコーチングレポート実行用
+
+requests・pandas・自動トークン管理システムは最初に使うときに読み込み、
+設定ファイルの読み込み・トークンの確認と更新もクライアントの作成時ではなく最初のリクエストで行う
+（import とクライアントの作成だけなら重い依存を読み込まない）
 """
 
-import requests
 import json
 import os
 from datetime import datetime
-import pandas as pd
 import sys
 from pathlib import Path
 
-# 自動トークン管理システムをインポート
+from lazy_import import lazy_module
+
+requests = lazy_module('requests')
+
+# 自動トークン管理システムの場所（読み込みは最初に使うとき）
 sys.path.append(str(Path(__file__).parent.parent / "認証・トークン"))
-try:
-    from auto_token_manager import AutoTokenManager
-except ImportError:
-    print("警告: auto_token_manager.py が見つかりません。自動トークン更新機能は無効です。")
-    AutoTokenManager = None
+
+
+def load_token_manager_class():
+    """AutoTokenManager（見つからなければ None）"""
+    try:
+        from auto_token_manager import AutoTokenManager
+    except ImportError:
+        print("警告: auto_token_manager.py が見つかりません。自動トークン更新機能は無効です。")
+        return None
+    return AutoTokenManager
+
 
 class ZohoAnalyticsAPIAuto:
     def __init__(self, access_token=None, workspace_id=None, auto_refresh=True):
@@ -34,29 +46,59 @@ class ZohoAnalyticsAPIAuto:
         self.base_url = "https://analyticsapi.zoho.com/restapi/v2"
         self.auto_refresh = auto_refresh
         self.token_manager = None
+        self.access_token = access_token
+        self.workspace_id = workspace_id
+        self.org_id = os.getenv('ZOHO_ANALYTICS_ORG_ID', '772044231')
+        self.headers = None
+        self._requested_access_token = access_token
+        self._requested_workspace_id = workspace_id
+        self._token_manager_loaded = False
+        self._ready = False
+    
+    def _get_token_manager(self):
+        """自動トークン管理システム（初回に作成。無効・作成失敗なら None）"""
+        if not self._token_manager_loaded:
+            self._token_manager_loaded = True
+            token_manager_class = load_token_manager_class() if self.auto_refresh else None
+            if token_manager_class:
+                try:
+                    self.token_manager = token_manager_class()
+                except Exception as e:
+                    print(f"⚠️ 自動トークン管理システムの初期化に失敗: {e}")
+        return self.token_manager
+    
+    def _ensure_ready(self):
+        """
+        最初のリクエストの前にトークンとワークスペースIDを用意する
+        （トークンがなければ ValueError）
+        """
+        if self._ready:
+            return
+        access_token = self._requested_access_token
+        workspace_id = self._requested_workspace_id
         
         # 自動トークン更新が有効な場合
-        if auto_refresh and AutoTokenManager:
+        token_manager = self._get_token_manager()
+        if token_manager:
             try:
-                self.token_manager = AutoTokenManager()
                 # 自動トークン更新を実行
-                if self.token_manager.auto_refresh():
+                if token_manager.auto_refresh():
                     print("✅ 自動トークン更新が完了しました")
                 else:
                     print("⚠️ 自動トークン更新に失敗しました。手動設定を使用します。")
             except Exception as e:
-                print(f"⚠️ 自動トークン管理システムの初期化に失敗: {e}")
+                print(f"⚠️ 自動トークン更新に失敗: {e}")
         
         # トークンとワークスペースIDを設定
-        if self.token_manager:
+        if token_manager:
             # 自動トークン管理から取得
-            self.access_token = self.token_manager.get_current_token()
+            self.access_token = token_manager.get_current_token()
             if not self.access_token:
                 raise ValueError("有効なアクセストークンを取得できませんでした")
             
             # 設定ファイルからワークスペースIDを取得
             try:
-                config = self.token_manager.load_config()
+                config = token_manager.load_config()
                 self.workspace_id = workspace_id or config.get('org_id')
             except:
                 self.workspace_id = workspace_id or os.getenv('ZOHO_ANALYTICS_WORKSPACE_ID')
@@ -71,18 +113,17 @@ class ZohoAnalyticsAPIAuto:
         if not self.workspace_id:
             raise ValueError("ワークスペースIDが必要です。環境変数 ZOHO_ANALYTICS_WORKSPACE_ID を設定してください。")
         
-        self.org_id = os.getenv('ZOHO_ANALYTICS_ORG_ID', '772044231')
-        
         self.headers = {
             'Authorization': f'Zoho-oauthtoken {self.access_token}',
             'ZANALYTICS-ORGID': self.org_id,
             'Content-Type': 'application/json'
         }
+        self._ready = True
         
         print(f"✅ APIクライアント初期化完了")
         print(f"   ワークスペースID: {self.workspace_id}")
         print(f"   組織ID: {self.org_id}")
-        print(f"   自動トークン更新: {'有効' if auto_refresh else '無効'}")
+        print(f"   自動トークン更新: {'有効' if self.auto_refresh else '無効'}")
     
     def _refresh_token_if_needed(self):
         """必要に応じてトークンを更新"""
@@ -126,6 +167,8 @@ class ZohoAnalyticsAPIAuto:
         """
         import urllib.parse
         
+        self._ensure_ready()
+        
         # トークン更新チェック
         if not self._refresh_token_if_needed():
             return None
@@ -258,6 +301,8 @@ class ZohoAnalyticsAPIAuto:
         """
         利用可能なワークスペースを取得
         """
+        self._ensure_ready()
+        
         # トークン更新チェック
         if not self._refresh_token_if_needed():
             return None
@@ -299,6 +344,8 @@ class ZohoAnalyticsAPIAuto:
         """
         ワークスペース内のテーブル一覧を取得
         """
+        self._ensure_ready()
+        
         # トークン更新チェック
         if not self._refresh_token_if_needed():
             return None
@@ -337,9 +384,10 @@ class ZohoAnalyticsAPIAuto:
             return None
     
     def get_token_status(self):
-        """トークンの状態を取得"""
-        if self.token_manager:
-            return self.token_manager.status()
+        """トークンの状態を取得（トークンの更新はしない）"""
+        token_manager = self._get_token_manager()
+        if token_manager:
+            return token_manager.status()
         else:
             print("自動トークン管理システムが無効です")
             return False
@@ -379,6 +427,7 @@ def save_results_to_file(results, output_file, format_type='json'):
     elif format_type == 'csv':
         # CSV形式で保存（結果がDataFrame形式の場合）
         if 'data' in results:
+            import pandas as pd
             df = pd.DataFrame(results['data'])
             df.to_csv(filename, index=False, encoding='utf-8-sig')
     
@@ -5,13 +5,15 @@ Zoho Analytics API 最終版クライアント
 VERSANTコーチングレポート実行用
 """
 
-import requests
 import json
 import os
 from datetime import datetime
-import pandas as pd
 import urllib.parse
 
+from lazy_import import lazy_module
+
+requests = lazy_module('requests')
+
 class ZohoAnalyticsAPIFinal:
     def __init__(self, access_token=None, workspace_id=None, org_id=None):
         """
@@ -64,6 +66,19 @@ class ZohoAnalyticsAPIFinal:
             print(f"❌ SQLファイルが見つかりません: {sql_file_path}")
             return None
         
+        return self.execute_sql(sql_query)
+    
+    def execute_sql(self, sql_query, save_result=True):
+        """
+        SQL文を実行
+        
+        Args:
+            sql_query (str): SQL文
+            save_result (bool): 結果を versant_report_*.json に保存する
+            
+        Returns:
+            dict: 実行結果
+        """
         # クエリを実行
         config = {
             "responseFormat": "json",
@@ -87,7 +102,7 @@ class ZohoAnalyticsAPIFinal:
                     print(f"   ✅ ジョブ開始成功 (ID: {job_id})")
                     
                     # ジョブの完了を待機
-                    return self.wait_for_job_completion(job_id)
+                    return self.wait_for_job_completion(job_id, save_result=save_result)
                 else:
                     print(f"   ❌ 予期しないレスポンス形式")
                     print(f"   レスポンス: {json.dumps(data, indent=2, ensure_ascii=False)}")
@@ -101,13 +116,14 @@ class ZohoAnalyticsAPIFinal:
             print(f"   ❌ リクエストエラー: {e}")
             return None
     
-    def wait_for_job_completion(self, job_id, max_wait_time=120):
+    def wait_for_job_completion(self, job_id, max_wait_time=120, save_result=True):
         """
         ジョブの完了を待機
         
         Args:
             job_id (str): ジョブID
             max_wait_time (int): 最大待機時間（秒）
+            save_result (bool): 結果をファイルに保存する
             
         Returns:
             dict: ジョブ結果
@@ -129,7 +145,7 @@ class ZohoAnalyticsAPIFinal:
                         download_url = status_data['data'].get('downloadUrl')
                         if download_url:
                             print(f"   ✅ ジョブ完了、データ取得中...")
-                            return self.download_data(download_url)
+                            return self.download_data(download_url, save_result=save_result)
                         else:
                             print(f"   ❌ ダウンロードURLが見つかりません")
                             return None
@@ -150,12 +166,13 @@ class ZohoAnalyticsAPIFinal:
         print(f"   ⏰ タイムアウト: {max_wait_time}秒経過")
         return None
     
-    def download_data(self, download_url):
+    def download_data(self, download_url, save_result=True):
         """
         データをダウンロード
         
         Args:
             download_url (str): ダウンロードURL
+            save_result (bool): 結果を versant_report_*.json に保存する
             
         Returns:
             dict: ダウンロード結果
@@ -169,13 +186,14 @@ class ZohoAnalyticsAPIFinal:
                     print(f"   取得件数: {len(data['data'])}件")
                     
                     # 結果をファイルに保存
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    output_file = f"versant_report_{timestamp}.json"
-                    
-                    with open(output_file, 'w', encoding='utf-8') as f:
-                        json.dump(data, f, ensure_ascii=False, indent=2)
-                    
-                    print(f"   💾 結果を保存: {output_file}")
+                    if save_result:
+                        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                        output_file = f"versant_report_{timestamp}.json"
+                        
+                        with open(output_file, 'w', encoding='utf-8') as f:
+                            json.dump(data, f, ensure_ascii=False, indent=2)
+                        
+                        print(f"   💾 結果を保存: {output_file}")
                     
                     # 最初の数件を表示
                     if len(data['data']) > 0:
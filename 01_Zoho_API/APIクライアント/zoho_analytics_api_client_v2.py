@@ -5,11 +5,13 @@ Zoho Analytics API v2 クライアント（POST版）
 VERSANTコーチングレポート実行用
 """
 
-import requests
 import json
 import os
 from datetime import datetime
-import pandas as pd
+
+from lazy_import import lazy_module
+
+requests = lazy_module('requests')
 
 class ZohoAnalyticsAPIv2:
     def __init__(self, access_token=None, workspace_id=None):
@@ -212,6 +214,7 @@ def save_results_to_file(results, output_file, format_type='json'):
                 json.dump(results, f, ensure_ascii=False, indent=2)
         elif format_type == 'csv':
             if 'data' in results and isinstance(results['data'], list):
+                import pandas as pd
                 df = pd.DataFrame(results['data'])
                 df.to_csv(output_file, index=False, encoding='utf-8-sig')
         
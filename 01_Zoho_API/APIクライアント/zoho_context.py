@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+1プロセス内の分析コマンドで共有する Zoho 接続コンテキスト
+zoho_tools.py のサブコマンド・batch で、分析クラスごとに繰り返していた
+トークン読み込み・Books組織IDの取得・セッション作成を1回にまとめる
+
+- トークンヘッダーはサービスごとに1つの辞書を共有（401時の更新が全分析に反映される）
+- ZohoSession は requests.Session・リトライ予算・GETレスポンスのキャッシュ（件数上限付き）を共有
+  （projection はセッションごとに指定できる）
+- Books組織IDはファイルにキャッシュし、/books/v3/organizations は期限切れ時だけ呼ぶ
+- memo(key, loader) で取得済みデータを分析間で使い回す
+  （請求書一覧の日付降順のページは books_invoice_pages で共有）
+
+使い方:
+    context = ZohoContext()
+    analyzer = CorrectInvoiceLeakageAnalyzer(context)   # context を省略すると単独実行用に作成
+"""
+
+import json
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from lazy_import import lazy_module
+from zoho_http_transport import TOKEN_DIR, FileTokenRefresher, ResponseCache, RetryBudget, ZohoSession
+
+requests = lazy_module('requests')
+
+BOOKS_ORGANIZATIONS_URL = "https://www.zohoapis.com/books/v3/organizations"
+BOOKS_INVOICES_URL = "https://www.zohoapis.com/books/v3/invoices"
+BOOKS_ORG_NAME = '株式会社シー・ティー・エス'
+ORG_CACHE_FILE = TOKEN_DIR / "zoho_books_org.json"
+# 組織IDはほぼ変わらないため、キャッシュの有効期間は長めにとる
+ORG_CACHE_DAYS = 30
+
+# サービス名 → トークンファイル名
+TOKEN_FILES = {
+    'crm': "zoho_crm_tokens.json",
+    'books': "zoho_books_tokens.json",
+}
+
+
+class ContextError(Exception):
+    """トークンファイルの読み込みなど、コンテキストの準備に失敗"""
+
+
+def pick_books_org(organizations, name=BOOKS_ORG_NAME):
+    """組織一覧から対象の組織IDを選ぶ（名前が一致しなければ先頭）"""
+    for org in organizations:
+        if name in org.get('name', ''):
+            return org['organization_id']
+    return organizations[0]['organization_id'] if organizations else None
+
+
+class ZohoContext:
+    """トークン・セッション・組織ID・取得済みデータをコマンド間で共有する"""
+
+    def __init__(self, token_dir=TOKEN_DIR, org_cache_file=ORG_CACHE_FILE, share_responses=False, log=print):
+        """
+        Args:
+            token_dir (Path): トークンファイルのディレクトリ
+            org_cache_file (Path): Books組織IDのキャッシュファイル（None でキャッシュしない）
+            share_responses (bool): 同じGETリクエストのレスポンスをセッション間で使い回すか
+            log (callable): メッセージの出力先
+        """
+        self.token_dir = Path(token_dir)
+        self.org_cache_file = Path(org_cache_file) if org_cache_file else None
+        self.log = log
+        self.response_cache = ResponseCache() if share_responses else None
+        self._headers = {}
+        self._http = {}
+        self._budgets = {}
+        self._org_id = None
+        self._memo = {}
+
+    def close(self):
+        """プールしている接続を閉じる"""
+        for http in self._http.values():
+            http.close()
+        self._http.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # ------------------------------------------------------------------
+    # トークン・セッション
+    # ------------------------------------------------------------------
+
+    def token_file(self, service):
+        if service not in TOKEN_FILES:
+            raise ContextError(f"未対応のサービスです: {service}")
+        return self.token_dir / TOKEN_FILES[service]
+
+    def headers(self, service):
+        """サービスの認証ヘッダー（同じ辞書を返すため、トークン更新は全利用者に反映される）"""
+        if service not in self._headers:
+            try:
+                with open(self.token_file(service), 'r', encoding='utf-8') as f:
+                    tokens = json.load(f)
+                access_token = tokens['access_token']
+            except (OSError, ValueError, KeyError) as e:
+                raise ContextError(f"トークンを読み込めません ({self.token_file(service).name}): {e}")
+            self._headers[service] = {'Authorization': f'Bearer {access_token}'}
+        return self._headers[service]
+
+    def session(self, service, projection=None):
+        """接続プール・リトライ予算・レスポンスキャッシュを共有する ZohoSession"""
+        if service not in self._http:
+            self._http[service] = requests.Session()
+            self._budgets[service] = RetryBudget()
+        return ZohoSession(FileTokenRefresher(self.token_file(service)),
+                           budget=self._budgets[service], session=self._http[service],
+                           log=self.log, projection=projection, response_cache=self.response_cache)
+
+    # ------------------------------------------------------------------
+    # Books組織ID
+    # ------------------------------------------------------------------
+
+    def books_org_id(self, refresh=False):
+        """Books組織ID（プロセス内・キャッシュファイルにあればAPIを呼ばない、取得失敗時は None）"""
+        if self._org_id and not refresh:
+            return self._org_id
+        if not refresh:
+            self._org_id = self.cached_books_org_id()
+            if self._org_id:
+                return self._org_id
+
+        try:
+            response = self.session('books').get(BOOKS_ORGANIZATIONS_URL, headers=self.headers('books'))
+        except Exception as e:
+            self.log(f"❌ 組織ID取得エラー: {str(e)}")
+            return None
+        if response.status_code != 200:
+            self.log(f"❌ 組織ID取得エラー: {response.status_code}")
+            return None
+        self._org_id = pick_books_org(response.json().get('organizations', []))
+        if self._org_id:
+            self._save_org_cache(self._org_id)
+        return self._org_id
+
+    def cached_books_org_id(self):
+        """キャッシュファイルの組織ID（未保存・期限切れなら None。APIは呼ばない）"""
+        if not (self.org_cache_file and self.org_cache_file.exists()):
+            return None
+        try:
+            with open(self.org_cache_file, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+            fetched_at = datetime.fromisoformat(cache['fetched_at'])
+        except (OSError, ValueError, KeyError):
+            return None
+        if datetime.now() - fetched_at > timedelta(days=ORG_CACHE_DAYS):
+            return None
+        return cache.get('organization_id')
+
+    def _save_org_cache(self, org_id):
+        """書き込み途中で中断しても壊れないよう置き換えで保存"""
+        if not self.org_cache_file:
+            return
+        self.org_cache_file.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = self.org_cache_file.with_suffix('.tmp')
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump({'organization_id': org_id, 'fetched_at': datetime.now().isoformat()},
+                      f, ensure_ascii=False, indent=2)
+        temp_file.replace(self.org_cache_file)
+
+    # ------------------------------------------------------------------
+    # 取得済みデータ
+    # ------------------------------------------------------------------
+
+    def memo(self, key, loader):
+        """key のデータがなければ loader() で取得し、以後は同じものを返す"""
+        if key not in self._memo:
+            self._memo[key] = loader()
+        return self._memo[key]
+
+    def books_invoice_pages(self, max_pages=None):
+        """
+        請求書一覧（日付の降順、200件ずつ）のページ
+        取得済みのページは分析間で使い回し、max_pages に足りない分だけ続きを取得する
+
+        Args:
+            max_pages (int): 必要なページ数（None なら最後まで）
+
+        Returns:
+            list: ページごとの請求書リスト（組織IDが取得できなければ None）
+        """
+        org_id = self.books_org_id()
+        if not org_id:
+            return None
+        state = self.memo(('books_invoice_pages', org_id), lambda: {'pages': [], 'complete': False})
+        pages = state['pages']
+        while not state['complete'] and (max_pages is None or len(pages) < max_pages):
+            page = len(pages) + 1
+            params = {'organization_id': org_id, 'per_page': 200, 'page': page,
+                      'sort_column': 'date', 'sort_order': 'D'}
+            response = self.session('books').get(BOOKS_INVOICES_URL, headers=self.headers('books'), params=params)
+            if response.status_code != 200:
+                # 次の呼び出しでこのページから取り直す
+                self.log(f"❌ 請求書一覧の取得エラー（ページ{page}）: {response.status_code}")
+                break
+            data = response.json()
+            if data.get('invoices'):
+                pages.append(data['invoices'])
+            if not data.get('invoices') or not data.get('page_context', {}).get('has_more_page', False):
+                state['complete'] = True
+        return pages[:max_pages] if max_pages is not None else list(pages)
+
+    def stats(self):
+        """共有状態の件数（batch の最後に表示）"""
+        return {
+            'sessions': len(self._http),
+            'cached_responses': len(self.response_cache) if self.response_cache is not None else 0,
+            'cache_hits': self.response_cache.hits if self.response_cache is not None else 0,
+            'memo': len(self._memo),
+            'org_id': self._org_id,
+        }
@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Zoho API 共通HTTPトランスポート
+429/5xxの一時エラーを指数バックオフ（フルジッター）で再試行する
+requestsベースのスクリプトとaiohttpベースのクライアントで同じリトライ方針を共有
+
+- Retry-Afterヘッダー（秒数・HTTP日付）を優先
+- 401時はトークンを更新して1回だけ再送
+- 5xx・通信エラーの再試行は冪等メソッド（GET/PUT/DELETE等）のみ
+- エンドポイント別のリトライ予算で、障害時に同じAPIを叩き続けない
+- 全呼び出しのレイテンシ・サイズ・ステータス・リトライを zoho_metrics に記録
+- 認証スクリプト（トークンの取得・更新・接続確認）もOAuthエンドポイントへの呼び出しを ZohoSession で行い、
+  429の再試行と METRICS への記録を分析スクリプトと揃える（セッションは各スクリプトの main・クラスで作る）
+- 環境変数 ZOHO_API_BASE_URL でZohoのホストをローカルシミュレータ等へ差し替え可能
+- projection（field_projection.FieldProjection）を渡すとCRMのレコード取得に fields を自動付与
+- response_cache（ResponseCache）を渡すと成功したGETを件数上限付きで使い回す
+  （If-Modified-Since などの条件付きGETはキャッシュを使わない）
+"""
+
+import copy
+import json
+import os
+import random
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from urllib.parse import urlparse
+
+from lazy_import import is_available, lazy_module
+from zoho_metrics import METRICS
+
+# requests・asyncio・aiohttp は最初のリクエストで読み込む（import だけなら起動時間に乗らない）
+requests = lazy_module('requests')
+asyncio = lazy_module('asyncio')
+aiohttp = lazy_module('aiohttp') if is_available('aiohttp') else None
+
+# 再試行対象のHTTPステータス
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# 冪等とみなすHTTPメソッド
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+
+# 付いていると同じURL・パラメータでも応答が変わるヘッダー（レスポンスキャッシュを使わない）
+CONDITIONAL_HEADERS = {'if-modified-since', 'if-none-match', 'if-match', 'if-unmodified-since', 'if-range', 'range'}
+
+# レスポンスキャッシュに残すGETの件数（古いものから捨てる）
+RESPONSE_CACHE_SIZE = 256
+
+ZOHO_TOKEN_URL = "https://accounts.zoho.com/oauth/v2/token"
+TOKEN_DIR = Path(__file__).parent.parent / "認証・トークン"
+CONFIG_FILE = Path(__file__).parent.parent / "設定ファイル" / "zoho_config.json"
+
+_ID_SEGMENT = re.compile(r'^\d{6,}$')
+_ZOHO_ORIGIN = re.compile(r'^https://[\w.-]*zoho(apis)?\.(com|jp)(?=/|$)')
+
+
+def endpoint_key(method, url):
+    """リトライ予算・統計用のエンドポイントキー（レコードIDは{id}に正規化）"""
+    path = urlparse(url).path
+    segments = ['{id}' if _ID_SEGMENT.match(seg) else seg for seg in path.split('/')]
+    return f"{method.upper()} {'/'.join(segments)}"
+
+
+def resolve_url(url):
+    """ZOHO_API_BASE_URL が設定されていればZohoのホスト部分を差し替える"""
+    base_url = os.getenv('ZOHO_API_BASE_URL')
+    if not base_url:
+        return url
+    return _ZOHO_ORIGIN.sub(base_url.rstrip('/'), url, count=1)
+
+
+def response_cache_key(url, params=None):
+    """GETレスポンスのキャッシュキー（パラメータの順序によらない）"""
+    items = params.items() if isinstance(params, dict) else (params or ())
+    return url, tuple(sorted((str(k), str(v)) for k, v in items))
+
+
+def is_conditional(headers):
+    """条件付きGET（If-Modified-Since 等）か。応答が304や差分になるためキャッシュと混ぜない"""
+    return any(name.lower() in CONDITIONAL_HEADERS for name in (headers or {}))
+
+
+class ResponseCache:
+    """成功したGETのレスポンス（件数上限付き、最近使っていないものから捨てる）"""
+
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        response = self._entries.get(key)
+        if response is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return response
+
+    def put(self, key, response):
+        self._entries[key] = response
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+def parse_retry_after(value):
+    """Retry-Afterヘッダーを待機秒数に変換（解釈できない場合はNone）"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def apply_token(headers, access_token):
+    """Authorizationヘッダーのトークンを差し替え（Bearer / Zoho-oauthtoken の形式は維持）"""
+    scheme = headers.get('Authorization', 'Bearer').split(' ', 1)[0]
+    headers['Authorization'] = f'{scheme} {access_token}'
+
+
+class RetryPolicy:
+    """リトライ方針（指数バックオフ＋フルジッター）"""
+
+    def __init__(self, max_retries=5, base_delay=1.0, max_delay=60.0, max_retry_after=300.0):
+        """
+        Args:
+            max_retries (int): 1リクエストあたりの最大再試行回数
+            base_delay (float): バックオフの基準秒数
+            max_delay (float): バックオフ1回あたりの上限秒数
+            max_retry_after (float): Retry-Afterとして受け入れる上限秒数
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+
+    def backoff_delay(self, attempt, retry_after=None):
+        """attempt回目（0始まり）の再試行までの待機秒数"""
+        if retry_after is not None:
+            # サーバー指定を優先し、同時再開を避けるため少しだけずらす
+            return min(retry_after, self.max_retry_after) + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def is_retryable(self, method, status=None, idempotent=None):
+        """再試行してよいか（429は未処理のため全メソッドで再試行）"""
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        if status == 429:
+            return True
+        return idempotent and (status is None or status in RETRYABLE_STATUSES)
+
+
+class RetryBudget:
+    """エンドポイント別のリトライ予算（プロセス内で共有可能）"""
+
+    def __init__(self, per_endpoint=30):
+        self.per_endpoint = per_endpoint
+        self.used = {}
+
+    def consume(self, key):
+        """予算を1消費（残りがなければFalse）"""
+        used = self.used.get(key, 0)
+        if used >= self.per_endpoint:
+            return False
+        self.used[key] = used + 1
+        return True
+
+    def remaining(self, key):
+        return self.per_endpoint - self.used.get(key, 0)
+
+
+class FileTokenRefresher:
+    """トークンファイルのrefresh_tokenでアクセストークンを更新し、ファイルへ書き戻す"""
+
+    def __init__(self, token_file, config_file=CONFIG_FILE):
+        self.token_file = Path(token_file)
+        self.config_file = Path(config_file)
+
+    def __call__(self):
+        """新しいアクセストークンを返す（失敗時はNone）"""
+        try:
+            with open(self.token_file, 'r', encoding='utf-8') as f:
+                tokens = json.load(f)
+            with open(self.config_file, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"  ⚠️ トークン更新の準備に失敗: {e}")
+            return None
+
+        if not tokens.get('refresh_token'):
+            print(f"  ⚠️ リフレッシュトークンがありません: {self.token_file.name}")
+            return None
+
+        payload = {
+            'refresh_token': tokens['refresh_token'],
+            'client_id': config['client_id'],
+            'client_secret': config['client_secret'],
+            'grant_type': 'refresh_token'
+        }
+        try:
+            # 再試行・メトリクス記録は通常のリクエストと同じ（401の更新は行わない）
+            response = ZohoSession().post(ZOHO_TOKEN_URL, data=payload, timeout=30)
+        except requests.exceptions.RequestException as e:
+            print(f"  ❌ トークン更新エラー: {e}")
+            return None
+
+        new_tokens = response.json() if response.status_code == 200 else {}
+        if 'access_token' not in new_tokens:
+            print(f"  ❌ トークン更新エラー: {response.status_code}")
+            return None
+
+        tokens['access_token'] = new_tokens['access_token']
+        tokens['expires_in'] = new_tokens.get('expires_in', 3600)
+        tokens['expires_at'] = (datetime.now() + timedelta(seconds=tokens['expires_in'])).isoformat()
+        tokens['updated_at'] = datetime.now().isoformat()
+
+        with open(self.token_file, 'w', encoding='utf-8') as f:
+            json.dump(tokens, f, ensure_ascii=False, indent=2)
+
+        print(f"  🔄 アクセストークンを更新しました: {self.token_file.name}")
+        return tokens['access_token']
+
+
+class ZohoSession:
+    """requests用のリトライ付きセッション
+
+    最終的なレスポンスをそのまま返すため、呼び出し側の
+    ``response.status_code`` による分岐はそのまま使える。
+    401でトークンを更新した場合は、渡されたheaders辞書も新しいトークンに書き換える。
+    response_cache を渡すと、成功したGETのレスポンスを URL・パラメータ単位で使い回す
+    （zoho_context.ZohoContext が同じプロセスの分析間で共有する）。
+    条件付きGET・stream=True のGETはキャッシュを読まず、保存もしない。
+    """
+
+    def __init__(self, token_refresher=None, policy=None, budget=None, session=None, log=print, projection=None,
+                 response_cache=None):
+        """
+        Args:
+            token_refresher (callable): 新しいアクセストークンを返す関数（401時に呼び出し）
+            policy (RetryPolicy): リトライ方針
+            budget (RetryBudget): エンドポイント別リトライ予算
+            session (requests.Session): 使用するセッション（省略時は新規作成）
+            log (callable): 再試行メッセージの出力先
+            projection (FieldProjection): CRMのレコード取得に付ける取得項目
+            response_cache (ResponseCache): GETレスポンスのキャッシュ（省略時はキャッシュしない）
+        """
+        self.token_refresher = token_refresher
+        self.policy = policy or RetryPolicy()
+        self.budget = budget or RetryBudget()
+        self.session = session or requests.Session()
+        self.log = log
+        self.projection = projection
+        self.response_cache = response_cache
+
+    def _can_retry(self, key, attempt):
+        return attempt < self.policy.max_retries and self.budget.consume(key)
+
+    def request(self, method, url, headers=None, idempotent=None, **kwargs):
+        """リトライ付きでリクエストを送信"""
+        method = method.upper()
+        key = endpoint_key(method, url)
+        host = urlparse(url).hostname
+        attempt = 0
+        token_refreshed = False
+        projected_module = None
+        if self.projection and method == 'GET':
+            kwargs['params'], projected_module = self.projection.inject(url, kwargs.get('params'))
+        cache_key = None
+        if (self.response_cache is not None and method == 'GET'
+                and not kwargs.get('stream') and not is_conditional(headers)):
+            cache_key = response_cache_key(url, kwargs.get('params'))
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                return self._finish(copy.copy(cached), projected_module)
+
+        while True:
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, resolve_url(url), headers=headers, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                METRICS.observe_request(key, 'error', time.perf_counter() - started, host=host)
+                if not (self.policy.is_retryable(method, idempotent=idempotent) and self._can_retry(key, attempt)):
+                    raise
+                METRICS.count_retry(key, 'connection')
+                delay = self.policy.backoff_delay(attempt)
+                self.log(f"  ⏳ 通信エラー、{delay:.1f}秒後に再試行 ({key} {attempt + 1}回目): {e}")
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            status = response.status_code
+            # stream=True のレスポンスは本文を読み込まないよう Content-Length で記録する
+            size = int(response.headers.get('Content-Length') or 0) if kwargs.get('stream') else len(response.content)
+            METRICS.observe_request(key, status, time.perf_counter() - started, size, host)
+
+            if status == 401 and self.token_refresher and headers is not None and not token_refreshed:
+                token_refreshed = True
+                new_token = self.token_refresher()
+                if new_token:
+                    apply_token(headers, new_token)
+                    METRICS.count_retry(key, 'token_refresh')
+                    continue
+                return response
+
+            if (status in RETRYABLE_STATUSES
+                    and self.policy.is_retryable(method, status, idempotent)
+                    and self._can_retry(key, attempt)):
+                METRICS.count_retry(key, status)
+                delay = self.policy.backoff_delay(attempt, parse_retry_after(response.headers.get('Retry-After')))
+                self.log(f"  ⏳ {status}応答、{delay:.1f}秒後に再試行 ({key} {attempt + 1}回目)")
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            if cache_key and status == 200:
+                self.response_cache.put(cache_key, response)
+                response = copy.copy(response)
+            return self._finish(response, projected_module)
+
+    def _finish(self, response, projected_module):
+        if projected_module:
+            return self.projection.attach(projected_module, response)
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+
+class TransportResponse:
+    """aiohttpレスポンスの読み取り済みスナップショット"""
+
+    def __init__(self, status, headers, text):
+        self.status = status
+        self.headers = headers
+        self.text = text
+
+    def json(self):
+        return json.loads(self.text) if self.text else {}
+
+
+class AsyncZohoSession:
+    """aiohttp用のリトライ付きセッション（ClientSessionはプールして再利用）"""
+
+    def __init__(self, token_refresher=None, policy=None, budget=None, timeout=60, log=print):
+        """
+        Args:
+            token_refresher (coroutine function): 新しいアクセストークンを返す非同期関数
+            policy (RetryPolicy): リトライ方針
+            budget (RetryBudget): エンドポイント別リトライ予算
+            timeout (float): 1リクエストあたりのタイムアウト秒数
+            log (callable): 再試行メッセージの出力先（MCPサーバーではstderrを指定）
+        """
+        if aiohttp is None:
+            raise ImportError("aiohttp がインストールされていません")
+        self.token_refresher = token_refresher
+        self.policy = policy or RetryPolicy()
+        self.budget = budget or RetryBudget()
+        self.timeout = timeout
+        self.log = log
+        self._session = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    def _can_retry(self, key, attempt):
+        return attempt < self.policy.max_retries and self.budget.consume(key)
+
+    async def request(self, method, url, headers=None, idempotent=None, **kwargs):
+        """リトライ付きでリクエストを送信し、TransportResponseを返す"""
+        method = method.upper()
+        key = endpoint_key(method, url)
+        host = urlparse(url).hostname
+        attempt = 0
+        token_refreshed = False
+
+        while True:
+            started = time.perf_counter()
+            try:
+                async with self._get_session().request(method, resolve_url(url), headers=headers, **kwargs) as response:
+                    body = await response.read()
+                    result = TransportResponse(
+                        response.status,
+                        dict(response.headers),
+                        body.decode(response.charset or 'utf-8', errors='replace')
+                    )
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                METRICS.observe_request(key, 'error', time.perf_counter() - started, host=host)
+                if not (self.policy.is_retryable(method, idempotent=idempotent) and self._can_retry(key, attempt)):
+                    raise
+                METRICS.count_retry(key, 'connection')
+                delay = self.policy.backoff_delay(attempt)
+                self.log(f"  ⏳ 通信エラー、{delay:.1f}秒後に再試行 ({key} {attempt + 1}回目): {e}")
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+
+            METRICS.observe_request(key, result.status, time.perf_counter() - started, len(body), host)
+
+            if result.status == 401 and self.token_refresher and headers is not None and not token_refreshed:
+                token_refreshed = True
+                new_token = await self.token_refresher()
+                if new_token:
+                    apply_token(headers, new_token)
+                    METRICS.count_retry(key, 'token_refresh')
+                    continue
+                return result
+
+            if (result.status in RETRYABLE_STATUSES
+                    and self.policy.is_retryable(method, result.status, idempotent)
+                    and self._can_retry(key, attempt)):
+                METRICS.count_retry(key, result.status)
+                delay = self.policy.backoff_delay(attempt, parse_retry_after(result.headers.get('Retry-After')))
+                self.log(f"  ⏳ {result.status}応答、{delay:.1f}秒後に再試行 ({key} {attempt + 1}回目)")
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+
+            return result
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Zoho API 計測モジュール
+エンドポイント別のレイテンシ・レスポンスサイズ・ステータス・リトライ回数・
+推定APIクレジットと、分析フェーズの所要時間を集計する
+
+zoho_http_transport を経由したHTTP呼び出しは自動で記録される。
+APIクレジットは Zoho のホスト宛ての呼び出しだけを数える（n8n などへの呼び出しは0）。
+プロセス終了時に node_exporter の textfile collector 用 .prom ファイルと
+JSONの実行サマリーを ZOHO_METRICS_DIR（既定: カレントディレクトリの logs/metrics）へ出力する。
+ZOHO_METRICS_DIR=off で出力を無効化（テスト・ベンチマークでは conftest で無効にしている）。
+"""
+
+import atexit
+import json
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+# レイテンシヒストグラムのバケット（秒）
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# APIクレジットを消費するホスト（www.zohoapis.com / analyticsapi.zoho.com / books.zoho.jp など）
+ZOHO_HOST = re.compile(r'(^|\.)zoho(apis)?\.(com|jp)$')
+
+# Zoho API のクレジット概算ルール（上から順に最初に一致したものを使用）
+# CRM: 一括読み取りジョブ作成=50, OAuth: 0
+CREDIT_RULES = [
+    (re.compile(r'^POST /crm/bulk/'), 50),
+    (re.compile(r'^\w+ /oauth/'), 0),
+]
+
+# ルールに一致しない Zoho API 呼び出し（CRMのレコード取得・検索・COQL、Books、Analytics）
+DEFAULT_CREDITS = 1
+
+# ZOHO_METRICS_DIR 未設定時の出力先（カレントディレクトリ基準。インストール先には書き込まない）
+DEFAULT_METRICS_DIR = Path("logs") / "metrics"
+
+
+def metrics_dir():
+    """出力先ディレクトリ（ZOHO_METRICS_DIR=off なら None）"""
+    value = os.getenv('ZOHO_METRICS_DIR')
+    if value and value.lower() == 'off':
+        return None
+    return Path(value) if value else DEFAULT_METRICS_DIR
+
+
+def estimate_credits(endpoint, status, host=None):
+    """1回のHTTP呼び出しで消費したAPIクレジットを概算（Zoho以外のホスト・認証・レート制限・5xx・通信エラーは0）"""
+    if not host or not ZOHO_HOST.search(host):
+        return 0
+    if not isinstance(status, int) or status in (401, 429) or status >= 500:
+        return 0
+    for pattern, credits in CREDIT_RULES:
+        if pattern.search(endpoint):
+            return credits
+    return DEFAULT_CREDITS
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{k}="{_escape_label(v)}"' for k, v in labels.items()) + '}'
+
+
+class EndpointStats:
+    """エンドポイント単位の集計値"""
+
+    def __init__(self):
+        self.bucket_counts = [0] * len(LATENCY_BUCKETS)
+        self.latency_sum = 0.0
+        self.count = 0
+        self.status_counts = {}
+        self.response_bytes = 0
+        self.retries = {}
+        self.credits = 0
+
+    def to_dict(self):
+        return {
+            'requests': self.count,
+            'latency_sum_seconds': round(self.latency_sum, 4),
+            'latency_avg_seconds': round(self.latency_sum / self.count, 4) if self.count else 0,
+            'status_counts': {str(k): v for k, v in self.status_counts.items()},
+            'response_bytes': self.response_bytes,
+            'retries': dict(self.retries),
+            'estimated_credits': self.credits
+        }
+
+
+class MetricsRegistry:
+    """プロセス内のHTTP・フェーズ計測を保持するレジストリ（スレッドセーフ）"""
+
+    def __init__(self, script=None):
+        self.script = script or Path(sys.argv[0]).stem or 'interactive'
+        self.started_at = datetime.now()
+        self.endpoints = {}
+        self.phases = {}
+        self._lock = threading.Lock()
+        self._export_registered = False
+
+    def _endpoint(self, endpoint):
+        stats = self.endpoints.get(endpoint)
+        if stats is None:
+            stats = self.endpoints[endpoint] = EndpointStats()
+            self._register_export()
+        return stats
+
+    def observe_request(self, endpoint, status, seconds, response_bytes=0, host=None):
+        """HTTP呼び出し1回分を記録（statusは整数、通信エラー時は 'error'。host はクレジット概算に使う）"""
+        with self._lock:
+            stats = self._endpoint(endpoint)
+            stats.count += 1
+            stats.latency_sum += seconds
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    stats.bucket_counts[i] += 1
+            stats.status_counts[status] = stats.status_counts.get(status, 0) + 1
+            stats.response_bytes += response_bytes
+            stats.credits += estimate_credits(endpoint, status, host)
+
+    def count_retry(self, endpoint, reason):
+        """再試行を記録（reason: ステータスコード / connection / token_refresh）"""
+        with self._lock:
+            stats = self._endpoint(endpoint)
+            stats.retries[str(reason)] = stats.retries.get(str(reason), 0) + 1
+
+    def record_phase(self, name, wall_seconds, cpu_seconds=None):
+        """分析フェーズの所要時間を記録（同名フェーズは加算）"""
+        with self._lock:
+            phase = self.phases.setdefault(name, {'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'calls': 0})
+            phase['wall_seconds'] += wall_seconds
+            phase['cpu_seconds'] += cpu_seconds or 0.0
+            phase['calls'] += 1
+            self._register_export()
+
+    def http_totals(self):
+        """記録済みHTTP呼び出しの合計待ち時間（秒）と件数"""
+        with self._lock:
+            return (sum(s.latency_sum for s in self.endpoints.values()),
+                    sum(s.count for s in self.endpoints.values()))
+
+    @contextmanager
+    def phase(self, name):
+        """with METRICS.phase('請求書取得'): のようにフェーズを計測"""
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            self.record_phase(name, time.perf_counter() - wall_start, time.process_time() - cpu_start)
+
+    def summary(self):
+        """JSON実行サマリー"""
+        with self._lock:
+            endpoints = {key: stats.to_dict() for key, stats in sorted(self.endpoints.items())}
+            phases = {name: dict(values) for name, values in self.phases.items()}
+        return {
+            'script': self.script,
+            'started_at': self.started_at.isoformat(),
+            'finished_at': datetime.now().isoformat(),
+            'totals': {
+                'requests': sum(e['requests'] for e in endpoints.values()),
+                'retries': sum(sum(e['retries'].values()) for e in endpoints.values()),
+                'response_bytes': sum(e['response_bytes'] for e in endpoints.values()),
+                'estimated_credits': sum(e['estimated_credits'] for e in endpoints.values()),
+                'latency_sum_seconds': round(sum(e['latency_sum_seconds'] for e in endpoints.values()), 4)
+            },
+            'endpoints': endpoints,
+            'phases': phases
+        }
+
+    def render_prometheus(self):
+        """Prometheusテキスト形式に変換"""
+        script = self.script
+        lines = []
+        with self._lock:
+            endpoints = sorted(self.endpoints.items())
+
+            lines.append('# HELP zoho_api_request_duration_seconds Zoho API呼び出しのレイテンシ')
+            lines.append('# TYPE zoho_api_request_duration_seconds histogram')
+            for endpoint, stats in endpoints:
+                for bound, count in zip(LATENCY_BUCKETS, stats.bucket_counts):
+                    lines.append(f'zoho_api_request_duration_seconds_bucket{_labels(script=script, endpoint=endpoint, le=bound)} {count}')
+                lines.append(f'zoho_api_request_duration_seconds_bucket{_labels(script=script, endpoint=endpoint, le="+Inf")} {stats.count}')
+                lines.append(f'zoho_api_request_duration_seconds_sum{_labels(script=script, endpoint=endpoint)} {stats.latency_sum:.6f}')
+                lines.append(f'zoho_api_request_duration_seconds_count{_labels(script=script, endpoint=endpoint)} {stats.count}')
+
+            lines.append('# HELP zoho_api_requests_total ステータス別のZoho API呼び出し数')
+            lines.append('# TYPE zoho_api_requests_total counter')
+            for endpoint, stats in endpoints:
+                for status, count in sorted(stats.status_counts.items(), key=lambda x: str(x[0])):
+                    lines.append(f'zoho_api_requests_total{_labels(script=script, endpoint=endpoint, status=status)} {count}')
+
+            lines.append('# HELP zoho_api_response_bytes_total レスポンスボディの合計バイト数')
+            lines.append('# TYPE zoho_api_response_bytes_total counter')
+            for endpoint, stats in endpoints:
+                lines.append(f'zoho_api_response_bytes_total{_labels(script=script, endpoint=endpoint)} {stats.response_bytes}')
+
+            lines.append('# HELP zoho_api_retries_total 理由別の再試行回数')
+            lines.append('# TYPE zoho_api_retries_total counter')
+            for endpoint, stats in endpoints:
+                for reason, count in sorted(stats.retries.items()):
+                    lines.append(f'zoho_api_retries_total{_labels(script=script, endpoint=endpoint, reason=reason)} {count}')
+
+            lines.append('# HELP zoho_api_credits_estimated_total 推定消費APIクレジット')
+            lines.append('# TYPE zoho_api_credits_estimated_total counter')
+            for endpoint, stats in endpoints:
+                lines.append(f'zoho_api_credits_estimated_total{_labels(script=script, endpoint=endpoint)} {stats.credits}')
+
+            lines.append('# HELP zoho_analysis_phase_seconds 分析フェーズの所要時間')
+            lines.append('# TYPE zoho_analysis_phase_seconds gauge')
+            for name, values in self.phases.items():
+                lines.append(f'zoho_analysis_phase_seconds{_labels(script=script, phase=name, clock="wall")} {values["wall_seconds"]:.6f}')
+                lines.append(f'zoho_analysis_phase_seconds{_labels(script=script, phase=name, clock="cpu")} {values["cpu_seconds"]:.6f}')
+
+        lines.append('# HELP zoho_run_last_completed_timestamp_seconds 最終実行の完了時刻')
+        lines.append('# TYPE zoho_run_last_completed_timestamp_seconds gauge')
+        lines.append(f'zoho_run_last_completed_timestamp_seconds{_labels(script=script)} {time.time():.0f}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self, output_dir=None):
+        """.promファイル（スクリプト名で上書き）とJSONサマリー（実行ごと）を出力（無効化されていれば None）"""
+        output_dir = Path(output_dir) if output_dir else metrics_dir()
+        if output_dir is None:
+            return None
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        # textfile collectorが書きかけを読まないよう一時ファイルからrename
+        prom_path = output_dir / f"zoho_{self.script}.prom"
+        tmp_path = prom_path.with_suffix('.prom.tmp')
+        tmp_path.write_text(self.render_prometheus(), encoding='utf-8')
+        os.replace(tmp_path, prom_path)
+
+        timestamp = self.started_at.strftime("%Y%m%d_%H%M%S")
+        summary_path = output_dir / f"{self.script}_run_{timestamp}.json"
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, ensure_ascii=False, indent=2)
+
+        return prom_path, summary_path
+
+    def _register_export(self):
+        if self._export_registered or metrics_dir() is None:
+            return
+        self._export_registered = True
+        atexit.register(self._export_at_exit)
+
+    def _export_at_exit(self):
+        # stdout は MCP stdio サーバーの JSON-RPC に使われるため、終了時のメッセージは stderr へ
+        try:
+            paths = self.export()
+            if paths is None:
+                return
+            prom_path, summary_path = paths
+            totals = self.summary()['totals']
+            print(f"📈 APIメトリクス: {totals['requests']}リクエスト / 推定{totals['estimated_credits']}クレジット → {summary_path}",
+                  file=sys.stderr)
+        except Exception as e:
+            print(f"⚠️ メトリクス出力に失敗: {e}", file=sys.stderr)
+
+
+# プロセス共通のレジストリ
+METRICS = MetricsRegistry()
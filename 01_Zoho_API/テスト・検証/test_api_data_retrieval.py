@@ -7,7 +7,6 @@ APIでSQLが意図しているデータを取得できるかをテストする
 import json
 import os
 from datetime import datetime, timedelta
-import pandas as pd
 
 def simulate_expected_data():
     """
@@ -6,13 +6,15 @@ Zoho Analytics API 自動トークン管理システム
 """
 
 import os
+import sys
 import json
-import requests
 import time
 from datetime import datetime, timedelta
 import logging
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).parent.parent / "APIクライアント"))
+
 class AutoTokenManager:
     def __init__(self, config_dir="01_Zoho_API/設定ファイル", token_dir="01_Zoho_API/認証・トークン"):
         """
@@ -141,6 +143,10 @@ class AutoTokenManager:
     
     def refresh_access_token(self, refresh_token, client_id, client_secret):
         """リフレッシュトークンを使用してアクセストークンを更新"""
+        # requests・トランスポートは更新が必要なときだけ読み込む（状態確認だけなら不要）
+        import requests
+        from zoho_http_transport import ZohoSession
+        
         url = "https://accounts.zoho.com/oauth/v2/token"
         
         payload = {
@@ -152,7 +158,7 @@ class AutoTokenManager:
         
         try:
             self.logger.info("アクセストークンを更新中...")
-            response = requests.post(url, data=payload, timeout=30)
+            response = ZohoSession(log=self.logger.warning).post(url, data=payload, timeout=30)
             response.raise_for_status()
             
             token_data = response.json()
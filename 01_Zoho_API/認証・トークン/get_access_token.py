@@ -9,12 +9,18 @@ import requests
 import json
 import os
 from datetime import datetime
+import sys
+from pathlib import Path
 
-def get_access_token_from_refresh(refresh_token, client_id, client_secret):
+sys.path.append(str(Path(__file__).parent.parent / "APIクライアント"))
+from zoho_http_transport import ZohoSession
+
+def get_access_token_from_refresh(http, refresh_token, client_id, client_secret):
     """
     リフレッシュトークンからアクセストークンを取得
     
     Args:
+        http (ZohoSession): HTTPセッション
         refresh_token (str): リフレッシュトークン
         client_id (str): クライアントID
         client_secret (str): クライアントシークレット
@@ -32,7 +38,7 @@ def get_access_token_from_refresh(refresh_token, client_id, client_secret):
     }
     
     try:
-        response = requests.post(url, data=payload)
+        response = http.post(url, data=payload)
         response.raise_for_status()
         
         token_data = response.json()
@@ -52,11 +58,12 @@ def get_access_token_from_refresh(refresh_token, client_id, client_secret):
         print(f"❌ トークン取得エラー: {e}")
         return None
 
-def get_access_token_from_auth_code(auth_code, client_id, client_secret, redirect_uri):
+def get_access_token_from_auth_code(http, auth_code, client_id, client_secret, redirect_uri):
     """
     認証コードからアクセストークンを取得
     
     Args:
+        http (ZohoSession): HTTPセッション
         auth_code (str): 認証コード
         client_id (str): クライアントID
         client_secret (str): クライアントシークレット
@@ -76,7 +83,7 @@ def get_access_token_from_auth_code(auth_code, client_id, client_secret, redirec
     }
     
     try:
-        response = requests.post(url, data=payload)
+        response = http.post(url, data=payload)
         response.raise_for_status()
         
         token_data = response.json()
@@ -136,6 +143,7 @@ def main():
     print("3. 手動でトークンを入力")
     
     choice = input("\n選択してください (1-3): ").strip()
+    http = ZohoSession()
     
     if choice == "1":
         # リフレッシュトークンから取得
@@ -146,7 +154,7 @@ def main():
         client_secret = input("クライアントシークレットを入力してください: ").strip()
         
         if refresh_token and client_id and client_secret:
-            token_data = get_access_token_from_refresh(refresh_token, client_id, client_secret)
+            token_data = get_access_token_from_refresh(http, refresh_token, client_id, client_secret)
             if token_data:
                 setup_environment_variables(token_data)
         else:
@@ -162,7 +170,7 @@ def main():
         redirect_uri = input("リダイレクトURIを入力してください: ").strip()
         
         if auth_code and client_id and client_secret and redirect_uri:
-            token_data = get_access_token_from_auth_code(auth_code, client_id, client_secret, redirect_uri)
+            token_data = get_access_token_from_auth_code(http, auth_code, client_id, client_secret, redirect_uri)
             if token_data:
                 setup_environment_variables(token_data)
         else:
@@ -3,13 +3,15 @@
 Zoho Books トークン取得スクリプト
 認証コードからアクセストークンを取得して保存します
 """
-import requests
 import json
 import sys
 from datetime import datetime, timedelta
 from pathlib import Path
 
-def get_books_token(auth_code):
+sys.path.append(str(Path(__file__).parent.parent / "APIクライアント"))
+from zoho_http_transport import ZohoSession
+
+def get_books_token(http, auth_code):
     """認証コードからBooksトークンを取得"""
     
     # 既存の認証情報を使用
@@ -31,7 +33,7 @@ def get_books_token(auth_code):
     }
     
     try:
-        response = requests.post(token_url, data=data)
+        response = http.post(token_url, data=data)
         
         if response.status_code == 200:
             token_data = response.json()
@@ -57,7 +59,7 @@ def get_books_token(auth_code):
             print(f"   スコープ: {token_data.get('scope', 'N/A')}")
             
             # 組織情報を取得してテスト
-            test_connection(token_data['access_token'])
+            test_connection(http, token_data['access_token'])
             
             return True
             
@@ -84,7 +86,7 @@ def get_books_token(auth_code):
         print(f"\n❌ エラーが発生しました: {str(e)}")
         return False
 
-def test_connection(access_token):
+def test_connection(http, access_token):
     """Booksへの接続をテスト"""
     print("\n🔍 Zoho Books接続テスト中...")
     
@@ -96,7 +98,7 @@ def test_connection(access_token):
     api_url = "https://books.zoho.com/api/v3/organizations"
     
     try:
-        response = requests.get(api_url, headers=headers)
+        response = http.get(api_url, headers=headers)
         
         if response.status_code == 200:
             data = response.json()
@@ -132,7 +134,7 @@ def main():
         print("   正しい形式: 1000.xxxxx...")
         sys.exit(1)
     
-    success = get_books_token(auth_code)
+    success = get_books_token(ZohoSession(), auth_code)
     
     if success:
         print("\n✨ セットアップ完了！")
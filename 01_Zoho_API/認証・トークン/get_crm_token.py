@@ -1,5 +1,9 @@
-import requests
 import json
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "APIクライアント"))
+from zoho_http_transport import ZohoSession
 
 CLIENT_ID = "1000.YN0LA88XQRCDTARO3FO5PWCOEY2IFZ"
 CLIENT_SECRET = "25549573ace167da7319c6b561a8ea477ca235e0ef"
@@ -16,7 +20,7 @@ data = {
     'grant_type': 'authorization_code'
 }
 
-response = requests.post(token_url, data=data)
+response = ZohoSession().post(token_url, data=data)
 
 if response.status_code == 200:
     token_data = response.json()
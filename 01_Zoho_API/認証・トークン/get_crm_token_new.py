@@ -3,13 +3,15 @@
 Zoho CRM トークン取得スクリプト
 認証コードからアクセストークンを取得して保存します
 """
-import requests
 import json
 import sys
 from datetime import datetime, timedelta
 from pathlib import Path
 
-def get_crm_token(auth_code):
+sys.path.append(str(Path(__file__).parent.parent / "APIクライアント"))
+from zoho_http_transport import ZohoSession
+
+def get_crm_token(http, auth_code):
     """認証コードからCRMトークンを取得"""
     
     # 既存の認証情報を使用
@@ -31,7 +33,7 @@ def get_crm_token(auth_code):
     }
     
     try:
-        response = requests.post(token_url, data=data)
+        response = http.post(token_url, data=data)
         
         if response.status_code == 200:
             token_data = response.json()
@@ -58,7 +60,7 @@ def get_crm_token(auth_code):
             print(f"   スコープ: {token_data.get('scope', 'N/A')}")
             
             # 接続テスト
-            test_connection(token_data['access_token'])
+            test_connection(http, token_data['access_token'])
             
             return True
             
@@ -85,7 +87,7 @@ def get_crm_token(auth_code):
         print(f"\n❌ エラーが発生しました: {str(e)}")
         return False
 
-def test_connection(access_token):
+def test_connection(http, access_token):
     """CRMへの接続をテスト"""
     print("\n🔍 Zoho CRM接続テスト中...")
     
@@ -103,7 +105,7 @@ def test_connection(access_token):
     }
     
     try:
-        response = requests.get(api_url, headers=headers, params=params)
+        response = http.get(api_url, headers=headers, params=params)
         
         if response.status_code == 200:
             data = response.json()
@@ -142,7 +144,7 @@ def main():
         print("   正しい形式: 1000.xxxxx...")
         sys.exit(1)
     
-    success = get_crm_token(auth_code)
+    success = get_crm_token(ZohoSession(), auth_code)
     
     if success:
         print("\n✨ セットアップ完了！")
@@ -2,12 +2,15 @@
 """
 Zoho CRMとBooksのトークン取得・管理スクリプト
 """
-import requests
 import json
 from datetime import datetime, timedelta
 from pathlib import Path
 from urllib.parse import urlencode
 import webbrowser
+import sys
+
+sys.path.append(str(Path(__file__).parent.parent / "APIクライアント"))
+from zoho_http_transport import ZohoSession
 
 class ZohoTokenManager:
     def __init__(self):
@@ -19,6 +22,7 @@ class ZohoTokenManager:
         self.client_id = "1000.YN0LA88XQRCDTARO3FO5PWCOEY2IFZ"
         self.client_secret = "25549573ace167da7319c6b561a8ea477ca235e0ef"
         self.redirect_uri = "http://localhost:8080/callback"
+        self.http = ZohoSession()
     
     def get_auth_url(self, service="crm"):
         """認証URLを生成"""
@@ -52,7 +56,7 @@ class ZohoTokenManager:
             'grant_type': 'authorization_code'
         }
         
-        response = requests.post(token_url, data=data)
+        response = self.http.post(token_url, data=data)
         
         if response.status_code == 200:
             token_data = response.json()
@@ -2,11 +2,14 @@
 """
 Zoho CRMとZoho Booksへの接続テストスクリプト
 """
-import requests
 import json
 import os
 from datetime import datetime, timedelta
 from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).parent.parent / "APIクライアント"))
+from zoho_http_transport import ZohoSession
 
 class ZohoConnector:
     def __init__(self):
@@ -14,6 +17,7 @@ class ZohoConnector:
         self.crm_tokens_file = self.base_path / "zoho_crm_tokens.json"
         self.books_tokens_file = self.base_path / "zoho_books_tokens.json"
         self.config_file = self.base_path / "zoho_config.json"
+        self.http = ZohoSession()
         
         # 設定読み込み
         self.load_config()
@@ -62,7 +66,7 @@ class ZohoConnector:
             'grant_type': 'refresh_token'
         }
         
-        response = requests.post(refresh_url, data=data)
+        response = self.http.post(refresh_url, data=data)
         
         if response.status_code == 200:
             new_tokens = response.json()
@@ -104,7 +108,7 @@ class ZohoConnector:
         }
         
         try:
-            response = requests.get(api_url, headers=headers, params=params)
+            response = self.http.get(api_url, headers=headers, params=params)
             
             if response.status_code == 200:
                 data = response.json()
@@ -159,7 +163,7 @@ class ZohoConnector:
             'grant_type': 'authorization_code'
         }
         
-        response = requests.post(token_url, data=data)
+        response = self.http.post(token_url, data=data)
         
         if response.status_code == 200:
             token_data = response.json()
@@ -200,7 +204,7 @@ class ZohoConnector:
         api_url = "https://books.zoho.com/api/v3/organizations"
         
         try:
-            response = requests.get(api_url, headers=headers)
+            response = self.http.get(api_url, headers=headers)
             
             if response.status_code == 200:
                 data = response.json()
@@ -238,7 +242,7 @@ class ZohoConnector:
         }
         
         try:
-            response = requests.get(api_url, headers=headers, params=params)
+            response = self.http.get(api_url, headers=headers, params=params)
             
             if response.status_code == 200:
                 data = response.json()
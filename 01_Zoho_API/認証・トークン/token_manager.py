@@ -6,10 +6,13 @@ Zoho Analytics Token Manager
 
 import json
 import time
-import requests
 from pathlib import Path
 from typing import Dict, Optional
 from datetime import datetime, timedelta
+import sys
+
+sys.path.append(str(Path(__file__).parent.parent / "APIクライアント"))
+from zoho_http_transport import ZohoSession
 
 class ZohoTokenManager:
     def __init__(self, config_file: str = "zoho_config.json"):
@@ -17,6 +20,7 @@ class ZohoTokenManager:
         self.token_file = Path("zoho_tokens.json")
         self.config = self._load_config()
         self.tokens = self._load_tokens()
+        self.http = ZohoSession()
     
     def _load_config(self) -> Dict:
         """設定ファイルから認証情報を読み込み"""
@@ -90,7 +94,7 @@ class ZohoTokenManager:
             'redirect_uri': self.config['redirect_uri']
         }
         
-        response = requests.post(token_url, data=data)
+        response = self.http.post(token_url, data=data)
         
         if response.status_code == 200:
             token_data = response.json()
@@ -121,7 +125,7 @@ class ZohoTokenManager:
             'client_secret': self.config['client_secret']
         }
         
-        response = requests.post(token_url, data=data)
+        response = self.http.post(token_url, data=data)
         
         if response.status_code == 200:
             new_token_data = response.json()
@@ -8,6 +8,11 @@ import json
 import requests
 import os
 from datetime import datetime
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "APIクライアント"))
+from zoho_http_transport import ZohoSession
 
 def load_existing_tokens():
     """
@@ -24,7 +29,7 @@ def load_existing_tokens():
         print("❌ zoho_tokens.json ファイルの形式が正しくありません")
         return None
 
-def refresh_access_token(refresh_token, client_id, client_secret):
+def refresh_access_token(http, refresh_token, client_id, client_secret):
     """
     リフレッシュトークンから新しいアクセストークンを取得
     """
@@ -39,7 +44,7 @@ def refresh_access_token(refresh_token, client_id, client_secret):
     
     try:
         print("🔄 アクセストークンを更新中...")
-        response = requests.post(url, data=payload)
+        response = http.post(url, data=payload)
         response.raise_for_status()
         
         token_data = response.json()
@@ -119,7 +124,7 @@ def main():
         return
     
     # 新しいアクセストークンを取得
-    new_token_data = refresh_access_token(refresh_token, client_id, client_secret)
+    new_token_data = refresh_access_token(ZohoSession(), refresh_token, client_id, client_secret)
     if new_token_data:
         # 環境変数を設定
         if setup_environment_variables(new_token_data):
@@ -1,7 +1,11 @@
-import requests
 import json
 import os
 from urllib.parse import urlencode
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "APIクライアント"))
+from zoho_http_transport import ZohoSession
 
 class ZohoAuth:
     def __init__(self, client_id, client_secret, redirect_uri):
@@ -10,6 +14,7 @@ class ZohoAuth:
         self.redirect_uri = redirect_uri
         self.access_token = None
         self.refresh_token = None
+        self.http = ZohoSession()
     
     def get_authorization_url(self, scope="ZohoAnalytics.metadata.read,ZohoAnalytics.data.read"):
         """認証URLを生成"""
@@ -35,7 +40,7 @@ class ZohoAuth:
             'grant_type': 'authorization_code'
         }
         
-        response = requests.post(token_url, data=data)
+        response = self.http.post(token_url, data=data)
         
         if response.status_code == 200:
             token_data = response.json()
@@ -59,7 +64,7 @@ class ZohoAuth:
             'grant_type': 'refresh_token'
         }
         
-        response = requests.post(token_url, data=data)
+        response = self.http.post(token_url, data=data)
         
         if response.status_code == 200:
             token_data = response.json()
@@ -1,6 +1,10 @@
-import requests
 import json
 from urllib.parse import urlencode
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "APIクライアント"))
+from zoho_http_transport import ZohoSession
 
 class ZohoCRMAuth:
     def __init__(self, client_id, client_secret, redirect_uri):
@@ -9,6 +13,7 @@ class ZohoCRMAuth:
         self.redirect_uri = redirect_uri
         self.access_token = None
         self.refresh_token = None
+        self.http = ZohoSession()
     
     def get_crm_authorization_url(self):
         """CRM API用の認証URLを生成（必要なスコープ付き）"""
@@ -37,7 +42,7 @@ class ZohoCRMAuth:
             'grant_type': 'authorization_code'
         }
         
-        response = requests.post(token_url, data=data)
+        response = self.http.post(token_url, data=data)
         
         if response.status_code == 200:
             token_data = response.json()
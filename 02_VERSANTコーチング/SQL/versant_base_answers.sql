@@ -0,0 +1,13 @@
+-- VERSANTコーチング ベース抽出（回答の日別件数）
+-- Answerテーブルのメールアドレス×日付ごとの回答数
+
+SELECT
+    a."eMail" as "メールアドレス",
+    DATE(a."Created at") as "日付",
+    COUNT(*) as "件数",
+    MAX(a."Created at") as "最終日時"
+FROM "Answer" a
+WHERE a."eMail" <> 'admin@cts-n.net'
+    AND a."Created at" IS NOT NULL
+GROUP BY 
+    a."eMail", DATE(a."Created at")
@@ -0,0 +1,21 @@
+-- VERSANTコーチング ベース抽出（受講生×手配）
+-- 対象商品の手配1件につき1行。レポートの各版は versant_report_engine.py がこの抽出と日別件数から集計する
+
+SELECT
+    c."Id" as "受講生ID",
+    c."姓" as "姓",
+    c."名" as "名",
+    c."メール" as "メールアドレス",
+    c."所属会社" as "所属会社",
+    acc."取引先名" as "取引先名",
+    p."商品名" as "商品名",
+    ar."学習開始日" as "学習開始日"
+FROM "連絡先" c
+INNER JOIN "手配" ar ON c."Id" = ar."連絡先"
+LEFT JOIN "取引先" acc ON c."取引先名" = acc."Id"
+LEFT JOIN "商品" p ON ar."商品" = p."Id"
+WHERE ar."商品" IN (
+    '5187347000184182087',
+    '5187347000184182088', 
+    '5187347000159927506'
+)
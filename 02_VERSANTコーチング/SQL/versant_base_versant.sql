@@ -0,0 +1,17 @@
+-- VERSANTコーチング ベース抽出（Versant提出の日別件数）
+-- Versantテーブルの受講生×日付ごとの提出数（手配のない受講生も含むため氏名・メールも取る）
+
+SELECT
+    v."連絡先名" as "受講生ID",
+    c."姓" as "姓",
+    c."名" as "名",
+    c."メール" as "メールアドレス",
+    c."所属会社" as "所属会社",
+    DATE(v."Completion Date") as "日付",
+    COUNT(*) as "件数",
+    MAX(v."Completion Date") as "最終日時"
+FROM "Versant" v
+LEFT JOIN "連絡先" c ON c."Id" = v."連絡先名"
+WHERE v."Completion Date" IS NOT NULL
+GROUP BY 
+    v."連絡先名", c."姓", c."名", c."メール", c."所属会社", DATE(v."Completion Date")
@@ -0,0 +1,11 @@
+-- VERSANTコーチング 差分更新（前回以降に回答した受講生）
+-- {since} は前回取得した回答の最終日時を SYNC_OVERLAP 遡った日時。受講生ごとの最終日時だけを返す
+
+SELECT
+    a."eMail" as "メールアドレス",
+    MAX(a."Created at") as "最終日時"
+FROM "Answer" a
+WHERE a."eMail" <> 'admin@cts-n.net'
+    AND a."Created at" > '{since}'
+GROUP BY 
+    a."eMail"
@@ -0,0 +1,10 @@
+-- VERSANTコーチング 差分更新（前回以降にVersantを提出した受講生）
+-- {since} は前回取得した提出の最終日時を SYNC_OVERLAP 遡った日時。受講生ごとの最終日時だけを返す
+
+SELECT
+    v."連絡先名" as "受講生ID",
+    MAX(v."Completion Date") as "最終日時"
+FROM "Versant" v
+WHERE v."Completion Date" > '{since}'
+GROUP BY 
+    v."連絡先名"
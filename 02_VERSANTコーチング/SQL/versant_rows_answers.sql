@@ -0,0 +1,13 @@
+-- VERSANTコーチング 差分更新（変化のあった受講生の回答の日別件数）
+-- versant_base_answers.sql を {keys} のメールアドレスに絞ったもの
+
+SELECT
+    a."eMail" as "メールアドレス",
+    DATE(a."Created at") as "日付",
+    COUNT(*) as "件数",
+    MAX(a."Created at") as "最終日時"
+FROM "Answer" a
+WHERE a."eMail" IN ({keys})
+    AND a."Created at" IS NOT NULL
+GROUP BY 
+    a."eMail", DATE(a."Created at")
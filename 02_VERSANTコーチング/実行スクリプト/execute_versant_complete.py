@@ -6,9 +6,8 @@ Executes the complete VERSANT coaching report with account, product master, and
 
 import os
 import json
-import time
 from datetime import datetime
-from zoho_analytics_api_client_final import ZohoAnalyticsAPIFinal
+from versant_report_engine import VARIANTS, AnalyticsFetcher, BaseExtract, ReportError, VersantReportEngine
 
 def execute_versant_complete():
     """Execute the complete VERSANT coaching report with all enhancements"""
@@ -23,18 +22,15 @@ def execute_versant_complete():
         print("Please set: ZOHO_ANALYTICS_ACCESS_TOKEN, ZOHO_ANALYTICS_WORKSPACE_ID, ZOHO_ANALYTICS_ORG_ID")
         return
     
-    # Initialize API client
-    api = ZohoAnalyticsAPIFinal(access_token, workspace_id, org_id)
+    # Initialize report engine (base extract is fetched once and cached under logs/versant)
+    engine = VersantReportEngine(BaseExtract(AnalyticsFetcher(access_token, workspace_id, org_id)))
     
-    # Read the complete SQL query
-    sql_file_path = "versant_coaching_report_complete.sql"
+    # Report variant (defined in versant_report_engine.VARIANTS)
+    variant = "complete"
     
     try:
-        with open(sql_file_path, 'r', encoding='utf-8') as f:
-            sql_query = f.read()
-        
         print(f"📋 Executing complete VERSANT coaching report...")
-        print(f"📁 SQL file: {sql_file_path}")
+        print(f"📁 Variant: {variant} ({VARIANTS[variant]['sql']})")
         print(f"🏢 Workspace ID: {workspace_id}")
         print(f"🏢 Organization ID: {org_id}")
         print(f"🎯 Product IDs: 5187347000184182087, 5187347000184182088, 5187347000159927506")
@@ -42,8 +38,8 @@ def execute_versant_complete():
         print(f"🏢 Includes: Account name, Product name, Learning start date")
         print()
         
-        # Execute the query
-        result = api.execute_query(sql_file_path)
+        # Build the report from the base extract
+        result = engine.report(variant)
         
         if result:
             # Generate timestamp for filename
@@ -141,8 +137,8 @@ def execute_versant_complete():
         else:
             print("❌ No results returned from the query")
             
-    except FileNotFoundError:
-        print(f"❌ Error: SQL file '{sql_file_path}' not found")
+    except ReportError as e:
+        print(f"❌ Error: {e}")
     except Exception as e:
         print(f"❌ Error executing query: {str(e)}")
 
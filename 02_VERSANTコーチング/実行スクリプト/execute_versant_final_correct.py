@@ -6,9 +6,8 @@ Executes the final corrected VERSANT coaching report with proper relationships
 
 import os
 import json
-import time
 from datetime import datetime
-from zoho_analytics_api_client_final import ZohoAnalyticsAPIFinal
+from versant_report_engine import VARIANTS, AnalyticsFetcher, BaseExtract, ReportError, VersantReportEngine
 
 def execute_versant_final_correct():
     """Execute the final corrected VERSANT coaching report"""
@@ -23,26 +22,23 @@ def execute_versant_final_correct():
         print("Please set: ZOHO_ANALYTICS_ACCESS_TOKEN, ZOHO_ANALYTICS_WORKSPACE_ID, ZOHO_ANALYTICS_ORG_ID")
         return
     
-    # Initialize API client
-    api = ZohoAnalyticsAPIFinal(access_token, workspace_id, org_id)
+    # Initialize report engine (base extract is fetched once and cached under logs/versant)
+    engine = VersantReportEngine(BaseExtract(AnalyticsFetcher(access_token, workspace_id, org_id)))
     
-    # Read the final corrected SQL query
-    sql_file_path = "versant_coaching_report_final_correct.sql"
+    # Report variant (defined in versant_report_engine.VARIANTS)
+    variant = "final_correct"
     
     try:
-        with open(sql_file_path, 'r', encoding='utf-8') as f:
-            sql_query = f.read()
-        
         print(f"📋 Executing final corrected VERSANT coaching report query...")
-        print(f"📁 SQL file: {sql_file_path}")
+        print(f"📁 Variant: {variant} ({VARIANTS[variant]['sql']})")
         print(f"🏢 Workspace ID: {workspace_id}")
         print(f"🏢 Organization ID: {org_id}")
         print(f"🎯 Product IDs: 5187347000184182087, 5187347000184182088, 5187347000159927506")
         print(f"📅 Daily counts for last 21 days")
         print()
         
-        # Execute the query
-        result = api.execute_query(sql_file_path)
+        # Build the report from the base extract
+        result = engine.report(variant)
         
         if result:
             # Generate timestamp for filename
@@ -94,8 +90,8 @@ def execute_versant_final_correct():
         else:
             print("❌ No results returned from the query")
             
-    except FileNotFoundError:
-        print(f"❌ Error: SQL file '{sql_file_path}' not found")
+    except ReportError as e:
+        print(f"❌ Error: {e}")
     except Exception as e:
         print(f"❌ Error executing query: {str(e)}")
 
@@ -6,9 +6,8 @@ Executes VERSANT coaching report with actual dates instead of D1, D2, etc.
 
 import os
 import json
-import time
 from datetime import datetime
-from zoho_analytics_api_client_final import ZohoAnalyticsAPIFinal
+from versant_report_engine import VARIANTS, AnalyticsFetcher, BaseExtract, ReportError, VersantReportEngine
 
 def execute_versant_with_dates():
     """Execute VERSANT coaching report with date display"""
@@ -23,27 +22,27 @@ def execute_versant_with_dates():
         print("Please set: ZOHO_ANALYTICS_ACCESS_TOKEN, ZOHO_ANALYTICS_WORKSPACE_ID, ZOHO_ANALYTICS_ORG_ID")
         return
     
-    # Initialize API client
-    api = ZohoAnalyticsAPIFinal(access_token, workspace_id, org_id)
+    # Initialize report engine (both variants are built from one cached base extract)
+    engine = VersantReportEngine(BaseExtract(AnalyticsFetcher(access_token, workspace_id, org_id)))
     
-    # SQL files to execute
-    sql_files = [
-        ("versant_coaching_report_answer_with_dates.sql", "日付表示版（○日前形式）"),
-        ("versant_coaching_report_answer_actual_dates.sql", "実際の日付表示版（YYYY-MM-DD形式）")
+    # Report variants to build
+    variants = [
+        ("answer_with_dates", "日付表示版（○日前形式）"),
+        ("answer_actual_dates", "実際の日付表示版（YYYY-MM-DD形式）")
     ]
     
-    for sql_file, description in sql_files:
+    for variant, description in variants:
         try:
             print(f"📋 Executing {description}...")
-            print(f"📁 SQL file: {sql_file}")
+            print(f"📁 Variant: {variant} ({VARIANTS[variant]['sql']})")
             print(f"🏢 Workspace ID: {workspace_id}")
             print(f"🏢 Organization ID: {org_id}")
             print(f"🎯 Product IDs: 5187347000184182087, 5187347000184182088, 5187347000159927506")
             print(f"📅 Daily counts with actual dates")
             print()
             
-            # Execute the query
-            result = api.execute_query(sql_file)
+            # Build the report from the base extract
+            result = engine.report(variant)
             
             if result:
                 # Generate timestamp for filename
@@ -95,8 +94,8 @@ def execute_versant_with_dates():
             else:
                 print(f"❌ No results from {description}")
                 
-        except FileNotFoundError:
-            print(f"❌ Error: SQL file '{sql_file}' not found")
+        except ReportError as e:
+            print(f"❌ Error: {e}")
         except Exception as e:
             print(f"❌ Error executing {description}: {str(e)}")
         
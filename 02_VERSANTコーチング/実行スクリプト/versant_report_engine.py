@@ -0,0 +1,789 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+VERSANTコーチングレポートのベース抽出と版ごとの集計
+レポートの各版（basic / minimal / grouped / with_dates / fixed_duplicates / extended ...）は
+どれも「受講生×手配」と「日別の回答・提出件数」を集計し直しているだけなので、版ごとに
+Analytics のエクスポートジョブを投げず、ベース抽出を一度だけ取得してローカルに保存し、
+版の違い（日別列の見出し・集計期間・商品名の連結・受講生ごとのまとめ方・並び順）は
+VARIANTS の定義に従って手元で集計する
+
+ベース抽出（SQL/versant_base_*.sql）:
+    students   対象商品の手配1件につき1行（受講生ID・氏名・メール・所属会社・取引先名・商品名・学習開始日）
+    answers    Answer（VERSANTコーチング回答）のメールアドレス×日付ごとの件数
+    versant    Versant（テスト提出）の受講生ID×日付ごとの件数
+
+保存形式:
+    logs/versant/base_extract.json   {"tables": {表名: {"fetched_at", "rows", "full_fetched_at",
+                                                          "high_water", "watermarks"}}}
+    取得から MAX_AGE_HOURS 時間以内の表は取り直さない（--refresh で取り直す）
+
+差分更新（--incremental）:
+    件数の表は受講生ごとの最終日時（watermarks）と表全体の最終日時（high_water）を持ち、
+    1. high_water の SYNC_OVERLAP 前より新しい行のある受講生と最終日時だけを問い合わせ（SQL/versant_changes_*.sql）。
+       同期が遅れて他の受講生より古い日時で届いた行も拾い、受講生ごとの最終日時と比べて変化のない受講生は除く
+    2. 最終日時が進んだ受講生の日別件数だけを IN で絞って取り直し（SQL/versant_rows_*.sql）、保存済みの行と置き換える
+    3. 結果/versant_{版}_report.json の、その受講生の行だけを集計し直して差し替える
+    名簿（students）は日をまたいでも FULL_REFRESH_DAYS 日は取り直さず、取り直したときは手配の変わった受講生の行だけを差し替える
+    基準日が変わったときは、日別列・期間合計にかかる日（最長の期間合計の初日以降）に件数のある受講生の行だけを
+    集計し直す（日付を見出しにする版は見出しが変わるので全行を集計し直す。いずれも取得はしない）
+    日付を遡って入力された行を拾うため、FULL_REFRESH_DAYS 日ごとに表全体を取り直す
+
+- 受講生ごとの件数は {日付: 件数} で持ち、基準日（--today）から日別列と期間合計を求める
+- 手配が複数ある受講生も件数は1回だけ数える（SQL の grouped 版で起きていた重複カウントは起きない）
+- 件数は数値で返す（Analytics のエクスポートは文字列）
+- pandas があれば to_dataframe() で DataFrame にできる
+
+使い方:
+    python versant_report_engine.py [版 ...] [--today=YYYY-MM-DD] [--refresh] [--list]
+    python versant_report_engine.py [版 ...] --incremental      差分更新して versant_{版}_report.json に反映
+"""
+
+import hashlib
+import json
+import os
+import sys
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent / "01_Zoho_API" / "APIクライアント"))
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+SQL_DIR = Path(__file__).parent.parent / "SQL"
+RESULTS_DIR = Path(__file__).parent.parent / "結果"
+DEFAULT_CACHE_PATH = Path(__file__).parent.parent.parent / "logs" / "versant" / "base_extract.json"
+
+# ベース抽出の表とSQLファイル
+BASE_TABLES = {
+    'students': 'versant_base_students.sql',
+    'answers': 'versant_base_answers.sql',
+    'versant': 'versant_base_versant.sql',
+}
+# 件数の表と、受講生を引くキー
+EVENT_KEYS = {
+    'answers': 'メールアドレス',
+    'versant': '受講生ID',
+}
+# 差分更新のSQL（変化のあった受講生の問い合わせ、その受講生の日別件数）
+INCREMENTAL_SQL = {
+    'answers': ('versant_changes_answers.sql', 'versant_rows_answers.sql'),
+    'versant': ('versant_changes_versant.sql', 'versant_rows_versant.sql'),
+}
+# 差分更新でも、この日数を過ぎたら表全体を取り直す
+FULL_REFRESH_DAYS = 7
+# 差分確認を high_water からこの時間だけ遡って問い合わせる（Analytics への同期の遅れ）
+SYNC_OVERLAP = timedelta(days=1)
+# IN で絞るときの1回のキー数
+KEY_BATCH_SIZE = 200
+
+# 保存した抽出をそのまま使う時間
+MAX_AGE_HOURS = 12
+
+# 日別列の日数（基準日を含む）と期間合計（None は全期間）
+DAILY_DAYS = 21
+WINDOWS = {
+    '3週間合計': 21,
+    '90日合計': 90,
+    '全期間合計': None,
+}
+AVERAGE_WINDOW = '3週間合計'
+
+# 学習状況（3週間合計が上限未満なら左の状況）
+STATUS_LEVELS = [(1, '未学習'), (10, '学習不足'), (30, '学習中')]
+STATUS_TOP = '積極的'
+
+ROSTER_COLUMNS = [('受講生ID', '受講生ID'), ('受講生名', '受講生名'), ('メールアドレス', 'メールアドレス'),
+                  ('会社名', '所属会社')]
+ACCOUNT_COLUMNS = [('受講生ID', '受講生ID'), ('受講生名', '受講生名'), ('メールアドレス', 'メールアドレス'),
+                   ('会社名', '取引先名'), ('商品名', '商品名'), ('学習開始日', '学習開始日')]
+
+ORDER_BY_STATUS = [('学習状況', True), ('3週間合計', True), ('姓', False), ('名', False)]
+ORDER_BY_TOTALS = [('全期間合計', True), ('90日合計', True), ('3週間合計', True)]
+
+# レポートの版
+#   source    件数の表（answers / versant）
+#   roster    'arranged' は手配のある受講生すべて、'active' は件数のある受講生のみ
+#   require   この期間合計が0の行を除く
+#   group_by  'student' は受講生ごとに1行（商品名は連結、学習開始日は最小）、'arrangement' は手配ごとに1行
+#   columns   [(出力列名, 受講生の項目), ...]
+#   days      日別列の見出し（None / 'ago'「20日前」 / 'D'「D20」 / 'date'「YYYY-MM-DD」）
+#   windows   出力する期間合計
+#   order_by  [(列または項目, 降順), ...]
+VARIANTS = {
+    'basic': {
+        'description': '基本版（Versant提出のある受講生IDごとの3週間合計）',
+        'sql': 'versant_coaching_report_basic.sql',
+        'source': 'versant', 'roster': 'active', 'require': '3週間合計',
+        'columns': [('受講生ID', '受講生ID')], 'days': None, 'windows': ['3週間合計'],
+        'order_by': [('学習状況', True), ('3週間合計', True)],
+    },
+    'minimal': {
+        'description': '最小版（手配のある受講生のVersant提出 3週間合計）',
+        'sql': 'versant_coaching_report_minimal.sql',
+        'source': 'versant', 'roster': 'arranged',
+        'columns': ROSTER_COLUMNS, 'days': None, 'windows': ['3週間合計'],
+        'order_by': ORDER_BY_STATUS,
+    },
+    'final_filtered': {
+        'description': '対象商品絞り込み版（minimal と同じ集計）',
+        'sql': 'versant_coaching_report_final_filtered.sql',
+        'source': 'versant', 'roster': 'arranged',
+        'columns': ROSTER_COLUMNS, 'days': None, 'windows': ['3週間合計'],
+        'order_by': ORDER_BY_STATUS,
+    },
+    'simplified': {
+        'description': '簡略版（Versant提出の日別件数 D20〜今日）',
+        'sql': 'versant_coaching_report_simplified.sql',
+        'source': 'versant', 'roster': 'arranged',
+        'columns': ROSTER_COLUMNS, 'days': 'D', 'windows': ['3週間合計'],
+        'order_by': ORDER_BY_STATUS,
+    },
+    'final_correct': {
+        'description': '最終修正版（Versant提出の日別件数 D20〜今日）',
+        'sql': 'versant_coaching_report_final_correct.sql',
+        'source': 'versant', 'roster': 'arranged',
+        'columns': ROSTER_COLUMNS, 'days': 'D', 'windows': ['3週間合計'],
+        'order_by': ORDER_BY_STATUS,
+    },
+    'answer_correct': {
+        'description': 'Answer版（回答の日別件数 D20〜今日と全期間合計）',
+        'sql': 'versant_coaching_report_answer_correct.sql',
+        'source': 'answers', 'roster': 'arranged',
+        'columns': ROSTER_COLUMNS, 'days': 'D', 'windows': ['3週間合計', '全期間合計'],
+        'order_by': ORDER_BY_STATUS,
+    },
+    'answer_with_dates': {
+        'description': '日付表示版（○日前形式）',
+        'sql': 'versant_coaching_report_answer_with_dates.sql',
+        'source': 'answers', 'roster': 'arranged',
+        'columns': ROSTER_COLUMNS, 'days': 'ago', 'windows': ['3週間合計', '全期間合計'],
+        'order_by': ORDER_BY_STATUS,
+    },
+    'answer_actual_dates': {
+        'description': '実際の日付表示版（YYYY-MM-DD形式）',
+        'sql': 'versant_coaching_report_answer_actual_dates.sql',
+        'source': 'answers', 'roster': 'arranged',
+        'columns': ROSTER_COLUMNS, 'days': 'date', 'windows': ['3週間合計', '全期間合計'],
+        'order_by': ORDER_BY_STATUS,
+    },
+    'complete': {
+        'description': '完全版（取引先名・商品名・学習開始日つき、手配ごとに1行）',
+        'sql': 'versant_coaching_report_complete.sql',
+        'source': 'answers', 'roster': 'arranged', 'group_by': 'arrangement',
+        'columns': ACCOUNT_COLUMNS, 'days': 'ago', 'windows': ['3週間合計', '全期間合計'],
+        'order_by': ORDER_BY_STATUS,
+    },
+    'grouped': {
+        'description': '受講生まとめ版（商品名を連結、受講生ごとに1行）',
+        'sql': 'versant_coaching_report_complete_grouped.sql',
+        'source': 'answers', 'roster': 'arranged', 'group_by': 'student',
+        'columns': ACCOUNT_COLUMNS, 'days': 'ago', 'windows': ['3週間合計', '全期間合計'],
+        'order_by': ORDER_BY_STATUS,
+    },
+    'fixed_duplicates': {
+        'description': '重複カウント修正版（手配商品名を連結、受講生ごとに1行）',
+        'sql': 'versant_coaching_report_fixed_duplicates.sql',
+        'source': 'answers', 'roster': 'arranged', 'group_by': 'student',
+        'columns': ACCOUNT_COLUMNS[:4] + [('手配商品名', '商品名'), ('学習開始日', '学習開始日')],
+        'days': 'ago', 'windows': ['3週間合計', '全期間合計'],
+        'order_by': ORDER_BY_STATUS,
+    },
+    'extended': {
+        'description': '拡張版（商品の絞り込みなし、Versant提出のある受講生の90日・全期間合計）',
+        'sql': 'versant_coaching_report_extended.sql',
+        'source': 'versant', 'roster': 'active', 'require': '全期間合計',
+        'columns': ROSTER_COLUMNS, 'days': None, 'windows': ['3週間合計', '90日合計', '全期間合計'],
+        'order_by': ORDER_BY_TOTALS,
+    },
+}
+
+
+class ReportError(Exception):
+    """ベース抽出の取得・版の指定のエラー"""
+
+
+def normalize_day(value):
+    """'2025-07-29 10:15:00' / '2025/07/29' を 'YYYY-MM-DD' にする（空なら ''）"""
+    return str(value or '')[:10].replace('/', '-')
+
+
+def email_key(value):
+    """メールアドレスの照合キー（Analytics の照合と同じく大文字小文字を区別しない）"""
+    return str(value or '').strip().lower()
+
+
+def event_key(source, value):
+    """件数の表の照合キー（answers はメールアドレス、versant は受講生ID）"""
+    return email_key(value) if source == 'answers' else str(value or '')
+
+
+def normalize_timestamp(value):
+    """最終日時を比較できる文字列にする（'2025/07/29 10:15:00' → '2025-07-29 10:15:00'）"""
+    return str(value or '').strip().replace('/', '-')
+
+
+def overlap_since(stamp, overlap=SYNC_OVERLAP):
+    """差分確認の起点（最終日時 stamp を overlap だけ遡る。日時として読めなければそのまま）"""
+    try:
+        moment = datetime.fromisoformat(stamp)
+    except ValueError:
+        return stamp
+    if len(stamp) == 10:
+        return (moment - overlap).date().isoformat()
+    return (moment - overlap).isoformat(sep=' ')
+
+
+def sql_literal(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def to_count(value):
+    """エクスポートの件数（文字列）を整数にする"""
+    if value in (None, ''):
+        return 0
+    return int(float(value))
+
+
+def learning_status(three_weeks):
+    for limit, label in STATUS_LEVELS:
+        if three_weeks < limit:
+            return label
+    return STATUS_TOP
+
+
+def day_labels(today, style):
+    """日別列の [(見出し, 日付), ...]（古い日から基準日まで）"""
+    labels = []
+    for days_ago in range(DAILY_DAYS - 1, -1, -1):
+        day = (today - timedelta(days=days_ago)).isoformat()
+        if style == 'date':
+            label = day
+        elif days_ago == 0:
+            label = '今日'
+        elif style == 'D':
+            label = f"D{days_ago}"
+        else:
+            label = f"{days_ago}日前"
+        labels.append((label, day))
+    return labels
+
+
+class AnalyticsFetcher:
+    """ベース抽出のSQLを Analytics で実行する（requests は初回の取得時に読み込む）"""
+
+    def __init__(self, access_token=None, workspace_id=None, org_id=None):
+        self.access_token = access_token or os.getenv('ZOHO_ANALYTICS_ACCESS_TOKEN')
+        self.workspace_id = workspace_id or os.getenv('ZOHO_ANALYTICS_WORKSPACE_ID')
+        self.org_id = org_id or os.getenv('ZOHO_ANALYTICS_ORG_ID')
+        self._client = None
+
+    def __call__(self, sql_query):
+        if self._client is None:
+            from zoho_analytics_api_client_final import ZohoAnalyticsAPIFinal
+            try:
+                self._client = ZohoAnalyticsAPIFinal(self.access_token, self.workspace_id, self.org_id)
+            except ValueError as e:
+                raise ReportError(f"{e}（ZOHO_ANALYTICS_ACCESS_TOKEN, ZOHO_ANALYTICS_WORKSPACE_ID, "
+                                  f"ZOHO_ANALYTICS_ORG_ID を設定してください）") from e
+        result = self._client.execute_sql(sql_query, save_result=False)
+        if result is None:
+            raise ReportError("Analytics のクエリ実行に失敗しました")
+        return result.get('data', [])
+
+
+class BaseExtract:
+    """ベース抽出のローカル保存（表ごとに取得日時を持つ）"""
+
+    def __init__(self, fetch=None, path=None, max_age_hours=MAX_AGE_HOURS):
+        """
+        Args:
+            fetch (callable): fetch(SQL文) -> 行（辞書）のリスト。省略時は AnalyticsFetcher
+            path (Path): 保存先（既定: logs/versant/base_extract.json）
+            max_age_hours (float): これより古い表は取り直す
+        """
+        self.fetch = fetch or AnalyticsFetcher()
+        self.path = Path(path or DEFAULT_CACHE_PATH)
+        self.max_age = timedelta(hours=max_age_hours)
+        self.data = self._load()
+        # この実行で取得した表
+        self.fetched = set()
+
+    def _load(self):
+        if not self.path.exists():
+            return {'tables': {}}
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = self.path.with_suffix('.tmp')
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False)
+        temp_file.replace(self.path)
+
+    def is_fresh(self, name, max_age=None):
+        entry = self.data['tables'].get(name)
+        if entry is None:
+            return False
+        return datetime.now() - datetime.fromisoformat(entry['fetched_at']) < (max_age or self.max_age)
+
+    @staticmethod
+    def _sql(file_name, **params):
+        with open(SQL_DIR / file_name, 'r', encoding='utf-8') as f:
+            sql_query = f.read()
+        return sql_query.format(**params) if params else sql_query
+
+    def table(self, name, refresh=False, max_age=None):
+        """表の行。保存がない・古い（max_age 省略時は max_age_hours）・refresh のときだけ Analytics から取り直す"""
+        if name not in BASE_TABLES:
+            raise ReportError(f"ベース抽出の表がありません: {name}")
+        if refresh or not self.is_fresh(name, max_age):
+            print(f"📥 ベース抽出を取得: {name}（{BASE_TABLES[name]}）")
+            rows = self.fetch(self._sql(BASE_TABLES[name]))
+            now = datetime.now().isoformat()
+            entry = {'fetched_at': now, 'full_fetched_at': now, 'rows': rows}
+            if name in EVENT_KEYS:
+                entry['watermarks'] = {}
+                self._advance_watermarks(name, entry, rows)
+            self.data['tables'][name] = entry
+            self.fetched.add(name)
+            self._save()
+            print(f"  ✅ {len(rows)}行")
+        return self.data['tables'][name]['rows']
+
+    @staticmethod
+    def _advance_watermarks(name, entry, rows):
+        watermarks = entry['watermarks']
+        for row in rows:
+            key = event_key(name, row.get(EVENT_KEYS[name]))
+            stamp = normalize_timestamp(row.get('最終日時'))
+            if key and stamp > watermarks.get(key, ''):
+                watermarks[key] = stamp
+        entry['high_water'] = max(watermarks.values(), default='')
+
+    def needs_full_refresh(self, name):
+        entry = self.data['tables'].get(name)
+        if entry is None or not entry.get('high_water'):
+            return True
+        full_fetched_at = datetime.fromisoformat(entry.get('full_fetched_at') or entry['fetched_at'])
+        return datetime.now() - full_fetched_at >= timedelta(days=FULL_REFRESH_DAYS)
+
+    def update(self, name):
+        """
+        件数の表を差分更新する
+
+        Returns:
+            set|None: 取り直した受講生の照合キー（表全体を取り直したときは None）
+        """
+        if name not in INCREMENTAL_SQL:
+            raise ReportError(f"差分更新できない表です: {name}")
+        if self.needs_full_refresh(name):
+            self.table(name, refresh=True)
+            return None
+
+        entry = self.data['tables'][name]
+        key_field = EVENT_KEYS[name]
+        changes_sql, rows_sql = INCREMENTAL_SQL[name]
+        since = overlap_since(entry['high_water'])
+        print(f"🔍 差分確認: {name}（{since} 以降）")
+        changed = {}
+        for row in self.fetch(self._sql(changes_sql, since=since)):
+            key = event_key(name, row.get(key_field))
+            if key and normalize_timestamp(row.get('最終日時')) > entry['watermarks'].get(key, ''):
+                changed[key] = row.get(key_field)
+
+        if changed:
+            values = sorted(changed.values())
+            rows = []
+            for start in range(0, len(values), KEY_BATCH_SIZE):
+                keys = ', '.join(sql_literal(value) for value in values[start:start + KEY_BATCH_SIZE])
+                rows.extend(self.fetch(self._sql(rows_sql, keys=keys)))
+            entry['rows'] = [row for row in entry['rows']
+                             if event_key(name, row.get(key_field)) not in changed] + rows
+            self._advance_watermarks(name, entry, rows)
+        entry['fetched_at'] = datetime.now().isoformat()
+        self.fetched.add(name)
+        self._save()
+        print(f"  ✅ 変化のあった受講生: {len(changed)}人 / {len(entry['watermarks'])}人")
+        return set(changed)
+
+
+class VersantReportEngine:
+    """ベース抽出から VARIANTS の各版を集計する"""
+
+    def __init__(self, extract=None, today=None, refresh=False):
+        """
+        Args:
+            extract (BaseExtract): ベース抽出（省略時は既定の保存先と AnalyticsFetcher）
+            today (date|str): レポートの基準日（SQL の CURDATE()。省略時は今日）
+            refresh (bool): 保存済みの抽出を使わず取り直す
+        """
+        self.extract = extract or BaseExtract()
+        if isinstance(today, str):
+            today = date.fromisoformat(today)
+        self.today = today or date.today()
+        self.refresh = refresh
+        self._loaded = set()
+        self._students = None
+        self._arrangements = None
+        self._events = {}
+        self._identities = {}
+        self._updates = {}
+        self._roster_changes = False
+        self._roster_base = None
+        # 名簿をそのまま使う時間（None は BaseExtract の max_age_hours。差分更新では FULL_REFRESH_DAYS 日）
+        self._roster_max_age = None
+
+    def _table(self, name, max_age=None):
+        rows = self.extract.table(name, refresh=self.refresh and name not in self._loaded, max_age=max_age)
+        self._loaded.add(name)
+        return rows
+
+    # ------------------------------------------------------------------
+    # 受講生・件数のインデックス
+    # ------------------------------------------------------------------
+
+    def students(self):
+        """{受講生ID: 受講生}（手配が複数あれば商品名を連結し、学習開始日は最小）"""
+        if self._students is None:
+            self._build_roster()
+        return self._students
+
+    def arrangements(self):
+        """手配ごとの受講生（受講生ID・取引先名・商品名・学習開始日の重複は1件）"""
+        if self._arrangements is None:
+            self._build_roster()
+        return self._arrangements
+
+    def _build_roster(self):
+        students, products, arrangements, seen = {}, defaultdict(set), [], set()
+        for row in self._table('students', max_age=self._roster_max_age):
+            student_id = str(row.get('受講生ID') or '')
+            if not student_id:
+                continue
+            start = normalize_day(row.get('学習開始日'))
+            product = row.get('商品名') or ''
+            student = students.get(student_id)
+            if student is None:
+                student = students[student_id] = self._identity(row)
+                student['取引先名'] = row.get('取引先名') or ''
+                student['学習開始日'] = start
+            elif start and (not student['学習開始日'] or start < student['学習開始日']):
+                student['学習開始日'] = start
+            if product:
+                products[student_id].add(product)
+            key = (student_id, row.get('取引先名') or '', product, start)
+            if key not in seen:
+                seen.add(key)
+                arrangements.append(dict(student, 取引先名=key[1], 商品名=product, 学習開始日=start))
+        for student_id, student in students.items():
+            student['商品名'] = ', '.join(sorted(products[student_id]))
+        self._students = students
+        self._arrangements = arrangements
+
+    def _identity(self, row):
+        last_name, first_name = row.get('姓') or '', row.get('名') or ''
+        return {
+            '受講生ID': str(row.get('受講生ID') or ''),
+            '姓': last_name,
+            '名': first_name,
+            '受講生名': f"{last_name} {first_name}",
+            'メールアドレス': row.get('メールアドレス') or '',
+            '所属会社': row.get('所属会社') or '',
+            '取引先名': '',
+            '商品名': '',
+            '学習開始日': '',
+        }
+
+    def events(self, source):
+        """{照合キー: {日付: 件数}}（answers はメールアドレス、versant は受講生ID）"""
+        if source not in self._events:
+            if source not in EVENT_KEYS:
+                raise ReportError(f"件数の表がありません: {source}")
+            counts = defaultdict(lambda: defaultdict(int))
+            identities = {}
+            for row in self._table(source):
+                key = event_key(source, row.get(EVENT_KEYS[source]))
+                day = normalize_day(row.get('日付'))
+                if not key or not day:
+                    continue
+                counts[key][day] += to_count(row.get('件数'))
+                if source == 'versant' and key not in identities:
+                    identities[key] = self._identity(row)
+            self._events[source] = {key: dict(days) for key, days in counts.items()}
+            self._identities[source] = identities
+        return self._events[source]
+
+    def _student_key(self, source, student):
+        return event_key(source, student[EVENT_KEYS[source]])
+
+    # ------------------------------------------------------------------
+    # 版の集計
+    # ------------------------------------------------------------------
+
+    def report(self, variant, ids=None):
+        """
+        版を集計する
+
+        Args:
+            variant (str): VARIANTS の版
+            ids (set): 指定するとこの受講生IDの行だけを集計する
+
+        Returns:
+            dict: {'data': [行, ...], 'variant', 'description', 'today'}（execute_query の結果と同じく data に行）
+        """
+        spec = self._spec(variant)
+        source = spec['source']
+        events = self.events(source)
+
+        if spec['roster'] == 'active':
+            known = {self._student_key(source, s): s for s in self.students().values()} \
+                if source == 'answers' else self.students()
+            identities = self._identities.get(source, {})
+            records = [known.get(key) or identities.get(key) or self._identity({'受講生ID': key})
+                       for key in events]
+        elif spec.get('group_by') == 'arrangement':
+            records = self.arrangements()
+        else:
+            records = list(self.students().values())
+
+        if ids is not None:
+            records = [record for record in records if record['受講生ID'] in ids]
+
+        labels = day_labels(self.today, spec['days']) if spec['days'] else []
+        bounds = {name: (self.today - timedelta(days=WINDOWS[name])).isoformat() if WINDOWS[name] else ''
+                  for name in WINDOWS}
+        rows = []
+        for record in records:
+            days = events.get(self._student_key(source, record), {})
+            totals = {name: sum(count for day, count in days.items() if day >= bounds[name]) for name in WINDOWS}
+            if spec.get('require') and not totals[spec['require']]:
+                continue
+            row = {name: record.get(field, '') for name, field in spec['columns']}
+            for label, day in labels:
+                row[label] = days.get(day, 0)
+            for name in WINDOWS:
+                if name in spec['windows']:
+                    row[name] = totals[name]
+                if name == AVERAGE_WINDOW:
+                    row['1日平均'] = round(totals[name] / WINDOWS[name], 1)
+            row['学習状況'] = learning_status(totals[AVERAGE_WINDOW])
+            rows.append((row, record))
+        return self._result(variant, rows)
+
+    @staticmethod
+    def _spec(variant):
+        spec = VARIANTS.get(variant)
+        if spec is None:
+            raise ReportError(f"レポートの版がありません: {variant}（{', '.join(VARIANTS)}）")
+        return spec
+
+    def _result(self, variant, rows):
+        """
+        [(行, 受講生), ...] を order_by で並べた結果（後ろの並び順から安定ソートを重ねる）
+        同順位は受講生ID順にして、差分更新で差し替えた結果と全件集計の結果を同じ並びにする
+        """
+        spec = VARIANTS[variant]
+        rows.sort(key=lambda pair: pair[0]['受講生ID'])
+        for key, descending in reversed(spec['order_by']):
+            rows.sort(key=lambda pair: pair[0][key] if key in pair[0] else pair[1].get(key, ''),
+                      reverse=descending)
+        return {
+            'variant': variant,
+            'description': spec['description'],
+            'today': self.today.isoformat(),
+            'data': [row for row, _ in rows],
+        }
+
+    def reports(self, variants=None):
+        """複数の版（ベース抽出は表ごとに1回だけ読み込む）"""
+        return {variant: self.report(variant) for variant in (variants or VARIANTS)}
+
+    # ------------------------------------------------------------------
+    # 差分更新
+    # ------------------------------------------------------------------
+
+    def update_source(self, source):
+        """件数の表を差分更新する（1回の実行で表ごとに1回）。戻り値は BaseExtract.update と同じ"""
+        if source not in self._updates:
+            changed = self.extract.update(source)
+            self._loaded.add(source)
+            if changed is None or changed:
+                self._events.pop(source, None)
+            self._updates[source] = changed
+        return self._updates[source]
+
+    def update_roster(self):
+        """
+        差分更新の名簿（1回の実行で1回）。FULL_REFRESH_DAYS 日以内に取得した名簿は日をまたいでも取り直さない
+
+        Returns:
+            set|None: 取り直した名簿で手配・氏名などが変わった受講生ID（取り直していなければ空）。
+            この実行で差分を取らずに名簿を取得していた・保存済みの名簿がなかったときは None
+        """
+        if self._roster_changes is False:
+            self._roster_max_age = timedelta(days=FULL_REFRESH_DAYS)
+            entry = self.extract.data['tables'].get('students')
+            if entry is None or 'students' in self.extract.fetched:
+                self._roster_changes = None
+            else:
+                previous = roster_by_student(entry['rows'])
+                # 差分の基準にした名簿（保存済みのレポートがこの名簿で集計されていれば行を差し替えられる）
+                self._roster_base = roster_digest(previous)
+                self._students = None
+                self.students()
+                current = roster_by_student(self.extract.data['tables']['students']['rows'])
+                self._roster_changes = {student_id for student_id in previous.keys() | current.keys()
+                                        if previous.get(student_id) != current.get(student_id)}
+        return self._roster_changes
+
+    def update_report(self, variant, output_dir=None):
+        """
+        保存済みのレポート（結果/versant_{版}_report.json）を差分更新する
+        変化のあった受講生の行だけを集計し直して差し替え、並べ直して保存する
+
+        Returns:
+            tuple: (保存先, 結果, 集計し直した受講生数。全行を集計し直したときは None)
+        """
+        spec = self._spec(variant)
+        source = spec['source']
+        changed = self.update_source(source)
+        roster_changed = self.update_roster()
+        path = Path(output_dir or RESULTS_DIR) / f"versant_{variant}_report.json"
+        previous = None
+        if path.exists():
+            with open(path, 'r', encoding='utf-8') as f:
+                previous = json.load(f)
+
+        self.students()
+        ids = None
+        if (changed is not None and roster_changed is not None and previous is not None
+                and previous.get('roster_digest') == self._roster_base):
+            ids = self._changed_ids(source, changed) | roster_changed
+            if previous.get('today') != self.today.isoformat():
+                ids = self._dated_ids(spec, previous.get('today'), ids)
+        if ids is None:
+            result = self.report(variant)
+        else:
+            updated = self.report(variant, ids=ids)['data']
+            identities = self._identities.get(source, {})
+            rows = [(row, self.students().get(row['受講生ID']) or identities.get(row['受講生ID']) or {})
+                    for row in previous['data'] if row['受講生ID'] not in ids]
+            rows += [(row, self.students().get(row['受講生ID']) or identities.get(row['受講生ID']) or {})
+                     for row in updated]
+            result = self._result(variant, rows)
+        result['updated_at'] = datetime.now().isoformat()
+        result['roster_digest'] = roster_digest(roster_by_student(self.extract.data['tables']['students']['rows']))
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = path.with_suffix('.tmp')
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        temp_file.replace(path)
+        return path, result, None if ids is None else len(ids)
+
+    def _changed_ids(self, source, changed):
+        """照合キーの集合を受講生IDの集合にする"""
+        if source == 'versant':
+            return set(changed)
+        return {student_id for student_id, student in self.students().items()
+                if self._student_key(source, student) in changed}
+
+    def _dated_ids(self, spec, previous_today, ids):
+        """
+        基準日が変わったときに集計し直す受講生ID
+        最長の期間合計の初日（前回・今回の基準日の早いほうから数える）以降に件数のない受講生は、
+        日別列も期間合計も0のまま変わらない（全期間合計は基準日によらない）
+        日付を見出しにする版・前回の基準日が読めないときは None（全行を集計し直す）
+        """
+        if spec['days'] == 'date' or not previous_today:
+            return None
+        span = max([DAILY_DAYS] + [days for days in WINDOWS.values() if days])
+        since = (min(date.fromisoformat(previous_today), self.today) - timedelta(days=span)).isoformat()
+        recent = {key for key, days in self.events(spec['source']).items() if max(days) >= since}
+        return ids | self._changed_ids(spec['source'], recent)
+
+
+def roster_by_student(rows):
+    """名簿の行を受講生IDごとにまとめる（取り直した名簿との比較用。行の並びは問わない）"""
+    grouped = defaultdict(list)
+    for row in rows:
+        grouped[str(row.get('受講生ID') or '')].append(json.dumps(row, ensure_ascii=False, sort_keys=True))
+    return {student_id: sorted(student_rows) for student_id, student_rows in grouped.items()}
+
+
+def roster_digest(roster):
+    """roster_by_student() の結果のハッシュ（レポートを集計した名簿の照合用）"""
+    text = json.dumps(sorted(roster.items()), ensure_ascii=False)
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def to_dataframe(result):
+    """report() の結果を DataFrame にする（pandas が必要）"""
+    if pd is None:
+        raise ReportError("pandas がインストールされていません")
+    return pd.DataFrame(result['data'])
+
+
+def save_report(result, output_dir=None):
+    """結果を 結果/versant_{版}_result_{日時}.json に保存する"""
+    output_dir = Path(output_dir or RESULTS_DIR)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_file = output_dir / f"versant_{result['variant']}_result_{timestamp}.json"
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    return output_file
+
+
+def update_reports(engine, variants):
+    """--incremental: 版ごとの保存済みレポートを差分更新する"""
+    updates = [(variant, engine.update_report(variant)) for variant in variants]
+    print(f"\n📅 基準日: {engine.today.isoformat()}")
+    for variant, (path, result, changed) in updates:
+        mode = "全行を集計" if changed is None else f"{changed}人分を差し替え"
+        print(f"  ✅ {variant}: {len(result['data'])}行（{mode}）→ {path.name}")
+    return 0
+
+
+def main(context=None):
+    """context（zoho_context.ZohoContext）を渡すと、同じプロセスの実行間でエンジンと取得済みテーブルを共有する"""
+    options = dict(arg[2:].split('=', 1) for arg in sys.argv[1:] if arg.startswith('--') and '=' in arg)
+    variants = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+
+    if '--list' in sys.argv:
+        for name, spec in VARIANTS.items():
+            print(f"  {name}: {spec['description']}（{spec['sql']}）")
+        return 0
+
+    print("="*80)
+    print("📊 VERSANTコーチングレポート（ベース抽出から集計）")
+    print("="*80)
+    try:
+        today, refresh = options.get('today'), '--refresh' in sys.argv
+        if context is None:
+            engine = VersantReportEngine(today=today, refresh=refresh)
+        else:
+            engine = context.memo(('versant', today, refresh),
+                                  lambda: VersantReportEngine(today=today, refresh=refresh))
+        if '--incremental' in sys.argv:
+            return update_reports(engine, variants or list(VARIANTS))
+        results = engine.reports(variants or None)
+    except ReportError as e:
+        print(f"❌ {e}")
+        return 1
+
+    print(f"\n📅 基準日: {engine.today.isoformat()}")
+    for variant, result in results.items():
+        output_file = save_report(result)
+        print(f"  ✅ {variant}: {len(result['data'])}行 → {output_file.name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+商談×商品内訳 結合エンジン
+商品内訳（Deal_Products / 商品内訳）と商談を、1件ずつ辞書を組み立てる代わりに
+DataFrame同士のハッシュ結合（pandas.merge）でまとめて結合する
+
+- 親商談IDは候補フィールド（Deal / Parent_Id 等）から列単位で1回だけ正規化する
+- 出力列は (列名, 元フィールド, 既定値, 変換) の定義リストで指定し、
+  参照項目（{'id', 'name'}）は列単位で名前に変換する
+- 件数に対して線形（商談側をIDでハッシュ化し、商品内訳を1回走査）
+- 商談IDのバッチ取得は fetch_batches_concurrently で並列に実行できる
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+# 商品内訳から親商談IDを探すフィールド（先頭優先）
+PARENT_KEY_FIELDS = ['Deal', 'Deal_Id', 'deal', 'deal_id', 'Related_Deal', 'Parent_Deal', 'Parent_Id']
+
+# 商談側の出力列（全スクリプト共通）
+DEAL_COLUMNS = [
+    ('商談ID', 'Id', '', None),
+    ('商談名', 'Deal_Name', '', None),
+    ('取引先名', 'Account_Name', '', 'name'),
+    ('商談担当者', 'Owner', '', 'name'),
+    ('完了予定日', 'Close_Date', '', None),
+    ('商談金額', 'Amount', 0, None),
+    ('商談ステージ', 'Stage', '', None),
+]
+
+PARENT_KEY_COLUMN = '_parent_deal_id'
+
+
+def extract_name(value):
+    """参照項目（{'name': ...}）から名前を取り出す"""
+    if isinstance(value, dict):
+        return value.get('name', '')
+    return str(value) if value else ''
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and value != value)
+
+
+def _ref_id(value):
+    if isinstance(value, dict):
+        return value.get('id') or value.get('Id')
+    if _is_missing(value) or value == '':
+        return None
+    return value
+
+
+def normalize_parent_key(frame, candidates=PARENT_KEY_FIELDS):
+    """候補フィールドを先頭から見て、最初に値がある親商談IDの列を返す"""
+    key = pd.Series(None, index=frame.index, dtype=object)
+    for field in candidates:
+        if field in frame:
+            key = key.where(key.notna(), frame[field].map(_ref_id))
+    return key
+
+
+def with_parent_key(products, candidates=PARENT_KEY_FIELDS):
+    """
+    商品内訳をDataFrameにし、正規化した親商談ID（文字列）を PARENT_KEY_COLUMN 列に付ける
+
+    join_deals_products はこの列があれば再計算せずに使うため、
+    商談IDの抽出と結合で同じ正規化結果を共有できる
+    """
+    frame = products if isinstance(products, pd.DataFrame) else pd.DataFrame.from_records(list(products))
+    if PARENT_KEY_COLUMN not in frame:
+        frame = frame.copy() if isinstance(products, pd.DataFrame) else frame
+        frame[PARENT_KEY_COLUMN] = normalize_parent_key(frame, candidates).map(
+            lambda value: None if value is None else str(value))
+    return frame
+
+
+def _column(frame, field, default, kind):
+    """出力列1本分を列単位で作る（フィールドがない・値が空なら既定値）"""
+    if isinstance(field, (list, tuple)):
+        # 候補フィールドのうち最初に値があるもの
+        values = pd.Series(None, index=frame.index, dtype=object)
+        for candidate in field:
+            if candidate in frame:
+                values = values.where(values.notna(), frame[candidate])
+    elif field in frame:
+        values = frame[field]
+    else:
+        return pd.Series([default] * len(frame), index=frame.index, dtype=object)
+
+    if kind == 'name':
+        return values.map(lambda value: '' if _is_missing(value) else extract_name(value))
+    values = values.map(lambda value: default if _is_missing(value) else value).astype(object)
+    if callable(kind):
+        values = values.map(kind)
+    return values
+
+
+def build_columns(frame, columns):
+    """(列名, 元フィールド, 既定値, 変換) の定義から出力DataFrameを作る"""
+    return pd.DataFrame({name: _column(frame, field, default, kind)
+                         for name, field, default, kind in columns}, index=frame.index)
+
+
+def join_deals_products(deals, products, product_columns, deal_columns=DEAL_COLUMNS,
+                        parent_key_fields=PARENT_KEY_FIELDS, deal_key='Id'):
+    """
+    商品内訳と商談をハッシュ結合して 商談×商品内訳 のフラットなDataFrameを返す
+
+    Args:
+        deals (list | DataFrame): 商談レコード（同じIDは後のものを優先）
+        products (list | DataFrame): 商品内訳レコード（with_parent_key 済みのDataFrameも可）
+        product_columns (list): 商品内訳側の出力列定義
+        deal_columns (list): 商談側の出力列定義
+        parent_key_fields (list): 親商談IDの候補フィールド
+        deal_key (str): 商談IDのフィールド
+
+    Returns:
+        DataFrame: 商談列＋商品内訳列（商品内訳の入力順、商談が見つからない商品内訳は除外）
+    """
+    deals_frame = deals if isinstance(deals, pd.DataFrame) else pd.DataFrame.from_records(list(deals))
+    products_frame = with_parent_key(products, parent_key_fields)
+    output_columns = [c[0] for c in deal_columns] + [c[0] for c in product_columns]
+
+    if deals_frame.empty or products_frame.empty or deal_key not in deals_frame:
+        return pd.DataFrame(columns=output_columns)
+
+    deals_frame = deals_frame.drop_duplicates(subset=deal_key, keep='last')
+    deal_side = build_columns(deals_frame, deal_columns)
+    deal_side.index = deals_frame[deal_key].astype(str).values
+
+    product_side = build_columns(products_frame, product_columns)
+    product_side[PARENT_KEY_COLUMN] = products_frame[PARENT_KEY_COLUMN]
+
+    merged = product_side.merge(deal_side, left_on=PARENT_KEY_COLUMN, right_index=True, how='inner', sort=False)
+    return merged[output_columns].reset_index(drop=True)
+
+
+def fetch_batches_concurrently(fetch_batch, ids, batch_size=50, max_workers=4):
+    """
+    IDをbatch_size件ずつに分けて fetch_batch(batch) を並列に実行し、結果を入力順に連結する
+
+    fetch_batch はリストを返す。例外はバッチごとに fetch_batch 側で処理すること。
+    """
+    batches = [ids[i:i + batch_size] for i in range(0, len(ids), batch_size)]
+    if not batches:
+        return []
+    results = []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as executor:
+        for batch_result in executor.map(fetch_batch, batches):
+            results.extend(batch_result)
+    return results
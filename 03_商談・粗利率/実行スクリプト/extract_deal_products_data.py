@@ -17,6 +17,41 @@ from datetime import datetime
 import os
 import sys
 
+from deal_product_join import join_deals_products, fetch_batches_concurrently, with_parent_key, PARENT_KEY_COLUMN
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../01_Zoho_API/APIクライアント/'))
+from field_projection import FieldProjection
+
+# Deal_Products は PRODUCT_COLUMNS で使う項目だけを取得する
+PROJECTION = FieldProjection.for_analysis('deal_products_export')
+
+# 親商談IDは Deal 参照のみを使う
+PARENT_KEY_FIELDS = ['Deal']
+
+# Deal_Products側の出力列 (列名, 元フィールド, 既定値, 変換)
+PRODUCT_COLUMNS = [
+    ('Deal_ProductsID', 'id', '', None),
+    ('商品名', 'Name', '', None),
+    ('単価', 'Unit_Price', 0, None),
+    ('数量', 'Number', 0, None),
+    ('小計', 'Subtotal', 0, None),
+    ('購入価格', 'Purchase_Price', 0, None),
+    ('購入価格金額', 'Purchase_Price_Amount', 0, None),
+    ('通貨', 'Currency', '', None),
+    ('タイプ', 'Type', '', None),
+    ('担当者', 'Owner', '', 'name'),
+    ('取引先', 'Account', '', 'name'),
+    ('連絡先', 'Contact', '', 'name'),
+    ('作成日時', 'Created_Time', '', None),
+    ('更新日時', 'Modified_Time', '', None),
+    ('Email', 'Email', '', None),
+    ('開始日', 'field1', '', None),
+    ('終了日', 'field2', '', None),
+    ('期間', 'field98', '', None),
+    ('状況', 'field', '', None),
+    ('承認状態', '$approval_state', '', None),
+]
+
 class ZohoCRMDataExtractor:
     def __init__(self, token_file_path):
         """初期化"""
@@ -52,6 +87,7 @@ class ZohoCRMDataExtractor:
         headers = self.get_headers()
         
         params = {
+            'fields': PROJECTION.fields_param('Deal_Products'),
             'per_page': 200,
             'page': 1,
             'sort_by': 'Created_Time',
@@ -100,16 +136,9 @@ class ZohoCRMDataExtractor:
         if not deal_ids:
             return []
             
-        all_deals = []
+        url = f"{self.api_domain}/crm/v2/Deals"
         
-        # IDを分割して取得（API制限対応）
-        batch_size = 50
-        for i in range(0, len(deal_ids), batch_size):
-            batch_ids = deal_ids[i:i+batch_size]
-            
-            url = f"{self.api_domain}/crm/v2/Deals"
-            headers = self.get_headers()
-            
+        def fetch_batch(batch_ids):
             # Deal IDsの条件を作成
             id_criteria = ' or '.join([f'(Id:equals:{deal_id})' for deal_id in batch_ids])
             
@@ -123,9 +152,10 @@ class ZohoCRMDataExtractor:
                 'fields': 'Id,Deal_Name,Account_Name,Contact_Name,Close_Date,Amount,Stage,Owner'
             }
             
+            batch_deals = []
             try:
                 while True:
-                    response = requests.get(url, headers=headers, params=params)
+                    response = requests.get(url, headers=self.get_headers(), params=params)
                     response.raise_for_status()
                     
                     data = response.json()
@@ -133,8 +163,7 @@ class ZohoCRMDataExtractor:
                     if 'data' not in data or not data['data']:
                         break
                         
-                    deals = data['data']
-                    all_deals.extend(deals)
+                    batch_deals.extend(data['data'])
                     
                     # 次のページがあるかチェック
                     info = data.get('info', {})
@@ -145,71 +174,19 @@ class ZohoCRMDataExtractor:
                     
             except Exception as e:
                 print(f"商談データ取得エラー（ID指定）: {e}")
-                continue
+            return batch_deals
+        
+        # IDを50件ずつに分割し、バッチを並列に取得（API制限対応）
+        all_deals = fetch_batches_concurrently(fetch_batch, list(deal_ids), batch_size=50)
         
         print(f"取得した商談数: {len(all_deals)}件")
         return all_deals
     
     def merge_and_process_data(self, deals, products):
         """
-        商談と商品データを紐づけて処理
+        商談と商品データを紐づけて処理（親商談IDを正規化してハッシュ結合し、DataFrameで返す）
         """
-        # 商談データを辞書化（IDをキーとする）
-        deals_dict = {deal['Id']: deal for deal in deals}
-        
-        merged_data = []
-        
-        for product in products:
-            # Deal IDを取得
-            deal_ref = product.get('Deal', {})
-            deal_id = deal_ref.get('id') if isinstance(deal_ref, dict) else None
-            
-            if not deal_id or deal_id not in deals_dict:
-                continue
-                
-            deal = deals_dict[deal_id]
-            
-            # データを結合
-            merged_record = {
-                # 商談情報
-                '商談ID': deal.get('Id', ''),
-                '商談名': deal.get('Deal_Name', ''),
-                '取引先名': self.extract_name(deal.get('Account_Name', '')),
-                '商談担当者': self.extract_name(deal.get('Owner', '')),
-                '完了予定日': deal.get('Close_Date', ''),
-                '商談金額': deal.get('Amount', 0),
-                '商談ステージ': deal.get('Stage', ''),
-                
-                # Deal_Products情報
-                'Deal_ProductsID': product.get('id', ''),
-                '商品名': product.get('Name', ''),
-                '単価': product.get('Unit_Price', 0),
-                '数量': product.get('Number', 0),
-                '小計': product.get('Subtotal', 0),
-                '購入価格': product.get('Purchase_Price', 0),
-                '購入価格金額': product.get('Purchase_Price_Amount', 0),
-                '通貨': product.get('Currency', ''),
-                'タイプ': product.get('Type', ''),
-                
-                # その他の情報
-                '担当者': self.extract_name(product.get('Owner', '')),
-                '取引先': self.extract_name(product.get('Account', '')),
-                '連絡先': self.extract_name(product.get('Contact', '')),
-                '作成日時': product.get('Created_Time', ''),
-                '更新日時': product.get('Modified_Time', ''),
-                
-                # カスタムフィールド（必要に応じて）
-                'Email': product.get('Email', ''),
-                '開始日': product.get('field1', ''),
-                '終了日': product.get('field2', ''),
-                '期間': product.get('field98', ''),
-                '状況': product.get('field', ''),
-                '承認状態': product.get('$approval_state', '')
-            }
-            
-            merged_data.append(merged_record)
-        
-        return merged_data
+        return join_deals_products(deals, products, PRODUCT_COLUMNS, parent_key_fields=PARENT_KEY_FIELDS)
     
     def extract_name(self, name_obj):
         """名前オブジェクトから名前を抽出"""
@@ -230,14 +207,14 @@ class ZohoCRMDataExtractor:
         
         try:
             # CSV出力
-            if data:
-                df = pd.DataFrame(data)
+            if len(data):
+                df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
                 df.to_csv(csv_filename, index=False, encoding='utf-8-sig')
                 print(f"CSVファイルに保存: {csv_filename}")
                 
                 # JSON出力
                 with open(json_filename, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, ensure_ascii=False, indent=2)
+                    json.dump(df.to_dict('records'), f, ensure_ascii=False, indent=2, default=str)
                 print(f"JSONファイルに保存: {json_filename}")
                 
                 # Excel出力
@@ -272,13 +249,9 @@ def main():
         print("Deal_Productsデータが見つかりませんでした")
         return
     
-    # 2. 関連する商談IDを抽出
-    deal_ids_from_products = set()
-    for product in deal_products:
-        deal_ref = product.get('Deal', {})
-        deal_id = deal_ref.get('id') if isinstance(deal_ref, dict) else None
-        if deal_id:
-            deal_ids_from_products.add(deal_id)
+    # 2. 関連する商談IDを抽出（親商談IDの正規化は結合でもそのまま使う）
+    deal_products = with_parent_key(deal_products, PARENT_KEY_FIELDS)
+    deal_ids_from_products = set(deal_products[PARENT_KEY_COLUMN].dropna())
     
     print(f"関連する商談ID数: {len(deal_ids_from_products)}件")
     
@@ -311,18 +284,14 @@ def main():
     print("\n=== 処理完了 ===")
     print(f"抽出件数: {len(merged_data)}件")
     
-    if merged_data:
+    if len(merged_data):
         # 日付範囲を確認
-        close_dates = [record['完了予定日'] for record in merged_data if record['完了予定日']]
-        if close_dates:
-            close_dates_sorted = sorted(close_dates)
-            print(f"完了予定日範囲: {close_dates_sorted[0]} ～ {close_dates_sorted[-1]}")
+        close_dates = merged_data.loc[merged_data['完了予定日'] != '', '完了予定日']
+        if len(close_dates):
+            print(f"完了予定日範囲: {close_dates.min()} ～ {close_dates.max()}")
         
         # 商談ステージの分布
-        stages = {}
-        for record in merged_data:
-            stage = record['商談ステージ']
-            stages[stage] = stages.get(stage, 0) + 1
+        stages = merged_data['商談ステージ'].value_counts()
         
         print("商談ステージ別分布:")
         for stage, count in sorted(stages.items()):
@@ -29,22 +29,15 @@ def clean_currency_string(value):
     # 既に数値の場合はそのまま返す
     return float(value) if not pd.isna(value) else 0
 
-def main():
-    # Excelファイルを読み込み
-    file_path = '2025年1月以降_商談_商品内訳_レポート_計算式付き.xlsx'
-    df = pd.read_excel(file_path)
-    
-    print(f"総データ数: {len(df)}")
-    print(f"小計データがある行数: {df['小計'].notna().sum()}")
-    print(f"原価データがある行数: {df['原価（税別）'].notna().sum()}")
+def calculate_margins(df):
+    """
+    小計と原価から粗利・粗利率を計算し、粗利率0以下の行を抽出
     
+    Returns:
+        tuple: (計算対象の行, 粗利率が0以下の行)
+    """
     # 小計と原価が両方とも存在する行のみを抽出
     valid_data = df[(df['小計'].notna()) & (df['原価（税別）'].notna())].copy()
-    print(f"小計と原価の両方がある行数: {len(valid_data)}")
-    
-    if len(valid_data) == 0:
-        print("計算可能なデータが見つかりませんでした。")
-        return
     
     # 通貨文字列を数値に変換
     valid_data['小計_数値'] = valid_data['小計'].apply(clean_currency_string)
@@ -65,6 +58,23 @@ def main():
         (valid_data['計算済み粗利率'] <= 0) & 
         (valid_data['計算済み粗利率'].notna())
     ]
+    return valid_data, zero_or_negative_margin
+
+def main():
+    # Excelファイルを読み込み
+    file_path = '2025年1月以降_商談_商品内訳_レポート_計算式付き.xlsx'
+    df = pd.read_excel(file_path)
+    
+    print(f"総データ数: {len(df)}")
+    print(f"小計データがある行数: {df['小計'].notna().sum()}")
+    print(f"原価データがある行数: {df['原価（税別）'].notna().sum()}")
+    
+    valid_data, zero_or_negative_margin = calculate_margins(df)
+    print(f"小計と原価の両方がある行数: {len(valid_data)}")
+    
+    if len(valid_data) == 0:
+        print("計算可能なデータが見つかりませんでした。")
+        return
     
     print(f"\n粗利率が0以下の行数: {len(zero_or_negative_margin)}")
     
@@ -18,6 +18,29 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '../../01_Zoho_API/認
 
 from zoho_analytics_helper import ZohoAnalyticsHelper
 from token_manager import ZohoTokenManager
+from month_utils import month_of, month_range
+from period_index import PeriodIndex, month_label
+from tax_engine import to_yen
+
+# 学習期間の月別集計を始める月（今期の初月）
+STUDY_START_MONTH = '2025-04'
+
+
+def study_months_summary(data, months):
+    """
+    商品内訳の学習期間を区間木に入れ、月ごとに学習期間がかかる明細の件数と小計を返す
+    （商品内訳のない商談の行は除く）
+    """
+    index = PeriodIndex.build(lines=(row for row in data if row.get('product_detail_id')))
+    summary = {}
+    for month, lines in index.lines_by_month(months).items():
+        summary[month] = {
+            'lines': len(lines),
+            'deals': len({line.get('deal_id') for line in lines}),
+            'subtotal': sum(to_yen(line.get('subtotal') or 0) for line in lines),
+        }
+    return summary, len(index.undated_lines)
+
 
 def get_current_period_deals():
     """今期（2025/4/1以降）の商談と商品内訳を取得"""
@@ -95,6 +118,17 @@ def get_current_period_deals():
                 print(f'商品内訳数: {unique_products}件')
                 print(f'総レコード数: {len(data)}件')
                 print()
+
+                # 月ごとに学習期間がかかっている商品内訳
+                months = month_range(STUDY_START_MONTH, month_of(datetime.now().strftime('%Y-%m-%d')))
+                study_summary, undated_lines = study_months_summary(data, months)
+                print(f'=== 学習期間の月別集計 ===')
+                for month, row in study_summary.items():
+                    print(f'{month_label(month)}: 商品内訳{row["lines"]}件（商談{row["deals"]}件）, '
+                          f'小計¥{row["subtotal"]:,}')
+                if undated_lines:
+                    print(f'学習期間不明: {undated_lines}件')
+                print()
                 
                 # 商談別にグループ化して表示
                 deal_count = 0
@@ -155,6 +189,7 @@ def get_current_period_deals():
                     'deal_count': unique_deals,
                     'product_count': unique_products,
                     'total_records': len(data),
+                    'study_months': study_summary,
                     'csv_file': csv_filename,
                     'excel_file': excel_filename,
                     'json_file': json_filename
@@ -7,6 +7,10 @@ ZohoCRMから商談と商品内訳を紐づけたデータを抽出するスク
 - 商談の完了予定日が2025/4/1以降
 - 必要項目: 商談名、取引先名、商談担当者、商品名、単価、数量、原価、小計、原価計
 - ID情報: 商談ID、商品内訳ID
+
+使い方:
+    python get_deal_products_final.py          # 通常API（Deal_Products先頭500件で試行）
+    python get_deal_products_final.py --bulk   # 一括読み取りジョブで全件を取得
 """
 
 import requests
@@ -16,6 +20,33 @@ import pandas as pd
 from datetime import datetime
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../01_Zoho_API/APIクライアント/'))
+from zoho_http_transport import ZohoSession, FileTokenRefresher
+from crm_bulk_read import CRMBulkReader, build_criteria
+from deal_product_join import join_deals_products, fetch_batches_concurrently, with_parent_key, PARENT_KEY_COLUMN
+
+# 一括読み取りで取得する商談項目（スキーマ上の完了予定日は Closing_Date）
+DEAL_BULK_FIELDS = ['Deal_Name', 'Account_Name', 'Contact_Name', 'Closing_Date', 'Amount', 'Stage', 'Owner']
+
+# 一括読み取りのCSVで数値に変換する商品内訳の列
+DEAL_PRODUCT_NUMERIC_FIELDS = ['Unit_Price', 'Quantity', 'Number', 'Total', 'Subtotal', 'Cost_Price', 'Cost_Total',
+                               'Purchase_Price', 'Purchase_Price_Amount', 'Line_Tax', 'Amount']
+
+# 商品内訳側の出力列 (列名, 元フィールド, 既定値, 変換)
+PRODUCT_COLUMNS = [
+    ('商品内訳ID', 'Id', '', None),
+    ('商品名', ['Product_Name', 'Name', 'product_name', 'name', 'Product'], '', 'name'),
+    ('単価', 'Unit_Price', 0, None),
+    ('数量', 'Quantity', 0, None),
+    ('小計', 'Total', 0, None),
+    ('原価', 'Cost_Price', 0, None),
+    ('原価計', 'Cost_Total', 0, None),
+    ('税額', 'Line_Tax', 0, None),
+    ('_原価フィールド', '_cost_fields_found', {}, str),
+    ('_原価ゼロ判定', '_is_zero_cost', False, None),
+]
 
 class ZohoCRMDataExtractor:
     def __init__(self, token_file_path):
@@ -23,6 +54,7 @@ class ZohoCRMDataExtractor:
         self.token_file_path = token_file_path
         self.access_token = None
         self.api_domain = "https://www.zohoapis.com"
+        self.bulk_reader = None
         self.load_tokens()
         
     def load_tokens(self):
@@ -91,6 +123,40 @@ class ZohoCRMDataExtractor:
         
         return all_products
     
+    def get_bulk_reader(self):
+        """一括読み取り用のリーダー（401時はトークンファイルのrefresh_tokenで更新）"""
+        if self.bulk_reader is None:
+            session = ZohoSession(FileTokenRefresher(self.token_file_path))
+            self.bulk_reader = CRMBulkReader(session, self.get_headers(), api_domain=self.api_domain)
+        return self.bulk_reader
+    
+    def iter_deal_products_bulk(self):
+        """
+        一括読み取りジョブでDeal_Productsの全件を1件ずつ返す（件数上限なし）
+        """
+        for product in self.get_bulk_reader().iter_records('Deal_Products',
+                                                           numeric_fields=DEAL_PRODUCT_NUMERIC_FIELDS):
+            # 一括読み取りでは親商談が Parent_Id 列になる。通常APIと同じ Deal で参照できるようにする
+            product.setdefault('Deal', product.get('Parent_Id'))
+            yield product
+    
+    def get_deals_bulk(self, deal_ids=None, close_date_from="2025-04-01"):
+        """
+        一括読み取りジョブで完了予定日以降の商談を取得し、指定IDのものだけを返す（deal_ids=None なら全件）
+        """
+        wanted_ids = set(deal_ids) if deal_ids is not None else None
+        criteria = build_criteria(('Closing_Date', 'greater_equal', close_date_from))
+        
+        all_deals = []
+        for deal in self.get_bulk_reader().iter_records('Deals', DEAL_BULK_FIELDS, criteria, numeric_fields=['Amount']):
+            if wanted_ids is None or deal.get('Id') in wanted_ids:
+                # 通常API経由のレコードと同じ項目名で参照できるようにする
+                deal.setdefault('Close_Date', deal.get('Closing_Date'))
+                all_deals.append(deal)
+        
+        print(f"取得した商談数: {len(all_deals)}件")
+        return all_deals
+    
     def get_deals_by_ids(self, deal_ids, close_date_from="2025-04-01"):
         """
         指定した商談IDリストから商談データを取得（完了予定日でフィルタ）
@@ -98,16 +164,9 @@ class ZohoCRMDataExtractor:
         if not deal_ids:
             return []
             
-        all_deals = []
+        url = f"{self.api_domain}/crm/v2/Deals"
         
-        # IDを分割して取得（API制限対応）
-        batch_size = 50
-        for i in range(0, len(deal_ids), batch_size):
-            batch_ids = deal_ids[i:i+batch_size]
-            
-            url = f"{self.api_domain}/crm/v2/Deals"
-            headers = self.get_headers()
-            
+        def fetch_batch(batch_ids):
             # Deal IDsの条件を作成
             id_criteria = ' or '.join([f'(Id:equals:{deal_id})' for deal_id in batch_ids])
             
@@ -121,9 +180,10 @@ class ZohoCRMDataExtractor:
                 'fields': 'Id,Deal_Name,Account_Name,Contact_Name,Close_Date,Amount,Stage,Owner'
             }
             
+            batch_deals = []
             try:
                 while True:
-                    response = requests.get(url, headers=headers, params=params)
+                    response = requests.get(url, headers=self.get_headers(), params=params)
                     response.raise_for_status()
                     
                     data = response.json()
@@ -131,8 +191,7 @@ class ZohoCRMDataExtractor:
                     if 'data' not in data or not data['data']:
                         break
                         
-                    deals = data['data']
-                    all_deals.extend(deals)
+                    batch_deals.extend(data['data'])
                     
                     # 次のページがあるかチェック
                     info = data.get('info', {})
@@ -143,7 +202,10 @@ class ZohoCRMDataExtractor:
                     
             except Exception as e:
                 print(f"商談データ取得エラー（ID指定）: {e}")
-                continue
+            return batch_deals
+        
+        # IDを50件ずつに分割し、バッチを並列に取得（API制限対応）
+        all_deals = fetch_batches_concurrently(fetch_batch, list(deal_ids), batch_size=50)
         
         print(f"取得した商談数: {len(all_deals)}件")
         return all_deals
@@ -153,8 +215,13 @@ class ZohoCRMDataExtractor:
         原価関連フィールドが0の商品をフィルタ
         """
         filtered_products = []
+        sample = None
         
+        # productsは一括読み取りのジェネレータでもよい（1件ずつ判定し、対象外は保持しない）
         for product in products:
+            if sample is None:
+                sample = product
+            
             # 原価関連のフィールドをチェック（可能性のあるフィールド名）
             cost_fields = ['Cost_Total', 'Cost_Price', 'cost_total', 'cost_price', 
                           'Unit_Cost', 'Line_Cost', 'Total_Cost']
@@ -180,9 +247,8 @@ class ZohoCRMDataExtractor:
         print(f"原価ゼロでフィルタ後: {len(filtered_products)}件")
         
         # デバッグ：最初の数件のフィールド情報を表示
-        if products:
+        if sample:
             print("\nサンプル商品データのフィールド:")
-            sample = products[0]
             for key, value in sample.items():
                 if not key.startswith('_'):
                     print(f"  {key}: {value}")
@@ -191,61 +257,13 @@ class ZohoCRMDataExtractor:
     
     def merge_data(self, deals, products):
         """
-        商談と商品データを紐づけ
+        商談と商品データを紐づけ（親商談IDを正規化してハッシュ結合し、DataFrameで返す）
         """
-        # 商談データを辞書化（IDをキーとする）
-        deals_dict = {deal['Id']: deal for deal in deals}
-        
-        merged_data = []
+        merged_data = join_deals_products(deals, products, PRODUCT_COLUMNS)
         
-        for product in products:
-            # Deal IDを取得（様々な可能性を試す）
-            deal_id = None
-            possible_deal_fields = ['Deal', 'Deal_Id', 'deal', 'deal_id', 'Related_Deal', 'Parent_Deal']
-            
-            for field in possible_deal_fields:
-                if field in product:
-                    deal_ref = product[field]
-                    if isinstance(deal_ref, dict):
-                        deal_id = deal_ref.get('id') or deal_ref.get('Id')
-                    else:
-                        deal_id = deal_ref
-                    if deal_id:
-                        break
-            
-            if not deal_id or deal_id not in deals_dict:
-                print(f"商談IDが見つからない商品: {product.get('Id', 'N/A')}")
-                continue
-                
-            deal = deals_dict[deal_id]
-            
-            # データを結合
-            merged_record = {
-                # 商談情報
-                '商談ID': deal.get('Id', ''),
-                '商談名': deal.get('Deal_Name', ''),
-                '取引先名': self.extract_name(deal.get('Account_Name', '')),
-                '商談担当者': self.extract_name(deal.get('Owner', '')),
-                '完了予定日': deal.get('Close_Date', ''),
-                '商談金額': deal.get('Amount', 0),
-                '商談ステージ': deal.get('Stage', ''),
-                
-                # 商品内訳情報
-                '商品内訳ID': product.get('Id', ''),
-                '商品名': self.extract_product_name(product),
-                '単価': product.get('Unit_Price', 0),
-                '数量': product.get('Quantity', 0),
-                '小計': product.get('Total', 0),
-                '原価': product.get('Cost_Price', 0),
-                '原価計': product.get('Cost_Total', 0),
-                '税額': product.get('Line_Tax', 0),
-                
-                # デバッグ情報
-                '_原価フィールド': str(product.get('_cost_fields_found', {})),
-                '_原価ゼロ判定': product.get('_is_zero_cost', False)
-            }
-            
-            merged_data.append(merged_record)
+        unmatched = len(products) - len(merged_data)
+        if unmatched:
+            print(f"商談IDが見つからない商品: {unmatched}件")
         
         return merged_data
     
@@ -288,14 +306,14 @@ class ZohoCRMDataExtractor:
         
         try:
             # CSV出力
-            if data:
-                df = pd.DataFrame(data)
+            if len(data):
+                df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
                 df.to_csv(csv_filename, index=False, encoding='utf-8-sig')
                 print(f"CSVファイルに保存: {csv_filename}")
                 
                 # JSON出力
                 with open(json_filename, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, ensure_ascii=False, indent=2)
+                    json.dump(df.to_dict('records'), f, ensure_ascii=False, indent=2, default=str)
                 print(f"JSONファイルに保存: {json_filename}")
                 
                 # Excel出力
@@ -321,52 +339,53 @@ def main():
     # データ抽出クラスのインスタンス化
     extractor = ZohoCRMDataExtractor(token_file)
     
-    # 1. Deal_Productsから商品内訳データを取得
-    print("\n1. Deal_Products（商品内訳）データを取得中...")
-    deal_products = extractor.get_deal_products(limit=500)  # まず500件で試す
-    print(f"取得したDeal_Products数: {len(deal_products)}件")
+    use_bulk = '--bulk' in sys.argv[1:]
     
-    if not deal_products:
-        print("Deal_Productsデータが見つかりませんでした")
-        return
-    
-    # 2. 原価ゼロの商品をフィルタ
-    print("\n2. 原価ゼロの商品をフィルタ中...")
-    zero_cost_products = extractor.filter_zero_cost_products(deal_products)
-    
-    if not zero_cost_products:
-        print("原価ゼロの商品が見つかりませんでした")
-        print("\nサンプルDeal_Productデータ:")
-        if deal_products:
-            print(json.dumps(deal_products[0], ensure_ascii=False, indent=2))
-        return
-    
-    # 3. 関連する商談IDを抽出
-    deal_ids_from_products = set()
-    for product in zero_cost_products:
-        # Deal IDを取得（様々な可能性を試す）
-        deal_id = None
-        possible_deal_fields = ['Deal', 'Deal_Id', 'deal', 'deal_id', 'Related_Deal', 'Parent_Deal']
+    if use_bulk:
+        # 1-4. 商品内訳（原価ゼロでフィルタしながら）と完了予定日以降の商談を一括読み取りで並行取得し、
+        #      商談IDでの絞り込みは結合に任せる
+        print("\n1. Deal_Products（原価ゼロ）と商談を一括読み取りで並行取得中...")
+        extractor.get_bulk_reader()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            products_future = executor.submit(
+                lambda: extractor.filter_zero_cost_products(extractor.iter_deal_products_bulk()))
+            deals_future = executor.submit(extractor.get_deals_bulk, None, "2025-04-01")
+            zero_cost_products = products_future.result()
+            deals = deals_future.result()
         
-        for field in possible_deal_fields:
-            if field in product:
-                deal_ref = product[field]
-                if isinstance(deal_ref, dict):
-                    deal_id = deal_ref.get('id') or deal_ref.get('Id')
-                else:
-                    deal_id = deal_ref
-                if deal_id:
-                    break
+        if not zero_cost_products:
+            print("原価ゼロの商品が見つかりませんでした")
+            return
+    else:
+        # 1. Deal_Productsから商品内訳データを取得
+        print("\n1. Deal_Products（商品内訳）データを取得中...")
+        deal_products = extractor.get_deal_products(limit=500)  # まず500件で試す
+        print(f"取得したDeal_Products数: {len(deal_products)}件")
         
-        if deal_id:
-            deal_ids_from_products.add(deal_id)
-    
-    print(f"関連する商談ID数: {len(deal_ids_from_products)}件")
+        if not deal_products:
+            print("Deal_Productsデータが見つかりませんでした")
+            return
+        
+        # 2. 原価ゼロの商品をフィルタ
+        print("\n2. 原価ゼロの商品をフィルタ中...")
+        zero_cost_products = extractor.filter_zero_cost_products(deal_products)
+        
+        if not zero_cost_products:
+            print("原価ゼロの商品が見つかりませんでした")
+            print("\nサンプルDeal_Productデータ:")
+            if deal_products:
+                print(json.dumps(deal_products[0], ensure_ascii=False, indent=2))
+            return
     
-    # 4. 関連する商談データを取得（完了予定日2025/4/1以降でフィルタ）
-    print("\n3. 関連する商談データを取得中...")
-    deal_ids_list = list(deal_ids_from_products)
-    deals = extractor.get_deals_by_ids(deal_ids_list, close_date_from="2025-04-01")
+        # 3. 関連する商談IDを抽出（親商談IDの正規化は結合でもそのまま使う）
+        zero_cost_products = with_parent_key(zero_cost_products)
+        deal_ids_from_products = set(zero_cost_products[PARENT_KEY_COLUMN].dropna())
+        
+        print(f"関連する商談ID数: {len(deal_ids_from_products)}件")
+        
+        # 4. 関連する商談データを取得（完了予定日2025/4/1以降でフィルタ）
+        print("\n3. 関連する商談データを取得中...")
+        deals = extractor.get_deals_by_ids(list(deal_ids_from_products), close_date_from="2025-04-01")
     
     if not deals:
         print("条件に合致する商談データが見つかりませんでした")
@@ -7,6 +7,10 @@ ZohoCRMから商談と商品内訳を紐づけたデータを抽出するスク
 - 商談の完了予定日が2025/4/1以降
 - 必要項目: 商談名、取引先名、商談担当者、商品名、単価、数量、原価、小計、原価計
 - ID情報: 商談ID、商品内訳ID
+
+使い方:
+    python get_deals_with_zero_cost_products.py          # 通常API（商品内訳先頭500件で試行）
+    python get_deals_with_zero_cost_products.py --bulk   # 一括読み取りジョブで全件を取得
 """
 
 import requests
@@ -17,12 +21,23 @@ from datetime import datetime
 import os
 import sys
 
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../01_Zoho_API/APIクライアント/'))
+from zoho_http_transport import ZohoSession, FileTokenRefresher
+from crm_bulk_read import CRMBulkReader, build_criteria
+
+# 一括読み取りで取得する商談項目（スキーマ上の完了予定日は Closing_Date）
+DEAL_BULK_FIELDS = ['Deal_Name', 'Account_Name', 'Contact_Name', 'Closing_Date', 'Amount', 'Stage', 'Owner']
+
+# 一括読み取りのCSVで数値に変換する商品内訳の列
+LINE_ITEM_NUMERIC_FIELDS = ['Unit_Price', 'Quantity', 'Number', 'Total', 'Subtotal', 'Cost_Price', 'Cost_Total', 'Line_Tax']
+
 class ZohoCRMDataExtractor:
     def __init__(self, token_file_path):
         """初期化"""
         self.token_file_path = token_file_path
         self.access_token = None
         self.api_domain = "https://www.zohoapis.com"
+        self.bulk_reader = None
         self.load_tokens()
         
     def load_tokens(self):
@@ -214,8 +229,14 @@ class ZohoCRMDataExtractor:
             return []
         
         # Pythonで原価関連のフィールドが0のものをフィルタ
+        return self.filter_zero_cost(all_products)
+    
+    def filter_zero_cost(self, products):
+        """
+        原価関連のフィールドが0の商品内訳を抽出（一括読み取りのジェネレータも1件ずつ判定）
+        """
         filtered_products = []
-        for product in all_products:
+        for product in products:
             # 原価関連のフィールドをチェック
             cost_fields = ['Cost_Total', 'Cost_Price', 'cost_total', 'cost_price']
             is_zero_cost = False
@@ -233,6 +254,41 @@ class ZohoCRMDataExtractor:
         print(f"原価ゼロでフィルタ後: {len(filtered_products)}件")
         return filtered_products
     
+    def get_bulk_reader(self):
+        """一括読み取り用のリーダー（401時はトークンファイルのrefresh_tokenで更新）"""
+        if self.bulk_reader is None:
+            session = ZohoSession(FileTokenRefresher(self.token_file_path))
+            self.bulk_reader = CRMBulkReader(session, self.get_headers(), api_domain=self.api_domain)
+        return self.bulk_reader
+    
+    def get_product_line_items_bulk(self):
+        """
+        一括読み取りジョブで商品内訳を全件取得し、原価ゼロのものを返す（件数上限なし）
+        """
+        def iter_line_items():
+            for product in self.get_bulk_reader().iter_records('Product_Line_Item',
+                                                               numeric_fields=LINE_ITEM_NUMERIC_FIELDS):
+                # 商品内訳の親商談は Parent_Id。通常APIと同じ Deal で参照できるようにする
+                product.setdefault('Deal', product.get('Parent_Id'))
+                yield product
+        
+        return self.filter_zero_cost(iter_line_items())
+    
+    def get_deals_bulk(self, deal_ids, close_date_from="2025-04-01"):
+        """
+        一括読み取りジョブで完了予定日以降の商談を取得し、指定IDのものだけを返す
+        """
+        wanted_ids = set(deal_ids)
+        criteria = build_criteria(('Closing_Date', 'greater_equal', close_date_from))
+        
+        all_deals = []
+        for deal in self.get_bulk_reader().iter_records('Deals', DEAL_BULK_FIELDS, criteria, numeric_fields=['Amount']):
+            if deal.get('Id') in wanted_ids:
+                # 通常API経由のレコードと同じ項目名で参照できるようにする
+                deal.setdefault('Close_Date', deal.get('Closing_Date'))
+                all_deals.append(deal)
+        return all_deals
+    
     def merge_data(self, deals, product_line_items):
         """
         商談と商品内訳データを紐づけ
@@ -322,6 +378,8 @@ def main():
     # データ抽出クラスのインスタンス化
     extractor = ZohoCRMDataExtractor(token_file)
     
+    use_bulk = '--bulk' in sys.argv[1:]
+    
     # 0. フィールド情報の取得（デバッグ用）
     print("\n0. Product_Line_Itemsフィールド情報を取得中...")
     fields_info = extractor.get_product_line_items_fields()
@@ -332,7 +390,10 @@ def main():
     
     # 1. まず商品内訳データ取得（原価小計=0）
     print("\n1. 商品内訳データを取得中...")
-    product_line_items = extractor.get_product_line_items(limit=500)  # まず500件で試す
+    if use_bulk:
+        product_line_items = extractor.get_product_line_items_bulk()
+    else:
+        product_line_items = extractor.get_product_line_items(limit=500)  # まず500件で試す
     print(f"取得した商品内訳数: {len(product_line_items)}件")
     
     if not product_line_items:
@@ -353,13 +414,16 @@ def main():
     deal_ids_list = list(deal_ids_from_products)
     deals = []
     
-    # 商談IDを分割して取得（API制限対応）
-    batch_size = 100
-    for i in range(0, len(deal_ids_list), batch_size):
-        batch_ids = deal_ids_list[i:i+batch_size]
-        batch_deals = extractor.get_deals_by_ids(batch_ids, close_date_from="2025-04-01")
-        deals.extend(batch_deals)
-        print(f"商談データ取得: {len(batch_deals)}件 (累計: {len(deals)}件)")
+    if use_bulk:
+        deals = extractor.get_deals_bulk(deal_ids_list, close_date_from="2025-04-01")
+    else:
+        # 商談IDを分割して取得（API制限対応）
+        batch_size = 100
+        for i in range(0, len(deal_ids_list), batch_size):
+            batch_ids = deal_ids_list[i:i+batch_size]
+            batch_deals = extractor.get_deals_by_ids(batch_ids, close_date_from="2025-04-01")
+            deals.extend(batch_deals)
+            print(f"商談データ取得: {len(batch_deals)}件 (累計: {len(deals)}件)")
     
     print(f"条件に合致する商談数: {len(deals)}件")
     
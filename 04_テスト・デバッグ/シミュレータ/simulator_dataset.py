@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Zohoシミュレータ用データセット
+既存のJSONダンプ（JT_ETP_完全分析結果 など）の商談を元に、
+CRM商談・Books請求書/入金・Analyticsテーブルを決定的に生成し、
+検索条件（criteria）・COQL・SQLの評価を行う
+
+aiohttpに依存しないため、ベンチマーク等からデータ生成だけを使うこともできる
+"""
+
+import json
+import random
+import re
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).parent.parent.parent
+
+sys.path.append(str(REPO_ROOT / "01_Zoho_API" / "APIクライアント"))
+from json_dump_loader import iter_dump_entries
+
+DEFAULT_SEED_DIR = REPO_ROOT / "11_請求書チェック" / "JT_ETP_完全分析結果"
+SCHEMA_FILE = REPO_ROOT / "07_スキーマ情報" / "zoho_crm_schema.json"
+
+DEFAULT_ORG_ID = "772043849"
+TAX_RATE = 0.10
+
+# CRM検索APIが返す最大件数
+SEARCH_RECORD_LIMIT = 2000
+# COQLのLIMIT未指定時の件数と上限
+COQL_DEFAULT_LIMIT = 200
+COQL_MAX_LIMIT = 2000
+
+# 複製レコードに振るIDの開始値（実データのIDと衝突しない桁）
+_CLONE_ID_BASE = 9000000000000000000
+
+
+class QueryError(ValueError):
+    """criteria・COQL・SQLの構文エラー"""
+
+
+def load_seed_deals(seed_dir=DEFAULT_SEED_DIR):
+    """シードディレクトリ内のJSON（索引サイドカーを除く）から商談を1件ずつ集め、IDで重複排除して返す"""
+    deals = {}
+    for path in sorted(Path(seed_dir).glob("*.json")):
+        if path.name.endswith('.idx.json'):
+            continue
+        for _, record, _, _ in iter_dump_entries(path):
+            if isinstance(record, dict) and record.get('id'):
+                deals.setdefault(record['id'], record)
+    return list(deals.values())
+
+
+def _parent_deals(children):
+    """子商談のfield78から親商談レコードを組み立てる"""
+    parents = {}
+    for child in children:
+        parent_ref = child.get('field78')
+        if not isinstance(parent_ref, dict) or not parent_ref.get('id'):
+            continue
+        parent = parents.setdefault(parent_ref['id'], {
+            'id': parent_ref['id'],
+            'Deal_Name': parent_ref.get('name'),
+            'Stage': '受注',
+            'Amount': 0,
+            'Closing_Date': child.get('Closing_Date'),
+            'field78': None
+        })
+        closing_date = child.get('Closing_Date')
+        if closing_date and (not parent['Closing_Date'] or closing_date < parent['Closing_Date']):
+            parent['Closing_Date'] = closing_date
+    return list(parents.values())
+
+
+class SimulatorDataset:
+    """シミュレータが返すレコード一式"""
+
+    def __init__(self, seed_deals=None, scale=1, seed=0, leakage_rate=0.1,
+                 mismatch_rate=0.05, org_id=DEFAULT_ORG_ID):
+        """
+        Args:
+            seed_deals (list): 元にする子商談（省略時は DEFAULT_SEED_DIR から読み込み）
+            scale (int): 商談を何倍に複製するか（ベンチマーク用）
+            seed (int): 乱数シード（同じシードなら同じデータ）
+            leakage_rate (float): 受注商談のうち請求書を作らない割合
+            mismatch_rate (float): 請求書金額を商談金額からずらす割合
+            org_id (str): Books組織ID
+        """
+        if seed_deals is None:
+            seed_deals = load_seed_deals()
+        self.org_id = org_id
+        self.rng = random.Random(seed)
+        self.deals = self._build_deals(seed_deals, scale)
+        self.deals_by_id = {deal['id']: deal for deal in self.deals}
+        self.invoices = self._build_invoices(leakage_rate, mismatch_rate)
+        self.invoices_by_id = {invoice['invoice_id']: invoice for invoice in self.invoices}
+        self.customerpayments = self._build_payments()
+        self.analytics_tables = {
+            'Deals': self.deals,
+            'Invoices': self.invoices,
+            'CustomerPayments': self.customerpayments
+        }
+        self._sql = None
+
+    def _build_deals(self, seed_deals, scale):
+        base_children = [dict(deal) for deal in seed_deals]
+        base = _parent_deals(base_children) + base_children
+        deals = list(base)
+        next_id = _CLONE_ID_BASE
+        for replica in range(1, scale):
+            id_map = {}
+            for deal in base:
+                next_id += 1
+                id_map[deal['id']] = str(next_id)
+            for deal in base:
+                clone = dict(deal)
+                clone['id'] = id_map[deal['id']]
+                clone['Deal_Name'] = f"{deal.get('Deal_Name')} #{replica}"
+                parent_ref = deal.get('field78')
+                if isinstance(parent_ref, dict) and parent_ref.get('id') in id_map:
+                    clone['field78'] = {'name': f"{parent_ref.get('name')} #{replica}",
+                                        'id': id_map[parent_ref['id']]}
+                deals.append(clone)
+        return deals
+
+    def _build_invoices(self, leakage_rate, mismatch_rate):
+        invoices = []
+        for deal in self.deals:
+            if deal.get('Stage') != '受注' or not deal.get('Amount'):
+                continue
+            if self.rng.random() < leakage_rate:
+                continue
+            sub_total = deal['Amount']
+            if self.rng.random() < mismatch_rate:
+                sub_total = round(sub_total * self.rng.choice((0.5, 0.9, 1.1)))
+            total = round(sub_total * (1 + TAX_RATE))
+            status = self.rng.choices(('paid', 'sent', 'overdue', 'void'), weights=(70, 15, 10, 5))[0]
+            parent_ref = deal.get('field78') or {}
+            number = len(invoices) + 1
+            invoices.append({
+                'invoice_id': str(_CLONE_ID_BASE // 10 + number),
+                'invoice_number': f"INV-{number:06d}",
+                'reference_number': deal['id'],
+                'customer_id': parent_ref.get('id') or deal['id'],
+                'customer_name': parent_ref.get('name') or deal.get('Deal_Name'),
+                'date': deal.get('Closing_Date'),
+                'due_date': _add_days(deal.get('Closing_Date'), 30),
+                'status': status,
+                'currency_code': 'JPY',
+                'sub_total': sub_total,
+                'tax_total': total - sub_total,
+                'total': total,
+                'balance': 0 if status in ('paid', 'void') else total,
+                'created_time': f"{deal.get('Closing_Date') or '2025-01-01'}T09:00:00+0900"
+            })
+        return invoices
+
+    def _build_payments(self):
+        payments = []
+        for invoice in self.invoices:
+            if invoice['status'] != 'paid':
+                continue
+            number = len(payments) + 1
+            payments.append({
+                'payment_id': str(_CLONE_ID_BASE // 100 + number),
+                'payment_number': str(number),
+                'customer_id': invoice['customer_id'],
+                'customer_name': invoice['customer_name'],
+                'date': _add_days(invoice['date'], self.rng.randint(5, 45)),
+                'amount': invoice['total'],
+                'unused_amount': 0,
+                'payment_mode': 'banktransfer',
+                'reference_number': invoice['reference_number'],
+                'invoice_numbers': invoice['invoice_number'],
+                'invoices': [{'invoice_id': invoice['invoice_id'],
+                              'invoice_number': invoice['invoice_number'],
+                              'amount_applied': invoice['total']}]
+            })
+        return payments
+
+    def add_analytics_table(self, name, rows):
+        """Analyticsエクスポート用のテーブルを追加（VERSANTの結果JSONなど）"""
+        self.analytics_tables[name] = rows
+        self._sql = None
+
+    @property
+    def sql(self):
+        """Analytics/COQL評価用のインメモリSQLite（遅延構築）"""
+        if self._sql is None:
+            self._sql = _build_sqlite(self.analytics_tables)
+        return self._sql
+
+
+def _add_days(date_str, days):
+    if not date_str:
+        return None
+    try:
+        return (datetime.strptime(date_str, '%Y-%m-%d') + timedelta(days=days)).strftime('%Y-%m-%d')
+    except ValueError:
+        return date_str
+
+
+# ---------------------------------------------------------------------------
+# CRM検索 criteria
+# ---------------------------------------------------------------------------
+
+CRITERIA_OPERATORS = {'equals', 'not_equal', 'in', 'starts_with', 'between', 'greater_than',
+                      'greater_equal', 'less_than', 'less_equal'}
+
+_CRITERION = re.compile(r'\(\s*([\w.$]+)\s*:\s*([a-z_]+)\s*:((?:\\.|[^()\\])*)\)')
+_CRITERIA_REST = re.compile(r'^(?:\s|\(|\)|and|or|__c\d+__)*$', re.IGNORECASE)
+
+
+def _field_value(record, field):
+    value = record
+    for part in field.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    if isinstance(value, dict):
+        return value.get('id')
+    return value
+
+
+def _coerce(value, sample):
+    """criteriaの文字列値を比較対象の型に合わせる"""
+    if isinstance(sample, bool):
+        return value.lower() == 'true'
+    if isinstance(sample, (int, float)):
+        try:
+            return float(value)
+        except ValueError:
+            return value
+    return value
+
+
+def _criterion(field, operator, raw):
+    if operator not in CRITERIA_OPERATORS:
+        raise QueryError(f"未対応の演算子: {operator}")
+    raw = re.sub(r'\\(.)', r'\1', raw.strip())
+
+    def test(record):
+        actual = _field_value(record, field)
+        if operator in ('equals', 'in'):
+            return any(actual == _coerce(v.strip(), actual) for v in raw.split(','))
+        if operator == 'not_equal':
+            return actual != _coerce(raw, actual)
+        if operator == 'starts_with':
+            return isinstance(actual, str) and actual.startswith(raw)
+        if actual is None:
+            return False
+        if operator == 'between':
+            low, high = (_coerce(v.strip(), actual) for v in raw.split(',', 1))
+            return low <= actual <= high
+        target = _coerce(raw, actual)
+        try:
+            if operator == 'greater_than':
+                return actual > target
+            if operator == 'greater_equal':
+                return actual >= target
+            if operator == 'less_than':
+                return actual < target
+            return actual <= target
+        except TypeError:
+            return False
+
+    return test
+
+
+def compile_criteria(criteria):
+    """`(Stage:equals:受注)and(Amount:greater_than:0)` 形式を判定関数に変換"""
+    tests = []
+
+    def replace(match):
+        tests.append(_criterion(match.group(1), match.group(2), match.group(3)))
+        return f" __c{len(tests) - 1}__ "
+
+    expression = _CRITERION.sub(replace, criteria)
+    if not tests or not _CRITERIA_REST.match(expression):
+        raise QueryError(f"criteriaを解析できません: {criteria}")
+
+    source = re.sub(r'__c(\d+)__', r'tests[\1](record)', expression)
+    source = re.sub(r'\b(and|or)\b', lambda m: f" {m.group(1).lower()} ", source, flags=re.IGNORECASE)
+    try:
+        return eval(f"lambda record: {source}", {'tests': tests})
+    except SyntaxError:
+        raise QueryError(f"criteriaを解析できません: {criteria}")
+
+
+# ---------------------------------------------------------------------------
+# SQLite（COQL・Analytics SQL）
+# ---------------------------------------------------------------------------
+
+def _sql_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def _build_sqlite(tables):
+    """レコードのリストをテーブル化（lookupは JSON文字列と "field.id" "field.name" 列に展開）"""
+    conn = sqlite3.connect(':memory:', check_same_thread=False)
+    for name, rows in tables.items():
+        columns = {}
+        for row in rows:
+            for key, value in row.items():
+                columns.setdefault(key, None)
+                if isinstance(value, dict):
+                    for sub_key in value:
+                        columns.setdefault(f"{key}.{sub_key}", None)
+        if not columns:
+            continue
+        column_list = list(columns)
+        quoted = ', '.join(f'"{c}"' for c in column_list)
+        conn.execute(f'CREATE TABLE "{name}" ({quoted})')
+        placeholders = ', '.join('?' for _ in column_list)
+        values = []
+        for row in rows:
+            record = []
+            for column in column_list:
+                if column in row:
+                    record.append(_sql_value(row[column]))
+                else:
+                    key, _, sub_key = column.partition('.')
+                    parent = row.get(key)
+                    record.append(parent.get(sub_key) if isinstance(parent, dict) else None)
+            values.append(record)
+        conn.executemany(f'INSERT INTO "{name}" ({quoted}) VALUES ({placeholders})', values)
+    conn.commit()
+    return conn
+
+
+def _quote_dotted_identifiers(query):
+    """文字列リテラル以外の field78.id を "field78.id" に置き換える"""
+    parts = re.split(r"('(?:[^'\\]|\\.|'')*')", query)
+    for i in range(0, len(parts), 2):
+        parts[i] = re.sub(r'(?<!["\w])([A-Za-z_]\w*)\.([A-Za-z_]\w*)(?!["\w])', r'"\1.\2"', parts[i])
+    return ''.join(parts)
+
+
+_COQL_LIMIT = re.compile(r'\s+limit\s+(\d+)(?:\s*,\s*(\d+))?(?:\s+offset\s+(\d+))?\s*$', re.IGNORECASE)
+_COQL_FROM = re.compile(r'\bfrom\s+(\w+)', re.IGNORECASE)
+
+
+def run_coql(dataset, select_query):
+    """COQLを実行し、(レコード一覧, more_records) を返す"""
+    query = select_query.strip().rstrip(';')
+    if not query.lower().startswith('select') or ' where ' not in f" {query.lower()} ":
+        raise QueryError("COQLには SELECT と WHERE 句が必要です")
+    module = _COQL_FROM.search(query)
+    if not module or module.group(1) != 'Deals':
+        raise QueryError("シミュレータのCOQLは Deals モジュールのみ対応しています")
+
+    offset, limit = 0, COQL_DEFAULT_LIMIT
+    match = _COQL_LIMIT.search(query)
+    if match:
+        if match.group(2) is not None:
+            offset, limit = int(match.group(1)), int(match.group(2))
+        else:
+            limit, offset = int(match.group(1)), int(match.group(3) or 0)
+        query = query[:match.start()]
+    if limit > COQL_MAX_LIMIT:
+        raise QueryError(f"LIMITは{COQL_MAX_LIMIT}件までです")
+
+    # COQLは常にidを返す
+    select_list = query[6:_COQL_FROM.search(query).start()]
+    if not re.search(r'(^|,)\s*id\s*(,|$)', select_list):
+        query = f"select id, {select_list.strip()} {query[_COQL_FROM.search(query).start():]}"
+
+    sql = f"{_quote_dotted_identifiers(query)} LIMIT {limit + 1} OFFSET {offset}"
+    try:
+        cursor = dataset.sql.execute(sql)
+    except sqlite3.Error as e:
+        raise QueryError(f"COQLの実行に失敗: {e}")
+    columns = [c[0] for c in cursor.description]
+    rows = cursor.fetchall()
+
+    records = []
+    for row in rows[:limit]:
+        record = {}
+        for column, value in zip(columns, row):
+            if isinstance(value, str) and value.startswith('{'):
+                try:
+                    value = json.loads(value)
+                except ValueError:
+                    pass
+            record[column] = value
+        records.append(record)
+    return records, len(rows) > limit
+
+
+def run_sql(dataset, sql_query):
+    """Analyticsのエクスポート用SQLを実行し、(列名, 行) を返す"""
+    try:
+        cursor = dataset.sql.execute(_quote_dotted_identifiers(sql_query.strip().rstrip(';')))
+    except sqlite3.Error as e:
+        raise QueryError(f"SQLの実行に失敗: {e}")
+    return [c[0] for c in cursor.description], cursor.fetchall()
+
+
+def load_field_schema(module='Deals', schema_file=SCHEMA_FILE):
+    """キャッシュ済みCRMスキーマからフィールド定義を返す（なければ空）"""
+    try:
+        with open(schema_file, 'r', encoding='utf-8') as f:
+            schema = json.load(f)
+    except (OSError, ValueError):
+        return []
+    for entry in schema.get('modules', []):
+        if entry.get('api_name') == module:
+            return entry.get('fields', [])
+    return []
@@ -0,0 +1,619 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Zoho CRM / Books / Analytics ローカルシミュレータ
+本番Zohoに接続せずに負荷試験・ベンチマーク・回帰確認を行うためのaiohttpサーバー
+
+対応エンドポイント:
+    CRM       GET  /crm/{v}/Deals                一覧（page / per_page / fields / ids / sort_by）
+              GET  /crm/{v}/Deals/{id}
+              GET  /crm/{v}/Deals/search         criteria / word（最大2000件）
+              POST /crm/{v}/coql                 select_query（Dealsのみ）
+              GET  /crm/{v}/settings/fields      07_スキーマ情報 のキャッシュを返す
+    Books     GET  /books/v3/invoices[/{id}]     reference_number / reference_number_contains /
+                                                 customer_id / status / date_start / date_end
+              GET  /books/v3/customerpayments
+              GET  /books/v3/organizations       （/api/v3/... も同じ扱い）
+    Analytics GET  /restapi/v2/bulk/workspaces/{ws}/data?CONFIG=...   エクスポートジョブ作成
+              GET  /restapi/v2/bulk/workspaces/{ws}/exportjobs/{job}[/data]
+              GET  /restapi/v2/workspaces[/{ws}/views]
+    OAuth     POST /oauth/v2/token               refresh_token / authorization_code
+    管理      GET  /__simulator/stats            ルート別の呼び出し数・注入したエラー数
+              POST /__simulator/expire_tokens    発行済みトークンを失効させる（401試験用）
+
+使い方:
+    python zoho_simulator.py --port=8765 --latency=0.05 --rate-limit=10 --error-rate=0.02
+
+    # zoho_http_transport 経由の呼び出しをシミュレータへ向ける
+    ZOHO_API_BASE_URL=http://127.0.0.1:8765 python ../../11_請求書チェック/correct_invoice_leakage_analyzer.py
+
+オプション:
+    --host=127.0.0.1 --port=8765
+    --seed-dir=DIR         商談のシードJSON（既定: 11_請求書チェック/JT_ETP_完全分析結果）
+    --scale=N              商談をN倍に複製
+    --seed=N               データ・遅延・エラー注入の乱数シード
+    --latency=秒 --jitter=秒   応答遅延（平均と揺らぎ）
+    --rate-limit=N         API（crm/books/analytics）ごとの毎秒リクエスト上限、超過時は429
+    --error-rate=率        500/502/503をランダムに返す割合
+    --token-ttl=秒         発行トークンの有効期限
+    --strict-auth          発行済みトークン以外を401にする（既定は任意のトークンを受け付ける）
+    --export-delay=秒      Analyticsエクスポートジョブが完了するまでの時間
+    --analytics-table=名前:ファイル.json   Analyticsテーブルを追加（複数指定可）
+
+エラー応答の本文はZohoの形式に似せた近似であり、完全な互換ではない
+"""
+
+import asyncio
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict, deque
+
+try:
+    from aiohttp import web
+except ImportError:
+    web = None
+
+from simulator_dataset import (
+    SEARCH_RECORD_LIMIT, QueryError, SimulatorDataset, compile_criteria,
+    load_field_schema, load_seed_deals, run_coql, run_sql
+)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_PER_PAGE = 200
+ERROR_STATUSES = (500, 502, 503)
+
+
+def _api_family(path):
+    """レート制限の単位（crm / books / analytics / oauth / admin）"""
+    if path.startswith('/crm/'):
+        return 'crm'
+    if path.startswith(('/books/', '/api/')):
+        return 'books'
+    if path.startswith('/restapi/'):
+        return 'analytics'
+    if path.startswith('/oauth/'):
+        return 'oauth'
+    return 'admin'
+
+
+def _int_param(query, name, default, maximum=None):
+    try:
+        value = int(query.get(name, default))
+    except (TypeError, ValueError):
+        value = default
+    value = max(value, 1)
+    return min(value, maximum) if maximum else value
+
+
+def _project(record, fields):
+    if not fields:
+        return dict(record)
+    projected = {name: record.get(name) for name in fields}
+    projected['id'] = record['id']
+    return projected
+
+
+class ZohoSimulator:
+    """Zoho APIを模したaiohttpアプリケーション"""
+
+    def __init__(self, dataset=None, latency=0.0, jitter=0.0, rate_limit=None, error_rate=0.0,
+                 error_statuses=ERROR_STATUSES, token_ttl=3600, strict_auth=False,
+                 export_delay=0.0, seed=0):
+        """
+        Args:
+            dataset (SimulatorDataset): 返すデータ（省略時はシードJSONから生成）
+            latency (float): 平均応答遅延（秒）
+            jitter (float): 遅延の揺らぎ幅（秒）
+            rate_limit (int): API種別ごとの毎秒リクエスト上限（Noneで無制限）
+            error_rate (float): ランダムに5xxを返す割合
+            error_statuses (tuple): 注入するステータスコード
+            token_ttl (int): 発行トークンの有効期限（秒）
+            strict_auth (bool): 発行済みトークン以外を401にする
+            export_delay (float): エクスポートジョブが完了するまでの秒数
+            seed (int): 遅延・エラー注入の乱数シード
+        """
+        if web is None:
+            raise ImportError("aiohttp がインストールされていません（pip install aiohttp）")
+        self.dataset = dataset or SimulatorDataset(seed=seed)
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.token_ttl = token_ttl
+        self.strict_auth = strict_auth
+        self.export_delay = export_delay
+        self.rng = random.Random(seed)
+
+        self.tokens = {}
+        self.export_jobs = {}
+        self.request_counts = Counter()
+        self.injected = Counter()
+        self._windows = defaultdict(deque)
+
+    # ------------------------------------------------------------------
+    # アプリケーション構築
+    # ------------------------------------------------------------------
+
+    def create_app(self):
+        @web.middleware
+        async def middleware(request, handler):
+            return await self._apply_conditions(request, handler)
+
+        app = web.Application(middlewares=[middleware])
+        app.router.add_post('/oauth/v2/token', self.oauth_token)
+
+        app.router.add_get('/crm/{version}/Deals', self.crm_deals)
+        app.router.add_get('/crm/{version}/Deals/search', self.crm_search)
+        app.router.add_get('/crm/{version}/Deals/{record_id}', self.crm_deal)
+        app.router.add_post('/crm/{version}/coql', self.crm_coql)
+        app.router.add_get('/crm/{version}/settings/fields', self.crm_fields)
+
+        for prefix in ('/books/v3', '/api/v3'):
+            app.router.add_get(f'{prefix}/organizations', self.books_organizations)
+            app.router.add_get(f'{prefix}/invoices', self.books_invoices)
+            app.router.add_get(f'{prefix}/invoices/{{invoice_id}}', self.books_invoice)
+            app.router.add_get(f'{prefix}/customerpayments', self.books_payments)
+
+        app.router.add_get('/restapi/v2/workspaces', self.analytics_workspaces)
+        app.router.add_get('/restapi/v2/workspaces/{workspace_id}/views', self.analytics_views)
+        app.router.add_get('/restapi/v2/bulk/workspaces/{workspace_id}/data', self.analytics_create_export)
+        app.router.add_get('/restapi/v2/bulk/workspaces/{workspace_id}/exportjobs/{job_id}', self.analytics_job_status)
+        app.router.add_get('/restapi/v2/bulk/workspaces/{workspace_id}/exportjobs/{job_id}/data', self.analytics_job_data)
+
+        app.router.add_get('/__simulator/stats', self.admin_stats)
+        app.router.add_post('/__simulator/expire_tokens', self.admin_expire_tokens)
+        return app
+
+    async def _apply_conditions(self, request, handler):
+        """遅延・レート制限・エラー注入・認証をまとめて適用"""
+        family = _api_family(request.path)
+        resource = request.match_info.route.resource
+        self.request_counts[f"{request.method} {resource.canonical if resource else request.path}"] += 1
+
+        if family == 'admin':
+            return await handler(request)
+
+        if self.latency or self.jitter:
+            await asyncio.sleep(max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter)))
+
+        if self.rate_limit and not self._allow(family):
+            self.injected['429'] += 1
+            return web.json_response(
+                {'code': 'TOO_MANY_REQUESTS', 'details': {}, 'message': 'API call limit exceeded', 'status': 'error'},
+                status=429, headers={'Retry-After': '1'}
+            )
+
+        if self.error_rate and self.rng.random() < self.error_rate:
+            status = self.rng.choice(self.error_statuses)
+            self.injected[str(status)] += 1
+            return web.json_response({'code': 'INTERNAL_ERROR', 'message': 'injected error', 'status': 'error'},
+                                     status=status)
+
+        if family != 'oauth' and not self._authorized(request):
+            return self._unauthorized(family)
+
+        return await handler(request)
+
+    def _allow(self, family):
+        """直近1秒のリクエスト数でレート制限を判定"""
+        now = time.monotonic()
+        window = self._windows[family]
+        while window and now - window[0] >= 1.0:
+            window.popleft()
+        if len(window) >= self.rate_limit:
+            return False
+        window.append(now)
+        return True
+
+    def _authorized(self, request):
+        header = request.headers.get('Authorization', '')
+        scheme, _, token = header.partition(' ')
+        if scheme not in ('Zoho-oauthtoken', 'Bearer') or not token.strip():
+            return False
+        if not self.strict_auth:
+            return True
+        expires_at = self.tokens.get(token.strip())
+        return expires_at is not None and expires_at > time.time()
+
+    def _unauthorized(self, family):
+        if family == 'books':
+            body = {'code': 57, 'message': 'You are not authorized to perform this operation'}
+        elif family == 'analytics':
+            body = {'status': 'failure', 'data': {'errorCode': 8535, 'errorMessage': 'Invalid OAuth token'}}
+        else:
+            body = {'code': 'INVALID_TOKEN', 'details': {}, 'message': 'invalid oauth token', 'status': 'error'}
+        return web.json_response(body, status=401)
+
+    # ------------------------------------------------------------------
+    # OAuth
+    # ------------------------------------------------------------------
+
+    async def oauth_token(self, request):
+        form = await request.post()
+        params = {**request.query, **form}
+        grant_type = params.get('grant_type')
+        if grant_type == 'refresh_token' and not params.get('refresh_token'):
+            return web.json_response({'error': 'invalid_code'})
+        if grant_type not in ('refresh_token', 'authorization_code'):
+            return web.json_response({'error': 'unsupported_grant_type'})
+
+        access_token = f"1000.sim.{uuid.uuid4().hex}"
+        self.tokens[access_token] = time.time() + self.token_ttl
+        body = {
+            'access_token': access_token,
+            'api_domain': f"{request.scheme}://{request.host}",
+            'token_type': 'Bearer',
+            'expires_in': self.token_ttl
+        }
+        if grant_type == 'authorization_code':
+            body['refresh_token'] = f"1000.simrefresh.{uuid.uuid4().hex}"
+        return web.json_response(body)
+
+    # ------------------------------------------------------------------
+    # CRM
+    # ------------------------------------------------------------------
+
+    def _crm_page(self, records, query, record_limit=None):
+        page = _int_param(query, 'page', 1)
+        per_page = _int_param(query, 'per_page', MAX_PER_PAGE, MAX_PER_PAGE)
+        if record_limit is not None and (page - 1) * per_page >= record_limit:
+            return web.json_response({'code': 'LIMIT_REACHED', 'details': {'limit': record_limit},
+                                      'message': 'maximum number of records reached', 'status': 'error'},
+                                     status=400)
+        if record_limit is not None:
+            records = records[:record_limit]
+
+        start = (page - 1) * per_page
+        chunk = records[start:start + per_page]
+        if not chunk:
+            return web.Response(status=204)
+
+        fields = [f for f in query.get('fields', '').split(',') if f]
+        return web.json_response({
+            'data': [_project(record, fields) for record in chunk],
+            'info': {
+                'per_page': per_page,
+                'count': len(chunk),
+                'page': page,
+                'more_records': start + per_page < len(records)
+            }
+        })
+
+    async def crm_deals(self, request):
+        query = request.query
+        records = self.dataset.deals
+        if query.get('ids'):
+            wanted = query['ids'].split(',')
+            records = [self.dataset.deals_by_id[i] for i in wanted if i in self.dataset.deals_by_id]
+        sort_by = query.get('sort_by')
+        if sort_by:
+            records = sorted(records, key=lambda r: str(r.get(sort_by) or ''),
+                             reverse=query.get('sort_order', 'desc') == 'desc')
+        return self._crm_page(records, query)
+
+    async def crm_deal(self, request):
+        record = self.dataset.deals_by_id.get(request.match_info['record_id'])
+        if record is None:
+            return web.json_response({'code': 'INVALID_DATA', 'details': {},
+                                      'message': 'the related id given seems to be invalid', 'status': 'error'},
+                                     status=400)
+        return web.json_response({'data': [dict(record)]})
+
+    async def crm_search(self, request):
+        query = request.query
+        if query.get('criteria'):
+            try:
+                test = compile_criteria(query['criteria'])
+            except QueryError as e:
+                return web.json_response({'code': 'INVALID_QUERY', 'details': {}, 'message': str(e),
+                                          'status': 'error'}, status=400)
+            records = [record for record in self.dataset.deals if test(record)]
+        elif query.get('word'):
+            word = query['word']
+            records = [record for record in self.dataset.deals if word in (record.get('Deal_Name') or '')]
+        else:
+            return web.json_response({'code': 'REQUIRED_PARAM_MISSING', 'details': {},
+                                      'message': 'One of the expected parameter is missing', 'status': 'error'},
+                                     status=400)
+        return self._crm_page(records, query, record_limit=SEARCH_RECORD_LIMIT)
+
+    async def crm_coql(self, request):
+        try:
+            body = await request.json()
+        except ValueError:
+            body = {}
+        try:
+            records, more = run_coql(self.dataset, body.get('select_query', ''))
+        except QueryError as e:
+            return web.json_response({'code': 'SYNTAX_ERROR', 'details': {}, 'message': str(e),
+                                      'status': 'error'}, status=400)
+        if not records:
+            return web.Response(status=204)
+        return web.json_response({'data': records, 'info': {'count': len(records), 'more_records': more}})
+
+    async def crm_fields(self, request):
+        return web.json_response({'fields': load_field_schema(request.query.get('module', 'Deals'))})
+
+    # ------------------------------------------------------------------
+    # Books
+    # ------------------------------------------------------------------
+
+    def _check_org(self, request):
+        if request.query.get('organization_id') != self.dataset.org_id:
+            return web.json_response({'code': 6041, 'message': 'organization_id is invalid'}, status=400)
+        return None
+
+    def _books_page(self, key, records, query):
+        page = _int_param(query, 'page', 1)
+        per_page = _int_param(query, 'per_page', MAX_PER_PAGE, MAX_PER_PAGE)
+        start = (page - 1) * per_page
+        return web.json_response({
+            'code': 0,
+            'message': 'success',
+            key: records[start:start + per_page],
+            'page_context': {
+                'page': page,
+                'per_page': per_page,
+                'has_more_page': start + per_page < len(records),
+                'sort_column': query.get('sort_column', 'created_time'),
+                'sort_order': 'D'
+            }
+        })
+
+    async def books_organizations(self, request):
+        return web.json_response({'code': 0, 'message': 'success', 'organizations': [{
+            'organization_id': self.dataset.org_id,
+            'name': 'シミュレータ組織',
+            'currency_code': 'JPY',
+            'is_default_org': True
+        }]})
+
+    async def books_invoices(self, request):
+        error = self._check_org(request)
+        if error:
+            return error
+        query = request.query
+        records = self.dataset.invoices
+        if 'reference_number' in query:
+            records = [r for r in records if r['reference_number'] == query['reference_number']]
+        if 'reference_number_contains' in query:
+            records = [r for r in records if query['reference_number_contains'] in r['reference_number']]
+        if 'customer_id' in query:
+            records = [r for r in records if r['customer_id'] == query['customer_id']]
+        if 'status' in query and query['status'] != 'all':
+            status = query['status']
+            if status == 'unpaid':
+                records = [r for r in records if r['status'] in ('sent', 'overdue')]
+            else:
+                records = [r for r in records if r['status'] == status]
+        if 'date_start' in query:
+            records = [r for r in records if (r['date'] or '') >= query['date_start']]
+        if 'date_end' in query:
+            records = [r for r in records if (r['date'] or '') <= query['date_end']]
+        if 'search_text' in query:
+            text = query['search_text']
+            records = [r for r in records
+                       if text in r['invoice_number'] or text in r['reference_number'] or text in r['customer_name']]
+        return self._books_page('invoices', records, query)
+
+    async def books_invoice(self, request):
+        error = self._check_org(request)
+        if error:
+            return error
+        invoice = self.dataset.invoices_by_id.get(request.match_info['invoice_id'])
+        if invoice is None:
+            return web.json_response({'code': 5, 'message': 'Invalid URL Passed'}, status=404)
+        return web.json_response({'code': 0, 'message': 'success', 'invoice': invoice})
+
+    async def books_payments(self, request):
+        error = self._check_org(request)
+        if error:
+            return error
+        query = request.query
+        records = self.dataset.customerpayments
+        if 'customer_id' in query:
+            records = [r for r in records if r['customer_id'] == query['customer_id']]
+        return self._books_page('customerpayments', records, query)
+
+    # ------------------------------------------------------------------
+    # Analytics
+    # ------------------------------------------------------------------
+
+    async def analytics_workspaces(self, request):
+        return web.json_response({'status': 'success', 'data': {
+            'ownedWorkspaces': [{'workspaceId': 'simulator', 'workspaceName': 'シミュレータ'}],
+            'sharedWorkspaces': []
+        }})
+
+    async def analytics_views(self, request):
+        views = [{'viewId': name, 'viewName': name, 'viewType': 'Table'} for name in self.dataset.analytics_tables]
+        return web.json_response({'status': 'success', 'data': {'views': views}})
+
+    async def analytics_create_export(self, request):
+        try:
+            config = json.loads(request.query.get('CONFIG', '{}'))
+        except ValueError:
+            config = {}
+        if not config.get('sqlQuery'):
+            return web.json_response({'status': 'failure', 'data': {'errorCode': 7103,
+                                      'errorMessage': 'sqlQuery is required'}}, status=400)
+
+        job_id = uuid.uuid4().hex
+        self.export_jobs[job_id] = {
+            'workspace_id': request.match_info['workspace_id'],
+            'config': config,
+            'ready_at': time.time() + self.export_delay,
+            'result': None,
+            'error': None
+        }
+        return web.json_response({'status': 'success', 'summary': 'Create bulk export job',
+                                  'data': {'jobId': job_id}})
+
+    def _run_job(self, job):
+        if job['result'] is None and job['error'] is None:
+            try:
+                job['result'] = run_sql(self.dataset, job['config']['sqlQuery'])
+            except QueryError as e:
+                job['error'] = str(e)
+        return job
+
+    async def analytics_job_status(self, request):
+        job = self.export_jobs.get(request.match_info['job_id'])
+        if job is None:
+            return web.json_response({'status': 'failure', 'data': {'errorCode': 8504,
+                                      'errorMessage': 'Invalid job id'}}, status=400)
+
+        data = {'jobId': request.match_info['job_id']}
+        if time.time() < job['ready_at']:
+            data.update({'jobCode': '1002', 'jobStatus': 'JOB IN PROGRESS', 'status': 'IN_PROGRESS'})
+        elif self._run_job(job)['error']:
+            data.update({'jobCode': '1003', 'jobStatus': 'JOB FAILED', 'status': 'FAILED',
+                         'errorMessage': job['error']})
+        else:
+            data.update({
+                'jobCode': '1004',
+                'jobStatus': 'JOB COMPLETED',
+                'status': 'COMPLETED',
+                'downloadUrl': f"{request.scheme}://{request.host}{request.path}/data",
+                'expiryTime': int((time.time() + 3600) * 1000)
+            })
+        return web.json_response({'status': 'success', 'summary': 'Get export job details', 'data': data})
+
+    async def analytics_job_data(self, request):
+        job = self.export_jobs.get(request.match_info['job_id'])
+        if job is None or time.time() < job['ready_at'] or self._run_job(job)['error']:
+            return web.json_response({'status': 'failure', 'data': {'errorCode': 8504,
+                                      'errorMessage': 'Job is not completed'}}, status=400)
+
+        columns, rows = job['result']
+        if job['config'].get('responseFormat', 'json') == 'csv':
+            lines = [','.join(columns)]
+            lines += [','.join('' if v is None else f'"{str(v)}"' for v in row) for row in rows]
+            return web.Response(text='\n'.join(lines) + '\n', content_type='text/csv')
+        return web.json_response({'data': [dict(zip(columns, row)) for row in rows]})
+
+    # ------------------------------------------------------------------
+    # 管理
+    # ------------------------------------------------------------------
+
+    async def admin_stats(self, request):
+        return web.json_response({
+            'requests': dict(self.request_counts),
+            'injected_errors': dict(self.injected),
+            'issued_tokens': len(self.tokens),
+            'deals': len(self.dataset.deals),
+            'invoices': len(self.dataset.invoices),
+            'customerpayments': len(self.dataset.customerpayments)
+        })
+
+    async def admin_expire_tokens(self, request):
+        for token in self.tokens:
+            self.tokens[token] = 0
+        return web.json_response({'expired': len(self.tokens)})
+
+
+class SimulatorThread:
+    """シミュレータを別スレッドで起動するコンテキストマネージャ（ベンチマーク・試験用）
+
+    with SimulatorThread(ZohoSimulator(latency=0.01)) as base_url:
+        os.environ['ZOHO_API_BASE_URL'] = base_url
+        ...
+    """
+
+    def __init__(self, simulator, host=DEFAULT_HOST, port=0):
+        self.simulator = simulator
+        self.host = host
+        self.port = port
+        self.base_url = None
+        self._loop = None
+        self._runner = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self.base_url
+
+    def __exit__(self, exc_type, exc, tb):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        return False
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._runner = web.AppRunner(self.simulator.create_app())
+        self._loop.run_until_complete(self._runner.setup())
+        site = web.TCPSite(self._runner, self.host, self.port)
+        self._loop.run_until_complete(site.start())
+        port = self._runner.addresses[0][1]
+        self.base_url = f"http://{self.host}:{port}"
+        self._ready.set()
+        self._loop.run_forever()
+        self._loop.close()
+
+
+def parse_options(argv):
+    """--key=value 形式の引数を辞書にする（--analytics-table は複数可）"""
+    options = {'analytics_tables': []}
+    for arg in argv:
+        if not arg.startswith('--'):
+            continue
+        key, _, value = arg[2:].partition('=')
+        key = key.replace('-', '_')
+        if key == 'analytics_table':
+            options['analytics_tables'].append(value)
+        else:
+            options[key] = value if value else True
+    return options
+
+
+def main():
+    """メイン処理"""
+    options = parse_options(sys.argv[1:])
+    seed = int(options.get('seed', 0))
+
+    seed_dir = options.get('seed_dir')
+    seed_deals = load_seed_deals(seed_dir) if seed_dir else None
+    dataset = SimulatorDataset(seed_deals, scale=int(options.get('scale', 1)), seed=seed)
+    for spec in options['analytics_tables']:
+        name, _, path = spec.partition(':')
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        dataset.add_analytics_table(name, data['data'] if isinstance(data, dict) else data)
+
+    simulator = ZohoSimulator(
+        dataset,
+        latency=float(options.get('latency', 0)),
+        jitter=float(options.get('jitter', 0)),
+        rate_limit=int(options['rate_limit']) if 'rate_limit' in options else None,
+        error_rate=float(options.get('error_rate', 0)),
+        token_ttl=int(options.get('token_ttl', 3600)),
+        strict_auth=bool(options.get('strict_auth')),
+        export_delay=float(options.get('export_delay', 0)),
+        seed=seed
+    )
+
+    host = options.get('host', DEFAULT_HOST)
+    port = int(options.get('port', DEFAULT_PORT))
+    print("="*70)
+    print("🧪 Zoho API シミュレータ")
+    print("="*70)
+    print(f"  商談: {len(dataset.deals)}件 / 請求書: {len(dataset.invoices)}件 / 入金: {len(dataset.customerpayments)}件")
+    print(f"  遅延: {simulator.latency}s±{simulator.jitter}s / レート制限: {simulator.rate_limit or 'なし'}"
+          f" / エラー注入: {simulator.error_rate:.0%}")
+    print(f"  👉 ZOHO_API_BASE_URL=http://{host}:{port}")
+    web.run_app(simulator.create_app(), host=host, port=port, print=None)
+
+
+if __name__ == "__main__":
+    main()
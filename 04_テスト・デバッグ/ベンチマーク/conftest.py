@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ホットパス ベンチマーク共通設定
+取得・マッチング・エクスポートの主要処理を、実データ規模（1x）と
+合成スケールアップ（10x / 100x）で pytest-benchmark により計測する
+
+使い方:
+    cd 04_テスト・デバッグ/ベンチマーク
+    pytest --update-baseline              # この環境のベースラインを作成・更新
+    pytest                                # ベースラインがあれば比較結果を表示
+    pytest --fail-on-regression           # 閾値を超えて遅くなったら失敗させる
+    pytest --scales=1,10 --regression-threshold=0.3
+    pytest --include-slow                 # O(n×m)の処理も全スケールで計測
+
+ベースラインは ベースライン/baseline.json に中央値（秒）で保存する。
+絶対時間はマシン・負荷に依存するため、ベースラインはリポジトリに含めず（.gitignore）、
+同じ環境で --update-baseline した結果とだけ比較する。
+"""
+
+import json
+import os
+import platform
+import sys
+from pathlib import Path
+
+import pytest
+
+# テスト・計測中のHTTP呼び出しを APIメトリクスとして logs/metrics へ出力しない
+os.environ.setdefault('ZOHO_METRICS_DIR', 'off')
+
+REPO_ROOT = Path(__file__).parent.parent.parent
+BASELINE_FILE = Path(__file__).parent / "ベースライン" / "baseline.json"
+
+# 中央値がこの秒数未満の差はノイズとして扱う
+MIN_REGRESSION_SECONDS = 0.002
+
+for path in (
+    REPO_ROOT / "01_Zoho_API" / "APIクライアント",
+    REPO_ROOT / "04_テスト・デバッグ" / "シミュレータ",
+    REPO_ROOT / "11_請求書チェック",
+    REPO_ROOT / "03_商談・粗利率" / "実行スクリプト",
+):
+    if str(path) not in sys.path:
+        sys.path.append(str(path))
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('zoho-baseline', 'ベースライン比較')
+    group.addoption('--scales', default='1,10,100',
+                    help='計測するスケール（カンマ区切り、既定: 1,10,100）')
+    group.addoption('--include-slow', action='store_true',
+                    help='O(n×m)の処理も全スケールで計測する')
+    group.addoption('--baseline-file', default=str(BASELINE_FILE),
+                    help='ベースラインJSONのパス')
+    group.addoption('--update-baseline', action='store_true',
+                    help='今回の結果でベースラインを上書きする')
+    group.addoption('--regression-threshold', type=float, default=0.2,
+                    help='中央値がこの割合以上遅くなったら回帰とみなす（既定: 0.2 = 20%%）')
+    group.addoption('--fail-on-regression', action='store_true',
+                    help='回帰があればテスト結果を失敗にする（既定は表示のみ）')
+
+
+def pytest_generate_tests(metafunc):
+    if 'scale' in metafunc.fixturenames:
+        scales = [int(s) for s in metafunc.config.getoption('scales').split(',') if s.strip()]
+        metafunc.parametrize('scale', scales, ids=[f"{s}x" for s in scales], scope='session')
+
+
+def pytest_configure(config):
+    config._zoho_benchmark_results = {}
+
+
+@pytest.fixture(autouse=True)
+def _record_benchmark(request):
+    """各ベンチマークの中央値をセッション集計へ記録"""
+    if 'benchmark' not in request.fixturenames:
+        yield
+        return
+    # 後片付けの時点では benchmark フィクスチャが破棄済みのため、先に取得しておく
+    benchmark = request.getfixturevalue('benchmark')
+    yield
+    stats = getattr(benchmark, 'stats', None)
+    # 計測前に失敗したテストは記録しない
+    if stats is None or not stats.stats.data:
+        return
+    request.config._zoho_benchmark_results[request.node.name] = stats.stats.median
+
+
+def _load_baseline(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _compare(config):
+    """(テスト名, ベースライン, 今回, 変化率, 回帰か) の一覧"""
+    baseline = _load_baseline(config.getoption('baseline_file'))
+    if not baseline:
+        return None
+    threshold = config.getoption('regression_threshold')
+    rows = []
+    for name, median in sorted(config._zoho_benchmark_results.items()):
+        base = baseline.get('results', {}).get(name)
+        if base is None:
+            rows.append((name, None, median, None, False))
+            continue
+        change = (median - base) / base if base else 0.0
+        regressed = change > threshold and median - base > MIN_REGRESSION_SECONDS
+        rows.append((name, base, median, change, regressed))
+    return rows
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config):
+    results = config._zoho_benchmark_results
+    if not results:
+        return
+
+    terminalreporter.section('ベースライン比較')
+    if config.getoption('update_baseline'):
+        terminalreporter.write_line(f"📁 ベースラインを更新: {config.getoption('baseline_file')}")
+        return
+
+    rows = _compare(config)
+    if rows is None:
+        terminalreporter.write_line("ℹ️ この環境のベースラインがありません（比較するには --update-baseline で作成）")
+        return
+
+    for name, base, median, change, regressed in rows:
+        if base is None:
+            terminalreporter.write_line(f"  🆕 {name}: {median * 1000:.2f}ms（ベースラインなし）")
+            continue
+        mark = '❌' if regressed else '✅'
+        terminalreporter.write_line(
+            f"  {mark} {name}: {base * 1000:.2f}ms → {median * 1000:.2f}ms ({change:+.1%})"
+        )
+
+
+def pytest_sessionfinish(session, exitstatus):
+    config = session.config
+    results = getattr(config, '_zoho_benchmark_results', None)
+    if not results:
+        return
+
+    if config.getoption('update_baseline'):
+        path = Path(config.getoption('baseline_file'))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        baseline = _load_baseline(path) or {}
+        merged = dict(baseline.get('results', {}))
+        merged.update(results)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'machine': platform.platform(),
+                'python': platform.python_version(),
+                'results': dict(sorted(merged.items()))
+            }, f, ensure_ascii=False, indent=2)
+        return
+
+    if not config.getoption('fail_on_regression'):
+        return
+    rows = _compare(config) or []
+    if any(regressed for *_, regressed in rows) and session.exitstatus == 0:
+        session.exitstatus = 1
+
+
+# ---------------------------------------------------------------------------
+# データフィクスチャ
+# ---------------------------------------------------------------------------
+
+@pytest.fixture(scope='session')
+def dataset(scale):
+    """シミュレータと同じ生成ロジックによる商談・請求書（scale倍）"""
+    from simulator_dataset import SimulatorDataset
+    return SimulatorDataset(scale=scale)
+
+
+@pytest.fixture(scope='session')
+def product_lines_csv(scale, tmp_path_factory):
+    """商談商品内訳レポート（記録済みCSV）をscale倍に複製したファイル"""
+    source = REPO_ROOT / "03_商談・粗利率" / "データ" / "2025年1月以降_商談_商品内訳_レポート_UTF8.csv"
+    with open(source, 'r', encoding='utf-8') as f:
+        header, *lines = f.read().splitlines()
+    path = tmp_path_factory.mktemp(f"products_{scale}x") / "商品内訳.csv"
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join([header] + lines * scale) + '\n')
+    return path
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+取得・マッチング・エクスポートのホットパス ベンチマーク
+各処理を 1x / 10x / 100x のデータで計測し、結果件数も合わせて検証する
+"""
+
+import contextlib
+import io
+import json
+import os
+import tracemalloc
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+pd = pytest.importorskip("pandas")
+
+
+def _quiet(func, *args, **kwargs):
+    """分析処理の進捗printを抑止して実行"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+def _skip_slow(request, scale):
+    if scale > 1 and not request.config.getoption('include_slow'):
+        pytest.skip("O(n×m)の処理のため1xのみ計測（--include-slow で全スケール）")
+
+
+def _rounds(scale):
+    return 3 if scale >= 100 else 5
+
+
+def _analyzer(**attributes):
+    """API接続なしで CorrectInvoiceLeakageAnalyzer を組み立てる"""
+    pytest.importorskip("requests")
+    from correct_invoice_leakage_analyzer import CorrectInvoiceLeakageAnalyzer
+    from tax_engine import TaxEngine, TaxRule
+    analyzer = CorrectInvoiceLeakageAnalyzer.__new__(CorrectInvoiceLeakageAnalyzer)
+    analyzer.closed_stages = ['受注', '入金待ち', '開講準備', '開講待ち']
+    analyzer.invalid_invoice_statuses = ['void']
+    analyzer.target_start_date = '2024-04-01'
+    analyzer.tax_rate = 0.10
+    analyzer.tax_rounding = '四捨五入'
+    analyzer.tax = TaxEngine(TaxRule(analyzer.tax_rate, analyzer.tax_rounding))
+    for name, value in attributes.items():
+        setattr(analyzer, name, value)
+    return analyzer
+
+
+def _traced_bytes(build):
+    """build() が返したオブジェクトが保持しているメモリ（バイト）"""
+    tracemalloc.start()
+    try:
+        result = build()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del result
+    return size
+
+
+def _hierarchy(dataset):
+    children = [deal for deal in dataset.deals if deal.get('field78')]
+    parents = {deal['id']: deal for deal in dataset.deals if not deal.get('field78')}
+    return children, parents
+
+
+# ---------------------------------------------------------------------------
+# 取得
+# ---------------------------------------------------------------------------
+
+def test_deal_pagination(benchmark, dataset, scale):
+    """シミュレータ経由での受注商談ページング取得（CorrectInvoiceLeakageAnalyzer.get_all_closed_deals）"""
+    pytest.importorskip("aiohttp")
+    from zoho_simulator import SimulatorThread, ZohoSimulator
+    from zoho_http_transport import ZohoSession
+    from field_projection import FieldProjection
+
+    with SimulatorThread(ZohoSimulator(dataset)) as base_url:
+        os.environ['ZOHO_API_BASE_URL'] = base_url
+        try:
+            projection = FieldProjection.for_analysis('correct_invoice_leakage')
+            analyzer = _analyzer(crm_session=ZohoSession(projection=projection),
+                                 crm_headers={'Authorization': 'Bearer benchmark'})
+            deals = benchmark.pedantic(_quiet, args=(analyzer.get_all_closed_deals,),
+                                       rounds=_rounds(scale), iterations=1)
+        finally:
+            os.environ.pop('ZOHO_API_BASE_URL', None)
+
+    # get_all_closed_deals は最大15ページまで
+    assert 0 < len(deals) <= 15 * 200
+    assert not projection.unprojected_reads
+
+
+# ---------------------------------------------------------------------------
+# 分類・マッチング
+# ---------------------------------------------------------------------------
+
+def test_hierarchy_categorization(benchmark, dataset, scale):
+    """親子構造の分類（categorize_deals_by_structure）"""
+    analyzer = _analyzer()
+    children, parents = _hierarchy(dataset)
+
+    categories = benchmark(_quiet, analyzer.categorize_deals_by_structure, children, parents)
+
+    assert len(categories['parent_child_sets']) == len(parents)
+
+
+def test_match_deals_with_invoices(benchmark, dataset, scale):
+    """親子カテゴリ別の請求漏れ判定（CorrectInvoiceLeakageAnalyzer.match_deals_with_invoices）"""
+    analyzer = _analyzer()
+    children, parents = _hierarchy(dataset)
+    categories = _quiet(analyzer.categorize_deals_by_structure, children, parents)
+    invoices = [inv for inv in dataset.invoices if inv['status'] != 'void']
+
+    results = benchmark(_quiet, analyzer.match_deals_with_invoices, categories, invoices)
+
+    assert len(results['parent_child_analysis']) == len(categories['parent_child_sets'])
+
+
+def test_match_deals_invoices(benchmark, dataset, scale):
+    """reference_number完全一致＋部分一致（ImprovedInvoiceMatcher.match_deals_invoices）"""
+    pytest.importorskip("requests")
+    from improved_invoice_matcher import ImprovedInvoiceMatcher
+    matcher = ImprovedInvoiceMatcher.__new__(ImprovedInvoiceMatcher)
+
+    results = benchmark.pedantic(_quiet, args=(matcher.match_deals_invoices, dataset.deals, dataset.invoices),
+                                 rounds=_rounds(scale), iterations=1)
+
+    assert len(results['exact_matches']) == len(dataset.invoices)
+
+
+def test_check_consistency(benchmark, dataset, scale, request):
+    """DataFrameベースの整合性チェック（InvoiceChecker.check_consistency）"""
+    _skip_slow(request, scale)
+    pytest.importorskip("requests")
+    from invoice_checker import InvoiceChecker
+    checker = InvoiceChecker.__new__(InvoiceChecker)
+
+    results = benchmark.pedantic(_quiet, args=(checker.check_consistency, dataset.deals, dataset.invoices),
+                                 rounds=3, iterations=1)
+
+    assert results['summary']['total_invoices'] == len(dataset.invoices)
+
+
+RECONCILIATION_CANDIDATES = 400
+
+
+def test_reconciliation_solver(benchmark):
+    """数百件の商談から差額に一致する組み合わせを探す（ReconciliationSolver.explain）"""
+    from simulator_dataset import SimulatorDataset
+    from reconciliation_solver import ReconciliationSolver, deal_candidates
+    deals = [deal for deal in SimulatorDataset().deals if deal.get('Amount')][:RECONCILIATION_CANDIDATES]
+    candidates = deal_candidates(deals, tax_rate=0.10)
+    # 大小の金額が混ざった7件の合計を差額とする
+    target = sum(candidate.amount for candidate in candidates[::57][:7])
+    solver = ReconciliationSolver(tolerance=0)
+
+    solutions = benchmark.pedantic(solver.explain, args=(candidates, target), rounds=3, iterations=1)
+
+    assert solutions and solutions[0]['gap'] == 0
+    assert sum(item.amount for item in solutions[0]['items']) == target
+
+
+TAX_LINES = 300_000
+
+
+def test_bulk_tax_calculation(benchmark):
+    """30万明細の税込み額を int64 配列でまとめて計算（TaxEngine.with_tax_many）"""
+    np = pytest.importorskip("numpy")
+    from tax_engine import TaxEngine
+    amounts = np.random.default_rng(0).integers(1, 5_000_000, TAX_LINES, dtype=np.int64)
+    engine = TaxEngine()
+
+    totals = benchmark.pedantic(engine.with_tax_many, args=(amounts,), rounds=5, iterations=1)
+
+    # 1件ずつの整数計算と一致する（浮動小数点の誤差がない）
+    sample = amounts[:1000].tolist()
+    assert totals[:1000].tolist() == [engine.with_tax(amount) for amount in sample]
+
+
+STUDY_LINES = 100_000
+
+
+def test_study_period_overlap(benchmark):
+    """10万明細の学習期間から各月にかかる明細を区間木で取り出す（PeriodIndex.lines_active_in_month）"""
+    from datetime import date, timedelta
+    from month_utils import month_range
+    from period_index import PeriodIndex
+    first = date(2023, 4, 1)
+    index = PeriodIndex()
+    for i in range(STUDY_LINES):
+        start = first + timedelta(days=(i * 37) % 900)
+        index.add_line({'id': i}, start.isoformat(), (start + timedelta(days=90 + i % 200)).isoformat())
+    months = month_range('2023-04', '2026-03')
+
+    counts = benchmark.pedantic(lambda: [len(index.lines_active_in_month(month)) for month in months],
+                                rounds=3, iterations=1)
+
+    assert len(index.lines_active_in_month('2024-01')) == counts[months.index('2024-01')] > 0
+
+
+HEAVY_MODULES = ('requests', 'pandas', 'aiohttp', 'openpyxl')
+
+
+def test_client_cold_start(benchmark):
+    """
+    別プロセスで Analytics クライアントを import・生成する時間（重い依存は読み込まない）
+    時間はマシンに依存するため絶対値では判定せず、ベースラインとの比較（conftest）に任せる
+    """
+    import subprocess
+    import sys
+    from pathlib import Path
+    client_dir = Path(__file__).parent.parent.parent / "01_Zoho_API" / "APIクライアント"
+    code = (
+        "import sys, time\n"
+        "started = time.perf_counter()\n"
+        "from zoho_analytics_api_client_auto import ZohoAnalyticsAPIAuto\n"
+        "ZohoAnalyticsAPIAuto()\n"
+        "elapsed = time.perf_counter() - started\n"
+        f"print(elapsed, *[name for name in {HEAVY_MODULES!r} if name in sys.modules])\n"
+    )
+
+    def cold_start():
+        output = subprocess.run([sys.executable, "-c", code], cwd=client_dir, check=True,
+                                capture_output=True, text=True).stdout.split()
+        return float(output[0]), output[1:]
+
+    elapsed, loaded = benchmark.pedantic(cold_start, rounds=5, iterations=1)
+    benchmark.extra_info['import_seconds'] = round(elapsed, 4)
+
+    assert loaded == []
+
+
+# ---------------------------------------------------------------------------
+# メモリ
+# ---------------------------------------------------------------------------
+
+RECORD_STORE_DEALS = 100_000
+
+
+def test_record_store_memory(benchmark):
+    """10万件の商談をAPIの辞書のまま保持した場合と DealStore の保持メモリ比較"""
+    from simulator_dataset import SimulatorDataset
+    from record_store import DealStore
+    seeds = SimulatorDataset().deals
+    rows = [
+        dict(seeds[i % len(seeds)], id=str(5187347000200000000 + i),
+             Account_Name={'name': f"取引先{i % 800}", 'id': str(5187347000000000000 + i % 800)},
+             Owner={'name': f"担当者{i % 30}", 'id': str(5187347000000100000 + i % 30)})
+        for i in range(RECORD_STORE_DEALS)
+    ]
+    # APIレスポンスと同じく、レコードごとに別の文字列オブジェクトを持たせる
+    payload = json.dumps(rows, ensure_ascii=False)
+    del rows
+
+    raw_bytes = _traced_bytes(lambda: json.loads(payload))
+    store_bytes = _traced_bytes(lambda: DealStore.from_api(json.loads(payload)))
+    store = benchmark.pedantic(lambda: DealStore.from_api(json.loads(payload)), rounds=3, iterations=1)
+
+    benchmark.extra_info.update({'raw_bytes': raw_bytes, 'store_bytes': store_bytes,
+                                 'reduction': round(raw_bytes / store_bytes, 1)})
+    assert len(store) == RECORD_STORE_DEALS
+    assert store_bytes * 3 < raw_bytes
+
+
+# ---------------------------------------------------------------------------
+# 粗利・エクスポート
+# ---------------------------------------------------------------------------
+
+def test_margin_extraction(benchmark, product_lines_csv, scale):
+    """通貨文字列の数値化と粗利率0以下の抽出（extract_zero_margin.calculate_margins）"""
+    from extract_zero_margin import calculate_margins
+    df = pd.read_csv(product_lines_csv, encoding='utf-8')
+
+    valid_data, zero_or_negative = benchmark.pedantic(calculate_margins, args=(df,),
+                                                      rounds=_rounds(scale), iterations=1)
+
+    assert len(valid_data) > 0
+    assert (zero_or_negative['計算済み粗利率'] <= 0).all()
+
+
+def test_deal_product_join(benchmark, dataset, scale):
+    """商談×商品内訳のハッシュ結合（deal_product_join.join_deals_products）"""
+    pytest.importorskip("requests")
+    from extract_deal_products_data import PARENT_KEY_FIELDS, PRODUCT_COLUMNS
+    from deal_product_join import join_deals_products
+    deals = [dict(deal, Id=deal['id']) for deal in dataset.deals]
+    products = [
+        {'id': f"{deal['id']}-{n}", 'Deal': {'id': deal['id'], 'name': deal['Deal_Name']},
+         'Name': f"商品{n}", 'Unit_Price': 10000, 'Number': 1, 'Subtotal': 10000}
+        for deal in dataset.deals for n in range(3)
+    ]
+
+    merged = benchmark.pedantic(join_deals_products, args=(deals, products, PRODUCT_COLUMNS),
+                                kwargs={'parent_key_fields': PARENT_KEY_FIELDS},
+                                rounds=_rounds(scale), iterations=1)
+
+    assert len(merged) == len(products)
+
+
+def test_snapshot_diff(benchmark, dataset, scale, tmp_path):
+    """2回分の請求漏れスナップショットのキー順マージ比較（SnapshotStore.diff）"""
+    pytest.importorskip("pyarrow")
+    from snapshot_store import SnapshotStore
+    store = SnapshotStore(tmp_path / "snapshots")
+    rows = [{'unit_key': f"deal:{deal['id']}", 'deal_name': deal.get('Deal_Name'),
+             'amount_difference': float(deal.get('Amount') or 0), 'is_leakage': bool(deal.get('Amount'))}
+            for deal in dataset.deals]
+    store.write('invoice_leakage', rows, key='unit_key', run_id='20250801_090000')
+    # 10件に1件の漏れを解消し、末尾に新しい漏れを追加した次回の実行
+    resolved = rows[::10]
+    changed = [dict(row, is_leakage=False) if i % 10 == 0 else row for i, row in enumerate(rows)]
+    added = [{'unit_key': f"deal:new{i}", 'deal_name': '新規', 'amount_difference': 1000.0, 'is_leakage': True}
+             for i in range(scale)]
+    store.write('invoice_leakage', changed + added, key='unit_key', run_id='20250802_090000')
+
+    result = benchmark.pedantic(store.diff, args=('invoice_leakage',),
+                                kwargs={'compare_columns': ['amount_difference'], 'leakage_column': 'is_leakage'},
+                                rounds=_rounds(scale), iterations=1)
+
+    assert len(result['new']) == len(added)
+    assert len(result['removed']) == sum(1 for row in resolved if row['is_leakage'])
+    assert result['changed'].empty
+
+
+def test_excel_export(benchmark, product_lines_csv, scale, tmp_path):
+    """計算式付きExcel出力（excel_calculator.csv_to_excel_with_calculations）"""
+    pytest.importorskip("openpyxl")
+    from excel_calculator import csv_to_excel_with_calculations
+    output = tmp_path / "計算式付き.xlsx"
+
+    benchmark.pedantic(_quiet, args=(csv_to_excel_with_calculations, product_lines_csv, output),
+                       rounds=_rounds(scale), iterations=1)
+
+    assert output.exists()
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ユニットテスト共通設定
+共通モジュール（税計算・照合ソルバー・台帳・索引など）の計算結果を、
+APIを呼ばずに小さな入力で確認する（速度はベンチマーク側で計測）
+
+使い方:
+    cd 04_テスト・デバッグ/ユニットテスト
+    pytest
+"""
+
+import os
+import sys
+from pathlib import Path
+
+# テスト・計測中のHTTP呼び出しを APIメトリクスとして logs/metrics へ出力しない
+os.environ.setdefault('ZOHO_METRICS_DIR', 'off')
+
+REPO_ROOT = Path(__file__).parent.parent.parent
+
+for path in (
+    REPO_ROOT,
+    REPO_ROOT / "01_Zoho_API" / "APIクライアント",
+    REPO_ROOT / "04_テスト・デバッグ" / "シミュレータ",
+    REPO_ROOT / "11_請求書チェック",
+    REPO_ROOT / "03_商談・粗利率" / "実行スクリプト",
+    REPO_ROOT / "02_VERSANTコーチング" / "実行スクリプト",
+    REPO_ROOT / "10_商品マスタ更新",
+):
+    if str(path) not in sys.path:
+        sys.path.append(str(path))
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""books_invoice_lookup: reference_number のまとめ検索と取得済みIDの管理"""
+
+from books_invoice_lookup import BooksInvoiceLookup
+
+
+class _Response:
+    def __init__(self, status_code, invoices=()):
+        self.status_code = status_code
+        self._data = {'invoices': list(invoices), 'page_context': {'has_more_page': False}}
+
+    def json(self):
+        return self._data
+
+
+class _FakeSession:
+    """reference_number / reference_number_contains を請求書一覧から絞り込んで返す"""
+
+    def __init__(self, invoices, failures=()):
+        self.invoices = invoices
+        self.failures = list(failures)
+        self.calls = []
+
+    def get(self, url, headers=None, params=None):
+        self.calls.append(dict(params))
+        if self.failures:
+            failure = self.failures.pop(0)
+            if isinstance(failure, Exception):
+                raise failure
+            return _Response(failure)
+        if 'reference_number' in params:
+            matched = [i for i in self.invoices if i['reference_number'] == params['reference_number']]
+        else:
+            matched = [i for i in self.invoices if params['reference_number_contains'] in i['reference_number']]
+        return _Response(200, matched)
+
+
+INVOICES = [
+    {'invoice_id': '1', 'reference_number': '5187347000100000001'},
+    {'invoice_id': '2', 'reference_number': '5187347000100000002'},
+    {'invoice_id': '3', 'reference_number': '5187347000900000003'},
+]
+
+
+def _lookup(session):
+    return BooksInvoiceLookup(session, {}, 'ORG', max_workers=1, max_queries=2, min_prefix_length=10)
+
+
+def test_lookup_groups_by_prefix_and_caches():
+    session = _FakeSession(INVOICES)
+    lookup = _lookup(session)
+    refs = [invoice['reference_number'] for invoice in INVOICES]
+    result = lookup.lookup(refs + ['5187347000900000009'])
+    assert [i['invoice_id'] for i in result['5187347000100000001']] == ['1']
+    assert result['5187347000900000009'] == []
+    assert len(session.calls) <= 2
+
+    lookup.lookup(refs)
+    assert len(session.calls) <= 2
+
+
+def test_failed_query_is_retried_on_next_lookup():
+    session = _FakeSession(INVOICES, failures=[500])
+    lookup = _lookup(session)
+    ref = '5187347000100000001'
+    assert lookup.invoices_for(ref) == []
+    assert ref not in lookup._resolved
+
+    assert [i['invoice_id'] for i in lookup.invoices_for(ref)] == ['1']
+    assert len(session.calls) == 2
+    lookup.invoices_for(ref)
+    assert len(session.calls) == 2
+
+
+def test_exception_does_not_mark_resolved():
+    session = _FakeSession(INVOICES, failures=[ConnectionError('timeout')])
+    lookup = _lookup(session)
+    ref = '5187347000900000003'
+    assert lookup.invoices_for(ref) == []
+    assert [i['invoice_id'] for i in lookup.invoices_for(ref)] == ['3']
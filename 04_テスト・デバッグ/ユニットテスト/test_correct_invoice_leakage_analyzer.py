@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""correct_invoice_leakage_analyzer: --incremental の差分取得と単位ごとの再判定"""
+
+import pytest
+
+from correct_invoice_leakage_analyzer import CorrectInvoiceLeakageAnalyzer, LeakageState
+from tax_engine import TaxEngine, TaxRule
+
+
+class _Response:
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self._data = data or {}
+
+    def json(self):
+        return self._data
+
+
+class _FakeCRM:
+    """商談一覧・IDリスト検索・If-Modified-Since（modified に入れた商談だけ返す）"""
+
+    def __init__(self, deals):
+        self.deals = {deal['id']: deal for deal in deals}
+        self.modified = []
+        self.calls = []
+
+    def get(self, url, headers=None, params=None):
+        self.calls.append(dict(params))
+        if 'ids' in params:
+            ids = params['ids'].split(',')
+            return _Response(200, {'data': [self.deals[i] for i in ids if i in self.deals]})
+        if 'If-Modified-Since' in headers:
+            if not self.modified:
+                return _Response(304)
+            return _Response(200, {'data': self.modified, 'info': {'more_records': False}})
+        return _Response(200, {'data': list(self.deals.values()), 'info': {'more_records': False}})
+
+
+class _FakeBooks:
+    """請求書一覧（last_modified_time の降順指定時はその順で返す）"""
+
+    def __init__(self, invoices):
+        self.invoices = invoices
+        self.calls = []
+
+    def get(self, url, headers=None, params=None):
+        self.calls.append(dict(params))
+        invoices = list(self.invoices)
+        if params.get('sort_column') == 'last_modified_time':
+            invoices.sort(key=lambda inv: inv.get('last_modified_time') or '', reverse=True)
+        return _Response(200, {'invoices': invoices, 'page_context': {'has_more_page': False}})
+
+
+def _deal(deal_id, amount, parent=None, stage='受注'):
+    return {'id': deal_id, 'Deal_Name': f"商談{deal_id}", 'Amount': amount, 'Stage': stage,
+            'Closing_Date': '2025-06-01', 'field78': {'id': parent, 'name': '親'} if parent else None}
+
+
+def _invoice(invoice_id, reference, total, modified='2020-01-01T00:00:00+0900'):
+    return {'invoice_id': invoice_id, 'reference_number': reference, 'total': total, 'status': 'sent',
+            'date': '2025-06-10', 'last_modified_time': modified}
+
+
+@pytest.fixture
+def analyzer():
+    analyzer = CorrectInvoiceLeakageAnalyzer.__new__(CorrectInvoiceLeakageAnalyzer)
+    analyzer.crm_session = _FakeCRM([_deal('10', 1000), _deal('20', 2000, parent='90'),
+                                     _deal('21', 500, parent='90'), _deal('90', 300), _deal('30', 700)])
+    analyzer.books_session = _FakeBooks([_invoice('I1', '10', 1100), _invoice('I2', '90', 3080),
+                                         _invoice('I3', '30', 100)])
+    analyzer.crm_headers = {}
+    analyzer.books_headers = {}
+    analyzer.org_id = 'ORG'
+    analyzer.closed_stages = ['受注']
+    analyzer.invalid_invoice_statuses = ['void']
+    analyzer.target_start_date = '2024-04-01'
+    analyzer.tax_rate = 0.10
+    analyzer.tax_rounding = '四捨五入'
+    analyzer.tax = TaxEngine(TaxRule(analyzer.tax_rate, analyzer.tax_rounding))
+    return analyzer
+
+
+def _run(analyzer, path):
+    state = LeakageState.load(analyzer.state_config(), path)
+    child_deals, parent_deals, invoices, touched = analyzer.sync_incremental(state)
+    categories = analyzer.categorize_deals_by_structure(child_deals, parent_deals)
+    results, changes = analyzer.match_deals_with_invoices_incremental(categories, invoices, state, touched)
+    state.save()
+    return results, changes
+
+
+def _full(analyzer):
+    child_deals = analyzer.get_all_closed_deals()
+    categories = analyzer.categorize_deals_by_structure(child_deals, analyzer.get_parent_deals(child_deals))
+    return analyzer.match_deals_with_invoices(categories, analyzer.get_all_invoices())
+
+
+def _rows(results):
+    return {key: sorted(rows, key=repr) for key, rows in results.items()}
+
+
+def test_unchanged_run_fetches_only_changes_and_judges_nothing(analyzer, tmp_path, monkeypatch):
+    path = tmp_path / "state.json"
+    first, _ = _run(analyzer, path)
+    analyzer.crm_session.calls.clear()
+    analyzer.books_session.calls.clear()
+
+    def fail(*args):
+        raise AssertionError("変更のない単位を判定・ハッシュ計算した")
+    monkeypatch.setattr(analyzer, 'analyze_unit', fail)
+    monkeypatch.setattr(analyzer, 'unit_fingerprint', fail)
+    second, changes = _run(analyzer, path)
+
+    assert changes['recomputed'] == [] and changes['removed'] == []
+    assert _rows(second) == _rows(first)
+    # 商談は If-Modified-Since の1回、請求書は更新日時順の1ページだけ
+    assert len(analyzer.crm_session.calls) == 1
+    assert [call['sort_column'] for call in analyzer.books_session.calls] == ['last_modified_time']
+
+
+def test_changed_records_rejudge_only_affected_units(analyzer, tmp_path):
+    path = tmp_path / "state.json"
+    _run(analyzer, path)
+
+    # 子商談21が失注、請求書I1が増額、新しい受注商談40
+    lost = _deal('21', 500, parent='90', stage='失注')
+    new = _deal('40', 100)
+    analyzer.crm_session.deals.update({'21': lost, '40': new})
+    analyzer.crm_session.modified = [lost, new]
+    analyzer.books_session.invoices[0] = _invoice('I1', '10', 1200, modified='2999-01-01T00:00:00+0900')
+
+    merged, changes = _run(analyzer, path)
+    assert sorted(key for key, _, _ in changes['recomputed']) == ['deal:10', 'deal:40', 'set:90']
+    assert _rows(merged) == _rows(_full(analyzer))
+
+
+def test_invoice_without_modified_time_is_treated_as_changed(analyzer, tmp_path):
+    path = tmp_path / "state.json"
+    _run(analyzer, path)
+
+    # last_modified_time のない請求書（商談30への追加請求）
+    extra = _invoice('I4', '30', 670)
+    del extra['last_modified_time']
+    analyzer.books_session.invoices.append(extra)
+
+    merged, changes = _run(analyzer, path)
+    assert [key for key, _, _ in changes['recomputed']] == ['deal:30']
+    assert _rows(merged) == _rows(_full(analyzer))
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""crm_bulk_read: 一括読み取りジョブの結果ZIPのストリーミング保存とCSVの変換"""
+
+import io
+import json
+import zipfile
+
+import pytest
+
+from crm_bulk_read import BulkReadError, CRMBulkReader, build_criteria
+
+
+def _zip_bytes(csv_text):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr('result.csv', csv_text.encode('utf-8-sig'))
+    return buffer.getvalue()
+
+
+class _Response:
+    def __init__(self, status_code, data=None, body=b''):
+        self.status_code = status_code
+        self.headers = {}
+        self.text = json.dumps(data or {})
+        self._data = data
+        self._body = body
+        self.closed = False
+
+    def json(self):
+        return self._data
+
+    @property
+    def content(self):
+        raise AssertionError("結果ZIPは iter_content で読むこと")
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self._body), 7):
+            yield self._body[i:i + 7]
+
+    def close(self):
+        self.closed = True
+
+
+class _FakeBulkSession:
+    """ジョブ作成 → 1回 IN PROGRESS → COMPLETED → ZIP を返す"""
+
+    def __init__(self, csv_text, download_status=200):
+        self.zip = _zip_bytes(csv_text)
+        self.download_status = download_status
+        self.polls = 0
+        self.responses = []
+
+    def post(self, url, headers=None, json=None, timeout=None):
+        self.query = json['query']
+        return _Response(201, {'data': [{'details': {'id': 'JOB1'}}]})
+
+    def get(self, url, headers=None, timeout=None, stream=False):
+        if url.endswith('/result'):
+            assert stream
+            response = _Response(self.download_status, body=self.zip)
+            self.responses.append(response)
+            return response
+        self.polls += 1
+        state = 'COMPLETED' if self.polls > 1 else 'IN PROGRESS'
+        return _Response(200, {'data': [{'state': state, 'result': {'count': 2, 'more_records': False}}]})
+
+
+CSV = "Id,Deal_Name,Owner,Owner.name,Amount,Parent_Id\n1,商談A,10,担当A,1200,900\n2,商談B,,,,\n"
+
+
+def test_iter_records_streams_zip_and_nests_lookups(tmp_path):
+    session = _FakeBulkSession(CSV)
+    reader = CRMBulkReader(session, {}, poll_interval=0, download_dir=tmp_path)
+    criteria = build_criteria(('Closing_Date', 'greater_equal', '2025-04-01'))
+    records = list(reader.iter_records('Deals', ['Deal_Name'], criteria, numeric_fields=['Amount']))
+
+    assert session.query['criteria'] == {'api_name': 'Closing_Date', 'comparator': 'greater_equal',
+                                         'value': '2025-04-01'}
+    assert records[0] == {'Id': '1', 'Deal_Name': '商談A', 'Owner': {'id': '10', 'name': '担当A'},
+                          'Amount': 1200, 'Parent_Id': '900'}
+    assert records[1]['Amount'] is None and records[1]['Owner'] == {'name': None}
+    assert session.responses[0].closed
+    # keep_files=False なのでZIPも途中ファイルも残らない
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_download_error_closes_response(tmp_path):
+    session = _FakeBulkSession(CSV, download_status=404)
+    reader = CRMBulkReader(session, {}, poll_interval=0, download_dir=tmp_path)
+    with pytest.raises(BulkReadError):
+        reader.fetch_all('Deals')
+    assert session.responses[0].closed
+
+
+def test_deal_products_bulk_maps_parent_id_to_deal(tmp_path):
+    from get_deal_products_final import ZohoCRMDataExtractor
+
+    token_file = tmp_path / "zoho_crm_tokens.json"
+    token_file.write_text(json.dumps({'access_token': 'x'}), encoding='utf-8')
+    extractor = ZohoCRMDataExtractor(str(token_file))
+    extractor.bulk_reader = CRMBulkReader(
+        _FakeBulkSession("Id,Parent_Id,Cost_Total,Total\n501,900,0,1000\n"), {}, poll_interval=0,
+        download_dir=tmp_path)
+
+    products = list(extractor.iter_deal_products_bulk())
+    assert products[0]['Deal'] == '900'
+
+    merged = extractor.merge_data([{'Id': '900', 'Deal_Name': '親商談', 'Amount': 1000}],
+                                  extractor.filter_zero_cost_products(products))
+    assert list(merged['商談名']) == ['親商談']
+    assert list(merged['商品内訳ID']) == ['501']
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""extraction_journal: ページ単位のジャーナルと中断後の再開"""
+
+import pytest
+
+from extraction_journal import ExtractionJournal, run_extraction
+
+
+def _pages(pages):
+    """{カーソル: (レコード, 次のカーソル)} を返す fetch_page（None のページは失敗させる）"""
+    calls = []
+
+    def fetch_page(cursor):
+        calls.append(cursor)
+        if pages[cursor] is None:
+            raise RuntimeError(f"ページ{cursor}の取得に失敗")
+        return pages[cursor]
+
+    return fetch_page, calls
+
+
+def test_resume_after_failure(tmp_path):
+    pages = {1: ([{'id': 'a'}], 2), 2: None}
+    fetch_page, calls = _pages(pages)
+    with pytest.raises(RuntimeError):
+        run_extraction(ExtractionJournal('deals', journal_dir=tmp_path), fetch_page)
+
+    pages[2] = ([{'id': 'b'}], None)
+    journal = ExtractionJournal('deals', journal_dir=tmp_path)
+    assert [r['id'] for r in run_extraction(journal, fetch_page)] == ['a', 'b']
+    assert calls == [1, 2, 2]
+    assert journal.complete
+
+
+def test_changed_params_start_over(tmp_path):
+    fetch_page, calls = _pages({1: ([{'id': 'a'}], None)})
+    run_extraction(ExtractionJournal('deals', params={'since': '2024-04-01'}, journal_dir=tmp_path), fetch_page)
+    run_extraction(ExtractionJournal('deals', params={'since': '2025-04-01'}, journal_dir=tmp_path), fetch_page)
+    assert calls == [1, 1]
+
+
+def test_truncated_last_line_is_dropped(tmp_path):
+    fetch_page, _ = _pages({1: ([{'id': 'a'}], 2), 2: None})
+    with pytest.raises(RuntimeError):
+        run_extraction(ExtractionJournal('deals', journal_dir=tmp_path), fetch_page)
+    with open(tmp_path / "deals.jsonl", 'a', encoding='utf-8') as f:
+        f.write('{"page": 2, "next": nu')
+    journal = ExtractionJournal('deals', journal_dir=tmp_path)
+    assert journal.next_cursor(1) == 2
+    assert journal.record_count() == 1
+
+
+def test_records_deduplicate_by_id_keeping_first_position(tmp_path):
+    journal = ExtractionJournal('deals', journal_dir=tmp_path)
+    journal.reset()
+    journal.append_page(1, [{'id': 'a', 'v': 1}, {'id': 'b', 'v': 1}], 2)
+    journal.append_page(2, [{'id': 'a', 'v': 2}, {'id': 'c', 'v': 1}], None)
+    assert [(r['id'], r['v']) for r in journal.records()] == [('a', 2), ('b', 1), ('c', 1)]
+
+
+def test_records_without_id_are_all_kept(tmp_path):
+    journal = ExtractionJournal('rows', id_field='invoice_id', journal_dir=tmp_path)
+    journal.reset()
+    journal.append_page(1, [{'total': 100}, {'invoice_id': '1', 'total': 200}, {'total': 100}], 2)
+    journal.append_page(2, [{'invoice_id': None, 'total': 300}], None)
+    assert [r['total'] for r in journal.records()] == [100, 200, 100, 300]
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""field_projection: 取得項目の宣言・スキーマ検証・fields の自動付与"""
+
+import json
+
+import pytest
+
+import field_projection
+from field_projection import PROJECTIONS, FieldProjection, ProjectionError, records_module
+
+
+@pytest.mark.parametrize('name', sorted(PROJECTIONS))
+def test_registered_projections_match_schema(name):
+    FieldProjection.for_analysis(name, validate=True)
+
+
+def test_creating_projection_does_not_read_schema(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("作成時にスキーマを読み込んだ")
+
+    monkeypatch.setattr(field_projection, 'load_schema_fields', fail)
+    projection = FieldProjection.for_analysis('correct_invoice_leakage')
+    assert projection.fields_param('Deals').startswith('id,Deal_Name')
+
+
+def test_validate_reports_unknown_fields(tmp_path):
+    schema_file = tmp_path / "schema.json"
+    schema_file.write_text(json.dumps({'modules': [{'api_name': 'Deals', 'fields': [{'api_name': 'Amount'}]}]}),
+                           encoding='utf-8')
+    FieldProjection('ok', {'Deals': ['id', 'Amount']}, schema_file=schema_file, validate=True)
+    with pytest.raises(ProjectionError, match='Stage'):
+        FieldProjection('ng', {'Deals': ['Amount', 'Stage']}, schema_file=schema_file, validate=True)
+    with pytest.raises(ProjectionError, match='Leads'):
+        FieldProjection('ng', {'Leads': ['Amount']}, schema_file=schema_file).validate()
+
+
+@pytest.mark.parametrize('url, module', [
+    ("https://www.zohoapis.com/crm/v2/Deals", 'Deals'),
+    ("https://www.zohoapis.com/crm/v2/Deals/search?criteria=x", 'Deals'),
+    ("https://www.zohoapis.com/crm/v2/Deals/5187347000001", 'Deals'),
+    ("https://www.zohoapis.com/crm/v2/settings/fields", None),
+    ("https://www.zohoapis.com/books/v3/invoices", None),
+])
+def test_records_module(url, module):
+    assert records_module(url) == module
+
+
+def test_inject_and_unprojected_read_warning():
+    messages = []
+    projection = FieldProjection('test', {'Deals': ['Amount']}, log=messages.append)
+    params, module = projection.inject("https://www.zohoapis.com/crm/v2/Deals", {'page': 1})
+    assert params == {'page': 1, 'fields': 'id,Amount'} and module == 'Deals'
+    assert projection.inject("https://www.zohoapis.com/crm/v2/Deals", {'fields': 'id'}) == ({'fields': 'id'}, None)
+
+    record = projection.wrap_records('Deals', [{'id': '1', 'Amount': 100}])[0]
+    assert record.get('Stage') is None and record.get('Stage') is None
+    assert len(messages) == 1 and 'Deals.Stage' in messages[0]
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""invoice_allocation: 親子セットの請求書を商談（明細）へ割り当てる"""
+
+import invoice_allocation
+from invoice_allocation import AllocationMatcher
+
+
+def _deal(deal_id, amount):
+    return {'id': deal_id, 'Amount': amount}
+
+
+def _invoice(number, total, reference=''):
+    return {'invoice_number': number, 'total': total, 'reference_number': reference}
+
+
+def _count_subsets(monkeypatch, matcher):
+    """部分集合の探索（_subsets）の呼び出し回数"""
+    calls = []
+    subsets = matcher._subsets
+
+    def counting(counts, invoice_total):
+        calls.append(invoice_total)
+        return subsets(counts, invoice_total)
+    monkeypatch.setattr(matcher, '_subsets', counting)
+    return calls
+
+
+def test_reference_match():
+    result = AllocationMatcher().allocate([_deal('1', 10000), _deal('2', 5000)],
+                                          [_invoice('INV-1', 11000, '1')])
+    assert [(a['method'], a['deals'], a['difference']) for a in result['allocations']] == [('参照一致', ['1'], 0)]
+    assert result['uncovered_deals'] == ['2']
+
+
+def test_one_deal_split_across_invoices():
+    result = AllocationMatcher().allocate([_deal('1', 10000)],
+                                          [_invoice('INV-1', 5500, '1'), _invoice('INV-2', 5500, '1')])
+    assert [(a['method'], a['invoices'], a['deals']) for a in result['allocations']] == [
+        ('分割請求', ['INV-1', 'INV-2'], ['1'])]
+    assert result['line_coverage'] == 1.0 and result['unmatched_invoices'] == []
+
+
+def test_partial_installment_is_reported():
+    result = AllocationMatcher().allocate([_deal('1', 10000)], [_invoice('INV-1', 5500, '1')])
+    assert result['allocations'] == []
+    assert result['partial'] == {'1': 0.5}
+
+
+def test_one_invoice_covers_several_children():
+    deals = [_deal('9', 0), _deal('11', 3000), _deal('12', 3000), _deal('13', 5000)]
+    # 税抜き 8,000（3,000 + 5,000）の税込み額
+    result = AllocationMatcher().allocate(deals, [_invoice('INV-1', 8800, '9')])
+    [allocation] = result['allocations']
+    assert allocation['method'] == '部分和'
+    assert sorted(allocation['deals'])[-1] == '13' and len(allocation['deals']) == 2
+    assert allocation['deal_total_in_tax'] == 8800
+    assert len(result['uncovered_deals']) == 1 and result['line_coverage'] == 2 / 3
+
+
+def test_rounding_difference_within_tolerance():
+    # 税抜き 1,005 × 3 件を1枚で請求（明細ごとの端数処理で 1,106 × 3 = 3,318、合計の税込みは 3,317）
+    deals = [_deal('1', 1005), _deal('2', 1005), _deal('3', 1005)]
+    result = AllocationMatcher().allocate(deals, [_invoice('INV-1', 3318)])
+    [allocation] = result['allocations']
+    assert sorted(allocation['deals']) == ['1', '2', '3'] and allocation['difference'] == 1
+
+
+def test_unreachable_total_leaves_invoice_unmatched():
+    deals = [_deal('1', 1000), _deal('2', 2000)]
+    result = AllocationMatcher().allocate(deals, [_invoice('INV-1', 5000)])
+    assert result['allocations'] == []
+    assert result['unmatched_invoices'] == ['INV-1']
+    assert result['uncovered_deals'] == ['1', '2']
+    assert result['line_coverage'] == 0 and result['amount_coverage'] == 0
+
+
+def test_search_is_memoized_across_sets(monkeypatch):
+    matcher = AllocationMatcher()
+    first = matcher.allocate([_deal('1', 3000), _deal('2', 3000), _deal('3', 5000)],
+                             [_invoice('A-1', 8800), _invoice('A-2', 3300)])
+    assert matcher.cache_hits == 0
+
+    # 金額の並びと請求額が同じ別のセットは探索し直さない
+    def fail(*args, **kwargs):
+        raise AssertionError("同じ金額の組を探索し直した")
+    monkeypatch.setattr(invoice_allocation, 'count_vectors', fail)
+    second = matcher.allocate([_deal('21', 3000), _deal('22', 3000), _deal('23', 5000)],
+                              [_invoice('B-1', 8800), _invoice('B-2', 3300)])
+    assert matcher.cache_hits == 1
+    assert second['line_coverage'] == first['line_coverage'] == 1.0
+    assert [a['invoices'] for a in second['allocations']] == [['B-1'], ['B-2']]
+    assert sorted(deal_id for a in second['allocations'] for deal_id in a['deals']) == ['21', '22', '23']
+
+
+def test_state_cap_stops_search(monkeypatch):
+    # 請求書4枚のうち一致できるのは3枚までなので、上限がなければすべての割り当てを調べる
+    deals = [_deal(str(i), amount) for i, amount in enumerate([1000, 2000, 3000, 4000, 5000, 6000])]
+    invoices = [_invoice(f"INV-{i}", 7700) for i in range(4)]
+
+    full = AllocationMatcher()
+    full_calls = _count_subsets(monkeypatch, full)
+    exhaustive = full.allocate(deals, invoices)
+    assert len(exhaustive['allocations']) == 3
+
+    monkeypatch.setattr(invoice_allocation, 'MAX_SEARCH_STATES', 2)
+    capped = AllocationMatcher()
+    capped_calls = _count_subsets(monkeypatch, capped)
+    result = capped.allocate(deals, invoices)
+    assert len(capped_calls) < len(full_calls)
+    # 打ち切っても見つかった割り当てはそれぞれ一致している
+    assert result['allocations']
+    assert all(abs(a['difference']) <= 1 for a in result['allocations'])
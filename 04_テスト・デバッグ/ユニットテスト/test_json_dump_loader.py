@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""json_dump_loader: ダンプのストリーミング読み込みとバイト位置の索引"""
+
+import json
+import os
+
+import pytest
+
+from json_dump_loader import DumpFormatError, JsonDump, iter_dump_entries
+
+RECORDS = [{'id': '1', 'Deal_Name': '商談あ', 'Amount': 1000},
+           {'id': '2', 'Deal_Name': 'deal "b"', 'Amount': 12.5},
+           {'id': '3', 'Deal_Name': '商談\nう', 'Amount': None}]
+
+
+def _write(path, text, bom=False):
+    path.write_bytes((b'\xef\xbb\xbf' if bom else b'') + text.encode('utf-8'))
+    return path
+
+
+def _dump(path, tmp_path, key=None):
+    return JsonDump(path, key, index_dir=tmp_path / "index")
+
+
+def test_offsets_point_at_records(tmp_path):
+    text = json.dumps({'summary': {'n': 3}, 'all_children': RECORDS}, ensure_ascii=False, indent=2)
+    path = _write(tmp_path / "dump.json", text)
+    data = path.read_bytes()
+    for _, record, start, end in iter_dump_entries(path, 'all_children'):
+        assert json.loads(data[start:end]) == record
+
+
+@pytest.mark.parametrize('bom', [False, True])
+def test_crlf_and_bom(tmp_path, bom):
+    text = json.dumps(RECORDS, ensure_ascii=False, indent=2).replace('\n', '\r\n')
+    path = _write(tmp_path / "dump.json", text, bom=bom)
+    dump = _dump(path, tmp_path)
+    assert list(dump) == RECORDS
+    assert dump.get_many(['3', '1', '9']) == {'3': RECORDS[2], '1': RECORDS[0]}
+
+
+def test_stale_index_is_rebuilt(tmp_path):
+    path = _write(tmp_path / "dump.json", json.dumps(RECORDS, ensure_ascii=False))
+    dump = _dump(path, tmp_path)
+    assert dump.get('2', fields=['Amount']) == {'Amount': 12.5}
+    assert dump.index_path.parent == tmp_path / "index"
+    assert not list(tmp_path.glob("*.idx.json"))
+
+    updated = [{'id': '0', 'Deal_Name': '先頭に追加'}] + RECORDS
+    _write(path, json.dumps(updated, ensure_ascii=False))
+    os.utime(path, (1, 1))
+    reopened = _dump(path, tmp_path)
+    assert reopened.count() == 4
+    assert reopened.get('2') == RECORDS[1]
+
+
+def test_not_an_array(tmp_path):
+    path = _write(tmp_path / "dump.json", '"text"')
+    with pytest.raises(DumpFormatError):
+        list(_dump(path, tmp_path))
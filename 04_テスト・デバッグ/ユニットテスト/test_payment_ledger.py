@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""payment_ledger: 月別パーティションの入金台帳と累積和の集計"""
+
+from datetime import date
+
+import pytest
+
+from month_utils import month_bounds, month_range
+from payment_ledger import BooksPaymentFetcher, PaymentLedger, open_ledger
+
+
+def test_month_helpers():
+    assert month_bounds('2024-02') == ('2024-02-01', '2024-02-29')
+    assert month_range('2024-11', '2025-02') == ['2024-11', '2024-12', '2025-01', '2025-02']
+
+
+def _payment(payment_id, day, amount, customer_id='C1', reference='', invoices=()):
+    return {'payment_id': payment_id, 'date': day, 'amount': amount, 'customer_id': customer_id,
+            'customer_name': 'JT ETP事務局' if customer_id == 'C1' else '他社', 'reference_number': reference,
+            'invoices': [{'invoice_id': invoice_id, 'invoice_number': number, 'amount_applied': applied}
+                         for invoice_id, number, applied in invoices]}
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = PaymentLedger(tmp_path)
+    ledger.replace_month('2025-06', [
+        _payment('1', '2025-06-10', 1000, reference='D1', invoices=[('I1', 'INV-1', 1000)]),
+        _payment('2', '2025-06-30', 500, customer_id='C2'),
+        # 月の違う入金は置き換え対象外
+        _payment('9', '2025-07-01', 9999),
+    ])
+    ledger.replace_month('2025-07', [
+        _payment('3', '2025-07-05', 2000, reference='D1', invoices=[('I1', 'INV-1', 300), ('I2', 'INV-2', 1700)]),
+    ])
+    return ledger
+
+
+def test_totals_by_period_and_customer(ledger):
+    assert len(ledger) == 3
+    assert ledger.total() == 3500
+    assert ledger.paid_through('2025-06') == 1500
+    assert ledger.total('2025-06-11', '2025-07-05') == 2500
+    assert ledger.total(customer_ids=['C1']) == 3000
+    assert ledger.count(date_to='2025-06', customer_ids=ledger.customer_ids(['jt'])) == 1
+    assert ledger.monthly_totals() == {'2025-06': 1500, '2025-07': 2000}
+
+
+def test_invoice_and_deal_totals(ledger):
+    assert ledger.invoice_paid('I1') == 1300
+    assert ledger.invoice_paid('INV-1', date_to='2025-06') == 1000
+    assert ledger.deal_paid('D1') == 3000
+    assert ledger.deal_paid('D1', invoices=[{'invoice_id': 'I2', 'reference_number': 'D1'}]) == 1700
+
+
+def test_replace_month_drops_removed_payments(ledger, tmp_path):
+    ledger.replace_month('2025-06', [_payment('2', '2025-06-30', 500, customer_id='C2')])
+    reopened = PaymentLedger(tmp_path)
+    assert reopened.total() == 2500
+    assert [p['payment_id'] for p in reopened.payments(date_to='2025-06')] == ['2']
+
+
+def test_months_to_sync_skips_closed_months(ledger):
+    # 6月は月末から45日を過ぎてから同期したので締まっている、7月はまだ45日以内
+    ledger.manifest['months']['2025-06']['synced_at'] = '2025-08-20T00:00:00'
+    ledger.manifest['months']['2025-07']['synced_at'] = '2025-08-20T00:00:00'
+    months = ledger.months_to_sync('2025-05', '2025-09', today=date(2025, 8, 25))
+    assert months == ['2025-05', '2025-07', '2025-08']
+
+
+class _Response:
+    def __init__(self, data):
+        self.status_code = 200
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+class _FakeBooks:
+    """入金一覧（適用先は invoice_numbers の文字列のみ）と入金の詳細"""
+
+    LIST = [
+        {'payment_id': 'P1', 'date': '2025-06-05', 'amount': 1200, 'unused_amount': 200,
+         'customer_id': 'C1', 'customer_name': 'JT ETP事務局', 'invoice_numbers': 'INV-1'},
+        {'payment_id': 'P2', 'date': '2025-06-20', 'amount': 3000, 'unused_amount': 0,
+         'customer_id': 'C1', 'customer_name': 'JT ETP事務局', 'invoice_numbers': 'INV-1, INV-2'},
+        {'payment_id': 'P3', 'date': '2025-06-25', 'amount': 400, 'unused_amount': 400,
+         'customer_id': 'C1', 'customer_name': 'JT ETP事務局', 'invoice_numbers': ''},
+    ]
+    DETAILS = {'P2': [{'invoice_id': 'I1', 'invoice_number': 'INV-1', 'amount_applied': 500},
+                      {'invoice_id': 'I2', 'invoice_number': 'INV-2', 'amount_applied': 2500}]}
+
+    def __init__(self):
+        self.urls = []
+
+    def get(self, url, headers=None, params=None):
+        self.urls.append(url)
+        if url.endswith('/customerpayments'):
+            rows = [p for p in self.LIST if params['date_start'] <= p['date'] <= params['date_end']]
+            return _Response({'customerpayments': [dict(p) for p in rows], 'page_context': {'has_more_page': False}})
+        payment_id = url.rsplit('/', 1)[1]
+        return _Response({'payment': {'payment_id': payment_id, 'invoices': self.DETAILS[payment_id]}})
+
+
+def test_list_shape_payments_are_indexed_by_invoice_number(tmp_path):
+    books = _FakeBooks()
+    fetcher = BooksPaymentFetcher(session=books, headers={}, org_id='ORG')
+    ledger = open_ledger('2025-06', start_month='2025-06', fetcher=fetcher, root=tmp_path)
+
+    # 複数の請求書に適用された P2 だけ詳細を取得する
+    assert [url.rsplit('/', 1)[1] for url in books.urls] == ['customerpayments', 'P2']
+    assert ledger.invoice_paid('INV-1') == 1000 + 500
+    assert ledger.invoice_paid('I2') == 2500
+    assert ledger.deal_paid('D1', invoices=[{'invoice_id': 'I1', 'invoice_number': 'INV-1',
+                                             'reference_number': 'D1'}]) == 1500
+
+
+def test_multi_invoice_list_row_without_details_is_not_split(tmp_path):
+    ledger = PaymentLedger(tmp_path)
+    ledger.replace_month('2025-06', [dict(_FakeBooks.LIST[1])])
+    assert ledger.total() == 3000
+    assert ledger.invoice_paid('INV-1') == 0
+    assert [inv['invoice_number'] for inv in ledger.payments()[0]['invoices']] == ['INV-1', 'INV-2']
+
+
+def test_old_ledger_format_is_resynced(ledger, tmp_path):
+    ledger.manifest.pop('version')
+    ledger._write_json(ledger.manifest_path, ledger.manifest)
+    assert PaymentLedger(tmp_path).months() == []
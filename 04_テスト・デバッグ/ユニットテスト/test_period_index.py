@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""period_index: 会計期間の区切り・成約日の累積和・学習期間の区間木"""
+
+import random
+
+import pytest
+
+from period_index import (COMPANY_CALENDAR, JT_ETP_CALENDAR, UNKNOWN_PERIOD, FiscalCalendar, IntervalTree,
+                          PeriodIndex, normalize_date)
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('2025/1/5', '2025-01-05'), ('2025-06-30T10:00:00+09:00', '2025-06-30'), ('', None), ('未定', None),
+])
+def test_normalize_date(value, expected):
+    assert normalize_date(value) == expected
+
+
+def test_company_calendar():
+    assert COMPANY_CALENDAR.fiscal_year('2025-03-31') == 2024
+    assert COMPANY_CALENDAR.half('2025-09-30') == (2025, 0)
+    assert COMPANY_CALENDAR.half('2025-10-01') == (2025, 1)
+    assert COMPANY_CALENDAR.half_bounds(2025, 1) == ('2025-10-01', '2026-03-31')
+
+
+def test_jt_etp_calendar():
+    assert JT_ETP_CALENDAR.half_bounds(2025, 0) == ('2025-01-01', '2025-05-31')
+    assert JT_ETP_CALENDAR.half_label('2025/6/1') == '下期(6月〜)'
+    assert JT_ETP_CALENDAR.half_label(None) == UNKNOWN_PERIOD
+
+
+def test_halves_between_crosses_year():
+    assert COMPANY_CALENDAR.halves_between('2025-02-01', '2025-11-01') == [(2024, 1), (2025, 0), (2025, 1)]
+
+
+def test_invalid_calendar():
+    with pytest.raises(ValueError):
+        FiscalCalendar(4, 4)
+
+
+def test_closing_index_counts_and_totals():
+    deals = [{'id': str(i), 'Closing_Date': day, 'Amount': amount}
+             for i, (day, amount) in enumerate([('2025-01-10', 100), ('2025-01-31', 200),
+                                                ('2025-02-01', 400), (None, 800)])]
+    index = PeriodIndex.build(deals, calendar=JT_ETP_CALENDAR)
+    assert [deal['id'] for deal in index.deals_closed_in_month('2025-01')] == ['0', '1']
+    assert index.closing_amount('2025-01-31', '2025-02-28') == 600
+    groups = index.deals_by_half()
+    assert [len(deals) for deals in groups.values()] == [3, 1]
+    assert list(groups)[-1] == UNKNOWN_PERIOD
+
+
+def test_interval_tree_matches_linear_scan():
+    rng = random.Random(7)
+    days = [f"2025-{month:02d}-{day:02d}" for month in range(1, 13) for day in (1, 10, 20, 28)]
+    intervals = []
+    for i in range(300):
+        start, end = sorted(rng.sample(days, 2))
+        intervals.append((start, end, i))
+    tree = IntervalTree(intervals)
+    for _ in range(200):
+        date_from, date_to = sorted(rng.sample(days, 2))
+        expected = {i for start, end, i in intervals if start <= date_to and end >= date_from}
+        assert set(tree.overlapping(date_from, date_to)) == expected
+
+
+def test_study_period_lines():
+    lines = [{'学習開始日': '2025-01-01', '学習終了日': '2025-03-31', 'n': 1},
+             {'学習開始日': '2025-04-01', 'n': 2},
+             {'学習開始日': '2025-05-01', '学習終了日': '2025-04-01', 'n': 3}]
+    index = PeriodIndex.build(lines=lines)
+    assert [line['n'] for line in index.lines_active_in_month('2025-03')] == [1]
+    assert [line['n'] for line in index.lines_active_on('2030-01-01')] == [2]
+    assert [line['n'] for line in index.undated_lines] == [3]
+
+
+def test_current_period_study_months():
+    from get_current_period_deals import study_months_summary
+
+    rows = [{'deal_id': '1', 'product_detail_id': 'a', 'study_start_date': '2025-04-10',
+             'study_end_date': '2025-05-31', 'subtotal': 1000},
+            {'deal_id': '1', 'product_detail_id': 'b', 'study_start_date': '2025-05-01', 'subtotal': 500},
+            {'deal_id': '2', 'product_detail_id': None},
+            {'deal_id': '3', 'product_detail_id': 'c', 'study_start_date': None, 'study_end_date': None}]
+    summary, undated = study_months_summary(rows, ['2025-04', '2025-05', '2025-06'])
+    assert summary == {'2025-04': {'lines': 1, 'deals': 1, 'subtotal': 1000},
+                       '2025-05': {'lines': 2, 'deals': 1, 'subtotal': 1500},
+                       '2025-06': {'lines': 1, 'deals': 1, 'subtotal': 500}}
+    assert undated == 1
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""reconciliation_solver: 差額に一致する候補の組み合わせ探索"""
+
+from reconciliation_solver import (Candidate, ReconciliationSolver, count_vectors, deal_candidates,
+                                   filter_candidates)
+
+
+def _candidates(amounts, customer=None):
+    return [Candidate('deal', str(i), f"商談{i}", amount, customer, f"2025-06-{i % 28 + 1:02d}")
+            for i, amount in enumerate(amounts)]
+
+
+def _amounts(solution):
+    return sorted(item.amount for item in solution['items'])
+
+
+def test_count_vectors_enumerates_each_multiset_once():
+    results = sorted(sorted(counts) for _, counts in count_vectors({3: 2, 5: 1}, [6, 8, 11]))
+    assert results == [[(3, 1), (5, 1)], [(3, 2)], [(3, 2), (5, 1)]]
+
+
+def test_dp_exact_match():
+    solutions = ReconciliationSolver().solve(_candidates([1000, 2500, 4000, 7000]), 6500)
+    assert solutions[0]['method'] == 'DP'
+    assert _amounts(solutions[0]) == [2500, 4000]
+    assert solutions[0]['gap'] == 0
+
+
+def test_dp_tolerance_prefers_smallest_gap():
+    solutions = ReconciliationSolver(tolerance=5).solve(_candidates([1003, 2000, 2998]), 3000)
+    assert [solution['gap'] for solution in solutions] == [-2, 3]
+    assert _amounts(solutions[0]) == [2998]
+
+
+def test_dp_reports_interchangeable_duplicates():
+    solutions = ReconciliationSolver().solve(_candidates([500, 500, 500, 1200]), 1700)
+    assert len(solutions) == 1
+    assert _amounts(solutions[0]) == [500, 1200]
+    assert len(solutions[0]['interchangeable'][500]) == 3
+
+
+def test_all_negative_amounts():
+    solutions = ReconciliationSolver().solve(_candidates([-300, -700, -1000]), -1000)
+    assert sorted(_amounts(solution) for solution in solutions) == [[-1000], [-700, -300]]
+
+
+def test_mixed_signs_use_meet_in_the_middle():
+    solutions = ReconciliationSolver().solve(_candidates([5000, -1200, 3000, 800]), 3800)
+    assert all(solution['method'] == '半分全列挙' for solution in solutions)
+    assert sorted(_amounts(solution) for solution in solutions) == [[-1200, 5000], [800, 3000]]
+
+
+def test_unreachable_target():
+    assert ReconciliationSolver().solve(_candidates([100, 200]), 1000) == []
+
+
+def test_explain_prefers_single_customer():
+    candidates = _candidates([1000, 2000], 'A社') + _candidates([3000], 'B社')
+    solutions = ReconciliationSolver().explain(candidates, 3000)
+    scopes = {solution['scope'] for solution in solutions}
+    assert scopes == {'A社', 'B社'}
+
+
+def test_deal_candidates_tax_is_rounded_per_deal():
+    deals = [{'id': '1', 'Deal_Name': 'x', 'Amount': 105, 'Account_Name': {'name': 'JT'}},
+             {'id': '2', 'Deal_Name': 'y', 'Amount': 105, 'field78': {'name': '親商談', 'id': '9'}}]
+    candidates = deal_candidates(deals, tax_rate='0.10', rounding='切り捨て')
+    assert [candidate.amount for candidate in candidates] == [115, 115]
+    assert [candidate.customer for candidate in candidates] == ['JT', '親商談']
+
+
+def test_filter_candidates():
+    candidates = _candidates([1, 2, 3], 'JT ETP事務局')
+    assert len(filter_candidates(candidates, customer='JT', date_from='2025-06-02')) == 2
+    assert filter_candidates(candidates, customer='その他') == []
+
+
+def test_mixed_signs_beyond_mitm_limit_use_shifted_dp():
+    amounts = [1000 * (i + 1) if i % 3 else -700 * (i + 1) for i in range(40)]
+    solutions = ReconciliationSolver(mitm_limit=36).solve(_candidates(amounts), 2300)
+    assert solutions and all(solution['method'] == 'DP（正負混在）' for solution in solutions)
+    for solution in solutions:
+        assert solution['gap'] == 0 and not solution['partial']
+        assert sum(_amounts(solution)) == 2300
+        assert len({item.id for item in solution['items']}) == len(solution['items'])
+
+
+def test_too_large_mixed_signs_return_partial_result():
+    amounts = [1000 * (i + 1) if i % 3 else -700 * (i + 1) for i in range(40)]
+    solver = ReconciliationSolver(mitm_limit=12, dp_max_bytes=16)
+    solutions = solver.solve(_candidates(amounts), 2300)
+    assert solutions
+    for solution in solutions:
+        assert solution['partial'] and sum(_amounts(solution)) == 2300
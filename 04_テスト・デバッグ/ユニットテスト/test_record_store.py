@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""record_store: 商談・請求書のコンパクトなレコードと索引"""
+
+import pytest
+
+from record_store import DealStore, InvoiceStore, decode_id, encode_id
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('5187347000123456789', 5187347000123456789), ('0123', '0123'), ('0', 0), ('', None),
+    ({'id': '42', 'name': 'x'}, 42), ('INV-001', 'INV-001'), (None, None),
+])
+def test_encode_id(value, expected):
+    assert encode_id(value) == expected
+
+
+def test_decode_id_round_trip():
+    assert decode_id(encode_id('5187347000123456789')) == '5187347000123456789'
+    assert decode_id(encode_id('0123')) == '0123'
+
+
+def _deal(deal_id, parent=None, **fields):
+    deal = {'id': deal_id, 'Deal_Name': f"商談{deal_id}", 'Amount': 1000, 'Stage': '受注',
+            'Closing_Date': '2025-06-30', 'Account_Name': {'name': 'JT', 'id': '77'}, 'Owner': {'name': '担当'}}
+    if parent:
+        deal['field78'] = {'name': f"商談{parent}", 'id': parent}
+    deal.update(fields)
+    return deal
+
+
+def test_deal_record_reads_like_api_dict():
+    store = DealStore.from_api([_deal('100', parent='1')])
+    record = store['100']
+    assert record['id'] == '100'
+    assert record.get('Amount') == 1000
+    assert record['Account_Name'] == {'name': 'JT', 'id': '77'}
+    assert record['field78'] == {'name': '商談1', 'id': '1'}
+    # 保持していない項目は辞書と違い KeyError（読み落としに気づけるように）
+    with pytest.raises(KeyError):
+        record['Description']
+
+
+def test_deal_store_replaces_by_id_and_indexes_children():
+    store = DealStore.from_api([_deal('100', parent='1'), _deal('101', parent='1'), _deal('1')])
+    store.add(_deal('100', parent='1', Amount=2000))
+    assert len(store) == 3
+    assert store.get('100')['Amount'] == 2000
+    assert sorted(record['id'] for record in store.children_of('1')) == ['100', '101']
+    assert '999' not in store
+
+
+def test_interned_values_are_shared():
+    store = DealStore.from_api([_deal('100'), _deal('101')])
+    first, second = store['100'], store['101']
+    assert first.stage is second.stage and first.account is second.account
+
+
+def test_invoice_store_reference_index_follows_replacement():
+    store = InvoiceStore.from_api([
+        {'invoice_id': '1', 'invoice_number': 'INV-1', 'reference_number': '100', 'status': 'sent', 'total': 1100},
+        {'invoice_id': '2', 'invoice_number': 'INV-2', 'reference_number': '100', 'status': 'void', 'total': 1100},
+        {'invoice_id': '3', 'invoice_number': 'INV-3', 'reference_number': '100', 'status': 'paid', 'total': 2200},
+    ], exclude_statuses=('void',))
+    assert [record['invoice_number'] for record in store.for_reference('100')] == ['INV-1', 'INV-3']
+    assert store.latest_for_reference(100)['total'] == 2200
+
+    store.add({'invoice_id': '1', 'invoice_number': 'INV-1', 'reference_number': '200', 'total': 1100})
+    assert [record['invoice_number'] for record in store.for_reference('100')] == ['INV-3']
+    assert store.latest_for_reference('200')['invoice_id'] == '1'
+    assert store.for_reference('300') == []
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""snapshot_store: 実行スナップショットの保存と2回の実行の比較"""
+
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from snapshot_store import SnapshotStore
+
+
+def _rows(leak_amount, set_types):
+    return [
+        {'unit_key': 'deal:1', 'amount_difference': leak_amount, 'is_leakage': leak_amount != 0,
+         'invoice_types': None},
+        {'unit_key': 'set:9', 'amount_difference': 0, 'is_leakage': False, 'invoice_types': set_types},
+        {'unit_key': 'set:8', 'amount_difference': 0, 'is_leakage': False, 'invoice_types': ['parent']},
+    ]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SnapshotStore(tmp_path)
+    store.write('invoice_leakage', _rows(100, ['parent', 'child']), key='unit_key', run_id='20250601_000000')
+    store.write('invoice_leakage', _rows(300, ['parent', 'child', 'child']), key='unit_key',
+                run_id='20250602_000000')
+    return store
+
+
+def test_diff_compares_list_columns(store):
+    result = store.diff('invoice_leakage')
+    assert result['old_run'] == '20250601_000000'
+    assert list(result['changed']['unit_key']) == ['deal:1', 'set:9']
+    assert result['new'].empty and result['removed'].empty
+
+
+def test_diff_leakage_column(store):
+    result = store.diff('invoice_leakage', compare_columns=['amount_difference'], leakage_column='is_leakage')
+    assert list(result['changed']['unit_key']) == ['deal:1']
+    assert list(result['changed']['amount_difference_new']) == [300]
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""tax_engine: 円単位の整数による消費税計算"""
+
+import pytest
+
+from tax_engine import TaxEngine, TaxRule, TaxRuleError, compare_rules, to_yen
+
+
+@pytest.mark.parametrize('value, expected', [
+    (None, 0), ('', 0), (1000, 1000), (1000.0, 1000), ('1234.5', 1235), ('-0.5', -1), (0.1 + 0.2, 0),
+])
+def test_to_yen(value, expected):
+    assert to_yen(value) == expected
+
+
+@pytest.mark.parametrize('rounding, expected', [('切り捨て', 10), ('四捨五入', 11), ('切り上げ', 11)])
+def test_tax_rounding(rounding, expected):
+    # 105 × 10% = 10.5
+    assert TaxEngine(rounding=rounding).tax(105) == expected
+
+
+def test_negative_amount_rounds_by_magnitude():
+    engine = TaxEngine(rounding='切り捨て')
+    assert engine.tax(-105) == -10
+    assert engine.with_tax(-105) == -115
+
+
+def test_float_multiplication_error_does_not_leak():
+    # 1,234,567 × 1.10 は float では 1358023.7000000002 になる
+    assert TaxEngine().with_tax(1234567) == 1358024
+
+
+def test_split_inclusive():
+    base, tax = TaxEngine().split_inclusive(1100)
+    assert (base, tax) == (1000, 100)
+    base, tax = TaxEngine(rate='0.08').split_inclusive(1000)
+    assert base + tax == 1000 and tax == 74
+
+
+def test_invoice_unit_rounds_once():
+    amounts = [105, 105, 105]
+    assert TaxEngine(rounding='切り捨て', unit='line').invoice_tax(amounts) == 30
+    assert TaxEngine(rounding='切り捨て', unit='invoice').invoice_tax(amounts) == 31
+    assert TaxEngine(rounding='切り捨て', unit='invoice').invoice_total(amounts) == 346
+
+
+def test_group_totals():
+    totals = TaxEngine(rounding='切り捨て').group_totals([105, 105, 1000], ['A', 'A', 'B'])
+    assert totals == {'A': {'base': 210, 'tax': 20, 'total': 230},
+                      'B': {'base': 1000, 'tax': 100, 'total': 1100}}
+
+
+def test_group_totals_length_mismatch():
+    with pytest.raises(TaxRuleError):
+        TaxEngine().group_totals([1, 2], ['A'])
+
+
+@pytest.mark.parametrize('kwargs', [{'rounding': '銀行丸め'}, {'unit': 'deal'}, {'rate': '-0.1'}])
+def test_invalid_rule(kwargs):
+    with pytest.raises(TaxRuleError):
+        TaxRule(**kwargs)
+
+
+def test_compare_rules_covers_every_combination():
+    results = compare_rules([105, 105, 105])
+    assert len(results) == 6
+    by_rule = {(rule.unit, rule.rounding): total for rule, total in results}
+    assert by_rule[('line', '切り捨て')] == 345
+    assert by_rule[('line', '四捨五入')] == 348
+    assert by_rule[('invoice', '切り捨て')] == 346
+    assert by_rule[('invoice', '四捨五入')] == 347
+
+
+np = pytest.importorskip('numpy')
+
+
+def test_int64_array_path_matches_scalar():
+    amounts = np.array([105, -105, 0, 1234567, 15, 25] * 20, dtype=np.int64)
+    engine = TaxEngine()
+    values = engine.yen_array(amounts)
+    assert values.dtype == np.int64 and values is amounts
+    assert engine.with_tax_many(amounts).tolist() == [engine.with_tax(int(a)) for a in amounts]
+    assert engine.invoice_total(amounts) == sum(engine.with_tax(int(a)) for a in amounts)
+
+
+def test_float_array_is_rounded_without_python_loop(monkeypatch):
+    import tax_engine
+
+    amounts = np.array([1234.5, -0.5, 0.49999999999999994, 2.675, np.nan, 1e6 + 0.4] * 20)
+    monkeypatch.setattr(tax_engine, 'to_yen', lambda value: pytest.fail("要素ごとに to_yen を呼んだ"))
+    values = TaxEngine().yen_array(amounts)
+    assert values.dtype == np.int64
+    assert values[:6].tolist() == [1235, -1, 0, 3, 0, 1000000]
+
+
+def test_float_array_beyond_int64_falls_back_to_python_ints():
+    engine = TaxEngine()
+    values = engine.yen_array(np.array([1e19, 1.0] * 40))
+    assert isinstance(values, list) and values[0] == 10**19
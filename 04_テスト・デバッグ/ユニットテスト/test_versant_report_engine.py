@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""versant_report_engine: ベース抽出からの版ごとの集計（日別列・期間合計・重複除去・商品名の連結）"""
+
+import json
+import re
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from versant_report_engine import ROSTER_COLUMNS, BaseExtract, VersantReportEngine
+
+TODAY = date(2025, 7, 29)
+
+
+def _day(days_ago, time='10:00:00'):
+    return f"{(TODAY - timedelta(days=days_ago)).isoformat()} {time}"
+
+
+class _FakeAnalytics:
+    """ベース抽出・差分更新のSQLを1行目のコメントで見分け、生の回答・提出から日別件数を返す"""
+
+    def __init__(self, students, answers, versant, contacts=None):
+        self.students = students
+        self.answers = answers      # [(メールアドレス, 日時), ...]
+        self.versant = versant      # [(受講生ID, 日時), ...]
+        self.contacts = contacts or {}
+        self.queries = []
+
+    def __call__(self, sql_query):
+        title = sql_query.splitlines()[0]
+        self.queries.append(title)
+        events, key_field = (self.answers, 'メールアドレス') if '回答' in title else (self.versant, '受講生ID')
+        if '受講生×手配' in title:
+            return [dict(row) for row in self.students]
+        if '前回以降' in title:
+            since = re.search(r"\" > '([^']*)'", sql_query).group(1)
+            latest = {}
+            for key, stamp in events:
+                if stamp > since:
+                    latest[key] = max(stamp, latest.get(key, ''))
+            return [{key_field: key, '最終日時': stamp} for key, stamp in latest.items()]
+        if '変化のあった受講生' in title:
+            keys = set(re.findall(r"'([^']*)'", re.search(r"IN \(([^)]*)\)", sql_query).group(1)))
+            return self._daily(events, key_field, keys)
+        if '日別件数' in title:
+            return self._daily(events, key_field)
+        raise AssertionError(f"想定外のSQL: {title}")
+
+    def _daily(self, events, key_field, keys=None):
+        groups = defaultdict(list)
+        for key, stamp in events:
+            if keys is None or key in keys:
+                groups[(key, stamp[:10])].append(stamp)
+        rows = []
+        for (key, day), stamps in groups.items():
+            # Analytics のエクスポートと同じく件数は文字列
+            row = {key_field: key, '日付': day, '件数': str(len(stamps)), '最終日時': max(stamps)}
+            if key_field == '受講生ID':
+                row.update(self.contacts.get(key, {}))
+            rows.append(row)
+        return rows
+
+
+def _student(student_id, last, product, start, email=None, account='取引先A'):
+    return {'受講生ID': student_id, '姓': last, '名': '太郎', 'メールアドレス': email or f"{student_id}@example.com",
+            '所属会社': '会社', '取引先名': account, '商品名': product, '学習開始日': start}
+
+
+STUDENTS = [
+    _student('S1', '佐藤', 'VERSANTコーチングB', '2025-06-01'),
+    _student('S1', '佐藤', 'VERSANTコーチングA', '2025-05-01'),
+    _student('S1', '佐藤', 'VERSANTコーチングA', '2025-05-01'),   # 同じ手配の重複行
+    _student('S2', '鈴木', 'VERSANTコーチングA', '2025-07-01'),
+]
+
+
+def _engine(tmp_path, fake):
+    return VersantReportEngine(BaseExtract(fake, path=tmp_path / "base_extract.json"), today=TODAY)
+
+
+@pytest.fixture
+def fake():
+    answers = [('S1@Example.com', _day(0)), ('s1@example.com', _day(0, '11:00:00')), ('s1@example.com', _day(20)),
+               ('s1@example.com', _day(21)), ('s1@example.com', _day(22)), ('s2@example.com', _day(5))]
+    versant = [('S1', _day(0)), ('S1', _day(89)), ('S1', _day(91)), ('S9', _day(3))]
+    contacts = {'S9': {'姓': '手配なし', '名': '花子', 'メールアドレス': 's9@example.com', '所属会社': '別会社'}}
+    return _FakeAnalytics(STUDENTS, answers, versant, contacts)
+
+
+def test_day_columns_and_windows(tmp_path, fake):
+    rows = {row['受講生ID']: row for row in _engine(tmp_path, fake).report('answer_correct')['data']}
+    s1 = rows['S1']
+    assert s1['今日'] == 2 and s1['D20'] == 1 and 'D21' not in s1
+    # 3週間合計は基準日の21日前から（日別列より1日長い、SQL の DATE_SUB(CURDATE(), INTERVAL 21 DAY) と同じ）
+    assert s1['3週間合計'] == 4 and s1['全期間合計'] == 5
+    assert s1['1日平均'] == round(4 / 21, 1)
+    assert s1['学習状況'] == '学習不足' and rows['S2']['学習状況'] == '学習不足'
+
+
+@pytest.mark.parametrize('variant, first, last', [
+    ('answer_with_dates', '20日前', '今日'),
+    ('answer_actual_dates', '2025-07-09', '2025-07-29'),
+    ('final_correct', 'D20', '今日'),
+])
+def test_day_label_styles(tmp_path, fake, variant, first, last):
+    row = _engine(tmp_path, fake).report(variant)['data'][0]
+    # 受講生の列のあとに日別列21日分、続いて期間合計
+    keys = list(row)[len(ROSTER_COLUMNS):]
+    assert keys[0] == first and keys[20] == last and keys[21] == '3週間合計'
+
+
+def test_grouped_counts_each_student_once_and_joins_products(tmp_path, fake):
+    engine = _engine(tmp_path, fake)
+    grouped = [row for row in engine.report('fixed_duplicates')['data'] if row['受講生ID'] == 'S1']
+    assert len(grouped) == 1
+    assert grouped[0]['手配商品名'] == 'VERSANTコーチングA, VERSANTコーチングB'
+    assert grouped[0]['学習開始日'] == '2025-05-01'
+    assert grouped[0]['全期間合計'] == 5
+
+    # 手配ごとの版は同じ手配の重複行を1行にまとめ、各行の件数は受講生の件数そのまま
+    complete = [row for row in engine.report('complete')['data'] if row['受講生ID'] == 'S1']
+    assert sorted(row['商品名'] for row in complete) == ['VERSANTコーチングA', 'VERSANTコーチングB']
+    assert [row['全期間合計'] for row in complete] == [5, 5]
+
+
+def test_active_roster_and_required_window(tmp_path, fake):
+    engine = _engine(tmp_path, fake)
+    basic = {row['受講生ID']: row for row in engine.report('basic')['data']}
+    # 3週間合計が0の S2（Versant提出なし）は出ない、手配のない S9 は提出があるので出る
+    assert set(basic) == {'S1', 'S9'}
+
+    extended = {row['受講生ID']: row for row in engine.report('extended')['data']}
+    assert extended['S1']['90日合計'] == 2 and extended['S1']['全期間合計'] == 3
+    assert extended['S9']['受講生名'] == '手配なし 花子'
+    assert list(extended) == ['S1', 'S9']
+
+
+def test_variants_share_one_base_extract(tmp_path, fake):
+    engine = _engine(tmp_path, fake)
+    engine.reports()
+    assert len(fake.queries) == 3
+
+    # 保存した抽出は次のエンジンでもそのまま使う
+    _engine(tmp_path, fake).reports(['grouped', 'basic'])
+    assert len(fake.queries) == 3
+
+
+def _age_roster(extract_path, hours):
+    with open(extract_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    data['tables']['students']['fetched_at'] = (datetime.now() - timedelta(hours=hours)).isoformat()
+    with open(extract_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+@pytest.mark.parametrize('roster_age_hours', [20, 8 * 24])
+@pytest.mark.parametrize('variant', ['fixed_duplicates', 'complete', 'basic', 'extended', 'answer_actual_dates'])
+def test_incremental_update_matches_full_rebuild(tmp_path, fake, variant, roster_age_hours):
+    extract_path = tmp_path / "base_extract.json"
+    output_dir = tmp_path / "結果"
+    VersantReportEngine(BaseExtract(fake, path=extract_path), today=TODAY).update_report(variant, output_dir)
+
+    # 翌日: 新しい回答・提出、名簿は S2 の手配追加・S3 の追加
+    next_day = TODAY + timedelta(days=1)
+    fake.answers += [('s2@example.com', f"{next_day} 09:00:00"), ('s3@example.com', f"{next_day} 09:30:00")]
+    fake.versant += [('S2', f"{next_day} 09:00:00")]
+    fake.students = STUDENTS + [_student('S2', '鈴木', 'VERSANTコーチングB', '2025-07-20'),
+                                _student('S3', '高橋', 'VERSANTコーチングA', '2025-07-25')]
+    _age_roster(extract_path, roster_age_hours)
+    fake.queries.clear()
+
+    engine = VersantReportEngine(BaseExtract(fake, path=extract_path), today=next_day)
+    _, merged, recomputed = engine.update_report(variant, output_dir)
+
+    refetched = any('受講生×手配' in title for title in fake.queries)
+    # 名簿は FULL_REFRESH_DAYS 日を過ぎるまで日をまたいでも取り直さない
+    assert refetched == (roster_age_hours > 24 * 7)
+    # 日付を見出しにする版だけは全行を集計し直す
+    assert (recomputed is None) == (variant == 'answer_actual_dates')
+
+    fresh = _FakeAnalytics(fake.students if refetched else STUDENTS, fake.answers, fake.versant, fake.contacts)
+    full = VersantReportEngine(BaseExtract(fresh, path=tmp_path / "full.json"), today=next_day).report(variant)
+    assert merged['data'] == full['data']
+
+
+def test_late_row_below_high_water_is_picked_up(tmp_path, fake):
+    extract = BaseExtract(fake, path=tmp_path / "base_extract.json")
+    extract.table('versant')
+    assert extract.data['tables']['versant']['high_water'] == _day(0)
+    assert extract.update('versant') == set()
+
+    # S9 の提出が遅れて同期された（日時は S1 の最終日時 = high_water より前、S9 の最終日時より後）
+    fake.versant.append(('S9', _day(0, '09:00:00')))
+    fake.queries.clear()
+    assert extract.update('versant') == {'S9'}
+    assert sum(int(row['件数']) for row in extract.data['tables']['versant']['rows'] if row['受講生ID'] == 'S9') == 2
+    assert sum('変化のあった受講生' in title for title in fake.queries) == 1
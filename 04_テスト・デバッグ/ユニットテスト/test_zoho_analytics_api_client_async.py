@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""zoho_analytics_api_client_async: ジョブの完了待ち・タイムアウト・キャンセル・同時実行数・トークン更新"""
+
+import asyncio
+import json
+import time
+
+import pytest
+
+from zoho_analytics_api_client_async import AsyncZohoAnalyticsAPIAuto
+from zoho_http_transport import TransportResponse, apply_token
+
+
+class _FakeTransport:
+    """
+    エクスポートジョブのAPIを真似る（AsyncZohoSession と同じく 401 ならトークンを更新して1回だけ再送する）
+    ジョブは作成後 polls_until_done 回目の状態確認で job_code になり、None なら終わらない
+    """
+
+    def __init__(self, job_code='1004', polls_until_done=2, valid_token='TOKEN'):
+        self.job_code = job_code
+        self.polls_until_done = polls_until_done
+        self.valid_token = valid_token
+        self.token_refresher = None
+        self.polls = {}
+        self.active_jobs = 0
+        self.max_active_jobs = 0
+        self.unauthorized = 0
+
+    async def request(self, method, url, headers=None, **kwargs):
+        response = await self._handle(url, headers)
+        if response.status == 401 and self.token_refresher:
+            new_token = await self.token_refresher()
+            if new_token:
+                apply_token(headers, new_token)
+                response = await self._handle(url, headers)
+        return response
+
+    async def _handle(self, url, headers):
+        # 実際の通信と同じく、応答の前に他のタスクへ順番を回す
+        await asyncio.sleep(0)
+        if headers['Authorization'] != f"Zoho-oauthtoken {self.valid_token}":
+            self.unauthorized += 1
+            return self._response(401, {'status': 'failure'})
+        if '/data?CONFIG=' in url:
+            job_id = f"J{len(self.polls) + 1}"
+            self.polls[job_id] = 0
+            self.active_jobs += 1
+            self.max_active_jobs = max(self.max_active_jobs, self.active_jobs)
+            return self._response(200, {'data': {'jobId': job_id}})
+        if url.endswith('/data'):
+            self.active_jobs -= 1
+            return self._response(200, {'data': [{'id': url.split('/')[-2]}]})
+        if '/exportjobs/' in url:
+            job_id = url.rsplit('/', 1)[1]
+            self.polls[job_id] += 1
+            if self.job_code is None or self.polls[job_id] < self.polls_until_done:
+                return self._response(200, {'data': {'jobCode': '1002', 'jobStatus': 'JOB IN PROGRESS'}})
+            if self.job_code != '1004':
+                self.active_jobs -= 1
+            return self._response(200, {'data': {'jobCode': self.job_code}})
+        return self._response(200, {'data': {'workspaces': []}})
+
+    @staticmethod
+    def _response(status, data):
+        return TransportResponse(status, {}, json.dumps(data))
+
+
+class _FakeTokenManager:
+    """auto_refresh は別スレッドで呼ばれる（同時の401が重なるよう少し待つ）"""
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.refreshes = 0
+
+    def auto_refresh(self):
+        time.sleep(0.05)
+        self.refreshes += 1
+        self.transport.valid_token = f"TOKEN{self.refreshes}"
+        return True
+
+    def get_current_token(self):
+        return f"TOKEN{self.refreshes}"
+
+
+def _client(transport, **kwargs):
+    options = dict(access_token='TOKEN', workspace_id='WS', poll_interval=0, log=lambda *args: None)
+    options.update(kwargs)
+    client = AsyncZohoAnalyticsAPIAuto(transport=transport, **options)
+    transport.token_refresher = client._refresh_for_retry
+    return client
+
+
+def test_polls_until_job_completes():
+    transport = _FakeTransport(polls_until_done=3)
+    result = asyncio.run(_client(transport).execute_query("SELECT 1"))
+    assert result == {'data': [{'id': 'J1'}]}
+    assert transport.polls == {'J1': 3}
+
+
+def test_failed_job_returns_none():
+    transport = _FakeTransport(job_code='1003')
+    assert asyncio.run(_client(transport).execute_query("SELECT 1")) is None
+    assert transport.polls == {'J1': 2}
+
+
+def test_wait_timeout_returns_none():
+    transport = _FakeTransport(job_code=None)
+    client = _client(transport, poll_interval=0.01)
+    started = time.perf_counter()
+    assert asyncio.run(client.execute_query("SELECT 1", max_wait_time=0.05)) is None
+    assert time.perf_counter() - started < 1
+    assert transport.polls['J1'] >= 2
+
+
+def test_cancellation_propagates_and_releases_slot():
+    transport = _FakeTransport(job_code=None)
+    client = _client(transport, poll_interval=0.01, max_concurrency=1)
+
+    async def scenario():
+        task = asyncio.create_task(client.execute_query("SELECT 1"))
+        while not transport.polls.get('J1'):
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # キャンセルされたジョブの枠は返っている
+        transport.job_code = '1004'
+        return await asyncio.wait_for(client.execute_query("SELECT 2"), 1)
+
+    assert asyncio.run(scenario()) == {'data': [{'id': 'J2'}]}
+
+
+def test_concurrent_jobs_are_bounded():
+    transport = _FakeTransport(polls_until_done=3)
+    client = _client(transport, max_concurrency=2)
+
+    async def scenario():
+        return await asyncio.gather(*(client.execute_query(f"SELECT {i}") for i in range(6)))
+
+    results = asyncio.run(scenario())
+    assert sorted(result['data'][0]['id'] for result in results) == [f"J{i}" for i in range(1, 7)]
+    assert transport.max_active_jobs == 2
+
+
+def test_concurrent_401s_refresh_token_once():
+    transport = _FakeTransport(valid_token='TOKEN1')
+    client = _client(transport, access_token='EXPIRED')
+    client.token_manager = _FakeTokenManager(transport)
+
+    async def scenario():
+        return await asyncio.gather(*(client.get_workspaces() for _ in range(5)))
+
+    results = asyncio.run(scenario())
+    assert results == [{'data': {'workspaces': []}}] * 5
+    assert transport.unauthorized == 5
+    assert client.token_manager.refreshes == 1
+    assert client.access_token == 'TOKEN1'
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""zoho_metrics: APIクレジットの概算と出力先"""
+
+import zoho_metrics
+from zoho_metrics import MetricsRegistry, estimate_credits
+
+
+def test_credits_only_for_zoho_hosts():
+    assert estimate_credits('GET /crm/v2/Deals', 200, 'www.zohoapis.com') == 1
+    assert estimate_credits('POST /crm/bulk/v2/read', 201, 'www.zohoapis.com') == 50
+    assert estimate_credits('GET /restapi/v2/workspaces', 200, 'analyticsapi.zoho.com') == 1
+    assert estimate_credits('POST /oauth/v2/token', 200, 'accounts.zoho.com') == 0
+    # n8n などZoho以外へのHTTP呼び出しは記録してもクレジットには数えない
+    assert estimate_credits('GET /api/v1/workflows', 200, 'n8n.example.com') == 0
+    assert estimate_credits('GET /api/v1/workflows', 200, None) == 0
+
+
+def test_failed_calls_use_no_credits():
+    for status in (401, 429, 503, 'error'):
+        assert estimate_credits('GET /crm/v2/Deals', status, 'www.zohoapis.com') == 0
+
+
+def test_observe_request_counts_credits_by_host():
+    registry = MetricsRegistry(script='test')
+    registry.observe_request('GET /crm/v2/Deals', 200, 0.1, 100, 'www.zohoapis.com')
+    registry.observe_request('GET /api/v1/workflows', 200, 0.1, 100, 'localhost')
+    totals = registry.summary()['totals']
+    assert totals['requests'] == 2 and totals['estimated_credits'] == 1
+
+
+def test_metrics_dir_from_env(monkeypatch, tmp_path):
+    monkeypatch.setenv('ZOHO_METRICS_DIR', 'off')
+    assert zoho_metrics.metrics_dir() is None
+    assert MetricsRegistry(script='test').export() is None
+
+    monkeypatch.setenv('ZOHO_METRICS_DIR', str(tmp_path))
+    prom_path, summary_path = MetricsRegistry(script='test').export()
+    assert prom_path.parent == tmp_path and summary_path.exists()
+
+    monkeypatch.delenv('ZOHO_METRICS_DIR')
+    assert zoho_metrics.metrics_dir() == zoho_metrics.DEFAULT_METRICS_DIR
+    assert not zoho_metrics.DEFAULT_METRICS_DIR.is_absolute()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""zoho_tools: 分析スクリプトの main(context) の終了ステータスと、コマンド間で共有する ZohoContext"""
+
+import json
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+import zoho_context
+import zoho_tools
+from zoho_context import ZohoContext
+from zoho_http_transport import ResponseCache
+
+INVOICES_URL = "https://www.zohoapis.com/books/v3/invoices"
+
+
+class _Response:
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self.headers = {}
+        self._data = data or {}
+        self.content = json.dumps(self._data).encode('utf-8')
+
+    def json(self):
+        return self._data
+
+
+class _FakeHTTP:
+    """
+    requests.Session の代わり（送ったリクエストを記録する）
+    組織一覧・CRMの商談（0件）・日付降順の請求書一覧（invoice_pages ページ）を返し、条件付きGETには304を返す
+    """
+
+    def __init__(self, invoice_pages=2):
+        self.invoice_pages = invoice_pages
+        self.calls = []
+
+    def request(self, method, url, headers=None, params=None, **kwargs):
+        params = dict(params or {})
+        self.calls.append((method, url, params, dict(headers or {})))
+        if 'If-Modified-Since' in (headers or {}):
+            return _Response(304)
+        if url.endswith('/organizations'):
+            return _Response(200, {'organizations': [{'organization_id': 'ORG-API', 'name': zoho_context.BOOKS_ORG_NAME}]})
+        if '/crm/' in url:
+            return _Response(200, {'data': [], 'info': {'more_records': False}})
+        page = int(params.get('page', 1))
+        invoice = {'invoice_id': f"{page}-{len(self.calls)}", 'invoice_number': f"INV-{page}", 'total': 1100,
+                   'reference_number': '', 'customer_name': 'JT ETP事務局', 'date': '2025-06-01', 'status': 'sent'}
+        return _Response(200, {'invoices': [invoice], 'page_context': {'has_more_page': page < self.invoice_pages}})
+
+    def close(self):
+        pass
+
+    def urls(self, suffix):
+        return [(url, params.get('page')) for _, url, params, _ in self.calls if url.endswith(suffix)]
+
+
+@pytest.fixture
+def http(monkeypatch):
+    http = _FakeHTTP()
+    monkeypatch.setattr(zoho_context, 'requests', SimpleNamespace(Session=lambda: http))
+    return http
+
+
+@pytest.fixture
+def token_dir(tmp_path):
+    for name in zoho_context.TOKEN_FILES.values():
+        (tmp_path / name).write_text(json.dumps({'access_token': 'x'}), encoding='utf-8')
+    return tmp_path
+
+
+class _NoOrgContext:
+    """トークン・セッションは用意できるが、Books組織IDが取得できないコンテキスト"""
+
+    def session(self, service, projection=None):
+        return object()
+
+    def headers(self, service):
+        return {}
+
+    def books_org_id(self, refresh=False):
+        return None
+
+
+@pytest.mark.parametrize('name', ['leakage', 'invoice-leakage', 'invoice-match', 'jt-etp', 'books-jt', 'pattern',
+                                  'hierarchy', 'relations', 'jt-etp-detail', 'parent-invoices'])
+def test_failed_analysis_returns_nonzero(name):
+    assert zoho_tools.run_command(_NoOrgContext(), name, []) == 1
+
+
+def test_shared_response_cache_hit_and_miss(http, token_dir):
+    context = ZohoContext(token_dir, org_cache_file=None, share_responses=True)
+    first = context.session('books').get(INVOICES_URL, headers=context.headers('books'),
+                                         params={'organization_id': 'ORG', 'page': 1})
+    # 別のセッション・パラメータの順序違いでも同じGETならキャッシュから返す
+    again = context.session('books').get(INVOICES_URL, headers=context.headers('books'),
+                                         params={'page': 1, 'organization_id': 'ORG'})
+    other_page = context.session('books').get(INVOICES_URL, headers=context.headers('books'),
+                                              params={'organization_id': 'ORG', 'page': 2})
+    assert len(http.calls) == 2
+    assert again.json() == first.json() and again is not first
+    assert other_page.json() != first.json()
+    assert context.stats()['cache_hits'] == 1
+
+
+def test_conditional_get_bypasses_response_cache(http, token_dir):
+    context = ZohoContext(token_dir, org_cache_file=None, share_responses=True)
+    headers = context.headers('books')
+    conditional = dict(headers, **{'If-Modified-Since': '2025-07-01T00:00:00'})
+
+    def get(request_headers):
+        return context.session('books').get(INVOICES_URL, headers=request_headers, params={'organization_id': 'ORG'})
+
+    assert get(headers).status_code == 200
+    # 条件付きGETはキャッシュ済みの全件の応答を返さず、304 も保存しない
+    assert get(conditional).status_code == 304
+    assert get(conditional).status_code == 304
+    assert get(headers).status_code == 200
+    assert len(http.calls) == 3
+
+
+def test_response_cache_is_bounded():
+    cache = ResponseCache(max_entries=2)
+    for key in ('a', 'b'):
+        cache.put(key, key)
+    assert cache.get('a') == 'a'
+    cache.put('c', 'c')
+    # 最近使っていない b から捨てる
+    assert len(cache) == 2 and cache.get('b') is None and cache.get('a') == 'a'
+
+
+def _write_org_cache(path, org_id, fetched_at):
+    path.write_text(json.dumps({'organization_id': org_id, 'fetched_at': fetched_at.isoformat()}), encoding='utf-8')
+
+
+def test_org_id_cache_skips_organizations_call(http, token_dir):
+    cache_file = token_dir / "org.json"
+    _write_org_cache(cache_file, 'ORG-CACHED', datetime.now() - timedelta(days=1))
+    context = ZohoContext(token_dir, org_cache_file=cache_file)
+    assert context.books_org_id() == 'ORG-CACHED'
+    assert http.calls == []
+
+
+def test_expired_org_id_cache_is_refetched(http, token_dir):
+    cache_file = token_dir / "org.json"
+    _write_org_cache(cache_file, 'ORG-OLD', datetime.now() - timedelta(days=zoho_context.ORG_CACHE_DAYS + 1))
+    context = ZohoContext(token_dir, org_cache_file=cache_file)
+    assert context.cached_books_org_id() is None
+    assert context.books_org_id() == 'ORG-API'
+    assert len(http.urls('/organizations')) == 1
+    # 取得し直した組織IDをキャッシュに保存し、次のプロセスはAPIを呼ばない
+    assert json.loads(cache_file.read_text(encoding='utf-8'))['organization_id'] == 'ORG-API'
+    assert ZohoContext(token_dir, org_cache_file=cache_file).books_org_id() == 'ORG-API'
+    assert len(http.urls('/organizations')) == 1
+
+
+def test_org_id_refresh_command_ignores_cache(http, token_dir, capsys):
+    cache_file = token_dir / "org.json"
+    _write_org_cache(cache_file, 'ORG-CACHED', datetime.now())
+    context = ZohoContext(token_dir, org_cache_file=cache_file)
+    assert zoho_tools.run_command(context, 'org-id', []) == 0
+    assert http.calls == []
+    assert zoho_tools.run_command(context, 'org-id', ['--refresh']) == 0
+    assert capsys.readouterr().out.split() == ['ORG-CACHED', 'ORG-API']
+    assert len(http.urls('/organizations')) == 1
+
+
+def test_batch_shares_fetched_invoice_pages(http, token_dir, monkeypatch):
+    from improved_invoice_matcher import ImprovedInvoiceMatcher
+
+    monkeypatch.setattr(ImprovedInvoiceMatcher, 'export_results_to_csv', lambda self, results: None)
+    cache_file = token_dir / "org.json"
+    _write_org_cache(cache_file, 'ORG', datetime.now())
+    context = ZohoContext(token_dir, org_cache_file=cache_file, share_responses=True)
+
+    assert zoho_tools.run_command(context, 'batch', ['invoice-match', 'parent-invoices']) == 0
+    # 請求書一覧の各ページは batch 全体で1回だけ取得する
+    assert http.urls('/invoices') == [(INVOICES_URL, 1), (INVOICES_URL, 2)]
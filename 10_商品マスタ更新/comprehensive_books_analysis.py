@@ -3,28 +3,30 @@
 ZohoBooks 包括的分析
 JT ETP関連請求書の完全な紐づけ把握
 """
-import requests
-import json
+import sys
 from pathlib import Path
 import pandas as pd
 from datetime import datetime
 import time
 import re
 
+sys.path.append(str(Path(__file__).parent.parent / "01_Zoho_API" / "APIクライアント"))
+from zoho_context import ContextError, ZohoContext
+
 class ComprehensiveBooksAnalyzer:
-    def __init__(self):
+    def __init__(self, context=None):
         self.base_path = Path(__file__).parent.parent / "01_Zoho_API" / "認証・トークン"
+        self.context = context or ZohoContext(self.base_path)
+        self.books_session = self.context.session('books')
         self.load_tokens()
         self.org_id = self.get_org_id()
         self.target_parent_id = "5187347000129692086"
 
     def load_tokens(self):
-        """トークンを読み込み"""
+        """トークンを読み込み（同じコンテキストの分析とヘッダーを共有）"""
         try:
-            with open(self.base_path / "zoho_books_tokens.json", 'r') as f:
-                books_tokens = json.load(f)
-            self.books_headers = {'Authorization': f'Bearer {books_tokens["access_token"]}'}
-        except Exception as e:
+            self.books_headers = self.context.headers('books')
+        except ContextError as e:
             print(f"❌ トークン読み込みエラー: {str(e)}")
             self.books_headers = None
 
@@ -32,18 +34,7 @@ class ComprehensiveBooksAnalyzer:
         """Books組織IDを取得"""
         if not self.books_headers:
             return None
-        
-        try:
-            response = requests.get("https://www.zohoapis.com/books/v3/organizations", headers=self.books_headers)
-            if response.status_code == 200:
-                orgs = response.json()['organizations']
-                for org in orgs:
-                    if '株式会社シー・ティー・エス' in org.get('name', ''):
-                        return org['organization_id']
-                return orgs[0]['organization_id'] if orgs else None
-        except Exception as e:
-            print(f"❌ 組織ID取得エラー: {str(e)}")
-        return None
+        return self.context.books_org_id()
 
     def search_jt_invoices_comprehensive(self):
         """JT関連請求書を包括的に検索"""
@@ -103,7 +94,7 @@ class ComprehensiveBooksAnalyzer:
             params.update(search_params)
             
             try:
-                response = requests.get(url, headers=self.books_headers, params=params)
+                response = self.books_session.get(url, headers=self.books_headers, params=params)
                 
                 if response.status_code == 200:
                     data = response.json()
@@ -216,7 +207,7 @@ class ComprehensiveBooksAnalyzer:
         params = {'organization_id': self.org_id}
         
         try:
-            response = requests.get(url, headers=self.books_headers, params=params)
+            response = self.books_session.get(url, headers=self.books_headers, params=params)
             if response.status_code == 200:
                 return response.json()['invoice']
         except Exception as e:
@@ -378,24 +369,24 @@ class ComprehensiveBooksAnalyzer:
         
         print(f"✅ エクスポート完了: {output_dir}")
 
-def main():
-    """メイン処理"""
+def main(context=None):
+    """メイン処理（context: zoho_tools から共有する ZohoContext）"""
     print("="*90)
     print("🔍 ZohoBooks JT ETP 包括分析")
     print("="*90)
     
-    analyzer = ComprehensiveBooksAnalyzer()
+    analyzer = ComprehensiveBooksAnalyzer(context)
     
     if not analyzer.org_id:
         print("❌ 認証に失敗しました。トークンを確認してください。")
-        return
+        return 1
     
     # 1. JT関連請求書の包括検索
     all_invoices, jt_invoices = analyzer.search_jt_invoices_comprehensive()
     
     if not jt_invoices:
         print("❌ JT関連請求書が見つかりませんでした")
-        return
+        return 1
     
     # 2. 詳細分析
     detailed_invoices, period_analysis, reference_patterns = analyzer.analyze_jt_invoice_details(jt_invoices)
@@ -412,6 +403,7 @@ def main():
     analyzer.export_comprehensive_results(detailed_invoices, analysis_summary)
     
     print(f"\n✅ ZohoBooks JT ETP 包括分析完了")
+    return 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
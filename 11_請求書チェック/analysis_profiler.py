@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+請求漏れ分析用プロファイラ
+各フェーズの壁時計時間・CPU時間・HTTP待ち時間を計測し、
+--profile 指定時はフェーズ別内訳レポート（_phases.json）を出力
+
+使い方:
+    python correct_invoice_leakage_analyzer.py --profile            # フェーズ計測のみ
+    python correct_invoice_leakage_analyzer.py --profile=cprofile   # cProfile (.prof) も取得
+    python correct_invoice_leakage_analyzer.py --profile=sample     # サンプリングでスタック収集 (.folded)
+
+スタックファイル（.folded）はサンプリング時だけ出力し、flamegraph.pl / speedscope でそのまま読み込める。
+cProfile の結果は呼び出し元ごとの集計で関数のスタックを持たないため .prof のみ
+（snakeviz や python -m pstats で見る）
+"""
+import cProfile
+import json
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "01_Zoho_API" / "APIクライアント"))
+try:
+    from zoho_metrics import METRICS
+except ImportError:
+    METRICS = None
+
+PROFILE_MODES = ('timers', 'cprofile', 'sample')
+
+
+def parse_profile_mode(argv=None):
+    """コマンドライン引数から --profile[=mode] を取り出す（未指定ならNone）"""
+    for arg in (sys.argv[1:] if argv is None else argv):
+        if arg == '--profile':
+            return 'timers'
+        if arg.startswith('--profile='):
+            mode = arg.split('=', 1)[1]
+            if mode not in PROFILE_MODES:
+                raise ValueError(f"--profile の指定が不正です: {mode}（{', '.join(PROFILE_MODES)}）")
+            return mode
+    return None
+
+
+def _http_totals():
+    """METRICSに記録済みのHTTP待ち時間とリクエスト数"""
+    if METRICS is None:
+        return 0.0, 0
+    return METRICS.http_totals()
+
+
+class StackSampler:
+    """メインスレッドのスタックを一定間隔で採取する軽量サンプリングプロファイラ"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = Counter()
+        self.current_phase = None
+        self._target_thread_id = threading.main_thread().ident
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target_thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{Path(code.co_filename).stem}:{code.co_name}")
+                frame = frame.f_back
+            stack.reverse()
+            if self.current_phase:
+                stack.insert(0, self.current_phase)
+            self.samples[';'.join(stack)] += 1
+
+
+class AnalysisProfiler:
+    """分析フェーズの計測とプロファイル結果の出力"""
+
+    def __init__(self, name, mode=None, output_dir=None):
+        """
+        Args:
+            name (str): 出力ファイル名に使う分析名
+            mode (str): None / 'timers' / 'cprofile' / 'sample'
+            output_dir (Path): 出力先（既定: ./プロファイル結果）
+        """
+        self.name = name
+        self.mode = mode
+        self.output_dir = Path(output_dir or Path(__file__).parent / "プロファイル結果")
+        self.phases = []
+        self._profile = None
+        self._sampler = None
+        self._started = None
+
+    @classmethod
+    def from_argv(cls, name, argv=None):
+        return cls(name, parse_profile_mode(argv))
+
+    @property
+    def enabled(self):
+        return self.mode is not None
+
+    def __enter__(self):
+        self._started = (time.perf_counter(), time.process_time())
+        if self.mode == 'cprofile':
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        elif self.mode == 'sample':
+            self._sampler = StackSampler()
+            self._sampler.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._profile:
+            self._profile.disable()
+        if self._sampler:
+            self._sampler.stop()
+        if self.enabled:
+            self.print_report()
+            self.save()
+        return False
+
+    @contextmanager
+    def phase(self, name):
+        """フェーズを計測（--profile 未指定でもMETRICSには記録）"""
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        http_start, requests_start = _http_totals()
+        if self._sampler:
+            self._sampler.current_phase = name
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            http_end, requests_end = _http_totals()
+            if self._sampler:
+                self._sampler.current_phase = None
+            self.phases.append({
+                'phase': name,
+                'wall_seconds': wall,
+                'cpu_seconds': cpu,
+                'http_seconds': http_end - http_start,
+                'http_requests': requests_end - requests_start
+            })
+            if METRICS is not None:
+                METRICS.record_phase(name, wall, cpu)
+
+    def print_report(self):
+        """フェーズ別内訳を表示"""
+        total_wall = time.perf_counter() - self._started[0]
+        total_cpu = time.process_time() - self._started[1]
+
+        print("\n" + "="*90)
+        print(f"⏱️ フェーズ別プロファイル: {self.name}")
+        print("="*90)
+        print(f"  {'フェーズ':<20}{'壁時計':>10}{'CPU':>10}{'HTTP待ち':>10}{'リクエスト':>10}{'構成比':>8}")
+        for phase in self.phases:
+            ratio = phase['wall_seconds'] / total_wall * 100 if total_wall > 0 else 0
+            print(f"  {phase['phase']:<20}"
+                  f"{phase['wall_seconds']:>9.2f}s{phase['cpu_seconds']:>9.2f}s"
+                  f"{phase['http_seconds']:>9.2f}s{phase['http_requests']:>10}{ratio:>7.1f}%")
+        print(f"  {'合計':<20}{total_wall:>9.2f}s{total_cpu:>9.2f}s")
+
+        if self._profile:
+            print(f"\n  🔍 累積時間上位15関数:")
+            stats = pstats.Stats(self._profile)
+            stats.sort_stats('cumulative').print_stats(15)
+        print("="*90)
+
+    def folded_stacks(self):
+        """フレームグラフ用の折りたたみスタック（重みはサンプル数。サンプリング時以外は空）"""
+        if not self._sampler:
+            return []
+        return [f"{self.name};{stack} {count}" for stack, count in self._sampler.samples.most_common()]
+
+    def save(self):
+        """内訳JSONと、サンプリング時はスタックファイル・cProfile 時は .prof を保存"""
+        self.output_dir.mkdir(exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        base = self.output_dir / f"{self.name}_{timestamp}"
+
+        with open(f"{base}_phases.json", 'w', encoding='utf-8') as f:
+            json.dump({
+                'name': self.name,
+                'mode': self.mode,
+                'total_wall_seconds': time.perf_counter() - self._started[0],
+                'total_cpu_seconds': time.process_time() - self._started[1],
+                'phases': self.phases
+            }, f, ensure_ascii=False, indent=2)
+
+        saved = [f"{base}_phases.json"]
+        if self._sampler:
+            with open(f"{base}.folded", 'w', encoding='utf-8') as f:
+                f.write('\n'.join(self.folded_stacks()) + '\n')
+            saved.append(f"{base}.folded")
+
+        if self._profile:
+            self._profile.dump_stats(f"{base}.prof")
+            saved.append(f"{base}.prof")
+
+        print(f"📁 プロファイル結果を保存: {' / '.join(saved)}")
@@ -3,42 +3,31 @@
 ZohoCRMとZohoBooksの商談と請求書の関連分析スクリプト
 テーブル構造、フィールド、紐づけロジックを調査
 """
-import requests
-import json
+import sys
 from pathlib import Path
 from datetime import datetime
-import pandas as pd
 
-def analyze_crm_books_relations():
-    """CRMとBooksのテーブル関連を分析"""
-    
-    # トークンファイルの読み込み
-    base_path = Path(__file__).parent.parent / "01_Zoho_API" / "認証・トークン"
-    
-    with open(base_path / "zoho_crm_tokens.json", 'r') as f:
-        crm_tokens = json.load(f)
-    
-    with open(base_path / "zoho_books_tokens.json", 'r') as f:
-        books_tokens = json.load(f)
+sys.path.append(str(Path(__file__).parent.parent / "01_Zoho_API" / "APIクライアント"))
+from zoho_context import ZohoContext
+
+def analyze_crm_books_relations(context=None):
+    """CRMとBooksのテーブル関連を分析（context: zoho_tools から共有する ZohoContext）"""
     
-    crm_headers = {'Authorization': f'Bearer {crm_tokens["access_token"]}'}
-    books_headers = {'Authorization': f'Bearer {books_tokens["access_token"]}'}
+    # トークン・セッション
+    context = context or ZohoContext(Path(__file__).parent.parent / "01_Zoho_API" / "認証・トークン")
+    crm_session = context.session('crm')
+    books_session = context.session('books')
+    crm_headers = context.headers('crm')
+    books_headers = context.headers('books')
     
     print("="*70)
     print("ZohoCRM & Books テーブル関連分析")
     print("="*70)
     
-    # Books組織ID取得
-    org_response = requests.get("https://www.zohoapis.com/books/v3/organizations", headers=books_headers)
-    org_id = None
-    if org_response.status_code == 200:
-        orgs = org_response.json()['organizations']
-        for org in orgs:
-            if '株式会社シー・ティー・エス' in org.get('name', ''):
-                org_id = org['organization_id']
-                break
-        if not org_id and orgs:
-            org_id = orgs[0]['organization_id']
+    org_id = context.books_org_id()
+    if not org_id:
+        print("❌ Books組織IDが取得できませんでした")
+        return 1
     
     print(f"使用する組織ID: {org_id}\n")
     
@@ -49,7 +38,7 @@ def analyze_crm_books_relations():
     crm_deals_url = "https://www.zohoapis.com/crm/v2/Deals"
     params = {'per_page': 3}
     
-    crm_response = requests.get(crm_deals_url, headers=crm_headers, params=params)
+    crm_response = crm_session.get(crm_deals_url, headers=crm_headers, params=params)
     
     if crm_response.status_code == 200:
         crm_data = crm_response.json()
@@ -95,7 +84,7 @@ def analyze_crm_books_relations():
     books_invoices_url = "https://www.zohoapis.com/books/v3/invoices"
     params = {'organization_id': org_id, 'per_page': 3}
     
-    books_response = requests.get(books_invoices_url, headers=books_headers, params=params)
+    books_response = books_session.get(books_invoices_url, headers=books_headers, params=params)
     
     if books_response.status_code == 200:
         books_data = books_response.json()
@@ -136,7 +125,7 @@ def analyze_crm_books_relations():
     books_contacts_url = "https://www.zohoapis.com/books/v3/contacts"
     params = {'organization_id': org_id, 'per_page': 3}
     
-    contacts_response = requests.get(books_contacts_url, headers=books_headers, params=params)
+    contacts_response = books_session.get(books_contacts_url, headers=books_headers, params=params)
     
     if contacts_response.status_code == 200:
         contacts_data = contacts_response.json()
@@ -186,16 +175,17 @@ def analyze_crm_books_relations():
     print("="*50)
     
     # より多くのデータを取得して分析
-    crm_deals = get_crm_deals_detailed(crm_headers)
-    books_invoices = get_books_invoices_detailed(books_headers, org_id)
-    books_contacts = get_books_contacts_detailed(books_headers, org_id)
+    crm_deals = get_crm_deals_detailed(crm_session, crm_headers)
+    books_invoices = get_books_invoices_detailed(books_session, books_headers, org_id)
+    books_contacts = get_books_contacts_detailed(books_session, books_headers, org_id)
     
     analyze_matching_possibilities(crm_deals, books_invoices, books_contacts)
     
     print("\n" + "="*70)
     print("分析完了")
+    return 0
 
-def get_crm_deals_detailed(headers):
+def get_crm_deals_detailed(session, headers):
     """詳細な商談データを取得"""
     url = "https://www.zohoapis.com/crm/v2/Deals"
     params = {
@@ -206,7 +196,7 @@ def get_crm_deals_detailed(headers):
     }
     
     try:
-        response = requests.get(url, headers=headers, params=params)
+        response = session.get(url, headers=headers, params=params)
         if response.status_code == 200:
             data = response.json()
             return data.get('data', [])
@@ -214,7 +204,7 @@ def get_crm_deals_detailed(headers):
         print(f"CRM取得エラー: {str(e)}")
     return []
 
-def get_books_invoices_detailed(headers, org_id):
+def get_books_invoices_detailed(session, headers, org_id):
     """詳細な請求書データを取得"""
     url = "https://www.zohoapis.com/books/v3/invoices"
     params = {
@@ -225,7 +215,7 @@ def get_books_invoices_detailed(headers, org_id):
     }
     
     try:
-        response = requests.get(url, headers=headers, params=params)
+        response = session.get(url, headers=headers, params=params)
         if response.status_code == 200:
             data = response.json()
             return data.get('invoices', [])
@@ -233,7 +223,7 @@ def get_books_invoices_detailed(headers, org_id):
         print(f"Books請求書取得エラー: {str(e)}")
     return []
 
-def get_books_contacts_detailed(headers, org_id):
+def get_books_contacts_detailed(session, headers, org_id):
     """詳細な顧客データを取得"""
     url = "https://www.zohoapis.com/books/v3/contacts"
     params = {
@@ -242,7 +232,7 @@ def get_books_contacts_detailed(headers, org_id):
     }
     
     try:
-        response = requests.get(url, headers=headers, params=params)
+        response = session.get(url, headers=headers, params=params)
         if response.status_code == 200:
             data = response.json()
             return data.get('contacts', [])
@@ -330,5 +320,9 @@ def analyze_matching_possibilities(deals, invoices, contacts):
     for match in amount_matches[:3]:  # 最初の3組を表示
         print(f"    {match['deal_name']} → {match['invoice_number']} (¥{match['amount']:,.0f})")
 
+def main(context=None):
+    """メイン処理（context: zoho_tools から共有する ZohoContext）"""
+    return analyze_crm_books_relations(context)
+
 if __name__ == "__main__":
-    analyze_crm_books_relations()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -3,39 +3,32 @@
 ZohoCRM商談の親子構造分析スクリプト
 商談の階層関係と請求書への影響を調査
 """
-import requests
-import json
+import sys
 from pathlib import Path
 from collections import defaultdict
 import pandas as pd
 from datetime import datetime
 
+sys.path.append(str(Path(__file__).parent.parent / "01_Zoho_API" / "APIクライアント"))
+from zoho_context import ZohoContext
+
 class DealHierarchyAnalyzer:
-    def __init__(self):
+    def __init__(self, context=None):
         self.base_path = Path(__file__).parent.parent / "01_Zoho_API" / "認証・トークン"
+        self.context = context or ZohoContext(self.base_path)
+        self.crm_session = self.context.session('crm')
+        self.books_session = self.context.session('books')
         self.load_tokens()
         self.org_id = self.get_org_id()
     
     def load_tokens(self):
-        """トークンを読み込み"""
-        with open(self.base_path / "zoho_crm_tokens.json", 'r') as f:
-            crm_tokens = json.load(f)
-        with open(self.base_path / "zoho_books_tokens.json", 'r') as f:
-            books_tokens = json.load(f)
-        
-        self.crm_headers = {'Authorization': f'Bearer {crm_tokens["access_token"]}'}
-        self.books_headers = {'Authorization': f'Bearer {books_tokens["access_token"]}'}
+        """トークンを読み込み（同じコンテキストの分析とヘッダーを共有）"""
+        self.crm_headers = self.context.headers('crm')
+        self.books_headers = self.context.headers('books')
     
     def get_org_id(self):
         """Books組織IDを取得"""
-        response = requests.get("https://www.zohoapis.com/books/v3/organizations", headers=self.books_headers)
-        if response.status_code == 200:
-            orgs = response.json()['organizations']
-            for org in orgs:
-                if '株式会社シー・ティー・エス' in org.get('name', ''):
-                    return org['organization_id']
-            return orgs[0]['organization_id'] if orgs else None
-        return None
+        return self.context.books_org_id()
     
     def get_deal_fields_info(self):
         """商談モジュールのフィールド情報を取得"""
@@ -45,7 +38,7 @@ class DealHierarchyAnalyzer:
         params = {'module': 'Deals'}
         
         try:
-            response = requests.get(url, headers=self.crm_headers, params=params)
+            response = self.crm_session.get(url, headers=self.crm_headers, params=params)
             if response.status_code == 200:
                 field_data = response.json()
                 fields = field_data.get('fields', [])
@@ -94,7 +87,7 @@ class DealHierarchyAnalyzer:
         }
         
         try:
-            response = requests.get(url, headers=self.crm_headers, params=params)
+            response = self.crm_session.get(url, headers=self.crm_headers, params=params)
             if response.status_code == 200:
                 data = response.json()
                 deals = data.get('data', [])
@@ -204,7 +197,7 @@ class DealHierarchyAnalyzer:
         }
         
         try:
-            response = requests.get(url, headers=self.books_headers, params=params)
+            response = self.books_session.get(url, headers=self.books_headers, params=params)
             if response.status_code == 200:
                 invoices = response.json().get('invoices', [])
                 print(f"✅ {len(invoices)}件の請求書を取得")
@@ -383,17 +376,17 @@ class DealHierarchyAnalyzer:
             df.to_csv(file_path, index=False, encoding='utf-8-sig')
             print(f"\n📁 階層分析結果を保存: {file_path}")
 
-def main():
-    """メイン処理"""
+def main(context=None):
+    """メイン処理（context: zoho_tools から共有する ZohoContext）"""
     print("="*70)
     print("ZohoCRM 商談階層構造分析ツール")
     print("="*70)
     
-    analyzer = DealHierarchyAnalyzer()
+    analyzer = DealHierarchyAnalyzer(context)
     
     if not analyzer.org_id:
         print("❌ Books組織IDが取得できませんでした")
-        return
+        return 1
     
     # 1. フィールド情報の取得
     fields, hierarchy_fields = analyzer.get_deal_fields_info()
@@ -403,7 +396,7 @@ def main():
     
     if not deals:
         print("❌ 商談データが取得できませんでした")
-        return
+        return 1
     
     # 3. 階層パターンの分析
     patterns = analyzer.analyze_hierarchy_patterns(deals)
@@ -419,6 +412,7 @@ def main():
     
     print("\n" + "="*70)
     print("階層構造分析完了")
+    return 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -3,36 +3,28 @@
 JT ETP事務局案件の詳細分析
 110円請求書除外、上期/下期分離分析
 """
-import requests
-import json
+import sys
 from pathlib import Path
 import pandas as pd
 from datetime import datetime
 
-def analyze_jt_etp_detail():
-    """JT ETP事務局案件の詳細分析"""
-    
-    # トークン読み込み
-    base_path = Path(__file__).parent.parent / "01_Zoho_API" / "認証・トークン"
-    with open(base_path / "zoho_crm_tokens.json", 'r') as f:
-        crm_tokens = json.load(f)
-    with open(base_path / "zoho_books_tokens.json", 'r') as f:
-        books_tokens = json.load(f)
-    
-    crm_headers = {'Authorization': f'Bearer {crm_tokens["access_token"]}'}
-    books_headers = {'Authorization': f'Bearer {books_tokens["access_token"]}'}
-    
-    # Books組織ID取得
-    org_response = requests.get("https://www.zohoapis.com/books/v3/organizations", headers=books_headers)
-    org_id = None
-    if org_response.status_code == 200:
-        orgs = org_response.json()['organizations']
-        for org in orgs:
-            if '株式会社シー・ティー・エス' in org.get('name', ''):
-                org_id = org['organization_id']
-                break
-        if not org_id and orgs:
-            org_id = orgs[0]['organization_id']
+sys.path.append(str(Path(__file__).parent.parent / "01_Zoho_API" / "APIクライアント"))
+from zoho_context import ZohoContext
+
+def analyze_jt_etp_detail(context=None):
+    """JT ETP事務局案件の詳細分析（context: zoho_tools から共有する ZohoContext）"""
+    
+    # トークン・セッション・組織ID
+    context = context or ZohoContext(Path(__file__).parent.parent / "01_Zoho_API" / "認証・トークン")
+    crm_session = context.session('crm')
+    books_session = context.session('books')
+    crm_headers = context.headers('crm')
+    books_headers = context.headers('books')
+    
+    org_id = context.books_org_id()
+    if not org_id:
+        print("❌ Books組織IDが取得できませんでした")
+        return 1
     
     print("="*80)
     print("🔍 JT ETP事務局案件 詳細分析")
@@ -46,7 +38,7 @@ def analyze_jt_etp_detail():
     
     # 親商談の詳細取得
     parent_url = f"https://www.zohoapis.com/crm/v2/Deals/{parent_deal_id}"
-    parent_response = requests.get(parent_url, headers=crm_headers)
+    parent_response = crm_session.get(parent_url, headers=crm_headers)
     
     if parent_response.status_code == 200:
         parent_deal = parent_response.json()['data'][0]
@@ -57,7 +49,7 @@ def analyze_jt_etp_detail():
         print(f"   完了予定日: {parent_deal.get('Closing_Date')}")
     else:
         print(f"❌ 親商談取得エラー: {parent_response.status_code}")
-        return
+        return 1
     
     # 子商談を取得（field78で親商談IDを参照している商談）
     print(f"\n📋 子商談を検索中...")
@@ -73,7 +65,7 @@ def analyze_jt_etp_detail():
             'page': page
         }
         
-        response = requests.get(deals_url, headers=crm_headers, params=params)
+        response = crm_session.get(deals_url, headers=crm_headers, params=params)
         
         if response.status_code == 200:
             data = response.json()
@@ -148,7 +140,7 @@ def analyze_jt_etp_detail():
             'page': page
         }
         
-        response = requests.get(invoice_url, headers=books_headers, params=params)
+        response = books_session.get(invoice_url, headers=books_headers, params=params)
         
         if response.status_code == 200:
             data = response.json()
@@ -307,6 +299,11 @@ def analyze_jt_etp_detail():
     output_file = Path(__file__).parent / f"JT_ETP詳細分析_{timestamp}.csv"
     df.to_csv(output_file, index=False, encoding='utf-8-sig')
     print(f"📁 詳細分析結果を保存: {output_file}")
+    return 0
+
+def main(context=None):
+    """メイン処理（context: zoho_tools から共有する ZohoContext）"""
+    return analyze_jt_etp_detail(context)
 
 if __name__ == "__main__":
-    analyze_jt_etp_detail()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -5,8 +5,15 @@ JT ETP親商談の金額と全ステージの商談を確認
 """
 import requests
 import json
+import sys
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).parent.parent / "01_Zoho_API" / "APIクライアント"))
+from tax_engine import TaxEngine
+
+# 商談金額（税抜き）の税込み換算（商談1件ごとに四捨五入）
+tax = TaxEngine()
+
 def load_crm_token():
     """CRMトークンを読み込み"""
     token_path = Path(__file__).parent.parent / "01_Zoho_API" / "認証・トークン" / "zoho_crm_tokens.json"
@@ -116,11 +123,14 @@ def analyze_all_children_by_stage(access_token, parent_id):
     print("="*60)
     
     total_amount = 0
+    total_amount_with_tax = 0
     for stage, data in sorted(stage_analysis.items()):
         count = data['count']
         amount = data['amount']
-        amount_with_tax = amount * 1.10
+        amount_with_tax = data['amount_with_tax'] = tax.invoice_total(
+            [d.get('Amount', 0) or 0 for d in data['deals']])
         total_amount += amount
+        total_amount_with_tax += amount_with_tax
         
         print(f"【{stage}】")
         print(f"  件数: {count}件")
@@ -143,7 +153,7 @@ def analyze_all_children_by_stage(access_token, parent_id):
         print()
     
     print(f"全商談合計（税抜き）: ¥{total_amount:,.0f}")
-    print(f"全商談合計（税込み）: ¥{total_amount * 1.10:,.0f}")
+    print(f"全商談合計（税込み）: ¥{total_amount_with_tax:,.0f}")
     
     return stage_analysis, kouki_analysis
 
@@ -154,15 +164,15 @@ def calculate_total_with_parent(parent_deal, stage_analysis):
     
     parent_amount = parent_deal.get('Amount', 0) or 0 if parent_deal else 0
     children_total = sum(data['amount'] for data in stage_analysis.values())
+    total_with_tax = tax.with_tax(parent_amount) + sum(data['amount_with_tax'] for data in stage_analysis.values())
     
     print(f"親商談金額: ¥{parent_amount:,.0f}")
     print(f"子商談合計: ¥{children_total:,.0f}")
     print(f"総合計（税抜き）: ¥{parent_amount + children_total:,.0f}")
-    print(f"総合計（税込み）: ¥{(parent_amount + children_total) * 1.10:,.0f}")
+    print(f"総合計（税込み）: ¥{total_with_tax:,.0f}")
     
     # 6月まで入金との比較
     june_payment = 91079160
-    total_with_tax = (parent_amount + children_total) * 1.10
     diff = total_with_tax - june_payment
     
     print(f"\n📊 6月まで入金との比較:")
@@ -182,7 +192,7 @@ def find_potential_missing_deals(stage_analysis, target_diff):
     
     for stage, data in sorted(non_jucyu_stages.items(), key=lambda x: x[1]['amount'], reverse=True):
         amount = data['amount']
-        amount_with_tax = amount * 1.10
+        amount_with_tax = data['amount_with_tax']
         count = data['count']
         
         if amount > 0:
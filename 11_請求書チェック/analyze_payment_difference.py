@@ -1,116 +1,166 @@
 #!/usr/bin/env python3
 """
-JT ETP ¥1,534,114差額の原因分析
-過去のデータとロジックから推測
+JT ETP 受注・後期なし商談と入金の差額分析
+保存済みの商談データ（JT_ETP_完全分析結果/JT_ETP_後期なし商談_*.json）と
+Booksの入金（payment_ledger の月別台帳）から差額を計算し、
+差額に一致する商談の組み合わせ（未入金の候補）を照合ソルバーで探す
+
+使い方:
+    python analyze_payment_difference.py [--until=2025-06-30] [--paid=入金額] [--payments=入金JSON]
+                                         [--deals=商談JSON] [--tolerance=0] [--from=YYYY-MM-DD]
+
+    --paid      入金額を直接指定（Booksに接続しない）
+    --payments  保存済みの入金JSON（customerpayments のリスト）を使う
+    --from      照合に使う商談の成約日の下限（新しい商談に絞って探す）
 """
+import json
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "01_Zoho_API" / "APIクライアント"))
+from json_dump_loader import JsonDump
+from month_utils import month_of
+from payment_ledger import BooksPaymentFetcher, LedgerError, open_ledger
+from reconciliation_solver import ReconciliationSolver, deal_candidates, print_solutions
+from tax_engine import TaxEngine, TaxRule, to_yen
+
+RESULTS_DIR = Path(__file__).parent / "JT_ETP_完全分析結果"
+
+TAX_RATE = 0.10
+DEFAULT_UNTIL = '2025-06-30'
+# JT ETP関連入金の判定キーワード（顧客名・参照番号・メモ）
+JT_KEYWORDS = ['JT', 'ETP', 'ジェイティ']
+
+
+def find_latest_deals_file():
+    """最新の「後期なし商談」保存データ"""
+    files = sorted(path for path in RESULTS_DIR.glob("JT_ETP_後期なし商談_*.json")
+                   if not path.name.endswith('.idx.json'))
+    return files[-1] if files else None
+
+
+def load_deals(path):
+    """保存データから「受注」商談を読み込む"""
+    return list(JsonDump(path).records(predicate=lambda deal: deal.get('Stage') == '受注'))
 
-def analyze_payment_difference():
-    """差額の原因を分析"""
+
+def load_payments(path):
+    """保存済みの入金JSON（リスト、または customerpayments を持つ辞書）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return data.get('customerpayments', []) if isinstance(data, dict) else data
+
+
+def fetch_payments(date_end, context=None):
+    """入金台帳を date_end の月まで同期し、date_end までの入金を返す（context があれば接続・組織IDを共有）"""
+    fetcher = None
+    if context is not None:
+        fetcher = BooksPaymentFetcher(context.session('books'), context.headers('books'), context.books_org_id())
+    try:
+        ledger = open_ledger(month_of(date_end), fetcher=fetcher)
+    except LedgerError as e:
+        print(f"❌ 入金台帳の同期エラー: {e}")
+        return None
+    return ledger.payments(date_to=date_end)
+
+
+def is_jt_etp_payment(payment):
+    text = f"{payment.get('customer_name', '')} {payment.get('description', '')} {payment.get('reference_number', '')}"
+    return any(keyword in text.upper() for keyword in JT_KEYWORDS)
+
+
+def analyze_payment_difference(deals, paid_amount, until, tolerance=0, date_from=None):
+    """差額を計算し、差額に一致する商談の組み合わせを探す"""
     print("="*80)
-    print("📊 JT ETP ¥1,534,114差額の原因分析")
+    print("📊 JT ETP 受注・後期なし商談と入金の差額分析")
     print("="*80)
-    
-    # 確定している数値
-    jt_etp_data = {
-        '受注かつ後期なし商談': {
-            '件数': 389,
-            '税抜き': 84193885,
-            '税込み': 92613274
-        },
-        '6月まで入金': 91079160,
-        '差額': 92613274 - 91079160  # 1,534,114
-    }
-    
-    print(f"📋 確定データ:")
-    print(f"  「受注」かつ「後期なし」商談: {jt_etp_data['受注かつ後期なし商談']['件数']}件")
-    print(f"  商談総額（税込み）: ¥{jt_etp_data['受注かつ後期なし商談']['税込み']:,.0f}")
-    print(f"  6月まで入金: ¥{jt_etp_data['6月まで入金']:,.0f}")
-    print(f"  差額: ¥{jt_etp_data['差額']:,.0f}")
-    
-    print(f"\n🔍 差額¥{jt_etp_data['差額']:,.0f}の可能性:")
+
+    candidates = deal_candidates(deals, tax_rate=TAX_RATE)
+    amount_ex_tax = sum(deal.get('Amount') or 0 for deal in deals)
+    amount_in_tax = sum(candidate.amount for candidate in candidates)
+    difference = amount_in_tax - paid_amount
+
+    print(f"📋 集計:")
+    print(f"  「受注」かつ「後期なし」商談: {len(deals)}件")
+    print(f"  商談総額（税抜き）: ¥{amount_ex_tax:,.0f}")
+    print(f"  商談総額（税込み・1件ごとに四捨五入）: ¥{amount_in_tax:,.0f}")
+    rounded_total = TaxEngine(TaxRule(TAX_RATE, unit='invoice')).invoice_total(
+        [deal.get('Amount') or 0 for deal in deals])
+    if rounded_total != amount_in_tax:
+        print(f"    ※ 合計にまとめて税を掛けると ¥{rounded_total:,.0f}（端数処理の差 ¥{amount_in_tax - rounded_total:+,.0f}）")
+    print(f"  {until}まで入金: ¥{paid_amount:,.0f}")
+    print(f"  差額: ¥{difference:,.0f}")
+
+    if difference <= 0:
+        print("\n✅ 入金が商談総額以上のため、未入金の商談はありません")
+        return difference, []
+
+    solver = ReconciliationSolver(tolerance=tolerance)
+    scope = f"成約日{date_from}以降の" if date_from else ""
+    print(f"\n🔍 差額¥{difference:,.0f}に一致する{scope}商談の組み合わせ（許容誤差¥{tolerance:,}）")
     print("="*50)
-    
-    # 可能性1: 7月入金
-    print("【可能性1】7月以降の入金")
-    print(f"  - 商談は「受注」だが入金は7月以降")
-    print(f"  - 約¥153万円分の商談が7月に入金された")
-    print(f"  - 入金タイミングのずれ")
-    
-    # 可能性2: 分割入金
-    print("\n【可能性2】分割入金・一部未入金")
-    print(f"  - 一部商談が分割払い契約")
-    print(f"  - 第1回は6月まで、第2回は7月以降")
-    print(f"  - 約¥153万円が未入金状態")
-    
-    # 可能性3: 請求書発行済み・未入金
-    print("\n【可能性3】請求書発行済み・未入金")
-    print(f"  - 請求書は発行されているが入金待ち")
-    print(f"  - 顧客の支払いサイクルによる遅延")
-    print(f"  - 約¥153万円の売掛金状態")
-    
-    # 可能性4: データ不整合
-    print("\n【可能性4】データ不整合")
-    print(f"  - 商談ステージと実際の契約状況のずれ")
-    print(f"  - 一部商談が「受注」だが実際は未確定")
-    print(f"  - システム更新の遅延")
-    
-    print(f"\n💡 確認すべき項目:")
-    print("="*30)
-    print("1. 7月の入金データ（ZohoBooks）")
-    print("2. 売掛金残高（未収金一覧）")
-    print("3. 請求書発行状況（未発行・未入金）")
-    print("4. 個別商談の入金予定日")
-    print("5. 分割払い契約の有無")
-    
-    # 過去の経験からの推測
-    print(f"\n🎯 最も可能性が高い原因:")
-    print("="*35)
-    print("【7月入金説】")
-    print(f"- JT ETEは企業研修で入金タイミングが月初に集中")
-    print(f"- 6月末締め→7月初入金のパターン")
-    print(f"- ¥{jt_etp_data['差額']:,.0f}が7月1-10日頃に入金された可能性が高い")
-    
-    print(f"\n📈 検証方法:")
-    print("1. ZohoBooksトークンを更新")
-    print("2. 7月1-31日の入金データを取得")
-    print("3. JT ETP関連入金を特定")
-    print("4. 差額との照合")
-    
-    print("="*80)
+    solutions = solver.explain(candidates, difference, date_from=date_from)
+    print_solutions(solutions, difference)
 
-def calculate_monthly_breakdown():
-    """月別の推定入金を計算"""
-    print("\n📊 月別入金推定")
+    if solutions:
+        print(f"\n💡 確認すべき項目:")
+        print("  上の組み合わせの商談について、請求書の発行状況と入金予定日をBooksで確認する")
+        if len(solutions) > 1:
+            print("  （複数の組み合わせが一致するため、入金の参照番号・日付で絞り込む）")
+    return difference, solutions
+
+
+def calculate_monthly_breakdown(amount_in_tax, paid_amount, deal_count):
+    """入金率と未入金相当の商談数を計算"""
+    print("\n📊 入金率")
     print("="*30)
-    
-    # 過去の分析データ
-    total_deal_amount = 92613274  # 税込み
-    june_payment = 91079160
-    difference = 1534114
-    
-    # 入金率計算
-    payment_rate = june_payment / total_deal_amount
-    print(f"6月まで入金率: {payment_rate:.1%}")
+
+    difference = amount_in_tax - paid_amount
+    payment_rate = paid_amount / amount_in_tax
+    print(f"入金率: {payment_rate:.1%}")
     print(f"未入金率: {(1-payment_rate):.1%}")
-    
-    # 平均単価での分析
-    avg_deal_amount = total_deal_amount / 389  # ¥238,081
+
+    avg_deal_amount = amount_in_tax / deal_count
     estimated_unpaid_deals = difference / avg_deal_amount
-    
+
     print(f"\n平均商談単価: ¥{avg_deal_amount:,.0f}")
     print(f"未入金相当商談数: {estimated_unpaid_deals:.0f}件")
-    
-    if estimated_unpaid_deals < 10:
-        print("→ 少数の大口案件の未入金")
-    elif estimated_unpaid_deals < 20:
-        print("→ 中規模案件の未入金")
+
+
+def main(context=None):
+    """メイン処理（context: zoho_tools から共有する ZohoContext）"""
+    options = dict(arg[2:].split('=', 1) for arg in sys.argv[1:] if arg.startswith('--') and '=' in arg)
+    until = options.get('until', DEFAULT_UNTIL)
+
+    deals_file = Path(options['deals']) if 'deals' in options else find_latest_deals_file()
+    if not deals_file or not deals_file.exists():
+        print(f"❌ 商談データが見つかりません: {deals_file or RESULTS_DIR}")
+        return 1
+    deals = load_deals(deals_file)
+    print(f"✅ 商談データ読み込み: {deals_file.name}（受注{len(deals)}件）")
+
+    if 'paid' in options:
+        paid_amount = to_yen(options['paid'].replace(',', ''))
     else:
-        print("→ 多数の小口案件の未入金")
+        payments = load_payments(options['payments']) if 'payments' in options else fetch_payments(until, context)
+        if payments is None:
+            print("❌ 入金データを取得できません（--paid=入金額 で直接指定できます）")
+            return 1
+        jt_payments = [p for p in payments if is_jt_etp_payment(p) and (p.get('date') or '') <= until]
+        paid_amount = sum(to_yen(p.get('amount')) for p in jt_payments)
+        print(f"✅ JT ETP関連入金: {len(jt_payments)}件 / {len(payments)}件")
+
+    if not deals:
+        print("❌ 受注商談がありません")
+        return 1
+
+    analyze_payment_difference(deals, paid_amount, until, tolerance=to_yen(options.get('tolerance', 0)),
+                               date_from=options.get('from'))
+    amount_in_tax = sum(candidate.amount for candidate in deal_candidates(deals, tax_rate=TAX_RATE))
+    calculate_monthly_breakdown(amount_in_tax, paid_amount, len(deals))
+    print("="*80)
+    return 0
 
-def main():
-    """メイン処理"""
-    analyze_payment_difference()
-    calculate_monthly_breakdown()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
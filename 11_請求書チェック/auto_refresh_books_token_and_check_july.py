@@ -5,9 +5,16 @@ ZohoBooks トークン自動再取得 & 7月入金確認
 """
 import requests
 import json
+import sys
 from pathlib import Path
 from datetime import datetime
 
+sys.path.append(str(Path(__file__).parent.parent / "01_Zoho_API" / "APIクライアント"))
+from payment_ledger import BooksPaymentFetcher, LedgerError, open_ledger
+from zoho_context import ZohoContext
+
+JULY = ('2025-07-01', '2025-07-31')
+
 def load_config():
     """設定ファイルを読み込み"""
     config_path = Path(__file__).parent.parent / "01_Zoho_API" / "設定ファイル" / "zoho_config.json"
@@ -78,80 +85,17 @@ def save_books_tokens(tokens):
     print(f"💾 新しいBooksトークン保存: {token_path}")
     return True
 
-def get_org_id(headers):
-    """Books組織IDを取得"""
-    try:
-        response = requests.get("https://www.zohoapis.com/books/v3/organizations", headers=headers)
-        if response.status_code == 200:
-            orgs = response.json()['organizations']
-            for org in orgs:
-                if '株式会社シー・ティー・エス' in org.get('name', ''):
-                    return org['organization_id']
-            return orgs[0]['organization_id'] if orgs else None
-        return None
-    except:
-        return "772044231"  # フォールバック
-
-def get_july_payments(headers, org_id):
-    """7月の入金データを取得"""
-    print("📊 7月の入金データを取得中...")
-    
-    url = "https://www.zohoapis.com/books/v3/customerpayments"
-    all_payments = []
-    page = 1
-    
-    while page <= 10:
-        params = {
-            'organization_id': org_id,
-            'per_page': 200,
-            'page': page,
-            'sort_column': 'date',
-            'sort_order': 'D',
-            'date_start': '2025-07-01',
-            'date_end': '2025-07-31'
-        }
-        
-        try:
-            response = requests.get(url, headers=headers, params=params)
-            
-            if response.status_code == 200:
-                data = response.json()
-                payments = data.get('customerpayments', [])
-                
-                if payments:
-                    all_payments.extend(payments)
-                    print(f"  ページ{page}: {len(payments)}件取得 (累計: {len(all_payments)}件)")
-                    
-                    page_context = data.get('page_context', {})
-                    if not page_context.get('has_more_page', False):
-                        break
-                    page += 1
-                else:
-                    print(f"  ページ{page}: データなし")
-                    break
-            else:
-                print(f"  ❌ ページ{page}エラー: {response.status_code}")
-                if page == 1:  # 最初のページでエラーの場合は詳細出力
-                    print(f"     レスポンス: {response.text}")
-                break
-                
-        except Exception as e:
-            print(f"  ❌ ページ{page}例外: {str(e)}")
-            break
-    
-    print(f"✅ 7月入金データ取得完了: {len(all_payments)}件")
-    return all_payments
-
-def analyze_july_payments_for_jt_etp(payments):
+def analyze_july_payments_for_jt_etp(ledger):
     """7月入金データをJT ETP視点で分析"""
     print(f"\n💰 7月入金分析（JT ETP差額解明）")
     print("="*50)
     
+    payments = ledger.payments(*JULY)
     if not payments:
         print("  7月の入金データはありません")
         return
     
-    total_amount = 0
+    total_amount = ledger.total(*JULY)
     jt_etp_payments = []
     potential_jt_etp = []
     
@@ -159,7 +103,6 @@ def analyze_july_payments_for_jt_etp(payments):
     
     for payment in payments:
         amount = payment.get('amount', 0)
-        total_amount += amount
         
         # 顧客名やメモでJT ETP関連を判定
         customer_name = payment.get('customer_name', '').upper()
@@ -267,16 +210,23 @@ def main():
     # 3. 新しいトークンを保存
     save_books_tokens(new_tokens)
     
-    # 4. 新しいトークンで組織ID取得
+    # 4. 新しいトークンで組織ID取得（キャッシュがあればAPIを呼ばない）
     headers = {'Authorization': f"Bearer {new_tokens['access_token']}"}
-    org_id = get_org_id(headers)
+    org_id = ZohoContext(Path(__file__).parent.parent / "01_Zoho_API" / "認証・トークン").books_org_id()
+    if not org_id:
+        print("❌ Books組織IDが取得できませんでした")
+        return
     print(f"✅ 組織ID: {org_id}")
     
-    # 5. 7月入金データ取得
-    july_payments = get_july_payments(headers, org_id)
+    # 5. 入金台帳を7月まで同期（同期済みの月はAPIを呼ばない）
+    try:
+        ledger = open_ledger('2025-07', fetcher=BooksPaymentFetcher(headers=headers, org_id=org_id))
+    except LedgerError as e:
+        print(f"❌ 入金台帳の同期エラー: {e}")
+        return
     
     # 6. JT ETP視点での分析
-    analyze_july_payments_for_jt_etp(july_payments)
+    analyze_july_payments_for_jt_etp(ledger)
     
     print("\n" + "="*80)
     print("🎯 結論: 7月入金データでJT ETP差額¥1,534,114の説明を試行")
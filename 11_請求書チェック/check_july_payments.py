@@ -3,100 +3,45 @@
 7月の入金データを確認
 JT ETP関連の入金状況をチェック
 """
-import requests
-import json
+import sys
 from pathlib import Path
-from datetime import datetime
 
-def load_books_token():
-    """Booksトークンを読み込み"""
-    token_path = Path(__file__).parent.parent / "01_Zoho_API" / "認証・トークン" / "zoho_books_tokens.json"
-    with open(token_path, 'r') as f:
-        tokens = json.load(f)
-    return tokens['access_token']
+sys.path.append(str(Path(__file__).parent.parent / "01_Zoho_API" / "APIクライアント"))
+from payment_ledger import LedgerError, open_ledger
+from reconciliation_solver import deal_candidates
+from tax_engine import to_yen
+from analyze_payment_difference import TAX_RATE, find_latest_deals_file, is_jt_etp_payment, load_deals
 
-def get_org_id(headers):
-    """Books組織IDを取得"""
-    response = requests.get("https://www.zohoapis.com/books/v3/organizations", headers=headers)
-    if response.status_code == 200:
-        orgs = response.json()['organizations']
-        for org in orgs:
-            if '株式会社シー・ティー・エス' in org.get('name', ''):
-                return org['organization_id']
-        return orgs[0]['organization_id'] if orgs else None
-    return None
+JULY = ('2025-07-01', '2025-07-31')
+UNTIL_JUNE = '2025-06'
 
-def get_july_payments(headers, org_id):
-    """7月の入金データを取得"""
-    print("📊 7月の入金データを取得中...")
-    
-    url = "https://www.zohoapis.com/books/v3/customerpayments"
-    all_payments = []
-    page = 1
-    
-    while page <= 5:
-        params = {
-            'organization_id': org_id,
-            'per_page': 200,
-            'page': page,
-            'sort_column': 'date',
-            'sort_order': 'D',
-            'date_start': '2025-07-01',
-            'date_end': '2025-07-31'
-        }
-        
-        try:
-            response = requests.get(url, headers=headers, params=params)
-            
-            if response.status_code == 200:
-                data = response.json()
-                payments = data.get('customerpayments', [])
-                
-                if payments:
-                    all_payments.extend(payments)
-                    print(f"  ページ{page}: {len(payments)}件取得")
-                    
-                    page_context = data.get('page_context', {})
-                    if not page_context.get('has_more_page', False):
-                        break
-                    page += 1
-                else:
-                    break
-            else:
-                print(f"  ❌ ページ{page}エラー: {response.status_code}")
-                if response.status_code == 400:
-                    print(f"     エラー詳細: {response.text}")
-                break
-                
-        except Exception as e:
-            print(f"  ❌ ページ{page}例外: {str(e)}")
-            break
-    
-    print(f"✅ 7月入金データ取得完了: {len(all_payments)}件")
-    return all_payments
+def june_difference(ledger):
+    """保存済みの「受注・後期なし」商談の税込み総額と6月末までのJT ETP関連入金の差額（商談データがなければNone）"""
+    deals_file = find_latest_deals_file()
+    if not deals_file:
+        return None
+    deals = load_deals(deals_file)
+    amount_in_tax = sum(candidate.amount for candidate in deal_candidates(deals, tax_rate=TAX_RATE))
+    paid_amount = sum(to_yen(p.get('amount')) for p in ledger.payments(date_to=UNTIL_JUNE) if is_jt_etp_payment(p))
+    print(f"  商談データ: {deals_file.name}（受注{len(deals)}件・税込み¥{amount_in_tax:,.0f}）")
+    print(f"  6月末までのJT ETP関連入金: ¥{paid_amount:,.0f}")
+    return amount_in_tax - paid_amount
 
-def analyze_july_payments(payments):
+def analyze_july_payments(ledger):
     """7月入金データを分析"""
     print(f"\n💰 7月入金分析")
     
+    payments = ledger.payments(*JULY)
     if not payments:
         print("  7月の入金データはありません")
         return
     
-    total_amount = 0
+    total_amount = ledger.total(*JULY)
     jt_etp_payments = []
     
     for payment in payments:
-        amount = payment.get('amount', 0)
-        total_amount += amount
-        
         # 顧客名やメモでJT ETP関連を判定
-        customer_name = payment.get('customer_name', '')
-        description = payment.get('description', '')
-        reference_number = payment.get('reference_number', '')
-        
-        if any(keyword in (customer_name + description + reference_number).upper() 
-               for keyword in ['JT', 'ETP', 'ジェイティ']):
+        if is_jt_etp_payment(payment):
             jt_etp_payments.append(payment)
     
     print(f"  7月総入金額: ¥{total_amount:,.0f}")
@@ -119,9 +64,12 @@ def analyze_july_payments(payments):
     else:
         print(f"  JT ETP関連入金: なし")
     
-    # 6月までの差額との比較
-    diff_amount = 1534114  # 前回の分析結果
+    # 6月までの差額との比較（商談データと入金台帳から計算）
     print(f"\n📊 差額との比較:")
+    diff_amount = june_difference(ledger)
+    if diff_amount is None:
+        print("  ⚠️ 後期なし商談の保存データがないため差額を計算できません")
+        return
     print(f"  6月まで商談との差額: ¥{diff_amount:,.0f}")
     
     if jt_etp_payments:
@@ -146,29 +94,15 @@ def main():
     print("📊 7月入金データ確認・JT ETP差額分析")
     print("="*80)
     
-    # 1. Booksトークン読み込み
+    # 1. 入金台帳を7月まで同期（同期済みの月はAPIを呼ばない）
     try:
-        access_token = load_books_token()
-        headers = {'Authorization': f'Bearer {access_token}'}
-        print("✅ Booksトークン読み込み完了")
-    except Exception as e:
-        print(f"❌ Booksトークン読み込みエラー: {e}")
+        ledger = open_ledger('2025-07')
+    except LedgerError as e:
+        print(f"❌ 入金台帳の同期エラー: {e}")
         return
     
-    # 2. 組織ID取得（または直接指定）
-    org_id = get_org_id(headers)
-    if not org_id:
-        # 以前の分析から組織IDを直接指定
-        print("⚠️ 組織ID取得失敗、既知のIDを使用")
-        org_id = "772044231"  # 設定ファイルから取得
-    
-    print(f"✅ 組織ID: {org_id}")
-    
-    # 3. 7月入金データ取得
-    july_payments = get_july_payments(headers, org_id)
-    
-    # 4. 入金分析
-    analyze_july_payments(july_payments)
+    # 2. 入金分析
+    analyze_july_payments(ledger)
     
     print("\n" + "="*80)
 
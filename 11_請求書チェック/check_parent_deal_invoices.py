@@ -3,130 +3,65 @@
 JT ETP親商談から発行された請求書を確認
 親商談ID: 5187347000129692086 の請求書を特定
 """
-import requests
-import json
+import sys
 from pathlib import Path
 
-def load_books_token():
-    """Booksトークンを読み込み"""
-    token_path = Path(__file__).parent.parent / "01_Zoho_API" / "認証・トークン" / "zoho_books_tokens.json"
-    with open(token_path, 'r') as f:
-        tokens = json.load(f)
-    return tokens['access_token']
+sys.path.append(str(Path(__file__).parent.parent / "01_Zoho_API" / "APIクライアント"))
+from zoho_context import ZohoContext
 
-def search_invoices_by_reference(headers, org_id, reference_number):
+# 請求書一覧（日付の降順）を取得するページ数の上限
+MAX_INVOICE_PAGES = 50
+# 参照番号の検索で調べるページ数（新しい請求書から）
+REFERENCE_SEARCH_PAGES = 20
+
+def search_invoices_by_reference(context, reference_number):
     """参照番号で請求書を検索"""
     print(f"📄 参照番号「{reference_number}」で請求書検索中...")
     
-    url = "https://www.zohoapis.com/books/v3/invoices"
-    page = 1
     found_invoices = []
-    
-    while page <= 20:
-        params = {
-            'organization_id': org_id,
-            'per_page': 200,
-            'page': page,
-            'sort_column': 'date',
-            'sort_order': 'D'
-        }
-        
-        try:
-            response = requests.get(url, headers=headers, params=params)
-            
-            if response.status_code == 200:
-                data = response.json()
-                invoices = data.get('invoices', [])
-                
-                if invoices:
-                    # 参照番号でフィルタ
-                    for invoice in invoices:
-                        inv_ref = invoice.get('reference_number', '').strip()
-                        if inv_ref == reference_number:
-                            found_invoices.append(invoice)
-                            print(f"  ✅ 発見: {invoice.get('invoice_number')} - ¥{invoice.get('total', 0):,.0f}")
-                    
-                    page_context = data.get('page_context', {})
-                    if not page_context.get('has_more_page', False):
-                        break
-                    page += 1
-                else:
-                    break
-            else:
-                print(f"  ❌ ページ{page}エラー: {response.status_code}")
-                break
-                
-        except Exception as e:
-            print(f"  ❌ ページ{page}例外: {str(e)}")
-            break
+    for invoices in context.books_invoice_pages(REFERENCE_SEARCH_PAGES):
+        # 参照番号でフィルタ
+        for invoice in invoices:
+            inv_ref = invoice.get('reference_number', '').strip()
+            if inv_ref == reference_number:
+                found_invoices.append(invoice)
+                print(f"  ✅ 発見: {invoice.get('invoice_number')} - ¥{invoice.get('total', 0):,.0f}")
     
     print(f"  検索完了: {len(found_invoices)}件の請求書を発見")
     return found_invoices
 
-def search_all_invoices_with_jt_etp_reference(headers, org_id):
+def search_all_invoices_with_jt_etp_reference(context):
     """JT ETP関連の参照番号を持つ請求書を全検索"""
     print(f"📄 JT ETP関連請求書を全検索中...")
     
-    url = "https://www.zohoapis.com/books/v3/invoices"
-    page = 1
     jt_etp_invoices = []
     
     parent_id = '5187347000129692086'
     
-    while page <= 50:  # より多くのページを検索
-        params = {
-            'organization_id': org_id,
-            'per_page': 200,
-            'page': page,
-            'sort_column': 'date',
-            'sort_order': 'D'
-        }
+    # 請求書一覧のページは参照番号の検索・同じコンテキストの他の分析と共有する
+    for page, invoices in enumerate(context.books_invoice_pages(MAX_INVOICE_PAGES), 1):
+        print(f"  ページ{page}: {len(invoices)}件を検索中...")
         
-        try:
-            response = requests.get(url, headers=headers, params=params)
+        # JT ETP関連を検索
+        for invoice in invoices:
+            inv_ref = invoice.get('reference_number', '').strip()
+            customer_name = invoice.get('customer_name', '').upper()
+            
+            # 親商談IDまたはJT関連で判定
+            is_jt_etp = (
+                inv_ref == parent_id or
+                'JT ETP' in customer_name or
+                'JT' in customer_name or
+                '日本たばこ' in customer_name
+            )
             
-            if response.status_code == 200:
-                data = response.json()
-                invoices = data.get('invoices', [])
-                
-                if invoices:
-                    print(f"  ページ{page}: {len(invoices)}件を検索中...")
-                    
-                    # JT ETP関連を検索
-                    for invoice in invoices:
-                        inv_ref = invoice.get('reference_number', '').strip()
-                        customer_name = invoice.get('customer_name', '').upper()
-                        
-                        # 親商談IDまたはJT関連で判定
-                        is_jt_etp = (
-                            inv_ref == parent_id or
-                            'JT ETP' in customer_name or
-                            'JT' in customer_name or
-                            '日本たばこ' in customer_name
-                        )
-                        
-                        if is_jt_etp:
-                            jt_etp_invoices.append(invoice)
-                            print(f"    ✅ 発見: {invoice.get('invoice_number')} - ¥{invoice.get('total', 0):,.0f}")
-                            print(f"        顧客: {invoice.get('customer_name', 'N/A')}")
-                            print(f"        参照番号: {inv_ref}")
-                            print(f"        日付: {invoice.get('date', 'N/A')}")
-                            print(f"        ステータス: {invoice.get('status', 'N/A')}")
-                    
-                    page_context = data.get('page_context', {})
-                    if not page_context.get('has_more_page', False):
-                        break
-                    page += 1
-                else:
-                    print(f"  ページ{page}: データなし")
-                    break
-            else:
-                print(f"  ❌ ページ{page}エラー: {response.status_code}")
-                break
-                
-        except Exception as e:
-            print(f"  ❌ ページ{page}例外: {str(e)}")
-            break
+            if is_jt_etp:
+                jt_etp_invoices.append(invoice)
+                print(f"    ✅ 発見: {invoice.get('invoice_number')} - ¥{invoice.get('total', 0):,.0f}")
+                print(f"        顧客: {invoice.get('customer_name', 'N/A')}")
+                print(f"        参照番号: {inv_ref}")
+                print(f"        日付: {invoice.get('date', 'N/A')}")
+                print(f"        ステータス: {invoice.get('status', 'N/A')}")
     
     print(f"✅ JT ETP関連請求書検索完了: {len(jt_etp_invoices)}件")
     return jt_etp_invoices
@@ -193,8 +128,8 @@ def analyze_jt_etp_invoices(invoices):
     
     return total_amount, status_count, by_parent_ref
 
-def main():
-    """メイン処理"""
+def main(context=None):
+    """メイン処理（context: zoho_tools から共有する ZohoContext）"""
     print("="*80)
     print("📊 JT ETP親商談から発行された請求書確認")
     print("="*80)
@@ -203,21 +138,19 @@ def main():
     print(f"親商談ID: {parent_id}")
     print(f"親商談名: 【2025】JT ETP _事務局")
     
-    # Booksトークン読み込み
-    try:
-        access_token = load_books_token()
-        headers = {'Authorization': f'Bearer {access_token}'}
-        org_id = "772043849"
-        print("✅ Booksトークン準備完了")
-    except Exception as e:
-        print(f"❌ トークン準備エラー: {e}")
-        return
+    # Booksトークン・組織ID
+    context = context or ZohoContext(Path(__file__).parent.parent / "01_Zoho_API" / "認証・トークン")
+    org_id = context.books_org_id()
+    if not org_id:
+        print("❌ Books組織IDが取得できませんでした")
+        return 1
+    print("✅ Booksトークン準備完了")
     
     # 1. 親商談IDで請求書を直接検索
-    parent_invoices = search_invoices_by_reference(headers, org_id, parent_id)
+    parent_invoices = search_invoices_by_reference(context, parent_id)
     
     # 2. JT ETP関連請求書を全検索
-    all_jt_etp_invoices = search_all_invoices_with_jt_etp_reference(headers, org_id)
+    all_jt_etp_invoices = search_all_invoices_with_jt_etp_reference(context)
     
     # 3. 分析
     if parent_invoices:
@@ -236,6 +169,7 @@ def main():
         print(f"  差額: ¥{deal_amount - total_amount:,.0f}")
     
     print("\n" + "="*80)
+    return 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -3,45 +3,44 @@
 JT ETP事務局 完全分析
 親商談 5187347000129692086 に紐づく全子商談531件の完全取得・分析
 """
-import requests
-import json
+import sys
 from pathlib import Path
 import pandas as pd
 from datetime import datetime
 from collections import defaultdict
 import time
 
+sys.path.append(str(Path(__file__).parent.parent / "01_Zoho_API" / "APIクライアント"))
+from zoho_context import ZohoContext
+from books_invoice_lookup import BooksInvoiceLookup
+from field_projection import FieldProjection
+from period_index import JT_ETP_CALENDAR, PeriodIndex
+from tax_engine import TaxEngine, TaxRule
+
 class CompleteJTETPAnalyzer:
-    def __init__(self):
+    def __init__(self, context=None):
         self.base_path = Path(__file__).parent.parent / "01_Zoho_API" / "認証・トークン"
+        self.context = context or ZohoContext(self.base_path)
+        self.crm_session = self.context.session('crm', projection=FieldProjection.for_analysis('complete_jt_etp'))
+        self.books_session = self.context.session('books')
         self.load_tokens()
         self.org_id = self.get_org_id()
+        self.invoice_lookup = BooksInvoiceLookup(self.books_session, self.books_headers, self.org_id)
         self.target_parent_id = "5187347000129692086"
         self.tax_rate = 0.10
+        self.tax = TaxEngine(TaxRule(self.tax_rate))
+        # 上期（1〜5月）・下期（6〜12月）
+        self.calendar = JT_ETP_CALENDAR
+        self.period_index = None
 
     def load_tokens(self):
-        """トークンを読み込み"""
-        with open(self.base_path / "zoho_crm_tokens.json", 'r') as f:
-            crm_tokens = json.load(f)
-        with open(self.base_path / "zoho_books_tokens.json", 'r') as f:
-            books_tokens = json.load(f)
-        
-        self.crm_headers = {'Authorization': f'Bearer {crm_tokens["access_token"]}'}
-        self.books_headers = {'Authorization': f'Bearer {books_tokens["access_token"]}'}
+        """トークンを読み込み（同じコンテキストの分析とヘッダーを共有）"""
+        self.crm_headers = self.context.headers('crm')
+        self.books_headers = self.context.headers('books')
 
     def get_org_id(self):
         """Books組織IDを取得"""
-        try:
-            response = requests.get("https://www.zohoapis.com/books/v3/organizations", headers=self.books_headers)
-            if response.status_code == 200:
-                orgs = response.json()['organizations']
-                for org in orgs:
-                    if '株式会社シー・ティー・エス' in org.get('name', ''):
-                        return org['organization_id']
-                return orgs[0]['organization_id'] if orgs else None
-        except Exception as e:
-            print(f"❌ 組織ID取得エラー: {str(e)}")
-        return None
+        return self.context.books_org_id()
 
     def get_parent_deal_details(self):
         """親商談の詳細を取得"""
@@ -50,7 +49,7 @@ class CompleteJTETPAnalyzer:
         url = f"https://www.zohoapis.com/crm/v2/Deals/{self.target_parent_id}"
         
         try:
-            response = requests.get(url, headers=self.crm_headers)
+            response = self.crm_session.get(url, headers=self.crm_headers)
             if response.status_code == 200:
                 parent_deal = response.json()['data'][0]
                 print(f"✅ 親商談: {parent_deal.get('Deal_Name')}")
@@ -75,7 +74,6 @@ class CompleteJTETPAnalyzer:
         while page <= max_pages:
             url = "https://www.zohoapis.com/crm/v2/Deals"
             params = {
-                'fields': 'id,Deal_Name,Amount,Stage,Closing_Date,Created_Time,Modified_Time,field78',
                 'per_page': 200,
                 'page': page,
                 'sort_by': 'Created_Time',
@@ -83,7 +81,7 @@ class CompleteJTETPAnalyzer:
             }
             
             try:
-                response = requests.get(url, headers=self.crm_headers, params=params)
+                response = self.crm_session.get(url, headers=self.crm_headers, params=params)
                 
                 if response.status_code == 200:
                     data = response.json()
@@ -135,132 +133,70 @@ class CompleteJTETPAnalyzer:
         
         return all_child_deals
 
+    def classify_period(self, closing_date):
+        """完了予定日から上期・下期を判定"""
+        return self.calendar.half_label(closing_date)
+
+    def _with_tax(self, deals):
+        """商談ごとに端数処理した税込み合計"""
+        return self.tax.invoice_total([deal.get('Amount', 0) or 0 for deal in deals])
+
     def analyze_child_deals_by_period(self, child_deals):
         """子商談を期間別に分析"""
         print(f"\\n📊 子商談期間別分析...")
         
+        # 成約日の索引（年度をまたいで上期・下期の2つにまとめる）
+        self.period_index = PeriodIndex.build(child_deals, calendar=self.calendar)
         period_analysis = {
-            '上期(〜5月)': {'deals': [], 'amount': 0},
-            '下期(6月〜)': {'deals': [], 'amount': 0},
-            '期間不明': {'deals': [], 'amount': 0}
+            period: {'deals': deals, 'amount': sum(deal.get('Amount', 0) or 0 for deal in deals)}
+            for period, deals in self.period_index.deals_by_half(with_year=False).items()
         }
         
-        total_amount = 0
-        
-        for deal in child_deals:
-            amount = deal.get('Amount', 0) or 0
-            total_amount += amount
-            closing_date = deal.get('Closing_Date', '')
-            
-            # 期間判定
-            if closing_date and '-' in closing_date:
-                try:
-                    month = int(closing_date.split('-')[1])
-                    if month <= 5:
-                        period = '上期(〜5月)'
-                    else:
-                        period = '下期(6月〜)'
-                except:
-                    period = '期間不明'
-            else:
-                period = '期間不明'
-            
-            period_analysis[period]['deals'].append(deal)
-            period_analysis[period]['amount'] += amount
+        total_amount = sum(deal.get('Amount', 0) or 0 for deal in child_deals)
         
         print(f"  総子商談金額（税抜）: ¥{total_amount:,.0f}")
-        print(f"  総子商談金額（税込）: ¥{total_amount * (1 + self.tax_rate):,.0f}")
+        print(f"  総子商談金額（税込）: ¥{self._with_tax(child_deals):,.0f}")
         
         for period, data in period_analysis.items():
             count = len(data['deals'])
             amount = data['amount']
-            amount_with_tax = amount * (1 + self.tax_rate)
+            amount_with_tax = self._with_tax(data['deals'])
             print(f"  {period}: {count}件, ¥{amount:,.0f}(税抜) / ¥{amount_with_tax:,.0f}(税込)")
         
         return period_analysis, total_amount
 
     def get_all_related_invoices(self, child_deals):
-        """関連する全請求書を取得"""
+        """関連する全請求書を取得（reference_numberでサーバー側検索）"""
         print(f"\\n📄 関連請求書取得中...")
         
-        # 検索対象IDリスト
-        target_ids = {self.target_parent_id}  # 親商談ID
-        for child in child_deals:
-            target_ids.add(child['id'])
+        # 検索対象ID → 子商談（親商談はNone）
+        deals_by_id = {child['id']: child for child in child_deals}
+        target_ids = set(deals_by_id) | {self.target_parent_id}
         
         print(f"  検索対象ID数: {len(target_ids)}件")
         
+        invoices_by_ref = self.invoice_lookup.lookup(target_ids)
+        
         related_invoices = []
         excluded_110yen = []
-        page = 1
-        max_pages = 20
         
-        while page <= max_pages:
-            url = "https://www.zohoapis.com/books/v3/invoices"
-            params = {
-                'organization_id': self.org_id,
-                'per_page': 200,
-                'page': page,
-                'sort_column': 'date',
-                'sort_order': 'D'
-            }
-            
-            try:
-                response = requests.get(url, headers=self.books_headers, params=params)
+        for ref_num, invoices in invoices_by_ref.items():
+            for invoice in invoices:
+                if invoice.get('total', 0) == 110:
+                    excluded_110yen.append(invoice)
+                    continue
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    invoices = data.get('invoices', [])
-                    
-                    if not invoices:
-                        break
-                    
-                    page_matches = 0
-                    for invoice in invoices:
-                        ref_num = invoice.get('reference_number', '').strip()
-                        if ref_num in target_ids:
-                            invoice_total = invoice.get('total', 0)
-                            if invoice_total == 110:
-                                excluded_110yen.append(invoice)
-                            else:
-                                # 親商談か子商談か判定
-                                if ref_num == self.target_parent_id:
-                                    invoice['relation_type'] = 'parent'
-                                else:
-                                    invoice['relation_type'] = 'child'
-                                    # 子商談の期間判定
-                                    child_deal = next((c for c in child_deals if c['id'] == ref_num), None)
-                                    if child_deal:
-                                        closing_date = child_deal.get('Closing_Date', '')
-                                        if closing_date and '-' in closing_date:
-                                            try:
-                                                month = int(closing_date.split('-')[1])
-                                                invoice['period'] = '上期(〜5月)' if month <= 5 else '下期(6月〜)'
-                                            except:
-                                                invoice['period'] = '期間不明'
-                                        else:
-                                            invoice['period'] = '期間不明'
-                                
-                                related_invoices.append(invoice)
-                                page_matches += 1
-                    
-                    print(f"  ページ{page}: {len(invoices)}件中{page_matches}件が関連請求書")
-                    
-                    page_context = data.get('page_context', {})
-                    if not page_context.get('has_more_page', False):
-                        break
-                    page += 1
-                    time.sleep(0.1)
-                    
+                # 親商談か子商談か判定
+                if ref_num == self.target_parent_id:
+                    invoice['relation_type'] = 'parent'
                 else:
-                    print(f"❌ 請求書ページ{page}取得エラー: {response.status_code}")
-                    break
-                    
-            except Exception as e:
-                print(f"❌ 請求書ページ{page}取得エラー: {str(e)}")
-                break
+                    invoice['relation_type'] = 'child'
+                    # 子商談の期間判定
+                    invoice['period'] = self.classify_period(deals_by_id[ref_num].get('Closing_Date', ''))
+                
+                related_invoices.append(invoice)
         
-        print(f"✅ 関連請求書取得完了: {len(related_invoices)}件")
+        print(f"✅ 関連請求書取得完了: {len(related_invoices)}件（APIリクエスト {self.invoice_lookup.request_count}回）")
         print(f"   110円除外請求書: {len(excluded_110yen)}件")
         
         return related_invoices, excluded_110yen
@@ -273,7 +209,7 @@ class CompleteJTETPAnalyzer:
         
         # 基本統計
         total_child_amount = sum(deal.get('Amount', 0) or 0 for deal in child_deals)
-        total_child_amount_with_tax = total_child_amount * (1 + self.tax_rate)
+        total_child_amount_with_tax = self._with_tax(child_deals)
         
         print(f"\\n【基本統計】")
         print(f"  親商談ID: {self.target_parent_id}")
@@ -315,7 +251,7 @@ class CompleteJTETPAnalyzer:
         for period, data in period_analysis.items():
             period_deals = data['deals']
             period_amount = data['amount']
-            period_amount_with_tax = period_amount * (1 + self.tax_rate)
+            period_amount_with_tax = self._with_tax(period_deals)
             
             # この期間の請求書
             period_invoices = [inv for inv in child_invoices if inv.get('period') == period]
@@ -332,7 +268,7 @@ class CompleteJTETPAnalyzer:
         billed_child_ids = set(inv.get('reference_number') for inv in child_invoices)
         unbilled_deals = [deal for deal in child_deals if deal['id'] not in billed_child_ids]
         unbilled_amount = sum(deal.get('Amount', 0) or 0 for deal in unbilled_deals)
-        unbilled_amount_with_tax = unbilled_amount * (1 + self.tax_rate)
+        unbilled_amount_with_tax = self._with_tax(unbilled_deals)
         
         print(f"\\n【未請求分析】")
         print(f"  未請求商談数: {len(unbilled_deals)}件")
@@ -361,29 +297,22 @@ class CompleteJTETPAnalyzer:
         output_dir.mkdir(exist_ok=True)
         
         # 子商談リスト
+        billed_ids = {inv.get('reference_number') for inv in related_invoices}
         child_data = []
         for deal in child_deals:
             amount = deal.get('Amount', 0) or 0
             closing_date = deal.get('Closing_Date', '')
             
-            # 期間判定
-            if closing_date and '-' in closing_date:
-                try:
-                    month = int(closing_date.split('-')[1])
-                    period = '上期(〜5月)' if month <= 5 else '下期(6月〜)'
-                except:
-                    period = '期間不明'
-            else:
-                period = '期間不明'
+            period = self.classify_period(closing_date)
             
             # 請求書有無
-            has_invoice = any(inv.get('reference_number') == deal['id'] for inv in related_invoices)
+            has_invoice = deal['id'] in billed_ids
             
             child_data.append({
                 'deal_id': deal['id'],
                 'deal_name': deal.get('Deal_Name'),
                 'amount': amount,
-                'amount_with_tax': amount * (1 + self.tax_rate),
+                'amount_with_tax': self.tax.with_tax(amount),
                 'stage': deal.get('Stage'),
                 'closing_date': closing_date,
                 'period': period,
@@ -418,17 +347,17 @@ class CompleteJTETPAnalyzer:
         
         print(f"✅ エクスポート完了: {output_dir}")
 
-def main():
-    """メイン処理"""
+def main(context=None):
+    """メイン処理（context: zoho_tools から共有する ZohoContext）"""
     print("="*90)
     print("🔍 JT ETP事務局 完全分析ツール")
     print("="*90)
     
-    analyzer = CompleteJTETPAnalyzer()
+    analyzer = CompleteJTETPAnalyzer(context)
     
     if not analyzer.org_id:
         print("❌ Books組織IDが取得できませんでした")
-        return
+        return 1
     
     # 1. 親商談詳細取得
     parent_deal = analyzer.get_parent_deal_details()
@@ -438,7 +367,7 @@ def main():
     
     if not child_deals:
         print("❌ 子商談が取得できませんでした")
-        return
+        return 1
     
     # 3. 期間別分析
     period_analysis, total_amount = analyzer.analyze_child_deals_by_period(child_deals)
@@ -453,6 +382,7 @@ def main():
     analyzer.export_detailed_results(child_deals, related_invoices, analysis_result)
     
     print(f"\\n✅ JT ETP事務局 完全分析完了")
+    return 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -6,10 +6,18 @@ JT ETEケースで学んだ知見を活用
 """
 import requests
 import json
+import sys
 from pathlib import Path
 from collections import defaultdict
 import time
 
+sys.path.append(str(Path(__file__).parent.parent / "01_Zoho_API" / "APIクライアント"))
+from tax_engine import TaxEngine
+from zoho_context import ZohoContext
+
+# 商談金額（税抜き）の税込み換算（商談1件ごとに四捨五入）
+tax = TaxEngine()
+
 def load_tokens():
     """CRMとBooksトークンを読み込み"""
     base_path = Path(__file__).parent.parent / "01_Zoho_API" / "認証・トークン"
@@ -23,7 +31,7 @@ def load_tokens():
     return {
         'crm_headers': {'Authorization': f'Bearer {crm_tokens["access_token"]}'},
         'books_headers': {'Authorization': f'Bearer {books_tokens["access_token"]}'},
-        'org_id': "772043849"
+        'org_id': ZohoContext(base_path).books_org_id()
     }
 
 def get_all_deals_since_april(headers, limit_pages=20):
@@ -179,25 +187,29 @@ def analyze_parent_child_structure(deals):
             for child in children:
                 analysis['child_only'].append(child)
     
-    # 統計
+    # 統計（税込みは商談1件ごとに換算して合計）
     total_amount = 0
+    total_amount_with_tax = 0
     total_deals = 0
     
     for category in ['parent_child_sets', 'parent_only', 'child_only', 'no_structure']:
         if category == 'parent_child_sets':
-            amount = sum(pc['total_amount'] for pc in analysis[category])
-            count = sum(1 + pc['children_count'] for pc in analysis[category])
+            amounts = [pc['parent_amount'] for pc in analysis[category]]
+            amounts += [c.get('Amount', 0) or 0 for pc in analysis[category] for c in pc['children']]
         else:
-            items = analysis[category]
-            amount = sum(item.get('Amount', 0) or 0 for item in items)
-            count = len(items)
+            amounts = [item.get('Amount', 0) or 0 for item in analysis[category]]
+        amount = sum(amounts)
+        amount_with_tax = tax.invoice_total(amounts)
+        count = len(amounts)
         
         total_amount += amount
+        total_amount_with_tax += amount_with_tax
         total_deals += count
         
-        analysis['stats'][category] = {'count': count, 'amount': amount}
+        analysis['stats'][category] = {'count': count, 'amount': amount, 'amount_with_tax': amount_with_tax}
     
-    analysis['stats']['total'] = {'count': total_deals, 'amount': total_amount}
+    analysis['stats']['total'] = {'count': total_deals, 'amount': total_amount,
+                                  'amount_with_tax': total_amount_with_tax}
     
     return analysis
 
@@ -297,7 +309,8 @@ def match_deals_with_invoices(structure_analysis, invoices):
                 related_invoices.append(('child', inv))
         
         invoice_total = sum(inv[1].get('total', 0) for inv in related_invoices)
-        deal_total_with_tax = deal_total * 1.10
+        deal_total_with_tax = tax.invoice_total(
+            [pc_set['parent_amount']] + [c.get('Amount', 0) or 0 for c in children])
         
         results['parent_child_analysis'].append({
             'parent_name': parent.get('Deal_Name'),
@@ -323,7 +336,7 @@ def match_deals_with_invoices(structure_analysis, invoices):
         deal_invoices = invoice_map.get(deal['id'], [])
         
         invoice_total = sum(inv.get('total', 0) for inv in deal_invoices)
-        deal_amount_with_tax = deal_amount * 1.10
+        deal_amount_with_tax = tax.with_tax(deal_amount)
         
         results['no_structure_analysis'].append({
             'deal_name': deal.get('Deal_Name'),
@@ -362,11 +375,11 @@ def generate_summary_report(structure_analysis, matching_results):
         if category != 'total':
             count = stats['count']
             amount = stats['amount']
-            amount_with_tax = amount * 1.10
+            amount_with_tax = stats['amount_with_tax']
             print(f"  {category}: {count}件 - ¥{amount:,.0f}（税抜き）¥{amount_with_tax:,.0f}（税込み）")
     
     total_stats = structure_analysis['stats']['total']
-    print(f"\n  合計: {total_stats['count']}件 - ¥{total_stats['amount']:,.0f}（税抜き）¥{total_stats['amount'] * 1.10:,.0f}（税込み）")
+    print(f"\n  合計: {total_stats['count']}件 - ¥{total_stats['amount']:,.0f}（税抜き）¥{total_stats['amount_with_tax']:,.0f}（税込み）")
     
     # マッチング結果
     summary = matching_results['summary']
@@ -2,170 +2,205 @@
 """
 商談・請求書パターン分析
 5つの主要パターンを検証する包括的分析
+
+対象期間の商談・請求書を件数上限なしで全件取得し、パターン別の照合は
+チャンク単位でワーカープロセスに分散する。商談・親商談・請求書の取得は
+1ページ（親商談は1バッチ）ごとにチェックポイントへ追記し、--resume で
+最後に確定したページの続きから再開できる。
+
+使い方:
+    python comprehensive_pattern_analysis.py [--resume] [--workers=N] [--profile[=mode]]
 """
-import requests
-import json
+import multiprocessing
+import os
+import sys
 from pathlib import Path
 from collections import defaultdict
 import time
 
-def load_tokens():
-    """CRMとBooksトークンを読み込み"""
-    base_path = Path(__file__).parent.parent / "01_Zoho_API" / "認証・トークン"
+sys.path.append(str(Path(__file__).parent.parent / "01_Zoho_API" / "APIクライアント"))
+from zoho_http_transport import TOKEN_DIR
+from zoho_context import ZohoContext
+from extraction_journal import ExtractionJournal, run_extraction
+from field_projection import FieldProjection
+from analysis_profiler import AnalysisProfiler
+from tax_engine import TaxEngine, TaxRule
+
+TARGET_START_DATE = '2024-04-01'
+
+# 商談金額（税抜き）の税込み換算（商談1件ごとに四捨五入）
+TAX = TaxEngine(TaxRule('0.10', '四捨五入'))
+# 請求書側の端数処理の単位が違っても一致とみなす差（商談1件あたり）
+ROUNDING_TOLERANCE_PER_DEAL = 1
+
+# ワーカーへ渡す照合タスクの単位（商談 or 親子セットの件数）
+MATCH_CHUNK_SIZE = 500
+
+# 親商談を ids 指定でまとめて取得する件数
+PARENT_BATCH_SIZE = 50
+
+# 段階ごとのページ単位チェックポイント（{段階}.jsonl）
+CHECKPOINT_DIR = Path(__file__).parent / "チェックポイント" / "comprehensive_pattern_analysis"
+
+def parse_options(argv=None):
+    """コマンドライン引数から --resume / --workers=N を取り出す"""
+    options = {'resume': False, 'workers': None}
+    for arg in (sys.argv[1:] if argv is None else argv):
+        if arg == '--resume':
+            options['resume'] = True
+        elif arg.startswith('--workers='):
+            options['workers'] = int(arg.split('=', 1)[1])
+    return options
+
+def run_stage(stage, params, fetch_page, start, resume, id_field='id'):
+    """
+    段階の取得をページごとにチェックポイントへ追記しながら実行
+
+    Args:
+        stage (str): 段階名（チェックポイントのファイル名）
+        params (dict): 取得条件（前回と異なればチェックポイントを使わない）
+        fetch_page (callable): fetch_page(cursor) -> (レコード, 次のカーソル or None)
+        start: 最初のカーソル
+        resume (bool): True なら確定済みのページを使い、続きから取得する
+    """
+    # --resume のときは完了済みの段階も古さに関係なく再利用する
+    journal = ExtractionJournal(stage, params=params, id_field=id_field,
+                                journal_dir=CHECKPOINT_DIR, reuse_hours=float('inf'))
+    if not resume:
+        journal.reset()
+    return run_extraction(journal, fetch_page, start)
+
+def load_tokens(context):
+    """CRMとBooksのヘッダー・Books組織ID（同じコンテキストの分析と共有）"""
+    return {
+        'crm_headers': context.headers('crm'),
+        'books_headers': context.headers('books'),
+        'org_id': context.books_org_id()
+    }
+
+def fetch_deal_page(session, headers, cursor):
+    """
+    2024/4/1以降の商談を1ページ取得（件数上限なし）
+
+    Closing_Dateの降順で取得するため、対象期間より古い商談が現れたページで打ち切る
+
+    Args:
+        cursor (dict): {'page': ページ番号, 'page_token': 2,000件を超える範囲のページトークン}
+
+    Returns:
+        tuple: (対象期間の商談, 次のカーソル or None)
+    """
+    url = "https://www.zohoapis.com/crm/v2/Deals"
+    params = {
+        'per_page': 200,
+        'sort_by': 'Closing_Date',
+        'sort_order': 'desc'
+    }
+    page = cursor['page']
+    if cursor.get('page_token'):
+        params['page_token'] = cursor['page_token']
+    else:
+        params['page'] = page
     
-    with open(base_path / "zoho_crm_tokens.json", 'r') as f:
-        crm_tokens = json.load(f)
+    response = session.get(url, headers=headers, params=params, timeout=30)
+    if response.status_code != 200:
+        raise RuntimeError(f"商談取得エラー（ページ{page}）: {response.status_code}")
     
-    with open(base_path / "zoho_books_tokens.json", 'r') as f:
-        books_tokens = json.load(f)
+    data = response.json()
+    deals = data.get('data', [])
+    target_deals = [d for d in deals if (d.get('Closing_Date') or '') >= TARGET_START_DATE]
+    print(f"  ページ{page}: {len(target_deals)}件")
     
-    return {
-        'crm_headers': {'Authorization': f'Bearer {crm_tokens["access_token"]}'},
-        'books_headers': {'Authorization': f'Bearer {books_tokens["access_token"]}'},
-        'org_id': "772043849"
-    }
+    info = data.get('info', {})
+    reached_older = any(d.get('Closing_Date') and d['Closing_Date'] < TARGET_START_DATE for d in deals)
+    if not deals or not info.get('more_records', False) or reached_older:
+        return target_deals, None
+    # 2,000件を超える範囲はpage_tokenでのみ取得できる
+    return target_deals, {'page': page + 1, 'page_token': info.get('next_page_token')}
 
-def get_comprehensive_deals(headers, sample_size=2000):
-    """包括的な商談データを取得"""
-    print(f"📊 包括的商談データ取得中（最大{sample_size}件）...")
+def get_comprehensive_deals(session, headers, resume=False):
+    """対象期間の全商談を取得"""
+    print(f"📊 包括的商談データ取得中（{TARGET_START_DATE}以降の全件）...")
     
-    url = "https://www.zohoapis.com/crm/v2/Deals"
-    all_deals = []
-    page = 1
-    
-    while len(all_deals) < sample_size and page <= 15:
-        params = {
-            'fields': 'id,Deal_Name,Account_Name,Amount,Stage,Closing_Date,field78',
-            'per_page': min(200, sample_size - len(all_deals)),
-            'page': page,
-            'sort_by': 'Closing_Date',
-            'sort_order': 'desc'
-        }
-        
-        try:
-            response = requests.get(url, headers=headers, timeout=30)
-            
-            if response.status_code == 200:
-                data = response.json()
-                deals = data.get('data', [])
-                
-                if deals:
-                    # 2024/4/1以降でフィルタ
-                    target_deals = []
-                    for d in deals:
-                        closing_date = d.get('Closing_Date')
-                        if closing_date and closing_date >= '2024-04-01':
-                            target_deals.append(d)
-                    
-                    all_deals.extend(target_deals)
-                    print(f"  ページ{page}: {len(target_deals)}件追加（累計: {len(all_deals)}件）")
-                    
-                    if not data.get('info', {}).get('more_records', False):
-                        break
-                    page += 1
-                else:
-                    break
-            else:
-                print(f"  ❌ エラー: {response.status_code}")
-                break
-        
-        except Exception as e:
-            print(f"  ❌ 例外: {str(e)}")
-            break
-        
-        time.sleep(0.3)
+    all_deals = run_stage('deals', {'since': TARGET_START_DATE},
+                          lambda cursor: fetch_deal_page(session, headers, cursor),
+                          {'page': 1, 'page_token': None}, resume)
     
     print(f"✅ 商談取得完了: {len(all_deals)}件")
     return all_deals
 
-def get_parent_deals_batch(headers, parent_ids):
-    """親商談を効率的に取得"""
+def get_parent_deals_batch(session, headers, parent_ids, resume=False):
+    """親商談を効率的に取得（PARENT_BATCH_SIZE件ずつ、バッチごとにチェックポイントへ追記）"""
     print(f"📊 親商談取得中（{len(parent_ids)}件）...")
     
-    parent_deals = {}
-    parent_id_list = list(parent_ids)
+    parent_id_list = sorted(parent_ids)
+    url = "https://www.zohoapis.com/crm/v2/Deals"
     
-    # 50件ずつバッチ処理
-    for i in range(0, len(parent_id_list), 50):
-        batch = parent_id_list[i:i+50]
-        batch_str = ','.join(batch)
-        
-        try:
-            url = "https://www.zohoapis.com/crm/v2/Deals"
-            params = {
-                'fields': 'id,Deal_Name,Account_Name,Amount,Stage,Closing_Date',
-                'ids': batch_str
-            }
-            
-            response = requests.get(url, headers=headers, timeout=30)
-            
-            if response.status_code == 200:
-                data = response.json()
-                batch_parents = data.get('data', [])
-                for parent in batch_parents:
-                    parent_deals[parent['id']] = parent
-                
-                print(f"  バッチ{i//50 + 1}: {len(batch_parents)}件取得")
-            
-            time.sleep(0.3)
-            
-        except Exception as e:
-            print(f"  バッチ{i//50 + 1}でエラー: {str(e)}")
+    def fetch_batch(offset):
+        batch = parent_id_list[offset:offset + PARENT_BATCH_SIZE]
+        response = session.get(url, headers=headers, params={'ids': ','.join(batch)}, timeout=30)
+        if response.status_code not in (200, 204):
+            raise RuntimeError(f"親商談取得エラー（バッチ{offset // PARENT_BATCH_SIZE + 1}）: {response.status_code}")
+        batch_parents = response.json().get('data', []) if response.status_code == 200 else []
+        print(f"  バッチ{offset // PARENT_BATCH_SIZE + 1}: {len(batch_parents)}件取得")
+        
+        next_offset = offset + PARENT_BATCH_SIZE
+        if next_offset >= len(parent_id_list):
+            return batch_parents, None
+        time.sleep(0.3)
+        return batch_parents, next_offset
+    
+    parents = run_stage('parent_deals', {'ids': parent_id_list}, fetch_batch, 0, resume) if parent_id_list else []
+    parent_deals = {parent['id']: parent for parent in parents}
     
     print(f"✅ 親商談取得完了: {len(parent_deals)}件")
     return parent_deals
 
-def get_relevant_invoices(headers, org_id, deal_ids, sample_size=1000):
-    """関連する請求書を効率的に取得"""
-    print(f"📄 関連請求書取得中（最大{sample_size}件）...")
-    
+def fetch_invoice_page(session, headers, org_id, page):
+    """
+    2024/4/1以降の請求書を1ページ取得（件数上限なし）
+
+    日付の降順で取得するため、対象期間より古い請求書が現れたページで打ち切る
+
+    Returns:
+        tuple: (対象期間の請求書, 次のページ番号 or None)
+    """
     url = "https://www.zohoapis.com/books/v3/invoices"
-    invoices = []
-    page = 1
-    
-    while len(invoices) < sample_size and page <= 10:
-        params = {
-            'organization_id': org_id,
-            'per_page': min(200, sample_size - len(invoices)),
-            'page': page,
-            'sort_column': 'date',
-            'sort_order': 'D'
-        }
-        
-        try:
-            response = requests.get(url, headers=headers, timeout=30)
-            
-            if response.status_code == 200:
-                data = response.json()
-                page_invoices = data.get('invoices', [])
-                
-                if page_invoices:
-                    # 2024年以降かつ関連する請求書
-                    relevant_invoices = []
-                    for inv in page_invoices:
-                        inv_date = inv.get('date', '')
-                        ref_num = inv.get('reference_number', '').strip()
-                        
-                        if inv_date >= '2024-04-01' and ref_num in deal_ids:
-                            relevant_invoices.append(inv)
-                    
-                    invoices.extend(relevant_invoices)
-                    print(f"  ページ{page}: {len(relevant_invoices)}件関連請求書発見（累計: {len(invoices)}件）")
-                    
-                    if not data.get('page_context', {}).get('has_more_page', False):
-                        break
-                    page += 1
-                else:
-                    break
-            else:
-                print(f"  ❌ エラー: {response.status_code}")
-                break
-        
-        except Exception as e:
-            print(f"  ❌ 例外: {str(e)}")
-            break
-        
-        time.sleep(0.3)
+    params = {
+        'organization_id': org_id,
+        'per_page': 200,
+        'page': page,
+        'sort_column': 'date',
+        'sort_order': 'D'
+    }
+    
+    response = session.get(url, headers=headers, params=params, timeout=30)
+    if response.status_code != 200:
+        raise RuntimeError(f"請求書取得エラー（ページ{page}）: {response.status_code}")
+    
+    data = response.json()
+    page_invoices = data.get('invoices', [])
+    target_invoices = [inv for inv in page_invoices if inv.get('date', '') >= TARGET_START_DATE]
+    
+    if (not page_invoices or not data.get('page_context', {}).get('has_more_page', False)
+            or len(target_invoices) < len(page_invoices)):
+        return target_invoices, None
+    return target_invoices, page + 1
+
+def get_relevant_invoices(session, headers, org_id, deal_ids, resume=False):
+    """関連する請求書を全件取得"""
+    print(f"📄 関連請求書取得中（{TARGET_START_DATE}以降の全件）...")
+    
+    def fetch_page(page):
+        page_invoices, next_page = fetch_invoice_page(session, headers, org_id, page)
+        relevant_count = sum(1 for inv in page_invoices if (inv.get('reference_number') or '').strip() in deal_ids)
+        print(f"  ページ{page}: {relevant_count}件関連請求書発見")
+        return page_invoices, next_page
+    
+    # チェックポイントには対象期間の請求書をそのまま残し、関連の絞り込みは取得後に行う
+    target_invoices = run_stage('invoices', {'since': TARGET_START_DATE, 'organization_id': org_id},
+                                fetch_page, 1, resume, id_field='invoice_id')
+    invoices = [inv for inv in target_invoices if (inv.get('reference_number') or '').strip() in deal_ids]
     
     print(f"✅ 関連請求書取得完了: {len(invoices)}件")
     return invoices
@@ -272,100 +307,147 @@ def analyze_deal_patterns(child_deals, parent_deals):
     
     return patterns
 
-def analyze_invoice_matching(patterns, invoices):
-    """各パターンの請求書マッチング分析"""
+def _match_single_deal(deal, invoice_map):
+    """単体商談の請求書照合"""
+    deal_id = deal['id']
+    deal_amount = deal.get('Amount', 0) or 0
+    deal_invoices = invoice_map.get(deal_id, [])
+    invoice_total = sum(inv.get('total', 0) for inv in deal_invoices)
+    deal_amount_with_tax = TAX.with_tax(deal_amount)
+    difference = deal_amount_with_tax - invoice_total
+    
+    return {
+        'deal_id': deal_id,
+        'deal_name': deal.get('Deal_Name', '')[:30],
+        'deal_amount': deal_amount,
+        'deal_amount_with_tax': deal_amount_with_tax,
+        'invoice_total': invoice_total,
+        'invoice_count': len(deal_invoices),
+        'difference': difference,
+        'match_status': 'perfect' if abs(difference) <= ROUNDING_TOLERANCE_PER_DEAL else 'mismatch'
+    }
+
+def _match_deal_set(pattern_name, deal_set, invoice_map):
+    """親子セットの請求書照合"""
+    parent = deal_set['parent']
+    children = deal_set['children']
+    
+    # 関連請求書を収集
+    related_invoices = []
+    
+    # 親商談の請求書
+    parent_invoices = invoice_map.get(parent['id'], [])
+    for inv in parent_invoices:
+        related_invoices.append(('parent', inv))
+    
+    # 子商談の請求書
+    for child in children:
+        child_invoices = invoice_map.get(child['id'], [])
+        for inv in child_invoices:
+            related_invoices.append(('child', inv))
+    
+    total_invoice_amount = sum(inv[1].get('total', 0) for inv in related_invoices)
+    
+    # パターン別の期待値計算（請求対象の商談ごとに税込み換算して合計）
+    parent_amounts = [deal_set['parent_amount']]
+    children_amounts = [child.get('Amount', 0) or 0 for child in children]
+    billed_amounts = []
+    if pattern_name == 'pattern1_parent_only':
+        billed_amounts = parent_amounts
+    elif pattern_name == 'pattern2_children_only':
+        billed_amounts = children_amounts
+    elif pattern_name in ['pattern3_parent_統括_no_amount', 'pattern4_parent_統括_with_amount']:
+        # 親から子商談分を請求すると仮定
+        billed_amounts = children_amounts
+    elif pattern_name == 'pattern5_分担':
+        # 親子両方から請求すると仮定
+        billed_amounts = parent_amounts + children_amounts
+    expected_invoice_amount = TAX.invoice_total(billed_amounts)
+    
+    difference = expected_invoice_amount - total_invoice_amount
+    
+    return {
+        'parent_id': parent['id'],
+        'parent_name': parent.get('Deal_Name', '')[:40],
+        'parent_amount': deal_set['parent_amount'],
+        'children_amount': deal_set['children_amount'],
+        'children_count': deal_set['children_count'],
+        'total_amount': deal_set['total_amount'],
+        'expected_invoice': expected_invoice_amount,
+        'actual_invoice': total_invoice_amount,
+        'difference': difference,
+        'invoice_breakdown': {
+            'parent_invoices': len([inv for type_, inv in related_invoices if type_ == 'parent']),
+            'child_invoices': len([inv for type_, inv in related_invoices if type_ == 'child']),
+            'parent_invoice_amount': sum(inv[1].get('total', 0) for inv in related_invoices if inv[0] == 'parent'),
+            'child_invoice_amount': sum(inv[1].get('total', 0) for inv in related_invoices if inv[0] == 'child')
+        },
+        'match_status': ('perfect' if abs(difference) <= ROUNDING_TOLERANCE_PER_DEAL * max(len(billed_amounts), 1)
+                         else 'mismatch')
+    }
+
+def match_pattern_chunk(task):
+    """
+    ワーカープロセスで1チャンク分の商談を照合する
+
+    Args:
+        task (tuple): (パターン名, 商談 or 親子セットのリスト, チャンクに関係する請求書のみの reference_number→請求書 辞書)
+    """
+    pattern_name, pattern_deals, invoice_map = task
+    if pattern_name == 'no_parent_relation':
+        return [_match_single_deal(deal, invoice_map) for deal in pattern_deals]
+    return [_match_deal_set(pattern_name, deal_set, invoice_map) for deal_set in pattern_deals]
+
+def _chunk_tasks(pattern_name, pattern_deals, invoice_map):
+    """パターンの商談をチャンクに分け、各チャンクに必要な請求書だけを添えたタスクを作る"""
+    tasks = []
+    for i in range(0, len(pattern_deals), MATCH_CHUNK_SIZE):
+        chunk = pattern_deals[i:i + MATCH_CHUNK_SIZE]
+        if pattern_name == 'no_parent_relation':
+            deal_ids = [deal['id'] for deal in chunk]
+        else:
+            deal_ids = [deal_set['parent']['id'] for deal_set in chunk]
+            deal_ids += [child['id'] for deal_set in chunk for child in deal_set['children']]
+        chunk_invoices = {deal_id: invoice_map[deal_id] for deal_id in deal_ids if deal_id in invoice_map}
+        tasks.append((pattern_name, chunk, chunk_invoices))
+    return tasks
+
+def analyze_invoice_matching(patterns, invoices, workers=None):
+    """
+    各パターンの請求書マッチング分析（全件）
+
+    Args:
+        workers (int): ワーカープロセス数（既定: CPU数、1なら同一プロセスで実行）
+    """
     print(f"\n🔗 パターン別請求書マッチング分析...")
     
     # 請求書をreference_numberでインデックス化
     invoice_map = defaultdict(list)
     for invoice in invoices:
-        ref_num = invoice.get('reference_number', '').strip()
+        ref_num = (invoice.get('reference_number') or '').strip()
         if ref_num:
             invoice_map[ref_num].append(invoice)
     
-    results = {}
-    
+    tasks = []
     for pattern_name, pattern_deals in patterns.items():
+        tasks.extend(_chunk_tasks(pattern_name, pattern_deals, invoice_map))
+    
+    workers = min(workers or os.cpu_count() or 1, max(len(tasks), 1))
+    print(f"  ⚙️ {len(tasks)}チャンク（{MATCH_CHUNK_SIZE}件単位）を{workers}プロセスで照合")
+    
+    results = {pattern_name: [] for pattern_name in patterns}
+    if workers > 1:
+        with multiprocessing.Pool(workers) as pool:
+            # imapはタスク順に結果を返すため、パターン内の並びは入力と同じになる
+            for (pattern_name, _, _), chunk_results in zip(tasks, pool.imap(match_pattern_chunk, tasks)):
+                results[pattern_name].extend(chunk_results)
+    else:
+        for task in tasks:
+            results[task[0]].extend(match_pattern_chunk(task))
+    
+    for pattern_name, pattern_results in results.items():
         print(f"\n  📊 {pattern_name}分析:")
         
-        if pattern_name == 'no_parent_relation':
-            # 単体商談の分析
-            pattern_results = []
-            for deal in pattern_deals[:50]:  # 最初の50件のみ
-                deal_id = deal['id']
-                deal_amount = deal.get('Amount', 0) or 0
-                deal_invoices = invoice_map.get(deal_id, [])
-                invoice_total = sum(inv.get('total', 0) for inv in deal_invoices)
-                
-                pattern_results.append({
-                    'deal_id': deal_id,
-                    'deal_name': deal.get('Deal_Name', '')[:30],
-                    'deal_amount': deal_amount,
-                    'deal_amount_with_tax': deal_amount * 1.10,
-                    'invoice_total': invoice_total,
-                    'invoice_count': len(deal_invoices),
-                    'difference': deal_amount * 1.10 - invoice_total,
-                    'match_status': 'perfect' if abs(deal_amount * 1.10 - invoice_total) < 10 else 'mismatch'
-                })
-        else:
-            # 親子セットの分析
-            pattern_results = []
-            for deal_set in pattern_deals:
-                parent = deal_set['parent']
-                children = deal_set['children']
-                
-                # 関連請求書を収集
-                related_invoices = []
-                
-                # 親商談の請求書
-                parent_invoices = invoice_map.get(parent['id'], [])
-                for inv in parent_invoices:
-                    related_invoices.append(('parent', inv))
-                
-                # 子商談の請求書
-                for child in children:
-                    child_invoices = invoice_map.get(child['id'], [])
-                    for inv in child_invoices:
-                        related_invoices.append(('child', inv))
-                
-                total_invoice_amount = sum(inv[1].get('total', 0) for inv in related_invoices)
-                
-                # パターン別の期待値計算
-                expected_invoice_amount = 0
-                if pattern_name == 'pattern1_parent_only':
-                    expected_invoice_amount = deal_set['parent_amount'] * 1.10
-                elif pattern_name == 'pattern2_children_only':
-                    expected_invoice_amount = deal_set['children_amount'] * 1.10
-                elif pattern_name in ['pattern3_parent_統括_no_amount', 'pattern4_parent_統括_with_amount']:
-                    # 親から子商談分を請求すると仮定
-                    expected_invoice_amount = deal_set['children_amount'] * 1.10
-                elif pattern_name == 'pattern5_分担':
-                    # 親子両方から請求すると仮定
-                    expected_invoice_amount = deal_set['total_amount'] * 1.10
-                
-                difference = expected_invoice_amount - total_invoice_amount
-                
-                pattern_results.append({
-                    'parent_id': parent['id'],
-                    'parent_name': parent.get('Deal_Name', '')[:40],
-                    'parent_amount': deal_set['parent_amount'],
-                    'children_amount': deal_set['children_amount'],
-                    'children_count': deal_set['children_count'],
-                    'total_amount': deal_set['total_amount'],
-                    'expected_invoice': expected_invoice_amount,
-                    'actual_invoice': total_invoice_amount,
-                    'difference': difference,
-                    'invoice_breakdown': {
-                        'parent_invoices': len([inv for type_, inv in related_invoices if type_ == 'parent']),
-                        'child_invoices': len([inv for type_, inv in related_invoices if type_ == 'child']),
-                        'parent_invoice_amount': sum(inv[1].get('total', 0) for inv in related_invoices if inv[0] == 'parent'),
-                        'child_invoice_amount': sum(inv[1].get('total', 0) for inv in related_invoices if inv[0] == 'child')
-                    },
-                    'match_status': 'perfect' if abs(difference) < 100 else 'mismatch'
-                })
-        
-        results[pattern_name] = pattern_results
-        
         # サマリー出力
         if pattern_results:
             total_deals = len(pattern_results)
@@ -463,59 +545,79 @@ def generate_comprehensive_report(patterns, matching_results):
     
     print("="*100)
 
-def main():
-    """メイン処理"""
+def main(context=None):
+    """メイン処理（context: zoho_tools から共有する ZohoContext）"""
     print("="*100)
     print("📊 5パターン包括的商談・請求書整合性分析")
     print("="*100)
     
-    try:
-        # 1. トークン準備
-        tokens = load_tokens()
-        print("✅ トークン準備完了")
-        
-        # 2. 商談データ取得
-        child_deals = get_comprehensive_deals(tokens['crm_headers'])
-        if not child_deals:
-            print("❌ 商談データが取得できませんでした")
-            return
-        
-        # 3. 親商談ID抽出・取得
-        parent_ids = set()
-        for deal in child_deals:
-            field78 = deal.get('field78')
-            if field78 and isinstance(field78, dict):
-                parent_id = field78.get('id')
-                if parent_id:
-                    parent_ids.add(parent_id)
-        
-        parent_deals = get_parent_deals_batch(tokens['crm_headers'], parent_ids)
-        
-        # 4. パターン分析
-        patterns = analyze_deal_patterns(child_deals, parent_deals)
-        
-        # 5. 関連する全商談IDを収集
-        all_deal_ids = set()
-        for deal in child_deals:
-            all_deal_ids.add(deal['id'])
-        for parent_id, parent in parent_deals.items():
-            all_deal_ids.add(parent_id)
-        
-        # 6. 請求書取得
-        invoices = get_relevant_invoices(tokens['books_headers'], tokens['org_id'], all_deal_ids)
-        
-        # 7. マッチング分析
-        matching_results = analyze_invoice_matching(patterns, invoices)
-        
-        # 8. 包括的レポート
-        generate_comprehensive_report(patterns, matching_results)
-        
-        print(f"\n✅ 包括的分析完了")
-        
-    except Exception as e:
-        print(f"❌ エラー: {str(e)}")
-        import traceback
-        traceback.print_exc()
+    profiler = AnalysisProfiler.from_argv('comprehensive_pattern_analysis')
+    options = parse_options()
+    resume = options['resume']
+    
+    with profiler:
+        try:
+            # 1. トークン準備（セッションはメインプロセスだけで作る。照合ワーカーはAPIを呼ばない）
+            context = context or ZohoContext(TOKEN_DIR)
+            tokens = load_tokens(context)
+            if not tokens['org_id']:
+                print("❌ Books組織IDが取得できませんでした")
+                return 1
+            crm_session = context.session('crm', projection=FieldProjection.for_analysis('comprehensive_pattern'))
+            books_session = context.session('books')
+            print("✅ トークン準備完了")
+            
+            # 2. 商談データ取得
+            with profiler.phase('商談取得'):
+                child_deals = get_comprehensive_deals(crm_session, tokens['crm_headers'], resume)
+            if not child_deals:
+                print("❌ 商談データが取得できませんでした")
+                return 1
+            
+            # 3. 親商談ID抽出・取得
+            parent_ids = set()
+            for deal in child_deals:
+                field78 = deal.get('field78')
+                if field78 and isinstance(field78, dict):
+                    parent_id = field78.get('id')
+                    if parent_id:
+                        parent_ids.add(parent_id)
+            
+            with profiler.phase('親商談取得'):
+                parent_deals = get_parent_deals_batch(crm_session, tokens['crm_headers'], parent_ids, resume)
+            
+            # 4. パターン分析
+            with profiler.phase('パターン分析'):
+                patterns = analyze_deal_patterns(child_deals, parent_deals)
+            
+            # 5. 関連する全商談IDを収集
+            all_deal_ids = set()
+            for deal in child_deals:
+                all_deal_ids.add(deal['id'])
+            for parent_id, parent in parent_deals.items():
+                all_deal_ids.add(parent_id)
+            
+            # 6. 請求書取得
+            with profiler.phase('請求書取得'):
+                invoices = get_relevant_invoices(books_session, tokens['books_headers'], tokens['org_id'],
+                                                 all_deal_ids, resume)
+            
+            # 7. マッチング分析
+            with profiler.phase('マッチング'):
+                matching_results = analyze_invoice_matching(patterns, invoices, options['workers'])
+            
+            # 8. 包括的レポート
+            with profiler.phase('レポート生成'):
+                generate_comprehensive_report(patterns, matching_results)
+            
+            print(f"\n✅ 包括的分析完了")
+            return 0
+            
+        except Exception as e:
+            print(f"❌ エラー: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            return 1
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -2,17 +2,132 @@
 """
 修正版 請求漏れ分析ツール
 レイアウトに依存しない親子構造分析
+
+使い方:
+    python correct_invoice_leakage_analyzer.py [--incremental] [--profile[=mode]]
+
+--incremental:
+    対象の商談・親商談・請求書と、親子セット・商談ごとの分析結果を入力（判定に使う
+    商談項目と紐づく請求書）のハッシュとともに チェックポイント/ に保存する。
+    次回は前回の同期以降に変更された商談（If-Modified-Since）と請求書
+    （last_modified_time の降順）だけを取得して保存済みのデータに反映し、
+    それらに関係する単位だけハッシュを計算し直して、変わった単位だけを再判定する。
+    Books で削除された請求書は差分では検出できないため、定期的に --incremental
+    なしで実行するか状態ファイルを削除して全件取得し直すこと
 """
-import requests
+import hashlib
 import json
+import sys
 from pathlib import Path
 from collections import defaultdict
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta
+
+from analysis_profiler import AnalysisProfiler
+
+sys.path.append(str(Path(__file__).parent.parent / "01_Zoho_API" / "APIクライアント"))
+from zoho_context import ZohoContext
+from field_projection import FieldProjection
+from record_store import DealStore, InvoiceStore
+from snapshot_store import SnapshotStore, SnapshotError, print_diff
+from tax_engine import TaxEngine, TaxRule
+
+STATE_FILE = Path(__file__).parent / "チェックポイント" / "correct_invoice_leakage_state.json"
+STATE_VERSION = 2
+
+# 差分取得の起点を前回の同期開始時刻からこれだけ戻す（時計のずれ・同期中の更新の取りこぼし防止）
+SYNC_OVERLAP = timedelta(minutes=10)
+
+# (分析結果のキー, 表示名)
+ANALYSIS_CATEGORIES = [
+    ('parent_child_analysis', '親子セット'),
+    ('parent_only_analysis', '親のみ'),
+    ('child_only_analysis', '子のみ（孤児）'),
+    ('no_structure_analysis', '構造なし')
+]
+
+# 分析単位キーの接頭辞（差分再計算の状態・スナップショットのキー）
+UNIT_KEY_PREFIXES = {
+    'parent_child_analysis': 'set',
+    'parent_only_analysis': 'parent',
+    'child_only_analysis': 'child',
+    'no_structure_analysis': 'deal'
+}
+
+
+def parse_modified_time(value):
+    """Books の last_modified_time（例: 2025-06-30T10:15:00+0900）をタイムゾーン付き datetime に（空なら None）"""
+    if not value:
+        return None
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%S%z')
+
+
+def is_modified_since(invoice, since):
+    """請求書が since 以降に変更されたか（last_modified_time がなければ変更ありとみなす）"""
+    modified = parse_modified_time(invoice.get('last_modified_time'))
+    return modified is None or modified >= since
+
+
+class LeakageState:
+    """差分再計算用の状態（分析単位キー → 入力ハッシュと判定結果、同期済みの商談・請求書）"""
+    
+    def __init__(self, config, path=STATE_FILE):
+        self.config = config
+        self.path = Path(path)
+        self.units = {}
+        self.updated_at = None
+        # 前回の同期開始時刻（ISO 8601、タイムゾーン付き）と同期済みのレコード
+        self.synced_at = None
+        self.deals = []
+        self.parents = []
+        self.invoices = []
+    
+    @classmethod
+    def load(cls, config, path=STATE_FILE):
+        """保存済みの状態を読み込み（分析条件が異なる・未保存なら空）"""
+        state = cls(config, path)
+        if not state.path.exists():
+            print("  ⚠️ 前回の状態がないため全件を判定します")
+            return state
+        with open(state.path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != STATE_VERSION or data.get('config') != config:
+            print("  ⚠️ 分析条件が前回と異なるため全件を判定し直します")
+            return state
+        state.units = data.get('units', {})
+        state.updated_at = data.get('updated_at')
+        state.synced_at = data.get('synced_at')
+        state.deals = data.get('deals', [])
+        state.parents = data.get('parents', [])
+        state.invoices = data.get('invoices', [])
+        print(f"  🔁 前回の状態を読み込み: {len(state.units)}単位（{state.updated_at}）")
+        return state
+    
+    def save(self):
+        """書き込み途中で中断しても壊れないよう置き換えで保存"""
+        self.updated_at = datetime.now().isoformat()
+        self.path.parent.mkdir(exist_ok=True)
+        temp_file = self.path.with_suffix('.tmp')
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': STATE_VERSION,
+                'config': self.config,
+                'updated_at': self.updated_at,
+                'synced_at': self.synced_at,
+                'units': self.units,
+                'deals': self.deals,
+                'parents': self.parents,
+                'invoices': self.invoices
+            }, f, ensure_ascii=False)
+        temp_file.replace(self.path)
+        print(f"  💾 分析状態を保存: {self.path.name}（{len(self.units)}単位）")
 
 class CorrectInvoiceLeakageAnalyzer:
-    def __init__(self):
+    def __init__(self, context=None):
         self.base_path = Path(__file__).parent.parent / "01_Zoho_API" / "認証・トークン"
+        self.context = context or ZohoContext(self.base_path)
+        self.crm_session = self.context.session('crm', projection=FieldProjection.for_analysis('correct_invoice_leakage'))
+        self.books_session = self.context.session('books')
         self.load_tokens()
         self.org_id = self.get_org_id()
         
@@ -25,29 +140,35 @@ class CorrectInvoiceLeakageAnalyzer:
         # 対象期間
         self.target_start_date = '2024-04-01'
         
-        # 消費税率（10%）
+        # 消費税率（10%）・端数処理（商談1件ごとに四捨五入）
         self.tax_rate = 0.10
+        self.tax_rounding = '四捨五入'
+        self.tax = TaxEngine(TaxRule(self.tax_rate, self.tax_rounding))
+    
+    def state_config(self):
+        """差分再計算の状態を再利用してよいかの判定に使う分析条件"""
+        return {
+            'closed_stages': self.closed_stages,
+            'invalid_invoice_statuses': self.invalid_invoice_statuses,
+            'target_start_date': self.target_start_date,
+            'tax_rate': self.tax_rate,
+            'tax_rounding': self.tax_rounding
+        }
     
     def load_tokens(self):
-        """トークンを読み込み"""
-        with open(self.base_path / "zoho_crm_tokens.json", 'r') as f:
-            crm_tokens = json.load(f)
-        with open(self.base_path / "zoho_books_tokens.json", 'r') as f:
-            books_tokens = json.load(f)
-        
-        self.crm_headers = {'Authorization': f'Bearer {crm_tokens["access_token"]}'}
-        self.books_headers = {'Authorization': f'Bearer {books_tokens["access_token"]}'}
+        """トークンを読み込み（同じコンテキストの分析とヘッダーを共有）"""
+        self.crm_headers = self.context.headers('crm')
+        self.books_headers = self.context.headers('books')
     
     def get_org_id(self):
         """Books組織IDを取得"""
-        response = requests.get("https://www.zohoapis.com/books/v3/organizations", headers=self.books_headers)
-        if response.status_code == 200:
-            orgs = response.json()['organizations']
-            for org in orgs:
-                if '株式会社シー・ティー・エス' in org.get('name', ''):
-                    return org['organization_id']
-            return orgs[0]['organization_id'] if orgs else None
-        return None
+        return self.context.books_org_id()
+    
+    def is_target_deal(self, deal):
+        """受注済みステージかつ対象期間の商談か"""
+        closing_date = deal.get('Closing_Date')
+        return bool(deal.get('Stage') in self.closed_stages and
+                    closing_date and closing_date >= self.target_start_date)
     
     def get_all_closed_deals(self):
         """受注済み商談を全件取得"""
@@ -59,14 +180,13 @@ class CorrectInvoiceLeakageAnalyzer:
         
         while page <= 15:
             params = {
-                'fields': 'id,Deal_Name,Account_Name,Amount,Stage,Closing_Date,field78',
                 'per_page': 200,
                 'page': page,
                 'sort_by': 'Closing_Date',
                 'sort_order': 'desc'
             }
             
-            response = requests.get(url, headers=self.crm_headers, params=params)
+            response = self.crm_session.get(url, headers=self.crm_headers, params=params)
             
             if response.status_code == 200:
                 data = response.json()
@@ -74,20 +194,13 @@ class CorrectInvoiceLeakageAnalyzer:
                 
                 if deals:
                     # 受注済み＋期間フィルタ
-                    filtered_deals = []
-                    for deal in deals:
-                        stage = deal.get('Stage')
-                        closing_date = deal.get('Closing_Date')
-                        
-                        if (stage in self.closed_stages and 
-                            closing_date and closing_date >= self.target_start_date):
-                            filtered_deals.append(deal)
+                    filtered_deals = [deal for deal in deals if self.is_target_deal(deal)]
                     
                     all_deals.extend(filtered_deals)
                     print(f"  ページ{page}: {len(deals)}件中{len(filtered_deals)}件が対象")
                     
                     # 古いデータが多い場合は終了
-                    old_deals = [d for d in deals if d.get('Closing_Date', '9999') < self.target_start_date]
+                    old_deals = [d for d in deals if (d.get('Closing_Date') or '9999') < self.target_start_date]
                     if len(old_deals) > 150:
                         print(f"    古いデータが多くなったため取得終了")
                         break
@@ -134,12 +247,11 @@ class CorrectInvoiceLeakageAnalyzer:
                 id_list = ','.join(id_batch)
                 url = "https://www.zohoapis.com/crm/v2/Deals"
                 params = {
-                    'fields': 'id,Deal_Name,Account_Name,Amount,Stage,Closing_Date',
                     'ids': id_list
                 }
                 
                 try:
-                    response = requests.get(url, headers=self.crm_headers, params=params)
+                    response = self.crm_session.get(url, headers=self.crm_headers, params=params)
                     
                     if response.status_code == 200:
                         data = response.json()
@@ -262,7 +374,7 @@ class CorrectInvoiceLeakageAnalyzer:
                 'sort_order': 'D'
             }
             
-            response = requests.get(url, headers=self.books_headers, params=params)
+            response = self.books_session.get(url, headers=self.books_headers, params=params)
             
             if response.status_code == 200:
                 data = response.json()
@@ -289,144 +401,323 @@ class CorrectInvoiceLeakageAnalyzer:
         print(f"✅ 有効な請求書: {len(all_invoices)}件")
         return all_invoices
     
-    def match_deals_with_invoices(self, categories, invoices):
-        """商談と請求書をマッチング"""
-        print("\n🔗 請求漏れ分析中...")
-        
-        # 請求書をreference_numberでインデックス化
-        invoice_map = {}
-        for invoice in invoices:
-            ref_num = invoice.get('reference_number', '').strip()
-            if ref_num:
-                invoice_map[ref_num] = invoice
+    def get_modified_deals(self, since):
+        """since 以降に変更された商談を取得（ステージ・期間を問わない。変更がなければ304で空）"""
+        print(f"📊 {since:%Y-%m-%d %H:%M}以降に変更された商談を取得中...")
         
-        analysis_results = {
-            'parent_child_analysis': [],
-            'parent_only_analysis': [],
-            'child_only_analysis': [],
-            'no_structure_analysis': []
-        }
+        url = "https://www.zohoapis.com/crm/v2/Deals"
+        headers = dict(self.crm_headers)
+        headers['If-Modified-Since'] = since.isoformat(timespec='seconds')
+        changed_deals = []
+        page = 1
         
-        # 1. 親子セット分析
-        print("  📊 親子セット分析...")
-        for pc_set in categories['parent_child_sets']:
-            parent = pc_set['parent']
-            children = pc_set['children']
-            total_deal_amount = pc_set['total_amount']
-            parent_amount = pc_set['parent_amount']
-            children_amount = pc_set['children_amount']
-            
-            # 関連する請求書を検索
-            related_invoices = []
-            
-            # 親商談の請求書
-            parent_invoice = invoice_map.get(parent['id'])
-            if parent_invoice:
-                related_invoices.append(('parent', parent_invoice))
-            
-            # 子商談の請求書
-            for child in children:
-                child_invoice = invoice_map.get(child['id'])
-                if child_invoice:
-                    related_invoices.append(('child', child_invoice))
-            
-            total_invoice_amount = sum(inv[1].get('total', 0) for inv in related_invoices)
-            # 商談金額を税込みに変換して比較
-            total_deal_amount_with_tax = total_deal_amount * (1 + self.tax_rate)
-            amount_diff = total_deal_amount_with_tax - total_invoice_amount
-            
-            analysis_results['parent_child_analysis'].append({
-                'parent_name': parent.get('Deal_Name'),
-                'parent_id': parent['id'],
-                'parent_amount': parent_amount,
-                'children_count': len(children),
-                'children_amount': children_amount,
-                'total_deal_amount': total_deal_amount,
-                'total_deal_amount_with_tax': total_deal_amount_with_tax,
-                'invoice_count': len(related_invoices),
-                'total_invoice_amount': total_invoice_amount,
-                'amount_difference': amount_diff,
-                'is_leakage': abs(amount_diff) > 1,
-                'invoice_types': [inv[0] for inv in related_invoices]
-            })
-        
-        # 2. 親のみ分析
-        print("  📊 親のみ分析...")
-        for parent in categories['parent_only']:
-            deal_amount = parent.get('Amount', 0) or 0
-            deal_amount_with_tax = deal_amount * (1 + self.tax_rate)
-            invoice = invoice_map.get(parent['id'])
+        while True:
+            params = {
+                'per_page': 200,
+                'page': page,
+                'sort_by': 'Modified_Time',
+                'sort_order': 'desc'
+            }
+            response = self.crm_session.get(url, headers=headers, params=params)
             
-            if invoice:
-                invoice_amount = invoice.get('total', 0)
-                amount_diff = deal_amount_with_tax - invoice_amount
-            else:
-                invoice_amount = 0
-                amount_diff = deal_amount_with_tax
+            if response.status_code in (204, 304):
+                break
+            if response.status_code != 200:
+                raise RuntimeError(f"変更商談の取得エラー: {response.status_code}")
+            data = response.json()
+            changed_deals.extend(data.get('data', []))
+            if not data.get('info', {}).get('more_records', False):
+                break
+            page += 1
+        
+        print(f"✅ 変更された商談: {len(changed_deals)}件")
+        return changed_deals
+    
+    def get_modified_invoices(self, since):
+        """since 以降に変更された請求書を取得（無効化されたものも含む）"""
+        print(f"\n📄 {since:%Y-%m-%d %H:%M}以降に変更された請求書を取得中...")
+        
+        url = "https://www.zohoapis.com/books/v3/invoices"
+        changed_invoices = []
+        page = 1
+        
+        while True:
+            params = {
+                'organization_id': self.org_id,
+                'per_page': 200,
+                'page': page,
+                'sort_column': 'last_modified_time',
+                'sort_order': 'D'
+            }
+            response = self.books_session.get(url, headers=self.books_headers, params=params)
             
-            analysis_results['parent_only_analysis'].append({
-                'deal_name': parent.get('Deal_Name'),
-                'deal_id': parent['id'],
-                'deal_amount': deal_amount,
-                'deal_amount_with_tax': deal_amount_with_tax,
-                'invoice_amount': invoice_amount,
-                'amount_difference': amount_diff,
-                'is_leakage': abs(amount_diff) > 1,
-                'has_invoice': invoice is not None
-            })
-        
-        # 3. 子のみ分析
-        print("  📊 子のみ（孤児）分析...")
-        for child in categories['child_only']:
-            deal_amount = child.get('Amount', 0) or 0
-            deal_amount_with_tax = deal_amount * (1 + self.tax_rate)
-            invoice = invoice_map.get(child['id'])
+            if response.status_code != 200:
+                raise RuntimeError(f"変更請求書の取得エラー: {response.status_code}")
+            data = response.json()
+            invoices = data.get('invoices', [])
+            # 更新日時の降順なので since より古い請求書が出たらそれ以降は変更なし
+            recent = [inv for inv in invoices if is_modified_since(inv, since)]
+            changed_invoices.extend(recent)
+            if len(recent) < len(invoices) or not data.get('page_context', {}).get('has_more_page', False):
+                break
+            page += 1
+        
+        print(f"✅ 変更された請求書: {len(changed_invoices)}件")
+        return changed_invoices
+    
+    def sync_incremental(self, state):
+        """
+        前回の同期以降に変更された商談・請求書だけを取得し、状態に保存済みのデータに反映
+        
+        Returns:
+            tuple: (child_deals, parent_deals, invoices, touched)
+                touched = 変更の影響を受けうる商談IDの集合（前回の状態がなければ None = 全単位）
+        """
+        started = datetime.now().astimezone()
+        
+        if state.synced_at is None:
+            child_deals = DealStore.from_api(self.get_all_closed_deals())
+            parent_deals = DealStore.from_api(self.get_parent_deals(child_deals).values())
+            invoices = InvoiceStore.from_api(self.get_all_invoices())
+            touched = None
+        else:
+            since = datetime.fromisoformat(state.synced_at) - SYNC_OVERLAP
+            children = {deal['id']: deal for deal in state.deals}
+            parents = {deal['id']: deal for deal in state.parents}
+            invoice_map = {invoice['invoice_id']: invoice for invoice in state.invoices}
+            touched = set()
             
-            if invoice:
-                invoice_amount = invoice.get('total', 0)
-                amount_diff = deal_amount_with_tax - invoice_amount
-            else:
-                invoice_amount = 0
-                amount_diff = deal_amount_with_tax
+            for deal in DealStore.from_api(self.get_modified_deals(since)).to_records():
+                deal_id = deal['id']
+                touched.add(deal_id)
+                # 変更前後の親も対象（子の増減・付け替えで親子セットの内容が変わる）
+                for record in (deal, children.get(deal_id)):
+                    if record and record.get('field78'):
+                        touched.add(record['field78']['id'])
+                if deal_id in parents:
+                    parents[deal_id] = deal
+                if self.is_target_deal(deal):
+                    children[deal_id] = deal
+                else:
+                    children.pop(deal_id, None)
             
-            analysis_results['child_only_analysis'].append({
-                'deal_name': child.get('Deal_Name'),
-                'deal_id': child['id'],
-                'deal_amount': deal_amount,
-                'deal_amount_with_tax': deal_amount_with_tax,
-                'invoice_amount': invoice_amount,
-                'amount_difference': amount_diff,
-                'is_leakage': abs(amount_diff) > 1,
-                'has_invoice': invoice is not None
-            })
-        
-        # 4. 構造なし分析
-        print("  📊 構造なし分析...")
-        for deal in categories['no_structure']:
-            deal_amount = deal.get('Amount', 0) or 0
-            deal_amount_with_tax = deal_amount * (1 + self.tax_rate)
-            invoice = invoice_map.get(deal['id'])
+            # 新しく参照された親商談だけ取得し、参照されなくなった親商談は外す
+            referenced = {deal['field78']['id'] for deal in children.values() if deal.get('field78')}
+            new_parent_children = [deal for deal in children.values()
+                                   if deal.get('field78') and deal['field78']['id'] not in parents]
+            if new_parent_children:
+                for deal in DealStore.from_api(self.get_parent_deals(new_parent_children).values()).to_records():
+                    parents[deal['id']] = deal
+            parents = {deal_id: deal for deal_id, deal in parents.items() if deal_id in referenced}
             
-            if invoice:
-                invoice_amount = invoice.get('total', 0)
-                amount_diff = deal_amount_with_tax - invoice_amount
-            else:
-                invoice_amount = 0
-                amount_diff = deal_amount_with_tax
+            for invoice in InvoiceStore.from_api(self.get_modified_invoices(since)).to_records():
+                previous = invoice_map.get(invoice['invoice_id'])
+                for record in (invoice, previous):
+                    if record and record.get('reference_number'):
+                        touched.add(record['reference_number'].strip())
+                if invoice.get('status') in self.invalid_invoice_statuses:
+                    invoice_map.pop(invoice['invoice_id'], None)
+                else:
+                    invoice_map[invoice['invoice_id']] = invoice
             
-            analysis_results['no_structure_analysis'].append({
-                'deal_name': deal.get('Deal_Name'),
-                'deal_id': deal['id'],
-                'deal_amount': deal_amount,
-                'deal_amount_with_tax': deal_amount_with_tax,
-                'invoice_amount': invoice_amount,
-                'amount_difference': amount_diff,
-                'is_leakage': abs(amount_diff) > 1,
-                'has_invoice': invoice is not None
-            })
+            child_deals = DealStore.from_api(children.values())
+            parent_deals = DealStore.from_api(parents.values())
+            # 全件取得と同じ日付の降順に並べて reference_number の重複時に同じ請求書を選ぶ
+            invoices = InvoiceStore.from_api(sorted(invoice_map.values(), key=lambda inv: inv.get('date') or '',
+                                                    reverse=True))
+            print(f"  🔁 差分反映後: 商談{len(child_deals)}件 / 親商談{len(parent_deals)}件"
+                  f" / 請求書{len(invoices)}件（影響する商談ID: {len(touched)}個）")
+        
+        state.synced_at = started.isoformat()
+        state.deals = child_deals.to_records()
+        state.parents = parent_deals.to_records()
+        state.invoices = invoices.to_records()
+        return child_deals, parent_deals, invoices, touched
+    
+    def _invoice_lookup(self, invoices):
+        """reference_number → 請求書 の検索関数（InvoiceStore は保持している索引を使う）"""
+        if isinstance(invoices, InvoiceStore):
+            return invoices.latest_for_reference
+        invoice_map = {}
+        for invoice in invoices:
+            ref_num = invoice.get('reference_number', '').strip()
+            if ref_num:
+                invoice_map[ref_num] = invoice
+        return invoice_map.get
+    
+    def iter_analysis_units(self, categories):
+        """分類結果を分析単位 (結果カテゴリ, 単位キー, 親子セットまたは商談) に展開"""
+        for pc_set in categories['parent_child_sets']:
+            yield 'parent_child_analysis', f"set:{pc_set['parent']['id']}", pc_set
+        for result_key, category_key in (('parent_only_analysis', 'parent_only'),
+                                         ('child_only_analysis', 'child_only'),
+                                         ('no_structure_analysis', 'no_structure')):
+            for deal in categories[category_key]:
+                yield result_key, f"{UNIT_KEY_PREFIXES[result_key]}:{deal['id']}", deal
+    
+    def analyze_unit(self, result_key, unit, invoice_for):
+        """分析単位1つ分の請求漏れ判定"""
+        if result_key == 'parent_child_analysis':
+            return self._analyze_parent_child_set(unit, invoice_for)
+        return self._analyze_single_deal(unit, invoice_for)
+    
+    def _analyze_parent_child_set(self, pc_set, invoice_for):
+        parent = pc_set['parent']
+        children = pc_set['children']
+        total_deal_amount = pc_set['total_amount']
+        
+        # 関連する請求書を検索
+        related_invoices = []
+        
+        # 親商談の請求書
+        parent_invoice = invoice_for(parent['id'])
+        if parent_invoice:
+            related_invoices.append(('parent', parent_invoice))
+        
+        # 子商談の請求書
+        for child in children:
+            child_invoice = invoice_for(child['id'])
+            if child_invoice:
+                related_invoices.append(('child', child_invoice))
+        
+        total_invoice_amount = sum(inv[1].get('total', 0) for inv in related_invoices)
+        # 商談金額を税込みに変換して比較（商談ごとに端数処理して合計）
+        total_deal_amount_with_tax = self.tax.invoice_total(
+            [parent.get('Amount') or 0] + [child.get('Amount') or 0 for child in children])
+        amount_diff = total_deal_amount_with_tax - total_invoice_amount
+        
+        return {
+            'parent_name': parent.get('Deal_Name'),
+            'parent_id': parent['id'],
+            'parent_amount': pc_set['parent_amount'],
+            'children_count': len(children),
+            'children_amount': pc_set['children_amount'],
+            'total_deal_amount': total_deal_amount,
+            'total_deal_amount_with_tax': total_deal_amount_with_tax,
+            'invoice_count': len(related_invoices),
+            'total_invoice_amount': total_invoice_amount,
+            'amount_difference': amount_diff,
+            'is_leakage': abs(amount_diff) > 1,
+            'invoice_types': [inv[0] for inv in related_invoices]
+        }
+    
+    def _analyze_single_deal(self, deal, invoice_for):
+        deal_amount = deal.get('Amount', 0) or 0
+        deal_amount_with_tax = self.tax.with_tax(deal_amount)
+        invoice = invoice_for(deal['id'])
+        
+        if invoice:
+            invoice_amount = invoice.get('total', 0)
+            amount_diff = deal_amount_with_tax - invoice_amount
+        else:
+            invoice_amount = 0
+            amount_diff = deal_amount_with_tax
+        
+        return {
+            'deal_name': deal.get('Deal_Name'),
+            'deal_id': deal['id'],
+            'deal_amount': deal_amount,
+            'deal_amount_with_tax': deal_amount_with_tax,
+            'invoice_amount': invoice_amount,
+            'amount_difference': amount_diff,
+            'is_leakage': abs(amount_diff) > 1,
+            'has_invoice': invoice is not None
+        }
+    
+    def match_deals_with_invoices(self, categories, invoices):
+        """商談と請求書をマッチング（invoices は請求書リストまたは InvoiceStore）"""
+        print("\n🔗 請求漏れ分析中...")
+        
+        invoice_for = self._invoice_lookup(invoices)
+        analysis_results = {result_key: [] for result_key, _ in ANALYSIS_CATEGORIES}
+        
+        current_key = None
+        for result_key, _, unit in self.iter_analysis_units(categories):
+            if result_key != current_key:
+                current_key = result_key
+                print(f"  📊 {dict(ANALYSIS_CATEGORIES)[result_key]}分析...")
+            analysis_results[result_key].append(self.analyze_unit(result_key, unit, invoice_for))
         
         return analysis_results
     
+    def unit_deals(self, result_key, unit):
+        """分析単位に含まれる商談"""
+        return [unit['parent']] + unit['children'] if result_key == 'parent_child_analysis' else [unit]
+    
+    def unit_fingerprint(self, result_key, unit, invoice_for):
+        """分析単位の入力（商談の判定項目と紐づく請求書）のハッシュ"""
+        parts = [result_key]
+        for deal in self.unit_deals(result_key, unit):
+            invoice = invoice_for(deal['id'])
+            parts.append((deal['id'], deal.get('Deal_Name'), deal.get('Amount'), deal.get('Stage'),
+                          deal.get('Closing_Date'),
+                          invoice.get('invoice_id') if invoice else None,
+                          invoice.get('total') if invoice else None))
+        return hashlib.blake2b(repr(parts).encode('utf-8'), digest_size=16).hexdigest()
+    
+    def match_deals_with_invoices_incremental(self, categories, invoices, state, touched=None):
+        """
+        前回の状態と入力ハッシュが同じ分析単位は結果を再利用し、変わった単位だけ再判定する
+        
+        touched（sync_incremental の戻り値）を渡すと、そのどの商談も含まない前回からある単位は
+        ハッシュも計算せずに再利用する
+        
+        Returns:
+            tuple: (analysis_results, changes)
+                changes = {'reused': 件数, 'recomputed': [(単位キー, 前回の結果, 今回の結果)],
+                           'removed': [(単位キー, 前回の結果)]}
+        """
+        print("\n🔗 請求漏れ分析中（差分再計算）...")
+        
+        invoice_for = self._invoice_lookup(invoices)
+        analysis_results = {result_key: [] for result_key, _ in ANALYSIS_CATEGORIES}
+        changes = {'reused': 0, 'recomputed': [], 'removed': []}
+        units = {}
+        
+        for result_key, unit_key, unit in self.iter_analysis_units(categories):
+            cached = state.units.get(unit_key)
+            if (cached and touched is not None
+                    and not any(deal['id'] in touched for deal in self.unit_deals(result_key, unit))):
+                units[unit_key] = cached
+                analysis_results[result_key].append(cached['result'])
+                changes['reused'] += 1
+                continue
+            fingerprint = self.unit_fingerprint(result_key, unit, invoice_for)
+            if cached and cached['hash'] == fingerprint:
+                row = cached['result']
+                changes['reused'] += 1
+            else:
+                row = self.analyze_unit(result_key, unit, invoice_for)
+                changes['recomputed'].append((unit_key, cached['result'] if cached else None, row))
+            units[unit_key] = {'hash': fingerprint, 'result': row}
+            analysis_results[result_key].append(row)
+        
+        changes['removed'] = [(unit_key, entry['result']) for unit_key, entry in state.units.items()
+                              if unit_key not in units]
+        state.units = units
+        
+        print(f"  再利用: {changes['reused']}単位 / 再計算: {len(changes['recomputed'])}単位"
+              f" / 対象外になった単位: {len(changes['removed'])}")
+        return analysis_results, changes
+    
+    def report_incremental_changes(self, changes):
+        """前回の実行から新たに漏れになった・解消した分析単位を表示"""
+        new_leakages = [(key, row) for key, before, row in changes['recomputed']
+                        if row['is_leakage'] and not (before and before['is_leakage'])]
+        resolved = [(key, row) for key, before, row in changes['recomputed']
+                    if before and before['is_leakage'] and not row['is_leakage']]
+        resolved += [(key, before) for key, before in changes['removed'] if before['is_leakage']]
+        
+        print(f"\n🔁 前回実行からの変化")
+        print(f"  新たな請求漏れ: {len(new_leakages)}件")
+        for key, row in new_leakages[:10]:
+            name = row.get('deal_name') or row.get('parent_name') or key
+            print(f"    • {name[:40]}  差額: ¥{row['amount_difference']:,.0f}")
+        print(f"  解消・対象外: {len(resolved)}件")
+        for key, row in resolved[:10]:
+            name = row.get('deal_name') or row.get('parent_name') or key
+            print(f"    • {name[:40]}")
+    
     def generate_leakage_report(self, analysis_results):
         """請求漏れレポートを生成"""
         print("\n" + "="*70)
@@ -497,51 +788,106 @@ class CorrectInvoiceLeakageAnalyzer:
                 file_path = output_dir / f"{category_name}_分析_{timestamp}.csv"
                 df.to_csv(file_path, index=False, encoding='utf-8-sig')
                 print(f"📁 {category_name}分析結果を保存: {file_path}")
+        
+        self.save_snapshot(analysis_results, timestamp)
+    
+    def leakage_frame(self, analysis_results):
+        """全カテゴリの分析結果を分析単位キー付きの1つのDataFrameにまとめる"""
+        frames = []
+        for category_key, _ in ANALYSIS_CATEGORIES:
+            data = analysis_results[category_key]
+            if not data:
+                continue
+            df = pd.DataFrame(data)
+            id_column = 'parent_id' if category_key == 'parent_child_analysis' else 'deal_id'
+            df.insert(0, 'unit_key', UNIT_KEY_PREFIXES[category_key] + ':' + df[id_column].astype(str))
+            df.insert(1, 'category', category_key)
+            frames.append(df)
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['unit_key', 'category'])
+    
+    def save_snapshot(self, analysis_results, run_id):
+        """分析結果をスナップショットに保存し、前回の実行との漏れの差分を表示"""
+        store = SnapshotStore()
+        try:
+            store.write('invoice_leakage', self.leakage_frame(analysis_results), key='unit_key',
+                        run_id=run_id, source=Path(__file__).name)
+            if len(store.runs('invoice_leakage')) > 1:
+                print_diff(store.diff('invoice_leakage', compare_columns=['amount_difference'],
+                                      leakage_column='is_leakage'))
+        except SnapshotError as e:
+            print(f"⚠️ スナップショットを保存できませんでした: {e}")
 
-def main():
-    """メイン処理"""
+def main(context=None):
+    """メイン処理（context: zoho_tools から共有する ZohoContext）"""
     print("="*70)
     print("修正版 請求漏れ分析ツール（消費税対応）")
     print("="*70)
     
-    analyzer = CorrectInvoiceLeakageAnalyzer()
-    
-    if not analyzer.org_id:
-        print("❌ Books組織IDが取得できませんでした")
-        return
+    profiler = AnalysisProfiler.from_argv('correct_invoice_leakage')
+    incremental = '--incremental' in sys.argv[1:]
     
-    print("\n📋 分析設定:")
-    print(f"  受注ステージ: {analyzer.closed_stages}")
-    print(f"  無効請求書ステータス: {analyzer.invalid_invoice_statuses}")
-    print(f"  対象期間: {analyzer.target_start_date}以降")
-    print(f"  消費税率: {analyzer.tax_rate * 100:.0f}% (商談=税抜き、請求書=税込みで比較)")
-    
-    # 1. 受注済み商談（子商談）取得
-    child_deals = analyzer.get_all_closed_deals()
-    
-    if not child_deals:
-        print("❌ 受注済み商談が見つかりませんでした")
-        return
-    
-    # 2. 親商談取得
-    parent_deals = analyzer.get_parent_deals(child_deals)
-    
-    # 3. 親子構造分類
-    categories = analyzer.categorize_deals_by_structure(child_deals, parent_deals)
-    
-    # 4. 請求書取得
-    invoices = analyzer.get_all_invoices()
-    
-    # 5. 請求漏れ分析
-    analysis_results = analyzer.match_deals_with_invoices(categories, invoices)
-    
-    # 6. レポート生成
-    analyzer.generate_leakage_report(analysis_results)
-    
-    # 7. 結果エクスポート
-    analyzer.export_analysis_results(analysis_results)
-    
-    print(f"\n✅ 請求漏れ分析完了")
+    with profiler:
+        analyzer = CorrectInvoiceLeakageAnalyzer(context)
+        
+        if not analyzer.org_id:
+            print("❌ Books組織IDが取得できませんでした")
+            return 1
+        
+        print("\n📋 分析設定:")
+        print(f"  受注ステージ: {analyzer.closed_stages}")
+        print(f"  無効請求書ステータス: {analyzer.invalid_invoice_statuses}")
+        print(f"  対象期間: {analyzer.target_start_date}以降")
+        print(f"  消費税率: {analyzer.tax_rate * 100:.0f}% (商談=税抜き、請求書=税込みで比較)")
+        
+        if incremental:
+            # 1〜2, 4. 前回の同期以降に変更された商談・請求書だけを取得して保存済みのデータに反映
+            with profiler.phase('差分取得'):
+                state = LeakageState.load(analyzer.state_config())
+                child_deals, parent_deals, invoices, touched = analyzer.sync_incremental(state)
+        else:
+            # 1. 受注済み商談（子商談）取得（以降はコンパクトなストアで保持）
+            with profiler.phase('商談取得'):
+                child_deals = DealStore.from_api(analyzer.get_all_closed_deals())
+        
+        if not child_deals:
+            print("❌ 受注済み商談が見つかりませんでした")
+            return 1
+        
+        if not incremental:
+            # 2. 親商談取得
+            with profiler.phase('親商談取得'):
+                parent_deals = DealStore.from_api(analyzer.get_parent_deals(child_deals).values())
+        
+        # 3. 親子構造分類
+        with profiler.phase('親子構造分類'):
+            categories = analyzer.categorize_deals_by_structure(child_deals, parent_deals)
+        
+        if not incremental:
+            # 4. 請求書取得
+            with profiler.phase('請求書取得'):
+                invoices = InvoiceStore.from_api(analyzer.get_all_invoices())
+        
+        # 5. 請求漏れ分析（--incremental は前回から入力が変わった単位だけ再判定）
+        with profiler.phase('マッチング'):
+            if incremental:
+                analysis_results, changes = analyzer.match_deals_with_invoices_incremental(
+                    categories, invoices, state, touched)
+                state.save()
+            else:
+                analysis_results = analyzer.match_deals_with_invoices(categories, invoices)
+        
+        # 6. レポート生成
+        with profiler.phase('レポート生成'):
+            analyzer.generate_leakage_report(analysis_results)
+            if incremental:
+                analyzer.report_incremental_changes(changes)
+        
+        # 7. 結果エクスポート
+        with profiler.phase('エクスポート'):
+            analyzer.export_analysis_results(analysis_results)
+        
+        print(f"\n✅ 請求漏れ分析完了")
+        return 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
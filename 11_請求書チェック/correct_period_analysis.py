@@ -3,6 +3,19 @@
 JT ETP 修正版期間分析
 実際の状況に基づく正確な分析
 """
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "01_Zoho_API" / "APIクライアント"))
+from month_utils import month_range
+from period_index import month_label
+from tax_engine import TaxEngine
+
+# 対象期間（成約月）と入金の締め月
+TARGET_MONTHS = month_range('2024-12', '2025-05')
+CUTOFF_MONTH = '2025-06'
+tax = TaxEngine()
+
 print("="*90)
 print("📊 JT ETP 修正版期間分析")
 print("  2024年12月〜2025年5月商談 vs 6月までの入金")
@@ -14,16 +27,16 @@ print("-" * 90)
 
 # 入金データ（画面確認済み）
 payments_data = {
-    '2025年3月': 34085369,
-    '2025年4月': 47090472,
-    '2025年5月': 9903319,
-    '2025年6月': 965194
+    '2025-03': 34085369,
+    '2025-04': 47090472,
+    '2025-05': 9903319,
+    '2025-06': 965194
 }
 
 total_payments = sum(payments_data.values())
 print(f"✅ 確認済み入金データ:")
 for month, amount in payments_data.items():
-    print(f"  {month}: ¥{amount:,.0f}")
+    print(f"  {month_label(month)}: ¥{amount:,.0f}")
 print(f"  合計: ¥{total_payments:,.0f}")
 
 print(f"\n🔍 【重要な前提】")
@@ -42,24 +55,25 @@ print("💰 入金額から推定される商談額（税抜き）:")
 
 total_estimated_deals_excluding_tax = 0
 for month, payment in payments_data.items():
-    if month != '2025年6月':  # 6月は対象期間外
-        estimated_deal_amount = payment / 1.1  # 税抜きに変換
+    if month in TARGET_MONTHS:  # 6月は対象期間外
+        estimated_deal_amount, _ = tax.split_inclusive(payment)  # 税抜きに変換
         total_estimated_deals_excluding_tax += estimated_deal_amount
-        print(f"  {month}: ¥{payment:,.0f}(入金) → ¥{estimated_deal_amount:,.0f}(推定商談税抜き)")
+        print(f"  {month_label(month)}: ¥{payment:,.0f}(入金) → ¥{estimated_deal_amount:,.0f}(推定商談税抜き)")
 
 # 6月分は追加情報として表示
-june_payment = payments_data['2025年6月']
-june_estimated = june_payment / 1.1
-print(f"  2025年6月: ¥{june_payment:,.0f}(入金) → ¥{june_estimated:,.0f}(推定商談税抜き)")
+june_payment = payments_data[CUTOFF_MONTH]
+june_estimated, _ = tax.split_inclusive(june_payment)
+print(f"  {month_label(CUTOFF_MONTH)}: ¥{june_payment:,.0f}(入金) → ¥{june_estimated:,.0f}(推定商談税抜き)")
 
 print(f"\n📈 【集計結果】")
 total_target_period_payment = total_payments - june_payment  # 6月分除外
 total_target_period_deals = total_estimated_deals_excluding_tax
+total_target_period_deals_with_tax = tax.with_tax(total_target_period_deals)
 
 print(f"対象期間（2024/12〜2025/5）:")
 print(f"  入金合計: ¥{total_target_period_payment:,.0f}")
 print(f"  推定商談額（税抜き）: ¥{total_target_period_deals:,.0f}")
-print(f"  推定商談額（税込み）: ¥{total_target_period_deals * 1.1:,.0f}")
+print(f"  推定商談額（税込み）: ¥{total_target_period_deals_with_tax:,.0f}")
 
 print(f"\n🎯 【比較分析】")
 print("="*90)
@@ -67,27 +81,27 @@ print("="*90)
 print(f"📊 基本比較:")
 print(f"  推定商談総額（税抜き）: ¥{total_target_period_deals:,.0f}")
 print(f"  実際の入金額: ¥{total_target_period_payment:,.0f}")
-print(f"  推定商談総額（税込み）: ¥{total_target_period_deals * 1.1:,.0f}")
+print(f"  推定商談総額（税込み）: ¥{total_target_period_deals_with_tax:,.0f}")
 
 # 差額分析
 diff_vs_excluding_tax = total_target_period_payment - total_target_period_deals
-diff_vs_including_tax = total_target_period_payment - (total_target_period_deals * 1.1)
+diff_vs_including_tax = total_target_period_payment - total_target_period_deals_with_tax
 
 print(f"\n💡 差額分析:")
 print(f"  入金 vs 商談（税抜き）: ¥{diff_vs_excluding_tax:,.0f}")
 print(f"  入金 vs 商談（税込み）: ¥{diff_vs_including_tax:,.0f}")
 
 # 適正性評価
-if abs(diff_vs_including_tax) <= total_target_period_deals * 1.1 * 0.02:  # 2%以内
+if abs(diff_vs_including_tax) <= total_target_period_deals_with_tax * 0.02:  # 2%以内
     status = "✅ ほぼ完全一致（適正処理）"
-elif abs(diff_vs_including_tax) <= total_target_period_deals * 1.1 * 0.05:  # 5%以内
+elif abs(diff_vs_including_tax) <= total_target_period_deals_with_tax * 0.05:  # 5%以内
     status = "✅ 概ね適正（軽微な差異）"
 else:
     status = "⚠️ 要確認（差異あり）"
 
 print(f"\n📋 【評価結果】")
 print(f"  {status}")
-print(f"  差異率: {abs(diff_vs_including_tax) / (total_target_period_deals * 1.1) * 100:.1f}%")
+print(f"  差異率: {abs(diff_vs_including_tax) / total_target_period_deals_with_tax * 100:.1f}%")
 
 # 追加分析：期間別パターン
 print(f"\n📅 【期間別パターン分析】")
@@ -95,12 +109,12 @@ print("-" * 90)
 
 monthly_analysis = {}
 for month, payment in payments_data.items():
-    if month != '2025年6月':
-        estimated_deal = payment / 1.1
-        monthly_analysis[month] = {
+    if month in TARGET_MONTHS:
+        estimated_deal, _ = tax.split_inclusive(payment)
+        monthly_analysis[month_label(month)] = {
             'payment': payment,
             'estimated_deal_excluding_tax': estimated_deal,
-            'estimated_deal_including_tax': estimated_deal * 1.1
+            'estimated_deal_including_tax': tax.with_tax(estimated_deal)
         }
 
 # パターン確認
@@ -131,6 +145,6 @@ print(f"\n💰 【最終結論】")
 print(f"2024年12月〜2025年5月の商談に対する請求・入金状況:")
 print(f"  推定商談額: ¥{total_target_period_deals:,.0f}（税抜き）")
 print(f"  実際入金額: ¥{total_target_period_payment:,.0f}")
-print(f"  処理率: {(total_target_period_payment / (total_target_period_deals * 1.1)) * 100:.1f}%")
+print(f"  処理率: {(total_target_period_payment / total_target_period_deals_with_tax) * 100:.1f}%")
 
 print("="*90)
\ No newline at end of file
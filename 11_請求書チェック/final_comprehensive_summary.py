@@ -3,12 +3,28 @@
 最終包括サマリー
 全データを抽出して「総額」「総額（税込み）」「請求金額」を算出
 """
-import requests
 import json
+import sys
 from pathlib import Path
 from collections import defaultdict
 import time
 
+sys.path.append(str(Path(__file__).parent.parent / "01_Zoho_API" / "APIクライアント"))
+from zoho_http_transport import ZohoSession, FileTokenRefresher, TOKEN_DIR
+from zoho_context import ZohoContext
+from extraction_journal import ExtractionJournal, run_extraction
+from field_projection import FieldProjection
+from analysis_profiler import AnalysisProfiler
+from tax_engine import TaxEngine
+
+# 商談金額（税抜き）の税込み換算（商談1件ごとに四捨五入）
+TAX = TaxEngine()
+
+# 429/5xxの再試行と401時のトークン更新を行う共有セッション
+crm_session = ZohoSession(FileTokenRefresher(TOKEN_DIR / "zoho_crm_tokens.json"),
+                          projection=FieldProjection.for_analysis('final_summary'))
+books_session = ZohoSession(FileTokenRefresher(TOKEN_DIR / "zoho_books_tokens.json"))
+
 def load_tokens():
     """CRMとBooksトークンを読み込み"""
     base_path = Path(__file__).parent.parent / "01_Zoho_API" / "認証・トークン"
@@ -22,87 +38,81 @@ def load_tokens():
     return {
         'crm_headers': {'Authorization': f'Bearer {crm_tokens["access_token"]}'},
         'books_headers': {'Authorization': f'Bearer {books_tokens["access_token"]}'},
-        'org_id': "772043849"
+        'org_id': ZohoContext(base_path).books_org_id()
     }
 
 def get_all_deals_comprehensive(headers, max_pages=100):
-    """2024/4/1以降の全商談を包括的に取得"""
+    """2024/4/1以降の全商談を包括的に取得（ページごとにジャーナルへ保存し、中断時は続きから再開）"""
     print("📊 2024/4/1以降の全商談を包括的に取得中...")
     
     url = "https://www.zohoapis.com/crm/v2/Deals"
-    all_deals = []
-    page = 1
+    fields = crm_session.projection.fields_param('Deals')
+    journal = ExtractionJournal('final_summary_deals', params={'fields': fields, 'since': '2024-04-01'})
     
-    while page <= max_pages:
+    def fetch_page(page):
         params = {
-            'fields': 'id,Deal_Name,Account_Name,Amount,Stage,Closing_Date,field78',
             'per_page': 200,
             'page': page,
             'sort_by': 'Closing_Date',
             'sort_order': 'desc'
         }
         
-        try:
-            if page % 10 == 1:  # 10ページごとに進捗表示
-                print(f"  ページ{page}-{min(page+9, max_pages)}を処理中...")
-            
-            response = requests.get(url, headers=headers, timeout=30)
-            
-            if response.status_code == 200:
-                data = response.json()
-                deals = data.get('data', [])
-                
-                if deals:
-                    # 2024/4/1以降でフィルタ
-                    target_deals = []
-                    old_deals_count = 0
-                    
-                    for deal in deals:
-                        closing_date = deal.get('Closing_Date')
-                        if closing_date and closing_date >= '2024-04-01':
-                            target_deals.append(deal)
-                        elif closing_date:
-                            old_deals_count += 1
-                    
-                    all_deals.extend(target_deals)
-                    
-                    # 古いデータが多くなったら終了
-                    if old_deals_count > 150:
-                        print(f"  古いデータが多いため終了（ページ{page}）")
-                        break
-                    
-                    if not data.get('info', {}).get('more_records', False):
-                        print(f"  全データ取得完了（ページ{page}）")
-                        break
-                    page += 1
-                else:
-                    print(f"  データなし（ページ{page}）")
-                    break
-            else:
-                print(f"  ❌ エラー: {response.status_code}（ページ{page}）")
-                break
-                
-        except Exception as e:
-            print(f"  ❌ 例外: {str(e)}（ページ{page}）")
-            break
+        if page % 10 == 1:  # 10ページごとに進捗表示
+            print(f"  ページ{page}-{min(page+9, max_pages)}を処理中...")
+        
+        response = crm_session.get(url, headers=headers, params=params, timeout=30)
+        if response.status_code != 200:
+            raise RuntimeError(f"商談取得エラー: {response.status_code}（ページ{page}）")
+        
+        data = response.json()
+        deals = data.get('data', [])
+        if not deals:
+            print(f"  データなし（ページ{page}）")
+            return [], None
+        
+        # 2024/4/1以降でフィルタ
+        target_deals = []
+        old_deals_count = 0
+        
+        for deal in deals:
+            closing_date = deal.get('Closing_Date')
+            if closing_date and closing_date >= '2024-04-01':
+                target_deals.append(deal)
+            elif closing_date:
+                old_deals_count += 1
+        
+        # 古いデータが多くなったら終了
+        if old_deals_count > 150:
+            print(f"  古いデータが多いため終了（ページ{page}）")
+            return target_deals, None
+        
+        if not data.get('info', {}).get('more_records', False):
+            print(f"  全データ取得完了（ページ{page}）")
+            return target_deals, None
+        
+        if page >= max_pages:
+            return target_deals, None
         
         if page % 5 == 0:  # 5ページごとに休憩
             time.sleep(1)
         else:
             time.sleep(0.2)
+        return target_deals, page + 1
+    
+    all_deals = run_extraction(journal, fetch_page)
     
     print(f"✅ 商談取得完了: {len(all_deals)}件")
     return all_deals
 
 def get_comprehensive_invoices(headers, org_id, max_pages=50):
-    """2024/4/1以降の全請求書を取得"""
+    """2024/4/1以降の全請求書を取得（ページごとにジャーナルへ保存し、中断時は続きから再開）"""
     print(f"📄 2024/4/1以降の全請求書を取得中...")
     
     url = "https://www.zohoapis.com/books/v3/invoices"
-    all_invoices = []
-    page = 1
+    journal = ExtractionJournal('final_summary_invoices', params={'organization_id': org_id, 'since': '2024-04-01'},
+                                id_field='invoice_id')
     
-    while page <= max_pages:
+    def fetch_page(page):
         params = {
             'organization_id': org_id,
             'per_page': 200,
@@ -111,49 +121,44 @@ def get_comprehensive_invoices(headers, org_id, max_pages=50):
             'sort_order': 'D'
         }
         
-        try:
-            if page % 10 == 1:
-                print(f"  ページ{page}-{min(page+9, max_pages)}を処理中...")
-            
-            response = requests.get(url, headers=headers, timeout=30)
-            
-            if response.status_code == 200:
-                data = response.json()
-                invoices = data.get('invoices', [])
-                
-                if invoices:
-                    # 2024/4/1以降でフィルタ
-                    target_invoices = []
-                    for invoice in invoices:
-                        inv_date = invoice.get('date', '')
-                        if inv_date >= '2024-04-01':
-                            # void以外の有効な請求書のみ
-                            if invoice.get('status') != 'void':
-                                target_invoices.append(invoice)
-                    
-                    all_invoices.extend(target_invoices)
-                    
-                    if not data.get('page_context', {}).get('has_more_page', False):
-                        print(f"  全請求書取得完了（ページ{page}）")
-                        break
-                    page += 1
-                else:
-                    print(f"  データなし（ページ{page}）")
-                    break
-            else:
-                print(f"  ❌ エラー: {response.status_code}（ページ{page}）")
-                if response.status_code == 401:
-                    print("  トークンの有効期限切れの可能性があります")
-                break
+        if page % 10 == 1:
+            print(f"  ページ{page}-{min(page+9, max_pages)}を処理中...")
         
-        except Exception as e:
-            print(f"  ❌ 例外: {str(e)}（ページ{page}）")
-            break
+        response = books_session.get(url, headers=headers, params=params, timeout=30)
+        if response.status_code != 200:
+            if response.status_code == 401:
+                print("  トークンの有効期限切れの可能性があります")
+            raise RuntimeError(f"請求書取得エラー: {response.status_code}（ページ{page}）")
+        
+        data = response.json()
+        invoices = data.get('invoices', [])
+        if not invoices:
+            print(f"  データなし（ページ{page}）")
+            return [], None
+        
+        # 2024/4/1以降でフィルタ
+        target_invoices = []
+        for invoice in invoices:
+            inv_date = invoice.get('date', '')
+            if inv_date >= '2024-04-01':
+                # void以外の有効な請求書のみ
+                if invoice.get('status') != 'void':
+                    target_invoices.append(invoice)
+        
+        if not data.get('page_context', {}).get('has_more_page', False):
+            print(f"  全請求書取得完了（ページ{page}）")
+            return target_invoices, None
+        
+        if page >= max_pages:
+            return target_invoices, None
         
         if page % 5 == 0:
             time.sleep(1)
         else:
             time.sleep(0.3)
+        return target_invoices, page + 1
+    
+    all_invoices = run_extraction(journal, fetch_page)
     
     print(f"✅ 請求書取得完了: {len(all_invoices)}件")
     return all_invoices
@@ -215,6 +220,7 @@ def analyze_deals_by_stage_and_structure(deals):
     return {
         'total_count': total_count,
         'total_amount': total_amount,
+        'total_amount_with_tax': TAX.invoice_total([deal.get('Amount', 0) or 0 for deal in deals]),
         'stage_stats': dict(stage_stats),
         'parent_ids': parent_ids,
         'children_by_parent': children_by_parent,
@@ -353,7 +359,7 @@ def generate_final_summary(deals_analysis, invoices_analysis, matching_analysis)
     # 基本統計
     deals_count = deals_analysis['total_count']
     deals_amount_excluding_tax = deals_analysis['total_amount']
-    deals_amount_including_tax = deals_amount_excluding_tax * 1.10
+    deals_amount_including_tax = deals_analysis['total_amount_with_tax']
     
     invoices_count = invoices_analysis['total_count']
     invoices_amount = invoices_analysis['total_amount']
@@ -443,41 +449,51 @@ def main():
     print("🎯 最終包括サマリー：総額・総額（税込み）・請求金額")
     print("="*100)
     
-    try:
-        # 1. トークン準備
-        tokens = load_tokens()
-        print("✅ トークン準備完了")
-        
-        # 2. 全商談取得
-        all_deals = get_all_deals_comprehensive(tokens['crm_headers'])
-        if not all_deals:
-            print("❌ 商談データが取得できませんでした")
-            return
-        
-        # 3. 全請求書取得
-        all_invoices = get_comprehensive_invoices(tokens['books_headers'], tokens['org_id'])
-        
-        # 4. 商談詳細分析
-        deals_analysis = analyze_deals_by_stage_and_structure(all_deals)
-        
-        # 5. 請求書詳細分析
-        invoices_analysis = analyze_invoices_comprehensive(all_invoices)
-        
-        # 6. マッチング分析
-        matching_analysis = match_deals_with_invoices(deals_analysis, all_invoices)
-        
-        # 7. 最終サマリー
-        summary_data = generate_final_summary(deals_analysis, invoices_analysis, matching_analysis)
-        
-        # 8. サマリー保存
-        save_final_summary(summary_data, deals_analysis, invoices_analysis)
-        
-        print(f"\n✅ 最終包括分析完了")
-        
-    except Exception as e:
-        print(f"❌ エラー: {str(e)}")
-        import traceback
-        traceback.print_exc()
+    profiler = AnalysisProfiler.from_argv('final_comprehensive_summary')
+    
+    with profiler:
+        try:
+            # 1. トークン準備
+            tokens = load_tokens()
+            print("✅ トークン準備完了")
+            
+            # 2. 全商談取得
+            with profiler.phase('商談取得'):
+                all_deals = get_all_deals_comprehensive(tokens['crm_headers'])
+            if not all_deals:
+                print("❌ 商談データが取得できませんでした")
+                return
+            
+            # 3. 全請求書取得
+            with profiler.phase('請求書取得'):
+                all_invoices = get_comprehensive_invoices(tokens['books_headers'], tokens['org_id'])
+            
+            # 4. 商談詳細分析
+            with profiler.phase('商談分析'):
+                deals_analysis = analyze_deals_by_stage_and_structure(all_deals)
+            
+            # 5. 請求書詳細分析
+            with profiler.phase('請求書分析'):
+                invoices_analysis = analyze_invoices_comprehensive(all_invoices)
+            
+            # 6. マッチング分析
+            with profiler.phase('マッチング'):
+                matching_analysis = match_deals_with_invoices(deals_analysis, all_invoices)
+            
+            # 7. 最終サマリー
+            with profiler.phase('レポート生成'):
+                summary_data = generate_final_summary(deals_analysis, invoices_analysis, matching_analysis)
+            
+            # 8. サマリー保存
+            with profiler.phase('保存'):
+                save_final_summary(summary_data, deals_analysis, invoices_analysis)
+            
+            print(f"\n✅ 最終包括分析完了")
+            
+        except Exception as e:
+            print(f"❌ エラー: {str(e)}")
+            import traceback
+            traceback.print_exc()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
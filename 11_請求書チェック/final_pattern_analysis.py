@@ -5,10 +5,15 @@
 """
 import requests
 import json
+import sys
 from pathlib import Path
 from collections import defaultdict
 import time
 
+sys.path.append(str(Path(__file__).parent.parent / "01_Zoho_API" / "APIクライアント"))
+from invoice_allocation import AllocationMatcher
+from zoho_context import ZohoContext
+
 def load_tokens():
     """CRMとBooksトークンを読み込み"""
     base_path = Path(__file__).parent.parent / "01_Zoho_API" / "認証・トークン"
@@ -22,7 +27,7 @@ def load_tokens():
     return {
         'crm_headers': {'Authorization': f'Bearer {crm_tokens["access_token"]}'},
         'books_headers': {'Authorization': f'Bearer {books_tokens["access_token"]}'},
-        'org_id': "772043849"
+        'org_id': ZohoContext(base_path).books_org_id()
     }
 
 def get_representative_parent_child_sets(headers):
@@ -229,6 +234,8 @@ def analyze_pattern_invoice_matching(patterns, invoices):
             invoice_map[ref_num].append(invoice)
     
     pattern_results = {}
+    # 金額の並びが同じセットの割り当て結果はセットをまたいで再利用する
+    matcher = AllocationMatcher(tax_rate=0.10)
     
     pattern_explanations = {
         'pattern1_parent_only': 'パターン1: 親商談完結',
@@ -265,22 +272,25 @@ def analyze_pattern_invoice_matching(patterns, invoices):
             # パターン別期待値計算
             if pattern_name == 'pattern1_parent_only':
                 # 親商談から請求されるはず
-                expected_amount = pc_set['parent_amount'] * 1.10
+                expected_amount = matcher.with_tax(pc_set['parent_amount'])
             elif pattern_name == 'pattern2_children_only':
                 # 子商談から請求されるはず
-                expected_amount = pc_set['children_amount'] * 1.10
+                expected_amount = matcher.with_tax(pc_set['children_amount'])
             elif pattern_name == 'pattern3_parent_統括_no_amount':
                 # 親商談から子商談分を請求されるはず
-                expected_amount = pc_set['children_amount'] * 1.10
+                expected_amount = matcher.with_tax(pc_set['children_amount'])
             elif pattern_name == 'pattern4_parent_統括_with_amount':
                 # 親商談から全体を請求される可能性
-                expected_amount = pc_set['total_amount'] * 1.10
+                expected_amount = matcher.with_tax(pc_set['total_amount'])
             elif pattern_name == 'pattern5_分担':
                 # 親子両方から請求される
-                expected_amount = pc_set['total_amount'] * 1.10
+                expected_amount = matcher.with_tax(pc_set['total_amount'])
             
             difference = expected_amount - total_invoice_amount
             
+            # 明細単位の割り当て（どの請求書がどの商談を請求しているか）
+            allocation = matcher.allocate([parent] + children, parent_invoices + child_invoices)
+            
             result = {
                 'parent_name': parent.get('Deal_Name', '')[:50],
                 'parent_amount': pc_set['parent_amount'],
@@ -294,7 +304,14 @@ def analyze_pattern_invoice_matching(patterns, invoices):
                 'parent_invoice_count': len(parent_invoices),
                 'child_invoice_count': len(child_invoices),
                 'difference': difference,
-                'match_status': 'perfect' if abs(difference) < 1000 else 'mismatch'
+                'match_status': 'perfect' if abs(difference) < 1000 else 'mismatch',
+                'allocations': allocation['allocations'],
+                'covered_deals': allocation['covered_deals'],
+                'uncovered_deals': allocation['uncovered_deals'],
+                'unmatched_invoices': allocation['unmatched_invoices'],
+                'partial_invoiced': allocation['partial'],
+                'line_coverage': allocation['line_coverage'],
+                'amount_coverage': allocation['amount_coverage']
             }
             
             results.append(result)
@@ -316,6 +333,16 @@ def analyze_pattern_invoice_matching(patterns, invoices):
                 print(f"      商談: 親¥{result['parent_amount']:,.0f} + 子¥{result['children_amount']:,.0f} = ¥{result['total_amount']:,.0f}")
                 print(f"      請求: 親¥{result['parent_invoice_amount']:,.0f} + 子¥{result['child_invoice_amount']:,.0f} = ¥{result['actual_invoice']:,.0f}")
                 print(f"      差額: ¥{result['difference']:,.0f} ({'✅' if result['match_status'] == 'perfect' else '❌'})")
+                print(f"      明細カバー: {len(result['covered_deals'])}/{len(result['covered_deals']) + len(result['uncovered_deals'])}件"
+                      f" ({result['line_coverage']*100:.1f}%)・金額 {result['amount_coverage']*100:.1f}%")
+                for allocation in result['allocations']:
+                    if allocation['method'] != '参照一致':
+                        print(f"        {allocation['method']}: {', '.join(allocation['invoices'])} → 商談{len(allocation['deals'])}件"
+                              f"（差¥{allocation['difference']:+,}）")
+                if result['unmatched_invoices']:
+                    print(f"        割り当てなし請求書: {', '.join(result['unmatched_invoices'][:10])}")
+                for deal_id, ratio in result['partial_invoiced'].items():
+                    print(f"        一部請求: 商談{deal_id}（{ratio*100:.1f}%）")
     
     return pattern_results
 
@@ -328,6 +355,8 @@ def generate_final_report(patterns, pattern_results):
     total_sets = 0
     total_perfect_matches = 0
     total_difference = 0
+    total_lines = 0
+    total_covered_lines = 0
     
     pattern_explanations = {
         'pattern1_parent_only': 'パターン1: 親商談完結（親商談のみ、親商談総額=請求額）',
@@ -350,13 +379,20 @@ def generate_final_report(patterns, pattern_results):
         perfect_matches = len([r for r in results if r['match_status'] == 'perfect'])
         pattern_difference = sum(abs(r['difference']) for r in results)
         
+        pattern_lines = sum(len(r['covered_deals']) + len(r['uncovered_deals']) for r in results)
+        pattern_covered = sum(len(r['covered_deals']) for r in results)
+        
         total_sets += len(results)
         total_perfect_matches += perfect_matches
         total_difference += pattern_difference
+        total_lines += pattern_lines
+        total_covered_lines += pattern_covered
         
         print(f"  対象組数: {len(results)}組")
         print(f"  完全一致: {perfect_matches}組 ({perfect_matches/len(results)*100:.1f}%)")
         print(f"  総差額: ¥{pattern_difference:,.0f}")
+        if pattern_lines:
+            print(f"  明細カバー: {pattern_covered}/{pattern_lines}件 ({pattern_covered/pattern_lines*100:.1f}%)")
         
         if pattern_name == 'pattern3_parent_統括_no_amount':
             print(f"  ✅ 仮説検証: JT ETEのように親商談¥0、子商談分を親から請求")
@@ -369,6 +405,8 @@ def generate_final_report(patterns, pattern_results):
     print(f"総分析組数: {total_sets}組")
     print(f"完全一致組数: {total_perfect_matches}組 ({total_perfect_matches/total_sets*100:.1f}%)")
     print(f"総差額: ¥{total_difference:,.0f}")
+    if total_lines:
+        print(f"明細カバー: {total_covered_lines}/{total_lines}件 ({total_covered_lines/total_lines*100:.1f}%)")
     
     if total_perfect_matches/total_sets >= 0.8:
         print("🎉 素晴らしい！商談・請求書の整合性は非常に高いです")
@@ -5,17 +5,22 @@ JT ETP 実際の商談金額集計
 """
 import requests
 import json
+import sys
 from pathlib import Path
 import pandas as pd
 from datetime import datetime
 import time
 
+sys.path.append(str(Path(__file__).parent.parent / "01_Zoho_API" / "APIクライアント"))
+from tax_engine import TaxEngine, TaxRule
+
 class ActualJTDealsAnalyzer:
     def __init__(self):
         self.base_path = Path(__file__).parent.parent / "01_Zoho_API" / "認証・トークン"
         self.load_tokens()
         self.target_parent_id = "5187347000129692086"
         self.tax_rate = 0.10
+        self.tax = TaxEngine(TaxRule(self.tax_rate))
 
     def load_tokens(self):
         """トークンを読み込み"""
@@ -181,7 +186,9 @@ class ActualJTDealsAnalyzer:
                 'stage': stage
             })
         
-        total_amount_including_tax = total_amount_excluding_tax * (1 + self.tax_rate)
+        # 商談1件ごとに税込み換算して合計（金額ゼロの商談は0円）
+        total_amount_including_tax = self.tax.invoice_total([detail['amount'] for detail in deal_details
+                                                             if detail['amount'] > 0])
         
         print(f"📈 集計結果:")
         print(f"  対象商談数: {len(deals_without_kouki)}件")
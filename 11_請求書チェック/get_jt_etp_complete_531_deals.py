@@ -3,11 +3,29 @@
 JT ETP 531件完全取得と「後期」なし商談の金額集計
 新しいCRMトークンを使用して全データを取得
 """
-import requests
 import json
+import sys
 from pathlib import Path
 from datetime import datetime
 
+sys.path.append(str(Path(__file__).parent.parent / "01_Zoho_API" / "APIクライアント"))
+from zoho_http_transport import ZohoSession, FileTokenRefresher, TOKEN_DIR
+from extraction_journal import ExtractionJournal, run_extraction
+from field_projection import FieldProjection
+from tax_engine import TaxEngine
+
+try:
+    from snapshot_store import SnapshotStore, SnapshotError, print_diff
+except ImportError:
+    SnapshotStore = None
+
+# 商談金額（税抜き）の税込み換算（商談1件ごとに四捨五入）
+tax = TaxEngine()
+
+# 429/5xxの再試行と401時のトークン更新を行う共有セッション
+crm_session = ZohoSession(FileTokenRefresher(TOKEN_DIR / "zoho_crm_tokens.json"),
+                          projection=FieldProjection.for_analysis('jt_etp_children'))
+
 def load_crm_token():
     """CRMトークンを読み込み"""
     token_path = Path(__file__).parent.parent / "01_Zoho_API" / "認証・トークン" / "zoho_crm_tokens.json"
@@ -15,54 +33,52 @@ def load_crm_token():
         tokens = json.load(f)
     return tokens['access_token']
 
-def get_all_jt_etp_children(access_token, parent_id):
-    """JT ETP親商談に紐づく全子商談を取得"""
+def get_all_jt_etp_children(access_token, parent_id, max_pages=50):
+    """JT ETP親商談に紐づく全子商談を取得（ページごとにジャーナルへ保存し、中断時は続きから再開）"""
     print(f"📊 JT ETP子商談取得開始 (親ID: {parent_id})")
     
     url = "https://www.zohoapis.com/crm/v2/Deals/search"
     headers = {'Authorization': f'Bearer {access_token}'}
+    criteria = f'(field78:equals:{parent_id})'
+    fields = crm_session.projection.fields_param('Deals')
+    journal = ExtractionJournal(f'jt_etp_children_{parent_id}', params={'criteria': criteria, 'fields': fields})
+    fetched = []
     
-    all_children = []
-    page = 1
-    
-    while page <= 50:  # 最大50ページまで
+    def fetch_page(page):
         params = {
-            'criteria': f'(field78:equals:{parent_id})',
+            'criteria': criteria,
             'page': page,
-            'per_page': 200,
-            'fields': 'id,Deal_Name,Amount,Stage,Closing_Date,field78'
+            'per_page': 200
         }
         
-        try:
-            response = requests.get(url, headers=headers, params=params)
-            
-            if response.status_code == 200:
-                data = response.json()
-                deals = data.get('data', [])
-                
-                if deals:
-                    all_children.extend(deals)
-                    print(f"  ページ{page}: {len(deals)}件取得 (累計: {len(all_children)}件)")
-                    
-                    # より多くのレコードがあるかチェック
-                    if not data.get('info', {}).get('more_records', False):
-                        break
-                    page += 1
-                else:
-                    print(f"  ページ{page}: データなし")
-                    break
-                    
-            elif response.status_code == 204:
-                print(f"  ページ{page}: データなし (204)")
-                break
-            else:
-                print(f"  ❌ ページ{page}エラー: {response.status_code}")
-                print(f"     レスポンス: {response.text}")
-                break
-                
-        except Exception as e:
-            print(f"  ❌ ページ{page}例外: {str(e)}")
-            break
+        response = crm_session.get(url, headers=headers, params=params)
+        
+        if response.status_code == 204:
+            print(f"  ページ{page}: データなし (204)")
+            return [], None
+        if response.status_code != 200:
+            print(f"     レスポンス: {response.text}")
+            raise RuntimeError(f"ページ{page}エラー: {response.status_code}")
+        
+        data = response.json()
+        deals = data.get('data', [])
+        if not deals:
+            print(f"  ページ{page}: データなし")
+            return [], None
+        
+        fetched.extend(deals)
+        print(f"  ページ{page}: {len(deals)}件取得 (今回の累計: {len(fetched)}件)")
+        
+        # より多くのレコードがあるかチェック（最大50ページまで）
+        if not data.get('info', {}).get('more_records', False) or page >= max_pages:
+            return deals, None
+        return deals, page + 1
+    
+    try:
+        all_children = run_extraction(journal, fetch_page)
+    except Exception as e:
+        print(f"  ❌ 取得中断: {str(e)}")
+        all_children = journal.records()
     
     print(f"✅ JT ETP子商談取得完了: {len(all_children)}件")
     return all_children
@@ -94,14 +110,10 @@ def calculate_amounts(deals, category_name):
     """商談金額を集計"""
     print(f"\n💰 {category_name}金額集計")
     
-    total_amount_excluding_tax = 0
+    amounts = [deal.get('Amount', 0) or 0 for deal in deals]
     deal_count = len(deals)
-    
-    for deal in deals:
-        amount = deal.get('Amount', 0) or 0
-        total_amount_excluding_tax += amount
-    
-    total_amount_including_tax = total_amount_excluding_tax * 1.10
+    total_amount_excluding_tax = sum(amounts)
+    total_amount_including_tax = tax.invoice_total(amounts)
     
     print(f"  件数: {deal_count}件")
     print(f"  総額（税抜き）: ¥{total_amount_excluding_tax:,.0f}")
@@ -153,6 +165,30 @@ def save_results(all_children, kouki_deals, non_kouki_deals, jucyu_deals, kouki_
     print(f"  全件データ: JT_ETP_全件データ_{timestamp}.json")
     print(f"  後期商談: JT_ETP_後期商談_{timestamp}.json")
     print(f"  後期なし商談: JT_ETP_後期なし商談_{timestamp}.json")
+    
+    # 4. スナップショット（前回の実行との差分比較用）
+    save_snapshot(all_children, kouki_deals, jucyu_deals, timestamp)
+
+def save_snapshot(all_children, kouki_deals, jucyu_deals, run_id):
+    """子商談を「受注」「後期」の区分付きでスナップショットに保存し、前回との差分を表示"""
+    if SnapshotStore is None:
+        print("⚠️ pandas が未インストールのためスナップショットを保存しません")
+        return
+    
+    jucyu_ids = {deal['id'] for deal in jucyu_deals}
+    kouki_ids = {deal['id'] for deal in kouki_deals}
+    rows = [dict(deal, is_jucyu=deal['id'] in jucyu_ids, is_kouki=deal['id'] in kouki_ids)
+            for deal in all_children]
+    
+    store = SnapshotStore()
+    try:
+        store.write('jt_etp_children', rows, key='id', run_id=run_id, source=Path(__file__).name)
+        if len(store.runs('jt_etp_children')) > 1:
+            print_diff(store.diff('jt_etp_children',
+                                  compare_columns=['Deal_Name', 'Amount', 'Stage', 'Closing_Date', 'is_kouki']),
+                       label_column='Deal_Name')
+    except SnapshotError as e:
+        print(f"⚠️ スナップショットを保存できませんでした: {e}")
 
 def main():
     """メイン処理"""
@@ -3,38 +3,31 @@
 改良版 ZohoCRM・Books 商談-請求書マッチングツール
 reference_numberを活用した高精度な紐づけを実装
 """
-import requests
-import json
+import sys
 from pathlib import Path
 from datetime import datetime
 import pandas as pd
 
+sys.path.append(str(Path(__file__).parent.parent / "01_Zoho_API" / "APIクライアント"))
+from zoho_context import ZohoContext
+
 class ImprovedInvoiceMatcher:
-    def __init__(self):
+    def __init__(self, context=None):
         self.base_path = Path(__file__).parent.parent / "01_Zoho_API" / "認証・トークン"
+        self.context = context or ZohoContext(self.base_path)
+        self.crm_session = self.context.session('crm')
+        self.books_session = self.context.session('books')
         self.load_tokens()
         self.org_id = self.get_org_id()
     
     def load_tokens(self):
-        """トークンを読み込み"""
-        with open(self.base_path / "zoho_crm_tokens.json", 'r') as f:
-            crm_tokens = json.load(f)
-        with open(self.base_path / "zoho_books_tokens.json", 'r') as f:
-            books_tokens = json.load(f)
-        
-        self.crm_headers = {'Authorization': f'Bearer {crm_tokens["access_token"]}'}
-        self.books_headers = {'Authorization': f'Bearer {books_tokens["access_token"]}'}
+        """トークンを読み込み（同じコンテキストの分析とヘッダーを共有）"""
+        self.crm_headers = self.context.headers('crm')
+        self.books_headers = self.context.headers('books')
     
     def get_org_id(self):
         """Books組織IDを取得"""
-        response = requests.get("https://www.zohoapis.com/books/v3/organizations", headers=self.books_headers)
-        if response.status_code == 200:
-            orgs = response.json()['organizations']
-            for org in orgs:
-                if '株式会社シー・ティー・エス' in org.get('name', ''):
-                    return org['organization_id']
-            return orgs[0]['organization_id'] if orgs else None
-        return None
+        return self.context.books_org_id()
     
     def get_all_deals(self):
         """全商談データを取得"""
@@ -53,7 +46,7 @@ class ImprovedInvoiceMatcher:
                 'sort_order': 'desc'
             }
             
-            response = requests.get(url, headers=self.crm_headers, params=params)
+            response = self.crm_session.get(url, headers=self.crm_headers, params=params)
             if response.status_code == 200:
                 data = response.json()
                 if 'data' in data and data['data']:
@@ -71,36 +64,11 @@ class ImprovedInvoiceMatcher:
         return all_deals
     
     def get_all_invoices(self):
-        """全請求書データを取得"""
+        """全請求書データを取得（同じコンテキストの分析と取得済みのページを共有）"""
         print("📄 請求書データを取得中...")
         
-        url = "https://www.zohoapis.com/books/v3/invoices"
-        all_invoices = []
-        page = 1
-        
-        while True:
-            params = {
-                'organization_id': self.org_id,
-                'per_page': 200,
-                'page': page,
-                'sort_column': 'date',
-                'sort_order': 'D'
-            }
-            
-            response = requests.get(url, headers=self.books_headers, params=params)
-            if response.status_code == 200:
-                data = response.json()
-                if 'invoices' in data and data['invoices']:
-                    all_invoices.extend(data['invoices'])
-                    page_context = data.get('page_context', {})
-                    if page_context.get('has_more_page', False):
-                        page += 1
-                    else:
-                        break
-                else:
-                    break
-            else:
-                break
+        pages = self.context.books_invoice_pages() or []
+        all_invoices = [invoice for invoices in pages for invoice in invoices]
         
         print(f"✅ {len(all_invoices)}件の請求書を取得")
         return all_invoices
@@ -338,17 +306,17 @@ class ImprovedInvoiceMatcher:
             df.to_csv(file_path, index=False, encoding='utf-8-sig')
             print(f"📁 未マッチ商談リストを保存: {file_path}")
 
-def main():
-    """メイン処理"""
+def main(context=None):
+    """メイン処理（context: zoho_tools から共有する ZohoContext）"""
     print("="*70)
     print("ZohoCRM・Books 改良版マッチングツール")
     print("="*70)
     
-    matcher = ImprovedInvoiceMatcher()
+    matcher = ImprovedInvoiceMatcher(context)
     
     if not matcher.org_id:
         print("❌ Books組織IDが取得できませんでした")
-        return
+        return 1
     
     # データ取得
     deals = matcher.get_all_deals()
@@ -356,7 +324,7 @@ def main():
     
     if not deals and not invoices:
         print("❌ データが取得できませんでした")
-        return
+        return 1
     
     # マッチング実行
     results = matcher.match_deals_invoices(deals, invoices)
@@ -366,6 +334,7 @@ def main():
     
     print("\n" + "="*70)
     print("マッチング完了")
+    return 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -5,8 +5,12 @@ field78 (法人商談) フィールドの詳細調査
 """
 import requests
 import json
+import sys
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).parent.parent / "01_Zoho_API" / "APIクライアント"))
+from zoho_context import ZohoContext
+
 def investigate_field78():
     """field78フィールドの詳細調査"""
     
@@ -199,24 +203,15 @@ def investigate_field78():
     # Books請求書との関連を確認
     print(f"\n💰 Books請求書との関連確認:")
     
-    # Books組織ID取得
+    # Booksトークン読み込み
     with open(base_path / "zoho_books_tokens.json", 'r') as f:
         books_tokens = json.load(f)
     
     books_headers = {'Authorization': f'Bearer {books_tokens["access_token"]}'}
     
-    org_response = requests.get("https://www.zohoapis.com/books/v3/organizations", headers=books_headers)
-    if org_response.status_code == 200:
-        orgs = org_response.json()['organizations']
-        org_id = None
-        for org in orgs:
-            if '株式会社シー・ティー・エス' in org.get('name', ''):
-                org_id = org['organization_id']
-                break
-        
-        if not org_id and orgs:
-            org_id = orgs[0]['organization_id']
-        
+    # Books組織ID取得（キャッシュがあればAPIを呼ばない）
+    org_id = ZohoContext(base_path).books_org_id()
+    if org_id:
         # 請求書データ取得
         invoice_url = "https://www.zohoapis.com/books/v3/invoices"
         params = {
@@ -3,16 +3,21 @@
 請求漏れ分析ツール
 親子構造を考慮した商談-請求書の照合分析
 """
-import requests
-import json
+import sys
 from pathlib import Path
 from collections import defaultdict
 import pandas as pd
 from datetime import datetime
 
+sys.path.append(str(Path(__file__).parent.parent / "01_Zoho_API" / "APIクライアント"))
+from zoho_context import ZohoContext
+
 class InvoiceLeakageAnalyzer:
-    def __init__(self):
+    def __init__(self, context=None):
         self.base_path = Path(__file__).parent.parent / "01_Zoho_API" / "認証・トークン"
+        self.context = context or ZohoContext(self.base_path)
+        self.crm_session = self.context.session('crm')
+        self.books_session = self.context.session('books')
         self.load_tokens()
         self.org_id = self.get_org_id()
         
@@ -26,25 +31,13 @@ class InvoiceLeakageAnalyzer:
         self.target_start_date = '2024-04-01'
     
     def load_tokens(self):
-        """トークンを読み込み"""
-        with open(self.base_path / "zoho_crm_tokens.json", 'r') as f:
-            crm_tokens = json.load(f)
-        with open(self.base_path / "zoho_books_tokens.json", 'r') as f:
-            books_tokens = json.load(f)
-        
-        self.crm_headers = {'Authorization': f'Bearer {crm_tokens["access_token"]}'}
-        self.books_headers = {'Authorization': f'Bearer {books_tokens["access_token"]}'}
+        """トークンを読み込み（同じコンテキストの分析とヘッダーを共有）"""
+        self.crm_headers = self.context.headers('crm')
+        self.books_headers = self.context.headers('books')
     
     def get_org_id(self):
         """Books組織IDを取得"""
-        response = requests.get("https://www.zohoapis.com/books/v3/organizations", headers=self.books_headers)
-        if response.status_code == 200:
-            orgs = response.json()['organizations']
-            for org in orgs:
-                if '株式会社シー・ティー・エス' in org.get('name', ''):
-                    return org['organization_id']
-            return orgs[0]['organization_id'] if orgs else None
-        return None
+        return self.context.books_org_id()
     
     def get_deal_layouts(self):
         """商談のレイアウト情報を取得"""
@@ -54,7 +47,7 @@ class InvoiceLeakageAnalyzer:
         params = {'module': 'Deals'}
         
         try:
-            response = requests.get(url, headers=self.crm_headers, params=params)
+            response = self.crm_session.get(url, headers=self.crm_headers, params=params)
             if response.status_code == 200:
                 data = response.json()
                 layouts = data.get('layouts', [])
@@ -89,7 +82,7 @@ class InvoiceLeakageAnalyzer:
                 'sort_order': 'desc'
             }
             
-            response = requests.get(url, headers=self.crm_headers, params=params)
+            response = self.crm_session.get(url, headers=self.crm_headers, params=params)
             
             if response.status_code == 200:
                 data = response.json()
@@ -231,7 +224,7 @@ class InvoiceLeakageAnalyzer:
                 'sort_order': 'D'
             }
             
-            response = requests.get(url, headers=self.books_headers, params=params)
+            response = self.books_session.get(url, headers=self.books_headers, params=params)
             
             if response.status_code == 200:
                 data = response.json()
@@ -455,17 +448,17 @@ class InvoiceLeakageAnalyzer:
                 df.to_csv(file_path, index=False, encoding='utf-8-sig')
                 print(f"📁 {category_name}分析結果を保存: {file_path}")
 
-def main():
-    """メイン処理"""
+def main(context=None):
+    """メイン処理（context: zoho_tools から共有する ZohoContext）"""
     print("="*70)
     print("請求漏れ分析ツール")
     print("="*70)
     
-    analyzer = InvoiceLeakageAnalyzer()
+    analyzer = InvoiceLeakageAnalyzer(context)
     
     if not analyzer.org_id:
         print("❌ Books組織IDが取得できませんでした")
-        return
+        return 1
     
     # 分析設定の確認
     print("\n📋 分析設定:")
@@ -481,7 +474,7 @@ def main():
     
     if not deals:
         print("❌ 受注済み商談が見つかりませんでした")
-        return
+        return 1
     
     # 3. 商談の親子構造分類
     categories = analyzer.categorize_deals_by_structure(deals, layouts)
@@ -499,6 +492,7 @@ def main():
     analyzer.export_analysis_results(analysis_results)
     
     print(f"\n✅ 請求漏れ分析完了")
+    return 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -5,16 +5,26 @@ JT ETP 期間別商談集計分析
 """
 import requests
 import json
+import sys
 from pathlib import Path
-import pandas as pd
 from datetime import datetime
 
+sys.path.append(str(Path(__file__).parent.parent / "01_Zoho_API" / "APIクライアント"))
+from month_utils import month_range
+from period_index import JT_ETP_CALENDAR, PeriodIndex, month_label
+from tax_engine import TaxEngine, TaxRule
+
+# 集計対象の成約月（両端を含む）
+TARGET_START_MONTH = '2024-12'
+TARGET_END_MONTH = '2025-05'
+
 class JTETPPeriodDealsAnalyzer:
     def __init__(self):
         self.base_path = Path(__file__).parent.parent / "01_Zoho_API" / "認証・トークン"
         self.load_tokens()
         self.target_parent_id = "5187347000129692086"
         self.tax_rate = 0.10
+        self.tax = TaxEngine(TaxRule(self.tax_rate))
 
     def load_tokens(self):
         """トークンを読み込み"""
@@ -134,7 +144,7 @@ class JTETPPeriodDealsAnalyzer:
             period_analysis[period] = {
                 'count': period_count,
                 'amount_excluding_tax': period_amount,
-                'amount_including_tax': period_amount * 1.1
+                'amount_including_tax': self.tax.with_tax(period_amount)
             }
             
             if period != 'その他期間':
@@ -145,49 +155,24 @@ class JTETPPeriodDealsAnalyzer:
 
     def analyze_deals_by_period(self, all_deals):
         """商談を期間別に分析"""
-        period_analysis = {
-            '2024年12月': {'deals': [], 'amount': 0},
-            '2025年1月': {'deals': [], 'amount': 0},
-            '2025年2月': {'deals': [], 'amount': 0},
-            '2025年3月': {'deals': [], 'amount': 0},
-            '2025年4月': {'deals': [], 'amount': 0},
-            '2025年5月': {'deals': [], 'amount': 0},
-            'その他': {'deals': [], 'amount': 0}
-        }
+        # 完了予定日の索引から月ごとに取り出す
+        index = PeriodIndex.build(all_deals, calendar=JT_ETP_CALENDAR)
+        period_analysis = {}
+        target_ids = set()
+        for month, deals in index.deals_by_month(month_range(TARGET_START_MONTH, TARGET_END_MONTH)).items():
+            period_analysis[month_label(month)] = {
+                'deals': deals,
+                'amount': sum(deal.get('Amount', 0) or 0 for deal in deals)
+            }
+            target_ids.update(id(deal) for deal in deals)
         
-        target_period_total = 0
-        target_period_deals = 0
+        # 対象期間外・完了予定日なし
+        others = [deal for deal in all_deals if id(deal) not in target_ids]
+        period_analysis['その他'] = {'deals': others, 'amount': sum(deal.get('Amount', 0) or 0 for deal in others)}
         
-        for deal in all_deals:
-            amount = deal.get('Amount', 0) or 0
-            closing_date = deal.get('Closing_Date', '')
-            
-            # 期間判定（完了予定日ベース）
-            period_key = 'その他'
-            if closing_date:
-                try:
-                    if closing_date >= '2024-12-01' and closing_date <= '2024-12-31':
-                        period_key = '2024年12月'
-                    elif closing_date >= '2025-01-01' and closing_date <= '2025-01-31':
-                        period_key = '2025年1月'
-                    elif closing_date >= '2025-02-01' and closing_date <= '2025-02-28':
-                        period_key = '2025年2月'
-                    elif closing_date >= '2025-03-01' and closing_date <= '2025-03-31':
-                        period_key = '2025年3月'
-                    elif closing_date >= '2025-04-01' and closing_date <= '2025-04-30':
-                        period_key = '2025年4月'
-                    elif closing_date >= '2025-05-01' and closing_date <= '2025-05-31':
-                        period_key = '2025年5月'
-                except:
-                    pass
-            
-            period_analysis[period_key]['deals'].append(deal)
-            period_analysis[period_key]['amount'] += amount
-            
-            # 対象期間（2024/12〜2025/5）の合計
-            if period_key != 'その他':
-                target_period_total += amount
-                target_period_deals += 1
+        # 対象期間（2024/12〜2025/5）の合計
+        target_period_total = sum(data['amount'] for period, data in period_analysis.items() if period != 'その他')
+        target_period_deals = len(target_ids)
         
         return period_analysis, target_period_total, target_period_deals
 
@@ -227,13 +212,14 @@ class JTETPPeriodDealsAnalyzer:
             print("✅ 実データでの分析")
             
             total_excluding_tax = target_total
-            total_including_tax = target_total * 1.1
+            total_including_tax = sum(self.tax.invoice_total([deal.get('Amount', 0) or 0 for deal in data['deals']])
+                                      for period, data in period_analysis.items() if period != 'その他')
             total_deals = target_count
             
             for period, data in period_analysis.items():
                 if period != 'その他' and data['amount'] > 0:
                     amount = data['amount']
-                    amount_with_tax = amount * 1.1
+                    amount_with_tax = self.tax.invoice_total([deal.get('Amount', 0) or 0 for deal in data['deals']])
                     count = len(data['deals'])
                     
                     print(f"  {period}: {count}件, ¥{amount:,.0f}(税抜) / ¥{amount_with_tax:,.0f}(税込)")
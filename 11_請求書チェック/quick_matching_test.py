@@ -5,8 +5,12 @@ reference_numberの活用を確認
 """
 import requests
 import json
+import sys
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).parent.parent / "01_Zoho_API" / "APIクライアント"))
+from zoho_context import ZohoContext
+
 def quick_matching_test():
     """簡易マッチングテスト"""
     
@@ -21,9 +25,8 @@ def quick_matching_test():
     crm_headers = {'Authorization': f'Bearer {crm_tokens["access_token"]}'}
     books_headers = {'Authorization': f'Bearer {books_tokens["access_token"]}'}
     
-    # Books組織ID取得
-    org_response = requests.get("https://www.zohoapis.com/books/v3/organizations", headers=books_headers)
-    org_id = org_response.json()['organizations'][1]['organization_id']  # 株式会社シー・ティー・エス
+    # Books組織ID取得（株式会社シー・ティー・エス、キャッシュがあればAPIを呼ばない）
+    org_id = ZohoContext(base_path).books_org_id()
     
     print("="*60)
     print("商談-請求書マッチング簡易テスト")
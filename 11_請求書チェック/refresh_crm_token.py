@@ -1,7 +1,11 @@
 #!/usr/bin/env python3
 import json
-import requests
 from datetime import datetime, timedelta
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "01_Zoho_API" / "APIクライアント"))
+from zoho_http_transport import ZohoSession
 
 def refresh_crm_token():
     """ZohoCRMのアクセストークンをリフレッシュ"""
@@ -30,7 +34,7 @@ def refresh_crm_token():
         'grant_type': 'refresh_token'
     }
     
-    response = requests.post(token_url, data=data)
+    response = ZohoSession().post(token_url, data=data)
     
     if response.status_code == 200:
         new_token_data = response.json()
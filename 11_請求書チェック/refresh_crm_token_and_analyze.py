@@ -4,10 +4,18 @@ CRMトークン更新後に包括的分析を実行
 """
 import requests
 import json
+import sys
 from pathlib import Path
 from datetime import datetime
 import time
 
+sys.path.append(str(Path(__file__).parent.parent / "01_Zoho_API" / "APIクライアント"))
+from tax_engine import TaxEngine
+from zoho_context import ZohoContext
+
+# 商談金額（税抜き）の税込み換算（商談1件ごとに四捨五入）
+tax = TaxEngine()
+
 def load_config():
     """設定ファイルを読み込み"""
     config_path = Path(__file__).parent.parent / "01_Zoho_API" / "設定ファイル" / "zoho_config.json"
@@ -127,17 +135,21 @@ def analyze_deal_structure_simple(deals):
     parent_ids = set()
     
     total_amount = 0
+    total_amount_with_tax = 0
     
     for deal in deals:
         stage = deal.get('Stage', '不明')
         amount = deal.get('Amount', 0) or 0
+        amount_with_tax = tax.with_tax(amount)
         total_amount += amount
+        total_amount_with_tax += amount_with_tax
         
         # ステージ別
         if stage not in stage_stats:
-            stage_stats[stage] = {'count': 0, 'amount': 0}
+            stage_stats[stage] = {'count': 0, 'amount': 0, 'amount_with_tax': 0}
         stage_stats[stage]['count'] += 1
         stage_stats[stage]['amount'] += amount
+        stage_stats[stage]['amount_with_tax'] += amount_with_tax
         
         # 親子関係
         field78 = deal.get('field78')
@@ -151,7 +163,7 @@ def analyze_deal_structure_simple(deals):
     for stage, stats in sorted(stage_stats.items(), key=lambda x: x[1]['amount'], reverse=True):
         count = stats['count']
         amount = stats['amount']
-        amount_with_tax = amount * 1.10
+        amount_with_tax = stats['amount_with_tax']
         print(f"    {stage}: {count}件 - ¥{amount:,.0f}（税抜き）¥{amount_with_tax:,.0f}（税込み）")
     
     print(f"\n  🏗️ 親子関係:")
@@ -161,7 +173,7 @@ def analyze_deal_structure_simple(deals):
     
     print(f"\n  💰 総計:")
     print(f"    総額（税抜き）: ¥{total_amount:,.0f}")
-    print(f"    総額（税込み）: ¥{total_amount * 1.10:,.0f}")
+    print(f"    総額（税込み）: ¥{total_amount_with_tax:,.0f}")
     
     return {
         'stage_stats': stage_stats,
@@ -171,6 +183,7 @@ def analyze_deal_structure_simple(deals):
             'parent_ids_count': len(parent_ids)
         },
         'total_amount': total_amount,
+        'total_amount_with_tax': total_amount_with_tax,
         'total_deals': len(deals)
     }
 
@@ -245,6 +258,7 @@ def simple_matching_analysis(deals, invoices):
     # 商談とのマッチング
     matched_deals = 0
     matched_amount = 0
+    matched_amount_with_tax = 0
     unmatched_amount = 0
     
     for deal in deals[:200]:  # 最初の200件のみ
@@ -254,6 +268,7 @@ def simple_matching_analysis(deals, invoices):
         if deal_id in invoice_map:
             matched_deals += 1
             matched_amount += deal_amount
+            matched_amount_with_tax += tax.with_tax(deal_amount)
         else:
             unmatched_amount += deal_amount
     
@@ -268,6 +283,7 @@ def simple_matching_analysis(deals, invoices):
         'matched_deals': matched_deals,
         'match_rate': matched_deals/200*100,
         'matched_amount': matched_amount,
+        'matched_amount_with_tax': matched_amount_with_tax,
         'unmatched_amount': unmatched_amount,
         'total_invoice_amount': total_invoice_amount
     }
@@ -294,7 +310,7 @@ def main():
             'crm': {'Authorization': f'Bearer {new_crm_token["access_token"]}'},
             'books': {'Authorization': f'Bearer {books_tokens["access_token"]}'}
         }
-        org_id = "772043849"
+        org_id = ZohoContext(books_path.parent).books_org_id()
         
         print("✅ 両方のトークン準備完了")
     
@@ -325,7 +341,7 @@ def main():
         
         total_deals = deal_analysis['total_deals']
         total_amount = deal_analysis['total_amount']
-        total_amount_with_tax = total_amount * 1.10
+        total_amount_with_tax = deal_analysis['total_amount_with_tax']
         
         print(f"📊 商談サマリー（2024/4/1以降）:")
         print(f"  総商談数: {total_deals:,.0f}件")
@@ -338,7 +354,7 @@ def main():
         
         print(f"\n🔗 マッチング結果:")
         print(f"  マッチ率: {matching_analysis['match_rate']:.1f}%")
-        print(f"  推定請求済み額: ¥{matching_analysis['matched_amount'] * 1.10:,.0f}（税込み）")
+        print(f"  推定請求済み額: ¥{matching_analysis['matched_amount_with_tax']:,.0f}（税込み）")
         
         coverage = matching_analysis['total_invoice_amount'] / total_amount_with_tax * 100
         print(f"  請求書カバー率: {coverage:.1f}%")
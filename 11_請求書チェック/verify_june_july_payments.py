@@ -3,66 +3,17 @@
 6月・7月の入金データを元データで確認・検算
 JT ETP関連入金の実際の金額を特定
 """
-import requests
-import json
+import sys
 from pathlib import Path
 
-def load_books_token():
-    """Booksトークンを読み込み"""
-    token_path = Path(__file__).parent.parent / "01_Zoho_API" / "認証・トークン" / "zoho_books_tokens.json"
-    with open(token_path, 'r') as f:
-        tokens = json.load(f)
-    return tokens['access_token']
+sys.path.append(str(Path(__file__).parent.parent / "01_Zoho_API" / "APIクライアント"))
+from payment_ledger import LedgerError, open_ledger
 
-def get_payments_for_period(headers, org_id, start_date, end_date, period_name):
-    """指定期間の入金データを取得"""
-    print(f"📊 {period_name}の入金データ取得中 ({start_date}～{end_date})")
-    
-    url = "https://www.zohoapis.com/books/v3/customerpayments"
-    all_payments = []
-    page = 1
-    
-    while page <= 20:
-        params = {
-            'organization_id': org_id,
-            'per_page': 200,
-            'page': page,
-            'sort_column': 'date',
-            'sort_order': 'D',
-            'date_start': start_date,
-            'date_end': end_date
-        }
-        
-        try:
-            response = requests.get(url, headers=headers, params=params)
-            
-            if response.status_code == 200:
-                data = response.json()
-                payments = data.get('customerpayments', [])
-                
-                if payments:
-                    all_payments.extend(payments)
-                    print(f"  ページ{page}: {len(payments)}件取得 (累計: {len(all_payments)}件)")
-                    
-                    page_context = data.get('page_context', {})
-                    if not page_context.get('has_more_page', False):
-                        break
-                    page += 1
-                else:
-                    print(f"  ページ{page}: データなし")
-                    break
-            else:
-                print(f"  ❌ ページ{page}エラー: {response.status_code}")
-                if page == 1:
-                    print(f"     レスポンス: {response.text}")
-                break
-                
-        except Exception as e:
-            print(f"  ❌ ページ{page}例外: {str(e)}")
-            break
-    
-    print(f"✅ {period_name}入金データ取得完了: {len(all_payments)}件")
-    return all_payments
+def get_payments_for_period(ledger, start_date, end_date, period_name):
+    """指定期間の入金データ（同期済みの入金台帳から）"""
+    payments = ledger.payments(start_date, end_date)
+    print(f"📊 {period_name}の入金データ ({start_date}～{end_date}): {len(payments)}件")
+    return payments
 
 def analyze_jt_etp_payments(payments, period_name):
     """JT ETP関連入金を詳細分析"""
@@ -176,25 +127,18 @@ def verify_calculation():
     print(f"  6月まで入金: ¥{target_values['june_until_payment']:,.0f}")
     print(f"  7月必要入金: ¥{target_values['july_required_payment']:,.0f}")
     
-    # Booksトークン読み込み
+    # 入金台帳を7月まで同期（同期済みの月はAPIを呼ばない）
     try:
-        access_token = load_books_token()
-        headers = {'Authorization': f'Bearer {access_token}'}
-        org_id = "772043849"  # 前回取得した組織ID
-        print("✅ Booksトークン準備完了")
-    except Exception as e:
-        print(f"❌ トークン準備エラー: {e}")
+        ledger = open_ledger('2025-07')
+    except LedgerError as e:
+        print(f"❌ 入金台帳の同期エラー: {e}")
         return
     
-    # 6月入金データ取得
-    june_payments = get_payments_for_period(
-        headers, org_id, '2025-06-01', '2025-06-30', '6月'
-    )
+    # 6月入金データ
+    june_payments = get_payments_for_period(ledger, '2025-06-01', '2025-06-30', '6月')
     
-    # 7月入金データ取得
-    july_payments = get_payments_for_period(
-        headers, org_id, '2025-07-01', '2025-07-31', '7月'
-    )
+    # 7月入金データ
+    july_payments = get_payments_for_period(ledger, '2025-07-01', '2025-07-31', '7月')
     
     # JT ETP関連分析
     june_jt_amount, june_jt_candidates = analyze_jt_etp_payments(june_payments, '6月')
@@ -2,87 +2,123 @@
 """
 消費税端数差額の逆引き検証
 商談金額と請求書金額の整合性を確認
+
+保存済みの受注商談（JT_ETP_後期なし商談_*.json）があれば、商談ごとの金額から
+端数処理（切り捨て・四捨五入・切り上げ）× 単位（商談ごと・合計で1回）の税込み合計を
+整数で計算し、請求書の金額を再現するルールを探す
 """
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "01_Zoho_API" / "APIクライアント"))
+from tax_engine import TaxEngine, compare_rules, to_yen
+
+from analyze_payment_difference import find_latest_deals_file, load_deals
+
+# 確定数値（保存データがないときの商談金額にも使う）
+DEAL_COUNT = 389
+DEAL_AMOUNT_EXCLUDING_TAX = 84193885  # 商談389件（税抜き）
+INVOICE_AMOUNT_WITH_JULY = 92613274   # 請求書（7月入金含む）
+JUNE_PAYMENT = 91079160               # 6月まで入金
+JULY_JT_ETP_PAYMENT = 584400          # 7月JT ETP入金（実際は違った）
+
+
+def load_deal_amounts():
+    """保存データの受注商談の金額（税抜き）。なければ None"""
+    deals_file = find_latest_deals_file()
+    if not deals_file:
+        return None
+    deals = load_deals(deals_file)
+    print(f"✅ 商談データ読み込み: {deals_file.name}（受注{len(deals)}件）")
+    return [deal.get('Amount') or 0 for deal in deals]
+
 
 def verify_tax_calculation():
     """消費税計算の逆引き検証"""
     print("="*80)
     print("📊 消費税端数差額の逆引き検証")
     print("="*80)
-    
-    # 正確な数値
-    deal_amount_excluding_tax = 84193885  # 商談389件（税抜き）
-    deal_amount_including_tax = 92613274  # 商談389件（税込み）
-    invoice_amount_with_july = 92613274   # 請求書（7月入金含む）
-    june_payment = 91079160              # 6月まで入金
-    july_jt_etp_payment = 584400         # 7月JT ETP入金（実際は違った）
-    
+
+    amounts = load_deal_amounts()
+    if amounts:
+        deal_count = len(amounts)
+        deal_amount_excluding_tax = sum(to_yen(amount) for amount in amounts)
+    else:
+        print("⚠️ 保存データがないため確定数値（合計額）で検証します")
+        deal_count = DEAL_COUNT
+        deal_amount_excluding_tax = DEAL_AMOUNT_EXCLUDING_TAX
+        amounts = [DEAL_AMOUNT_EXCLUDING_TAX]
+
     print("📋 確定数値:")
-    print(f"  商談389件（税抜き）: ¥{deal_amount_excluding_tax:,.0f}")
-    print(f"  商談389件（税込み）: ¥{deal_amount_including_tax:,.0f}")
-    print(f"  請求書（7月入金含む）: ¥{invoice_amount_with_july:,.0f}")
-    print(f"  6月まで入金: ¥{june_payment:,.0f}")
-    
-    # 消費税計算の検証
-    print(f"\n🧮 消費税計算検証:")
-    calculated_tax_inclusive = deal_amount_excluding_tax * 1.10
-    print(f"  計算値（税抜き × 1.10）: ¥{calculated_tax_inclusive:,.2f}")
-    print(f"  実際の税込み額: ¥{deal_amount_including_tax:,.0f}")
-    
-    tax_diff = calculated_tax_inclusive - deal_amount_including_tax
-    print(f"  差額: ¥{tax_diff:,.2f}")
-    
-    if abs(tax_diff) < 1:
-        print("  ✅ 消費税計算は正確")
+    print(f"  商談{deal_count}件（税抜き）: ¥{deal_amount_excluding_tax:,.0f}")
+    print(f"  請求書（7月入金含む）: ¥{INVOICE_AMOUNT_WITH_JULY:,.0f}")
+    print(f"  6月まで入金: ¥{JUNE_PAYMENT:,.0f}")
+
+    # 端数処理ルールごとの税込み合計（整数演算なので浮動小数点の誤差はない）
+    print(f"\n🧮 端数処理ルール別の税込み合計:")
+    matching_rules = []
+    for rule, total in compare_rules(amounts):
+        diff = total - INVOICE_AMOUNT_WITH_JULY
+        mark = "✅" if diff == 0 else "  "
+        print(f"  {mark} {rule}: ¥{total:,.0f}（請求書との差 ¥{diff:+,.0f}）")
+        if diff == 0:
+            matching_rules.append(rule)
+
+    if matching_rules:
+        rule = matching_rules[0]
+        print(f"\n  ✅ 請求書は「{rule}」で計算した額と一致")
     else:
-        print(f"  ⚠️ 消費税計算に{tax_diff:,.2f}円の差異")
-    
+        rule = None
+        print(f"\n  ⚠️ どの端数処理ルールでも請求書額と一致しません（金額そのものの差異）")
+    engine = TaxEngine(rule)
+    deal_amount_including_tax = engine.invoice_total(amounts)
+
     # 請求書との照合
     print(f"\n📊 請求書との照合:")
-    invoice_diff = deal_amount_including_tax - invoice_amount_with_july
-    print(f"  商談税込み: ¥{deal_amount_including_tax:,.0f}")
-    print(f"  請求書額: ¥{invoice_amount_with_july:,.0f}")
+    invoice_diff = deal_amount_including_tax - INVOICE_AMOUNT_WITH_JULY
+    print(f"  商談税込み（{engine.rule}）: ¥{deal_amount_including_tax:,.0f}")
+    print(f"  請求書額: ¥{INVOICE_AMOUNT_WITH_JULY:,.0f}")
     print(f"  差額: ¥{invoice_diff:,.0f}")
-    
+
     if invoice_diff == 0:
         print("  ✅ 完全一致！商談と請求書は整合")
     else:
         print(f"  ⚠️ {abs(invoice_diff):,.0f}円の差異あり")
-    
+
     # 入金との照合
     print(f"\n💰 入金との照合:")
-    july_missing = deal_amount_including_tax - june_payment
+    july_missing = deal_amount_including_tax - JUNE_PAYMENT
     print(f"  商談税込み: ¥{deal_amount_including_tax:,.0f}")
-    print(f"  6月まで入金: ¥{june_payment:,.0f}")
+    print(f"  6月まで入金: ¥{JUNE_PAYMENT:,.0f}")
     print(f"  7月入金必要額: ¥{july_missing:,.0f}")
-    
+
     # 7月の実際のJT ETP入金
     print(f"\n🔍 7月入金の検証:")
     print(f"  必要な7月入金: ¥{july_missing:,.0f}")
-    print(f"  実際の7月JT ETP入金: ¥{july_jt_etp_payment:,.0f}（誤認）")
-    
+    print(f"  実際の7月JT ETP入金: ¥{JULY_JT_ETP_PAYMENT:,.0f}（誤認）")
+
     # 逆引き：必要な7月入金を特定
     print(f"\n🎯 逆引き結論:")
     print("="*50)
-    print("1. 商談389件と請求書は完全一致（¥92,613,274）")
-    print("2. 6月まで入金: ¥91,079,160")
+    print(f"1. 商談{deal_count}件と請求書の差額: ¥{invoice_diff:,.0f}（{engine.rule}）")
+    print(f"2. 6月まで入金: ¥{JUNE_PAYMENT:,.0f}")
     print(f"3. 7月に入金されるべき額: ¥{july_missing:,.0f}")
-    print("4. この¥1,534,114が7月のJT ETP関連入金として")
+    print(f"4. この¥{july_missing:,.0f}が7月のJT ETP関連入金として")
     print("   ZohoBooksに記録されているはず")
-    
+
     print(f"\n💡 検証すべき点:")
-    print("- 7月の入金¥1,534,114に相当するJT ETP入金を特定")
+    print(f"- 7月の入金¥{july_missing:,.0f}に相当するJT ETP入金を特定")
     print("- 顧客名が「JT」以外でもJT ETP関連の可能性")
     print("- 複数の小口入金の合計がこの金額になる可能性")
-    
+
     # 平均単価から推定
-    avg_deal_amount = deal_amount_excluding_tax / 389
-    estimated_deals = july_missing / (avg_deal_amount * 1.10)
-    
+    avg_deal_amount_with_tax = deal_amount_including_tax / deal_count
+    estimated_deals = july_missing / avg_deal_amount_with_tax
+
     print(f"\n📈 推定:")
-    print(f"  平均商談単価（税抜き）: ¥{avg_deal_amount:,.0f}")
+    print(f"  平均商談単価（税込み）: ¥{avg_deal_amount_with_tax:,.0f}")
     print(f"  7月入金相当商談数: {estimated_deals:.1f}件")
     print(f"  → 約{estimated_deals:.0f}件分の商談が7月に入金")
 
 if __name__ == "__main__":
-    verify_tax_calculation()
\ No newline at end of file
+    verify_tax_calculation()
@@ -5,11 +5,15 @@ Zoho CRM と Zoho Books 統合認証マネージャー
 請求書チェックプロジェクト用
 """
 
-import requests
 import json
 import os
 from datetime import datetime
 from urllib.parse import urlencode
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "01_Zoho_API" / "APIクライアント"))
+from zoho_http_transport import ZohoSession
 
 class ZohoAuthManager:
     def __init__(self, client_id, client_secret, redirect_uri, org_id):
@@ -18,6 +22,7 @@ class ZohoAuthManager:
         self.redirect_uri = redirect_uri
         self.org_id = org_id
         self.base_url = "https://accounts.zoho.com/oauth/v2"
+        self.http = ZohoSession()
         
     def get_authorization_url(self, scope="ZohoCRM.modules.ALL,ZohoCRM.settings.modules.READ,ZohoCRM.settings.fields.READ,ZohoBooks.fullaccess.all"):
         """CRMとBooks両方のスコープを含む認証URLを生成"""
@@ -44,7 +49,7 @@ class ZohoAuthManager:
             'grant_type': 'authorization_code'
         }
         
-        response = requests.post(token_url, data=data)
+        response = self.http.post(token_url, data=data)
         
         if response.status_code == 200:
             return response.json()
@@ -62,7 +67,7 @@ class ZohoAuthManager:
             'grant_type': 'refresh_token'
         }
         
-        response = requests.post(token_url, data=data)
+        response = self.http.post(token_url, data=data)
         
         if response.status_code == 200:
             return response.json()
@@ -90,6 +95,7 @@ class ZohoCRMAPI:
         self.access_token = access_token
         self.org_id = org_id
         self.base_url = f"https://www.zohoapis.com/crm/v3"
+        self.http = ZohoSession()
         
     def get_headers(self):
         """APIリクエスト用のヘッダーを取得"""
@@ -101,7 +107,7 @@ class ZohoCRMAPI:
     def get_modules(self):
         """利用可能なモジュール一覧を取得"""
         url = f"{self.base_url}/settings/modules"
-        response = requests.get(url, headers=self.get_headers())
+        response = self.http.get(url, headers=self.get_headers())
         
         if response.status_code == 200:
             return response.json()
@@ -111,7 +117,7 @@ class ZohoCRMAPI:
     def get_module_fields(self, module_name):
         """指定モジュールのフィールド一覧を取得"""
         url = f"{self.base_url}/settings/modules/{module_name}/fields"
-        response = requests.get(url, headers=self.get_headers())
+        response = self.http.get(url, headers=self.get_headers())
         
         if response.status_code == 200:
             return response.json()
@@ -124,7 +130,7 @@ class ZohoCRMAPI:
         if params:
             url += "?" + urlencode(params)
         
-        response = requests.get(url, headers=self.get_headers())
+        response = self.http.get(url, headers=self.get_headers())
         
         if response.status_code == 200:
             return response.json()
@@ -136,6 +142,7 @@ class ZohoBooksAPI:
         self.access_token = access_token
         self.org_id = org_id
         self.base_url = f"https://books.zoho.com/api/v3"
+        self.http = ZohoSession()
         
     def get_headers(self):
         """APIリクエスト用のヘッダーを取得"""
@@ -148,7 +155,7 @@ class ZohoBooksAPI:
     def get_organizations(self):
         """組織一覧を取得"""
         url = f"{self.base_url}/organizations"
-        response = requests.get(url, headers=self.get_headers())
+        response = self.http.get(url, headers=self.get_headers())
         
         if response.status_code == 200:
             return response.json()
@@ -161,7 +168,7 @@ class ZohoBooksAPI:
         if params:
             url += "?" + urlencode(params)
         
-        response = requests.get(url, headers=self.get_headers())
+        response = self.http.get(url, headers=self.get_headers())
         
         if response.status_code == 200:
             return response.json()
@@ -171,7 +178,7 @@ class ZohoBooksAPI:
     def get_invoice(self, invoice_id):
         """特定の請求書を取得"""
         url = f"{self.base_url}/invoices/{invoice_id}"
-        response = requests.get(url, headers=self.get_headers())
+        response = self.http.get(url, headers=self.get_headers())
         
         if response.status_code == 200:
             return response.json()
@@ -184,7 +191,7 @@ class ZohoBooksAPI:
         if params:
             url += "?" + urlencode(params)
         
-        response = requests.get(url, headers=self.get_headers())
+        response = self.http.get(url, headers=self.get_headers())
         
         if response.status_code == 200:
             return response.json()
@@ -12,7 +12,6 @@ from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
-import aiohttp
 from mcp.server import Server
 from mcp.server.models import InitializationOptions
 from mcp.types import (
@@ -26,6 +25,9 @@ from mcp.types import (
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
+# 共通HTTPトランスポートは zoho-http-transport パッケージから使う（README のインストール手順を参照）
+from zoho_http_transport import AsyncZohoSession
+
 
 class N8NClient:
     """N8N APIクライアント"""
@@ -33,6 +35,8 @@ class N8NClient:
     def __init__(self, api_url: str, api_key: str):
         self.api_url = api_url.rstrip('/')
         self.api_key = api_key
+        # MCPはstdoutをプロトコルに使うため、再試行ログはstderrへ
+        self.transport = AsyncZohoSession(log=lambda message: print(message, file=sys.stderr))
         
     async def make_request(self, method: str, endpoint: str, params: Optional[Dict] = None, data: Optional[Dict] = None) -> Dict:
         """API リクエストを実行"""
@@ -42,18 +46,21 @@ class N8NClient:
             "Content-Type": "application/json"
         }
         
-        async with aiohttp.ClientSession() as session:
-            async with session.request(method, url, headers=headers, params=params, json=data) as response:
-                response_text = await response.text()
-                
-                if response.status == 200:
-                    return json.loads(response_text) if response_text else {}
-                elif response.status == 201:
-                    return json.loads(response_text) if response_text else {}
-                elif response.status == 204:
-                    return {"success": True}
-                else:
-                    raise Exception(f"N8N API エラー: {response.status} - {response_text}")
+        # 429/5xxはバックオフ付きで再試行
+        response = await self.transport.request(method, url, headers=headers, params=params, json=data)
+        
+        if response.status == 200:
+            return response.json()
+        elif response.status == 201:
+            return response.json()
+        elif response.status == 204:
+            return {"success": True}
+        else:
+            raise Exception(f"N8N API エラー: {response.status} - {response.text}")
+    
+    async def close(self):
+        """HTTPセッションを閉じる"""
+        await self.transport.close()
     
     async def get_workflows(self, active: Optional[bool] = None) -> List[Dict]:
         """ワークフロー一覧を取得"""
@@ -478,16 +485,20 @@ class N8NMCPServer:
         """サーバーを実行"""
         from mcp.server.stdio import stdio_server
         
-        async with stdio_server() as (read_stream, write_stream):
-            await self.server.run(
-                read_stream, 
-                write_stream, 
-                InitializationOptions(
-                    server_name="n8n-mcp",
-                    server_version="1.0.0",
-                    capabilities={}
+        try:
+            async with stdio_server() as (read_stream, write_stream):
+                await self.server.run(
+                    read_stream, 
+                    write_stream, 
+                    InitializationOptions(
+                        server_name="n8n-mcp",
+                        server_version="1.0.0",
+                        capabilities={}
+                    )
                 )
-            )
+        finally:
+            if self.client:
+                await self.client.close()
 
 
 async def main():
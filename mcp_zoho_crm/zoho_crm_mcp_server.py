@@ -19,7 +19,6 @@ import socketserver
 import threading
 import time
 
-import aiohttp
 from mcp.server import Server
 from mcp.server.models import InitializationOptions
 from mcp.types import (
@@ -33,6 +32,9 @@ from mcp.types import (
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
+# 共通HTTPトランスポートは zoho-http-transport パッケージから使う（README のインストール手順を参照）
+from zoho_http_transport import AsyncZohoSession
+
 
 class CallbackServer:
     """OAuth認証コールバック受信用サーバー"""
@@ -117,7 +119,13 @@ class ZohoCRMClient:
         self.token_expires_at = None
         self.api_domain = "https://www.zohoapis.com"
         self.redirect_uri = "http://localhost:8080/callback"
-        self.token_file_path = project_root / "01_Zoho_API" / "認証・トークン" / "zoho_crm_tokens.json"
+        self.token_file_path = Path(os.getenv('ZOHO_CRM_TOKEN_FILE') or
+                                    project_root / "01_Zoho_API" / "認証・トークン" / "zoho_crm_tokens.json")
+        # MCPはstdoutをプロトコルに使うため、再試行ログはstderrへ
+        self.transport = AsyncZohoSession(
+            token_refresher=self._refresh_for_retry,
+            log=lambda message: print(message, file=sys.stderr)
+        )
         
     async def refresh_access_token(self):
         """アクセストークンをリフレッシュ（失敗時は自動再認証）"""
@@ -135,26 +143,25 @@ class ZohoCRMClient:
             "grant_type": "refresh_token"
         }
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(token_url, data=data) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    self.access_token = result.get("access_token")
-                    # リフレッシュトークンが更新される場合があります
-                    if result.get("refresh_token"):
-                        self.refresh_token = result.get("refresh_token")
-                    expires_in = result.get("expires_in", 3600)
-                    self.token_expires_at = datetime.now() + timedelta(seconds=expires_in)
-                    
-                    # 新しいトークンを保存
-                    await self.save_tokens()
-                    return True
-                else:
-                    error_text = await response.text()
-                    print(f"リフレッシュトークンが無効になりました: {response.status} - {error_text}")
-                    print("自動再認証を開始します...")
-                    await self.perform_full_authentication()
-                    return True
+        # トークンエンドポイントも共通トランスポート経由（429の再試行・メトリクス記録）
+        response = await self.transport.request("POST", token_url, data=data)
+        if response.status == 200:
+            result = response.json()
+            self.access_token = result.get("access_token")
+            # リフレッシュトークンが更新される場合があります
+            if result.get("refresh_token"):
+                self.refresh_token = result.get("refresh_token")
+            expires_in = result.get("expires_in", 3600)
+            self.token_expires_at = datetime.now() + timedelta(seconds=expires_in)
+            
+            # 新しいトークンを保存
+            await self.save_tokens()
+            return True
+        else:
+            print(f"リフレッシュトークンが無効になりました: {response.status} - {response.text}")
+            print("自動再認証を開始します...")
+            await self.perform_full_authentication()
+            return True
     
     async def perform_full_authentication(self):
         """完全な認証フローを実行（ブラウザを使用）"""
@@ -221,21 +228,19 @@ class ZohoCRMClient:
             'grant_type': 'authorization_code'
         }
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(token_url, data=data) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    self.access_token = result.get('access_token')
-                    self.refresh_token = result.get('refresh_token')
-                    expires_in = result.get('expires_in', 3600)
-                    self.token_expires_at = datetime.now() + timedelta(seconds=expires_in)
-                    
-                    # トークンを保存
-                    await self.save_tokens()
-                    return True
-                else:
-                    error_text = await response.text()
-                    raise Exception(f"トークン取得エラー: {response.status} - {error_text}")
+        response = await self.transport.request('POST', token_url, data=data)
+        if response.status == 200:
+            result = response.json()
+            self.access_token = result.get('access_token')
+            self.refresh_token = result.get('refresh_token')
+            expires_in = result.get('expires_in', 3600)
+            self.token_expires_at = datetime.now() + timedelta(seconds=expires_in)
+            
+            # トークンを保存
+            await self.save_tokens()
+            return True
+        else:
+            raise Exception(f"トークン取得エラー: {response.status} - {response.text}")
     
     async def save_tokens(self):
         """トークンをファイルに保存"""
@@ -301,16 +306,24 @@ class ZohoCRMClient:
             "Content-Type": "application/json"
         }
         
-        async with aiohttp.ClientSession() as session:
-            async with session.request(method, url, headers=headers, params=params, json=data) as response:
-                response_text = await response.text()
-                
-                if response.status == 200:
-                    return json.loads(response_text) if response_text else {}
-                elif response.status == 204:
-                    return {"success": True}
-                else:
-                    raise Exception(f"API エラー: {response.status} - {response_text}")
+        # 429/5xxはバックオフ付きで再試行、401はトークン更新後に再送
+        response = await self.transport.request(method, url, headers=headers, params=params, json=data)
+        
+        if response.status == 200:
+            return response.json()
+        elif response.status == 204:
+            return {"success": True}
+        else:
+            raise Exception(f"API エラー: {response.status} - {response.text}")
+    
+    async def _refresh_for_retry(self):
+        """401応答時にトークンを更新し、新しいアクセストークンを返す"""
+        await self.refresh_access_token()
+        return self.access_token
+    
+    async def close(self):
+        """HTTPセッションを閉じる"""
+        await self.transport.close()
     
     async def get_modules(self) -> List[Dict]:
         """利用可能なモジュール一覧を取得"""
@@ -756,16 +769,20 @@ class ZohoCRMMCPServer:
         """サーバーを実行"""
         from mcp.server.stdio import stdio_server
         
-        async with stdio_server() as (read_stream, write_stream):
-            await self.server.run(
-                read_stream, 
-                write_stream, 
-                InitializationOptions(
-                    server_name="zoho-crm-mcp",
-                    server_version="1.0.0",
-                    capabilities={}
+        try:
+            async with stdio_server() as (read_stream, write_stream):
+                await self.server.run(
+                    read_stream, 
+                    write_stream, 
+                    InitializationOptions(
+                        server_name="zoho-crm-mcp",
+                        server_version="1.0.0",
+                        capabilities={}
+                    )
                 )
-            )
+        finally:
+            if self.client:
+                await self.client.close()
 
 
 async def main():
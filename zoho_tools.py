@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+zoho-tools: 分析スクリプトの共通コマンドライン
+スクリプトごとに繰り返していたインタープリタ起動・トークン読み込み・Books組織IDの取得を、
+1つのプロセスの ZohoContext（zoho_context.py）で共有する
+
+- 組織IDはキャッシュファイルから読み、/books/v3/organizations は期限切れ時だけ呼ぶ
+- CRM・Books の接続（requests.Session）とトークンヘッダーをコマンド間で共有
+- batch では同じGET（請求書一覧のページなど）のレスポンスを分析間で使い回す
+  （条件付きGETは除く）。日付順の請求書一覧など、複数の分析が同じ形で使うデータは
+  context.memo で1回だけ取得する
+- 分析スクリプトは実行するコマンドのものだけ読み込む（status などは重い依存を読み込まない）
+
+使い方（リポジトリのルートで実行）:
+    python zoho_tools.py list
+    python zoho_tools.py status
+    python zoho_tools.py org-id [--refresh]
+    python zoho_tools.py leakage --incremental
+    python zoho_tools.py versant grouped basic --today=2025-07-01
+    python zoho_tools.py query 02_VERSANTコーチング/SQL/versant_base_students.sql
+    python zoho_tools.py batch "leakage --incremental" invoice-match jt-etp
+    python zoho_tools.py batch --file=毎朝の分析.txt     # 1行1コマンド（# はコメント）
+"""
+
+import importlib
+import json
+import shlex
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).parent
+API_CLIENT_DIR = REPO_ROOT / "01_Zoho_API" / "APIクライアント"
+TOKEN_DIR = REPO_ROOT / "01_Zoho_API" / "認証・トークン"
+
+# 分析スクリプトの置き場所（sys.path に追加して import する）
+SCRIPT_DIRS = [
+    API_CLIENT_DIR,
+    REPO_ROOT / "11_請求書チェック",
+    REPO_ROOT / "10_商品マスタ更新",
+    REPO_ROOT / "02_VERSANTコーチング" / "実行スクリプト",
+]
+
+# コマンド名 → (説明, モジュール名)。各モジュールの main(context) を呼び出す
+ANALYSES = {
+    'leakage': ("請求漏れ分析（親子構造・消費税対応）[--incremental] [--profile]",
+                'correct_invoice_leakage_analyzer'),
+    'invoice-leakage': ("請求漏れ分析（レイアウト別の親子構造）", 'invoice_leakage_analyzer'),
+    'invoice-match': ("商談・請求書マッチング", 'improved_invoice_matcher'),
+    'jt-etp': ("JT ETP事務局 完全分析", 'complete_jt_etp_analysis'),
+    'books-jt': ("Books JT ETP 包括分析", 'comprehensive_books_analysis'),
+    'pattern': ("5パターン包括的整合性分析 [--resume] [--workers=N] [--profile]", 'comprehensive_pattern_analysis'),
+    'hierarchy': ("商談の親子構造分析", 'analyze_deal_hierarchy'),
+    'relations': ("CRM・Books のテーブル関連分析", 'analyze_crm_books_relations'),
+    'jt-etp-detail': ("JT ETP事務局 上期/下期の詳細分析", 'analyze_jt_etp_detail'),
+    'parent-invoices': ("JT ETP親商談の請求書確認", 'check_parent_deal_invoices'),
+    'payment-difference': ("JT ETP 後期なし商談と入金の差額 [--until=] [--paid=] [--payments=]",
+                           'analyze_payment_difference'),
+    'versant': ("VERSANTコーチングレポート [版名...] [--today=] [--refresh] [--incremental]",
+                'versant_report_engine'),
+}
+
+for path in SCRIPT_DIRS:
+    if str(path) not in sys.path:
+        sys.path.append(str(path))
+
+from zoho_context import ContextError, ZohoContext
+
+
+def parse_options(args):
+    """--key=value 形式のオプションと、それ以外の引数に分ける"""
+    options = dict(arg[2:].split('=', 1) for arg in args if arg.startswith('--') and '=' in arg)
+    positional = [arg for arg in args if not arg.startswith('--')]
+    return options, positional
+
+
+# ---------------------------------------------------------------------------
+# 組み込みコマンド
+# ---------------------------------------------------------------------------
+
+def command_list(context, args):
+    """コマンド一覧"""
+    print("コマンド:")
+    for name, (description, _) in COMMANDS.items():
+        print(f"  {name:<16} {description}")
+    for name, (description, module) in ANALYSES.items():
+        print(f"  {name:<16} {description}（{module}.py）")
+    return 0
+
+
+def command_status(context, args):
+    """トークンの有効期限と組織IDキャッシュ（APIは呼ばない）"""
+    print("🔑 トークン状態")
+    for service in ('crm', 'books'):
+        token_file = context.token_file(service)
+        try:
+            with open(token_file, 'r', encoding='utf-8') as f:
+                tokens = json.load(f)
+        except (OSError, ValueError):
+            print(f"  ❌ {service}: {token_file.name} を読み込めません")
+            continue
+        expires_at = tokens.get('expires_at')
+        if not expires_at:
+            print(f"  ⚠️ {service}: 有効期限が不明です（{token_file.name}）")
+            continue
+        remaining = (datetime.fromisoformat(expires_at) - datetime.now()).total_seconds()
+        mark = '✅' if remaining > 0 else '⚠️'
+        state = f"残り{remaining / 60:.0f}分" if remaining > 0 else "期限切れ（次のリクエストで更新）"
+        print(f"  {mark} {service}: {expires_at}（{state}）")
+
+    org_id = context.cached_books_org_id()
+    print(f"\n🏢 Books組織ID: {org_id or '未取得（org-id で取得）'}")
+    return 0
+
+
+def command_org_id(context, args):
+    """Books組織ID（--refresh でAPIから取り直す）"""
+    org_id = context.books_org_id(refresh='--refresh' in args)
+    if not org_id:
+        print("❌ Books組織IDが取得できませんでした")
+        return 1
+    print(org_id)
+    return 0
+
+
+def analytics_client(context):
+    """Analytics クライアント（トークンの取得は最初のリクエストまで遅らせ、コマンド間で共有）"""
+    from zoho_analytics_api_client_auto import ZohoAnalyticsAPIAuto
+    return context.memo('analytics', ZohoAnalyticsAPIAuto)
+
+
+def command_workspaces(context, args):
+    """Analytics のワークスペース一覧"""
+    result = analytics_client(context).get_workspaces()
+    if not result or 'data' not in result:
+        print("❌ ワークスペース取得に失敗しました")
+        return 1
+    for kind in ('ownedWorkspaces', 'sharedWorkspaces'):
+        for workspace in result['data'].get(kind, []):
+            print(f"  {workspace.get('workspaceId')}  {workspace.get('workspaceName')}")
+    return 0
+
+
+def command_tables(context, args):
+    """Analytics のテーブル一覧"""
+    result = analytics_client(context).get_tables()
+    if not result or 'data' not in result:
+        print("❌ テーブル取得に失敗しました")
+        return 1
+    for view in result['data'].get('views', []):
+        print(f"  {view.get('viewId')}  {view.get('viewName')}")
+    return 0
+
+
+def command_query(context, args):
+    """SQLファイルを Analytics で実行（--output= でJSONに保存）"""
+    options, paths = parse_options(args)
+    if not paths:
+        print("使い方: python zoho_tools.py query <SQLファイル> [...] [--output=結果.json]")
+        return 1
+    client = analytics_client(context)
+    failed = 0
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            result = client.execute_query(f.read())
+        if result is None:
+            failed += 1
+            print(f"  ❌ {path}")
+            continue
+        print(f"  ✅ {path}: {len(result.get('data', []))}行")
+        if options.get('output'):
+            output_file = Path(options['output'])
+            if len(paths) > 1:
+                output_file = output_file.with_name(f"{output_file.stem}_{Path(path).stem}{output_file.suffix}")
+            with open(output_file, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+            print(f"     💾 {output_file}")
+    return 1 if failed else 0
+
+
+def command_batch(context, args):
+    """複数のコマンドを1つのプロセスで順に実行（接続・トークン・取得済みデータを共有）"""
+    options, commands = parse_options(args)
+    if options.get('file'):
+        with open(options['file'], 'r', encoding='utf-8') as f:
+            commands += [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+    if not commands:
+        print("使い方: python zoho_tools.py batch \"<コマンド> [オプション]\" ... [--file=コマンド一覧.txt]")
+        return 1
+
+    results = []
+    for line in commands:
+        name, *command_args = shlex.split(line)
+        if name == 'batch':
+            print("⚠️ batch の中で batch は実行できません")
+            results.append((line, 1, 0.0))
+            continue
+        print(f"\n{'=' * 80}\n▶ {line}\n{'=' * 80}")
+        started = time.perf_counter()
+        try:
+            status = run_command(context, name, command_args)
+        except Exception as e:
+            # 1つの分析が失敗しても残りは実行する
+            print(f"❌ {name} でエラーが発生しました: {e}")
+            status = 1
+        results.append((line, status, time.perf_counter() - started))
+
+    print(f"\n{'=' * 80}\n📋 batch 結果\n{'=' * 80}")
+    for line, status, seconds in results:
+        print(f"  {'✅' if not status else '❌'} {line}（{seconds:.1f}秒）")
+    stats = context.stats()
+    print(f"  共有: 接続 {stats['sessions']}件、キャッシュ済みレスポンス {stats['cached_responses']}件"
+          f"（再利用 {stats['cache_hits']}回）、"
+          f"組織ID {stats['org_id'] or '-'}")
+    return 1 if any(status for _, status, _ in results) else 0
+
+
+# コマンド名 → (説明, 関数)
+COMMANDS = {
+    'list': ("コマンド一覧", command_list),
+    'status': ("トークンの有効期限と組織IDキャッシュ（APIは呼ばない）", command_status),
+    'org-id': ("Books組織ID [--refresh]", command_org_id),
+    'workspaces': ("Analytics のワークスペース一覧", command_workspaces),
+    'tables': ("Analytics のテーブル一覧", command_tables),
+    'query': ("SQLファイルを Analytics で実行 <SQLファイル>... [--output=]", command_query),
+    'batch': ("複数のコマンドを1プロセスで実行 \"<コマンド> [オプション]\"... [--file=]", command_batch),
+}
+
+
+def run_analysis(context, module_name, args):
+    """分析スクリプトの main(context) を、そのスクリプトを直接実行したときと同じ引数で呼び出す"""
+    module = importlib.import_module(module_name)
+    saved_argv = sys.argv
+    sys.argv = [module.__file__, *args]
+    try:
+        return module.main(context) or 0
+    finally:
+        sys.argv = saved_argv
+
+
+def run_command(context, name, args):
+    """コマンドを実行して終了ステータスを返す"""
+    if name in COMMANDS:
+        return COMMANDS[name][1](context, args)
+    if name in ANALYSES:
+        return run_analysis(context, ANALYSES[name][1], args)
+    print(f"❌ 未知のコマンドです: {name}（python zoho_tools.py list で一覧）")
+    return 1
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        return 1
+    name, args = sys.argv[1], sys.argv[2:]
+    with ZohoContext(TOKEN_DIR, share_responses=(name == 'batch')) as context:
+        try:
+            return run_command(context, name, args)
+        except (ContextError, ValueError) as e:
+            # トークンファイル・Analytics のトークン設定がない
+            print(f"❌ {e}")
+            return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())